@@ -100,7 +100,7 @@ def format_fecha_es(fecha: datetime.date, con_anio: bool = False) -> str:
 
 # Motor difuso
 try:
-    from motor_difuso import calcular_espera
+    from motor_difuso import calcular_espera, calcular_espera_batch
     FUZZY_AVAILABLE = True
     logger.info("Motor difuso cargado exitosamente")
 except ImportError:
@@ -109,6 +109,8 @@ except ImportError:
     def calcular_espera(ocupacion, urgencia):
         base = ocupacion * 0.4 + urgencia * 5
         return min(60, max(5, base))
+    def calcular_espera_batch(ocupaciones, urgencia, hora=12):
+        return [calcular_espera(ocupacion, urgencia) for ocupacion in ocupaciones]
 
 # =====================================================
 # ✅ SISTEMA DE LOGGING MEJORADO (conversation_logger.py)
@@ -1210,12 +1212,11 @@ class ActionRecomendarHorarioFuzzy(Action):
                     'tarde': ('12:00-15:00', (12, 15))
                 }
                 
-                # Calcular tiempo de espera con motor difuso
+                # Calcular tiempo de espera con motor difuso (todas las franjas en una sola evaluación)
                 recomendaciones_detalladas = {}
-                for franja, porcentaje_ocupacion in ocupacion_franjas.items():
-                    urgencia = 5  # Nivel medio
-                    tiempo_espera = calcular_espera(porcentaje_ocupacion, urgencia)
-                    
+                urgencia = 5  # Nivel medio
+                tiempos_espera = [float(t) for t in calcular_espera_batch(list(ocupacion_franjas.values()), urgencia, 12)]
+                for (franja, porcentaje_ocupacion), tiempo_espera in zip(ocupacion_franjas.items(), tiempos_espera):
                     rango, horas = franjas_info[franja]
                     
                     # Obtener horarios disponibles de esta franja
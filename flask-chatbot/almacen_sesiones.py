@@ -0,0 +1,194 @@
+"""
+ALMACÉN DE SESIONES EN MEMORIA
+Reemplaza al dict SESSION_CONTEXTS del orquestador, que nunca soltaba nada:
+- Capacidad máxima con desalojo LRU (la sesión usada hace más tiempo sale primero)
+- Expiración por inactividad (TTL) con un hilo de barrido en segundo plano
+- Métricas de sesiones vivas, creadas, expiradas y desalojadas
+Se usa igual que un dict (in, [], del, get, clear, len) para no romper a quien lo importa.
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# CONFIGURACIÓN
+# =====================================================
+
+SESIONES_MAX = int(os.getenv('SESIONES_MAX', 5000))  # Sesiones vivas como máximo
+SESIONES_TTL = float(os.getenv('SESIONES_TTL', 1800))  # Segundos de inactividad antes de expirar
+SESIONES_BARRIDO_SEG = float(os.getenv('SESIONES_BARRIDO_SEG', 60))  # Cada cuánto corre el barrido
+
+# =====================================================
+# ALMACÉN
+# =====================================================
+
+class AlmacenSesiones:
+    """
+    Dict thread-safe session_id -> contexto con LRU + TTL de inactividad.
+    Leer una sesión cuenta como actividad: la renueva y la pasa al final del LRU.
+    """
+
+    def __init__(self, capacidad: int = SESIONES_MAX, ttl: float = SESIONES_TTL,
+                 barrido_seg: float = SESIONES_BARRIDO_SEG):
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self.barrido_seg = barrido_seg
+        self._datos = OrderedDict()  # session_id -> (ultimo_uso, contexto), del más viejo al más nuevo
+        self._lock = threading.RLock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._metricas = {'creadas': 0, 'hits': 0, 'misses': 0, 'expiradas': 0, 'desalojadas': 0}
+
+    # =====================================================
+    # ACCESO
+    # =====================================================
+
+    def _vencida(self, ultimo_uso: float, ahora: float) -> bool:
+        return ahora - ultimo_uso > self.ttl
+
+    def _leer(self, session_id: str, contar: bool = True) -> Optional[Any]:
+        """Contexto vivo (renovado) o None; las sesiones vencidas se eliminan al leerlas"""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(session_id)
+            if entrada is not None and self._vencida(entrada[0], ahora):
+                del self._datos[session_id]
+                self._metricas['expiradas'] += 1
+                entrada = None
+            if entrada is None:
+                if contar:
+                    self._metricas['misses'] += 1
+                return None
+            self._datos[session_id] = (ahora, entrada[1])
+            self._datos.move_to_end(session_id)
+            if contar:
+                self._metricas['hits'] += 1
+            return entrada[1]
+
+    def _guardar(self, session_id: str, contexto: Any):
+        """Guarda (o reemplaza) una sesión y desaloja las menos usadas si se pasa de capacidad"""
+        with self._lock:
+            self._datos[session_id] = (time.monotonic(), contexto)
+            self._datos.move_to_end(session_id)
+            while len(self._datos) > self.capacidad:
+                desalojada, _ = self._datos.popitem(last=False)
+                self._metricas['desalojadas'] += 1
+                logger.info(f"🧹 Sesión desalojada por capacidad: {desalojada}")
+        # Toda escritura pasa por acá (obtener_o_crear y almacen[id] = ...): el barrido arranca con la primera
+        if self._hilo is None:
+            self.iniciar_barrido()
+
+    def obtener_o_crear(self, session_id: str, fabrica: Callable[[str], Any]) -> Tuple[Any, bool]:
+        """(contexto, creado): lo crea con fabrica(session_id) si no existe o expiró"""
+        with self._lock:
+            contexto = self._leer(session_id)
+            if contexto is not None:
+                return contexto, False
+            contexto = fabrica(session_id)
+            self._guardar(session_id, contexto)
+            self._metricas['creadas'] += 1
+        return contexto, True
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        contexto = self._leer(session_id)
+        return default if contexto is None else contexto
+
+    def pop(self, session_id: str, default: Any = None) -> Any:
+        with self._lock:
+            entrada = self._datos.pop(session_id, None)
+        return default if entrada is None else entrada[1]
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    # Interfaz de dict
+    def __contains__(self, session_id: str) -> bool:
+        return self._leer(session_id, contar=False) is not None
+
+    def __getitem__(self, session_id: str) -> Any:
+        contexto = self._leer(session_id)
+        if contexto is None:
+            raise KeyError(session_id)
+        return contexto
+
+    def __setitem__(self, session_id: str, contexto: Any):
+        self._guardar(session_id, contexto)
+
+    def __delitem__(self, session_id: str):
+        with self._lock:
+            del self._datos[session_id]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._datos)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._datos))
+
+    def keys(self):
+        with self._lock:
+            return list(self._datos)
+
+    def values(self):
+        with self._lock:
+            return [contexto for _, contexto in self._datos.values()]
+
+    def items(self):
+        with self._lock:
+            return [(session_id, contexto) for session_id, (_, contexto) in self._datos.items()]
+
+    # =====================================================
+    # EXPIRACIÓN
+    # =====================================================
+
+    def barrer(self) -> int:
+        """Elimina las sesiones inactivas más de `ttl` segundos; devuelve cuántas"""
+        ahora = time.monotonic()
+        eliminadas = 0
+        with self._lock:
+            # El OrderedDict está ordenado por último uso: basta recorrer desde el frente
+            while self._datos:
+                session_id, (ultimo_uso, _) = next(iter(self._datos.items()))
+                if not self._vencida(ultimo_uso, ahora):
+                    break
+                del self._datos[session_id]
+                eliminadas += 1
+            self._metricas['expiradas'] += eliminadas
+        if eliminadas:
+            logger.info(f"🧹 {eliminadas} sesiones expiradas por inactividad")
+        return eliminadas
+
+    def iniciar_barrido(self):
+        """Hilo daemon que barre las sesiones vencidas cada `barrido_seg` segundos"""
+        with self._lock:
+            if self._hilo is not None:
+                return
+            self._hilo = threading.Thread(target=self._bucle_barrido, name='barrido-sesiones', daemon=True)
+        self._hilo.start()
+
+    def _bucle_barrido(self):
+        while not self._detener.wait(self.barrido_seg):
+            try:
+                self.barrer()
+            except Exception as e:
+                logger.warning(f"⚠️ Error en barrido de sesiones: {e}")
+
+    def detener(self):
+        self._detener.set()
+
+    def metricas(self) -> Dict:
+        """Métricas del almacén (para /api/debug/status)"""
+        with self._lock:
+            datos = dict(self._metricas)
+            datos['vivas'] = len(self._datos)
+        datos['capacidad'] = self.capacidad
+        datos['ttl'] = self.ttl
+        return datos
@@ -0,0 +1,104 @@
+"""
+ANÁLISIS DE MENSAJE (UNA SOLA PASADA)
+Todo lo que clasificar(), _clasificar_por_patrones(), la lógica difusa,
+extraer_entidades() y generar_respuesta_inteligente() derivaban del mensaje
+por su cuenta (minúsculas, listas de palabras, texto sin acentos, números,
+emails, fechas y horas, frases clave) se calcula una vez por mensaje y se comparte.
+- Lo que usa todo mensaje (minúsculas, sin acentos, tokens, frases clave, números
+  y email) se arma al crear el análisis
+- El resto se calcula la primera vez que alguna etapa lo pide
+Los spans son posiciones en el mensaje original (el plegado de acentos no cambia el largo).
+Los tokens son tuplas: ninguna etapa puede modificar lo que ven las demás.
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from automata_frases import plegar_acentos
+from parser_temporal import ResultadoTemporal, escanear_expresiones, interpretar_fecha_hora
+
+# =====================================================
+# PATRONES CON SPANS
+# =====================================================
+# El email y los números del análisis son sus matches (con span)
+
+RE_EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+RE_GRUPOS_NUMERICOS = re.compile(r'\b\d+\b')
+
+PUNTUACION_TOKEN = '¿?¡!.,'
+
+class _perezoso:
+    """
+    Como functools.cached_property pero sin su lock (Python < 3.12), que costaba
+    más que lo que se calcula: el primer acceso guarda el valor en la instancia.
+    """
+
+    def __init__(self, funcion):
+        self.funcion = funcion
+        self.nombre = funcion.__name__
+        self.__doc__ = funcion.__doc__
+
+    def __get__(self, instancia, duenio=None):
+        if instancia is None:
+            return self
+        valor = instancia.__dict__[self.nombre] = self.funcion(instancia)
+        return valor
+
+# =====================================================
+# ANÁLISIS
+# =====================================================
+
+class AnalisisMensaje:
+    """
+    Formas derivadas de un mensaje, calculadas una vez.
+
+    Uso:
+        analisis = AnalisisMensaje('Quiero turno, mi correo es ana@mail.com', AUTOMATA_FRASES)
+        analisis.normalizado  -> 'quiero turno, mi correo es ana@mail.com'
+        analisis.email.group(0), analisis.email.span()  -> 'ana@mail.com', (27, 39)
+        'pide_turno' in analisis.frases
+        analisis.fecha_hora(contexto).fecha_span  -> también queda en analisis.temporal
+    """
+
+    def __init__(self, mensaje: str, automata=None):
+        self.original = mensaje
+        self.lower = mensaje.lower()
+        self.normalizado = self.lower.strip()  # Minúsculas sin espacios en los extremos
+        self.sin_acentos = plegar_acentos(self.lower)  # Minúsculas sin acentos ni ñ, mismo largo
+        self.tokens = tuple(self.normalizado.split())  # Palabras en minúscula
+        # Frases clave del autómata (ResultadoEscaneo), sin acentos si el autómata compara así; None sin autómata
+        if automata is None:
+            self.frases = None
+        elif automata.sin_acentos:
+            self.frases = automata.escanear(self.sin_acentos, plegado=True)
+        else:
+            self.frases = automata.escanear(self.normalizado)
+        self.numeros = tuple(RE_GRUPOS_NUMERICOS.finditer(mensaje))  # Grupos de dígitos (con span)
+        self.email = RE_EMAIL.search(mensaje)  # Primer email (con span) o None
+        self.temporal = None  # Último ResultadoTemporal de fecha_hora()
+
+    @_perezoso
+    def tokens_originales(self) -> Tuple[str, ...]:
+        """Palabras con las mayúsculas originales"""
+        return tuple(self.original.split())
+
+    @_perezoso
+    def tokens_limpios(self) -> Tuple[str, ...]:
+        """Tokens sin signos de pregunta/exclamación, puntos ni comas en los extremos"""
+        return tuple([token.strip(PUNTUACION_TOKEN) for token in self.tokens])
+
+    @_perezoso
+    def expresiones_temporales(self) -> Dict[str, List[re.Match]]:
+        """Horas y fechas escritas con números ("09:30", "15/11", "las 9"...): forma -> matches con span"""
+        return escanear_expresiones(self.sin_acentos)
+
+    def fecha_hora(self, contexto=None, ahora: datetime = None) -> ResultadoTemporal:
+        """
+        Fecha, hora y franja con sus spans (parser_temporal), reusando el escaneo de frases
+        (el autómata debe incluir GRUPOS_TEMPORALES) y las expresiones ya encontradas.
+        Depende del contexto ("ese día", fecha recomendada): el último resultado queda en self.temporal.
+        """
+        self.temporal = interpretar_fecha_hora(self.sin_acentos, contexto, self.frases, ahora,
+                                               expresiones=self.expresiones_temporales)
+        return self.temporal
@@ -6,9 +6,13 @@ Ciudad del Este
 
 from flask import Flask, render_template, request, jsonify, session
 import requests
-import psycopg2
 from datetime import datetime
-from orquestador_inteligente import procesar_mensaje_inteligente
+from orquestador_inteligente import procesar_mensaje_inteligente, metricas_cascada, SESSION_CONTEXTS, backend_sesiones
+from db_pool import obtener_conexion, metricas_pool, DB_CONFIG
+from cache_ocupacion import cache_ocupacion
+from cola_notificaciones import metricas_notificaciones, iniciar_notificaciones
+from cache_llm import metricas_caches_llm
+from cliente_llm import metricas_clientes_llm
 import json
 import logging
 import os
@@ -24,19 +28,15 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'tu-clave-secreta-cambiar-en-produccion'
 
+# Outbox + workers de notificaciones (recupera pendientes sin esperar a la primera reserva)
+iniciar_notificaciones()
+
 # =====================================================
 # CONFIGURACIÓN
 # =====================================================
 RASA_URL = "http://localhost:5005/webhooks/rest/webhook"
 RASA_STATUS_URL = "http://localhost:5005/status"
 
-DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'chatbotdb',
-    'user': 'botuser',
-    'password': 'root'
-}
-
 # =====================================================
 # IMPORTAR SISTEMA DE LOGGING MEJORADO
 # =====================================================
@@ -58,9 +58,9 @@ logger.info("✅ Orquestador HABILITADO - Usando Llama 3.1 con contexto completo
 
 
 def get_db_connection():
-    """Conexión a PostgreSQL"""
+    """Conexión a PostgreSQL (tomada del pool compartido; close() la devuelve)"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = obtener_conexion()
         return conn
     except Exception as e:
         logger.error(f"Error conectando a BD: {e}")
@@ -917,6 +917,20 @@ def debug_status():
     except:
         status['database'] = False
     
+    # Métricas del pool de conexiones
+    try:
+        status['db_pool'] = metricas_pool()
+    except Exception:
+        status['db_pool'] = None
+    
+    status['cache_ocupacion'] = cache_ocupacion.metricas()
+    status['notificaciones'] = metricas_notificaciones()
+    status['clasificacion'] = metricas_cascada.metricas()
+    status['cache_llm'] = metricas_caches_llm()
+    status['llm_endpoints'] = metricas_clientes_llm()
+    status['sesiones'] = SESSION_CONTEXTS.metricas()
+    status['backend_sesiones'] = backend_sesiones.metricas() if backend_sesiones else {'backend': 'memoria'}
+    
     return jsonify(status)
 
 # =====================================================
@@ -1159,6 +1173,11 @@ def confirmar_turno(token):
             color = "#27ae60"
             icon = "✅"
         
+        # Write-through: la disponibilidad solo cuenta turnos 'activo',
+        # así que al salir de ese estado el slot se libera en el cache
+        if estado == 'activo':
+            cache_ocupacion.registrar_liberacion(fecha, hora)
+        
         cur.close()
         conn.close()
         
@@ -1378,17 +1397,13 @@ if __name__ == '__main__':
 
 @app.route('/api/dashboard/user-corrections')
 def get_user_corrections():
-    import psycopg2
     import json
 
     conn = None
     try:
-        conn = psycopg2.connect(
-            host="localhost",
-            database="chatbotdb",
-            user="botuser",
-            password="root"
-        )
+        conn = get_db_connection()
+        if not conn:
+            raise Exception("No se pudo conectar a la base de datos")
         cur = conn.cursor()
         cur.execute("""
             SELECT id, session_id, user_message, bot_response, corrected_response, created_at
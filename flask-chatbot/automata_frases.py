@@ -0,0 +1,138 @@
+"""
+AUTÓMATA DE FRASES (AHO-CORASICK)
+Indexa muchas listas de frases a la vez y, con un solo recorrido del mensaje,
+reporta todas las frases encontradas (como subcadenas) y a qué grupos pertenecen.
+Equivale a hacer `any(frase in mensaje for frase in lista)` para cada lista,
+pero sin volver a recorrer el mensaje por cada frase.
+Con sin_acentos=True compara sin acentos ni ñ: "miércoles" y "miercoles" son la misma frase.
+"""
+
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, Set
+
+
+# á→a, é→e, í→i, ó→o, ú→u, ü→u, ñ→n (el texto ya viene en minúsculas)
+REEMPLAZOS_SIN_ACENTOS = (('á', 'a'), ('é', 'e'), ('í', 'i'), ('ó', 'o'), ('ú', 'u'), ('ü', 'u'), ('ñ', 'n'))
+
+def plegar_acentos(texto: str) -> str:
+    """
+    Texto sin acentos ni ñ, del mismo largo: los spans sobre el plegado valen para el original.
+    Con replace() en cadena y salida rápida para ASCII (str.translate es ~10x más lento).
+    """
+    if texto.isascii():
+        return texto
+    for con_acento, sin_acento in REEMPLAZOS_SIN_ACENTOS:
+        if con_acento in texto:
+            texto = texto.replace(con_acento, sin_acento)
+    return texto
+
+
+class ResultadoEscaneo:
+    """Frases y grupos encontrados en un mensaje"""
+
+    __slots__ = ('frases', 'grupos')
+
+    def __init__(self, frases: Set[str], grupos: Set[str]):
+        self.frases = frases
+        self.grupos = grupos
+
+    def __contains__(self, grupo: str) -> bool:
+        return grupo in self.grupos
+
+    def __repr__(self):
+        return f"ResultadoEscaneo(grupos={sorted(self.grupos)})"
+
+
+class AutomataFrases:
+    """
+    Autómata Aho-Corasick sobre grupos de frases.
+
+    Uso:
+        automata = AutomataFrases({'saludo': ['hola', 'buenas'], 'turno': ['turno']})
+        hits = automata.escanear('hola, quiero un turno')
+        'saludo' in hits  -> True
+        hits.frases       -> {'hola', 'turno'}
+
+    Con sin_acentos=True las frases se indexan plegadas (plegar_acentos) y escanear()
+    pliega el texto; `frases` del resultado vienen plegadas.
+    """
+
+    def __init__(self, grupos: Dict[str, Iterable[str]], sin_acentos: bool = False):
+        self.sin_acentos = sin_acentos
+        self._transiciones = [{}]   # estado -> {caracter: estado}
+        self._fallo = [0]           # estado -> estado de fallo
+        self._frases = [set()]      # estado -> frases que terminan aquí (incluye las de fallo)
+        self._grupos_frase = {}     # frase -> grupos a los que pertenece
+
+        for grupo, frases in grupos.items():
+            for frase in frases:
+                if sin_acentos:
+                    frase = plegar_acentos(frase)  # Variantes con y sin acento quedan en una sola frase
+                self._grupos_frase.setdefault(frase, set()).add(grupo)
+                self._insertar(frase)
+
+        self._grupos_frase = {f: frozenset(g) for f, g in self._grupos_frase.items()}
+        self._construir_fallos()
+        self._frases = [frozenset(s) for s in self._frases]
+        # estado -> grupos de sus frases, para no recalcularlos en cada escaneo
+        self._grupos = [frozenset().union(*(self._grupos_frase[f] for f in s)) for s in self._frases]
+
+    def _insertar(self, frase: str):
+        estado = 0
+        for caracter in frase:
+            siguiente = self._transiciones[estado].get(caracter)
+            if siguiente is None:
+                siguiente = len(self._transiciones)
+                self._transiciones[estado][caracter] = siguiente
+                self._transiciones.append({})
+                self._fallo.append(0)
+                self._frases.append(set())
+            estado = siguiente
+        self._frases[estado].add(frase)
+
+    def _construir_fallos(self):
+        """BFS estándar de Aho-Corasick: enlaces de fallo y salidas heredadas"""
+        cola = deque(self._transiciones[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self._transiciones[estado].items():
+                cola.append(siguiente)
+                fallo = self._fallo[estado]
+                while fallo and caracter not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._transiciones[fallo].get(caracter, 0)
+                self._fallo[siguiente] = destino if destino != siguiente else 0
+                self._frases[siguiente] |= self._frases[self._fallo[siguiente]]
+
+    def escanear(self, texto: str, plegado: bool = False) -> ResultadoEscaneo:
+        """
+        Recorre el texto una vez y devuelve todas las frases/grupos presentes.
+        `plegado`: el texto ya pasó por plegar_acentos (AnalisisMensaje lo tiene calculado).
+        """
+        if self.sin_acentos and not plegado:
+            texto = plegar_acentos(texto)
+        transiciones = self._transiciones
+        fallo = self._fallo
+        salidas = self._frases
+
+        estado = 0
+        estados = set()  # Estados con salida visitados: se juntan sus frases una vez al final
+        for caracter in texto:
+            while estado and caracter not in transiciones[estado]:
+                estado = fallo[estado]
+            estado = transiciones[estado].get(caracter, 0)
+            if salidas[estado]:
+                estados.add(estado)
+
+        encontradas = set()
+        grupos = set()
+        for estado in estados:
+            encontradas |= salidas[estado]
+            grupos |= self._grupos[estado]
+        return ResultadoEscaneo(encontradas, grupos)
+
+    def grupos_de(self, frase: str) -> FrozenSet[str]:
+        """Grupos a los que pertenece una frase indexada"""
+        if self.sin_acentos:
+            frase = plegar_acentos(frase)
+        return self._grupos_frase.get(frase, frozenset())
@@ -0,0 +1,265 @@
+"""
+BACKENDS DE SESIONES COMPARTIDOS
+Guardan el SessionContext serializado fuera del proceso para poder correr
+varios workers/hosts de gunicorn: cada mensaje carga el contexto, lo procesa
+y lo vuelve a guardar.
+
+- Versionado optimista: cada guardado indica la versión que leyó; si otro
+  worker guardó antes, se lanza ConflictoVersion y el orquestador fusiona
+- BackendLocal: en el mismo proceso (tests, un solo worker)
+- BackendPostgres: tabla sesiones_chat en la BD del sistema
+- BackendRedis: clave por sesión con expiración nativa (requiere `redis`)
+Con SESIONES_BACKEND=memoria (por defecto) no se usa ningún backend: los
+contextos viven como objetos en SESSION_CONTEXTS, como siempre.
+"""
+
+import os
+import time
+import threading
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+from almacen_sesiones import AlmacenSesiones, SESIONES_TTL, SESIONES_BARRIDO_SEG
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# CONFIGURACIÓN
+# =====================================================
+
+SESIONES_BACKEND = os.getenv('SESIONES_BACKEND', 'memoria')  # 'memoria', 'local', 'postgres' o 'redis'
+SESIONES_REDIS_URL = os.getenv('SESIONES_REDIS_URL', 'redis://localhost:6379/0')
+SESIONES_REINTENTOS = int(os.getenv('SESIONES_REINTENTOS', 3))  # Fusiones ante conflicto antes de rendirse
+
+class ConflictoVersion(Exception):
+    """Otro worker guardó la sesión después de que la leímos"""
+    pass
+
+# =====================================================
+# INTERFAZ
+# =====================================================
+
+class BackendSesiones(ABC):
+    """
+    cargar(session_id) -> (version, datos) o None si no existe / expiró
+    guardar(session_id, datos, version) -> nueva versión; `version` es la leída (0 = sesión nueva)
+    """
+
+    nombre = 'base'
+
+    def __init__(self):
+        self._metricas = {'cargas': 0, 'guardados': 0, 'conflictos': 0}
+        self._lock_metricas = threading.Lock()
+
+    def _contar(self, clave: str):
+        with self._lock_metricas:
+            self._metricas[clave] += 1
+
+    @abstractmethod
+    def cargar(self, session_id: str) -> Optional[Tuple[int, str]]:
+        ...
+
+    @abstractmethod
+    def guardar(self, session_id: str, datos: str, version: int) -> int:
+        ...
+
+    @abstractmethod
+    def eliminar(self, session_id: str):
+        ...
+
+    def metricas(self) -> Dict:
+        with self._lock_metricas:
+            datos = dict(self._metricas)
+        datos['backend'] = self.nombre
+        return datos
+
+# =====================================================
+# LOCAL (MISMO PROCESO)
+# =====================================================
+
+class BackendLocal(BackendSesiones):
+    """Sesiones serializadas en un AlmacenSesiones del proceso (LRU + TTL)"""
+
+    nombre = 'local'
+
+    def __init__(self, almacen: AlmacenSesiones = None):
+        super().__init__()
+        self._almacen = almacen if almacen is not None else AlmacenSesiones()
+        self._lock = threading.Lock()
+
+    def cargar(self, session_id: str) -> Optional[Tuple[int, str]]:
+        self._contar('cargas')
+        return self._almacen.get(session_id)
+
+    def guardar(self, session_id: str, datos: str, version: int) -> int:
+        with self._lock:
+            actual = self._almacen.get(session_id)
+            if (actual[0] if actual else 0) != version:
+                self._contar('conflictos')
+                raise ConflictoVersion(session_id)
+            self._almacen[session_id] = (version + 1, datos)
+        self._contar('guardados')
+        return version + 1
+
+    def eliminar(self, session_id: str):
+        self._almacen.pop(session_id)
+
+# =====================================================
+# POSTGRES
+# =====================================================
+
+SQL_CREAR_SESIONES = """
+    CREATE TABLE IF NOT EXISTS sesiones_chat (
+        session_id VARCHAR(100) PRIMARY KEY,
+        version INTEGER NOT NULL,
+        datos TEXT NOT NULL,
+        actualizado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+class BackendPostgres(BackendSesiones):
+    """
+    Tabla sesiones_chat (session_id, version, datos, actualizado).
+    Las filas inactivas más de `ttl` segundos cuentan como inexistentes y se
+    borran de a tandas, a lo sumo una vez cada SESIONES_BARRIDO_SEG.
+    """
+
+    nombre = 'postgres'
+
+    def __init__(self, ttl: float = SESIONES_TTL):
+        super().__init__()
+        self.ttl = ttl
+        self._tabla_lista = False
+        self._ultimo_barrido = time.monotonic()
+
+    def _ejecutar(self, sql: str, params: tuple = ()) -> Optional[tuple]:
+        """Ejecuta una sentencia con una conexión del pool y devuelve la primera fila (si hay)"""
+        from db_pool import obtener_conexion  # psycopg2 solo hace falta con este backend
+        conn = obtener_conexion()
+        try:
+            cursor = conn.cursor()
+            if not self._tabla_lista:
+                cursor.execute(SQL_CREAR_SESIONES)
+                self._tabla_lista = True
+            cursor.execute(sql, params)
+            fila = cursor.fetchone() if cursor.description else None
+            conn.commit()
+            cursor.close()
+            return fila
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()  # Devuelve la conexión al pool
+
+    def cargar(self, session_id: str) -> Optional[Tuple[int, str]]:
+        self._contar('cargas')
+        fila = self._ejecutar("""
+            SELECT version, datos FROM sesiones_chat
+            WHERE session_id = %s
+            AND actualizado > NOW() - %s * INTERVAL '1 second'
+        """, (session_id, self.ttl))
+        return (fila[0], fila[1]) if fila else None
+
+    def guardar(self, session_id: str, datos: str, version: int) -> int:
+        if version == 0:
+            # Sesión nueva: insertar, o pisar una fila vencida (si está viva es un conflicto)
+            fila = self._ejecutar("""
+                INSERT INTO sesiones_chat (session_id, version, datos, actualizado)
+                VALUES (%s, 1, %s, NOW())
+                ON CONFLICT (session_id) DO UPDATE
+                SET version = sesiones_chat.version + 1, datos = EXCLUDED.datos, actualizado = NOW()
+                WHERE sesiones_chat.actualizado <= NOW() - %s * INTERVAL '1 second'
+                RETURNING version
+            """, (session_id, datos, self.ttl))
+        else:
+            fila = self._ejecutar("""
+                UPDATE sesiones_chat
+                SET version = version + 1, datos = %s, actualizado = NOW()
+                WHERE session_id = %s AND version = %s
+                RETURNING version
+            """, (datos, session_id, version))
+        if fila is None:
+            self._contar('conflictos')
+            raise ConflictoVersion(session_id)
+        self._contar('guardados')
+        self._barrer_si_corresponde()
+        return fila[0]
+
+    def eliminar(self, session_id: str):
+        self._ejecutar("DELETE FROM sesiones_chat WHERE session_id = %s", (session_id,))
+
+    def _barrer_si_corresponde(self):
+        if time.monotonic() - self._ultimo_barrido < SESIONES_BARRIDO_SEG:
+            return
+        self._ultimo_barrido = time.monotonic()
+        try:
+            self._ejecutar("DELETE FROM sesiones_chat WHERE actualizado < NOW() - %s * INTERVAL '1 second'",
+                           (self.ttl,))
+        except Exception as e:
+            logger.warning(f"⚠️ Error barriendo sesiones_chat: {e}")
+
+# =====================================================
+# REDIS
+# =====================================================
+
+# Compare-and-set atómico: solo guarda si la versión en Redis es la que se leyó
+LUA_GUARDAR = """
+local actual = tonumber(redis.call('HGET', KEYS[1], 'v') or '0')
+if actual ~= tonumber(ARGV[1]) then
+    return -1
+end
+redis.call('HSET', KEYS[1], 'v', actual + 1, 'd', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return actual + 1
+"""
+
+class BackendRedis(BackendSesiones):
+    """Hash sesion:<id> con campos v (versión) y d (datos); el TTL de inactividad lo maneja Redis"""
+
+    nombre = 'redis'
+
+    def __init__(self, url: str = SESIONES_REDIS_URL, ttl: float = SESIONES_TTL):
+        super().__init__()
+        import redis  # Dependencia opcional: solo con SESIONES_BACKEND=redis
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._guardar_script = self._redis.register_script(LUA_GUARDAR)
+        self.ttl = int(ttl)
+
+    @staticmethod
+    def _clave(session_id: str) -> str:
+        return f"sesion:{session_id}"
+
+    def cargar(self, session_id: str) -> Optional[Tuple[int, str]]:
+        self._contar('cargas')
+        version, datos = self._redis.hmget(self._clave(session_id), 'v', 'd')
+        return (int(version), datos) if version is not None else None
+
+    def guardar(self, session_id: str, datos: str, version: int) -> int:
+        nueva = self._guardar_script(keys=[self._clave(session_id)], args=[version, datos, self.ttl])
+        if nueva == -1:
+            self._contar('conflictos')
+            raise ConflictoVersion(session_id)
+        self._contar('guardados')
+        return int(nueva)
+
+    def eliminar(self, session_id: str):
+        self._redis.delete(self._clave(session_id))
+
+# =====================================================
+# FÁBRICA
+# =====================================================
+
+def crear_backend_sesiones(tipo: str = SESIONES_BACKEND) -> Optional[BackendSesiones]:
+    """Backend según SESIONES_BACKEND; None = contextos vivos en memoria (un solo proceso)"""
+    if tipo == 'memoria':
+        return None
+    if tipo == 'local':
+        return BackendLocal()
+    if tipo == 'postgres':
+        return BackendPostgres()
+    if tipo == 'redis':
+        return BackendRedis()
+    logger.warning(f"⚠️ SESIONES_BACKEND desconocido '{tipo}', usando memoria")
+    return None
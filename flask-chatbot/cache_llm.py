@@ -0,0 +1,179 @@
+"""
+CACHE DE RESPUESTAS DEL LLM
+LRU + TTL para las respuestas de LM Studio (clasificación de intents y fallback).
+Los mismos mensajes cortos ("hola", "cuanto cuesta", "que hay hoy") se repiten
+todo el tiempo: con el cache solo la primera vez se paga el round-trip de 1-5s.
+La clave es el mensaje normalizado + la etiqueta de contexto que usa el prompt.
+Opcionalmente se persiste en disco (JSON) para no arrancar en frío tras un reinicio.
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# CONFIGURACIÓN
+# =====================================================
+
+LLM_CACHE_MAX = int(os.getenv('LLM_CACHE_MAX', 2000))  # Entradas por cache
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', 6 * 3600))  # Segundos de validez
+LLM_CACHE_DIR = os.getenv('LLM_CACHE_DIR', '')  # Carpeta para persistir ('' = solo memoria)
+LLM_CACHE_GUARDAR_CADA = int(os.getenv('LLM_CACHE_GUARDAR_CADA', 25))  # Escrituras entre volcados a disco
+
+RE_ESPACIOS = re.compile(r'\s+')
+
+def normalizar_mensaje(mensaje: str) -> str:
+    """Minúsculas y espacios colapsados: 'Hola  ' y 'hola' comparten entrada"""
+    return RE_ESPACIOS.sub(' ', mensaje.lower()).strip()
+
+# =====================================================
+# CACHE
+# =====================================================
+
+class CacheLLM:
+    """
+    Cache LRU thread-safe con TTL.
+    Las claves son (mensaje normalizado, contexto); los valores deben ser serializables a JSON.
+    """
+
+    def __init__(self, nombre: str, capacidad: int = LLM_CACHE_MAX, ttl: float = LLM_CACHE_TTL,
+                 archivo: Optional[str] = None):
+        self.nombre = nombre
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self.archivo = archivo
+        self._datos = OrderedDict()  # clave -> (timestamp, valor), del más viejo al más usado
+        self._lock = threading.Lock()
+        self._lock_disco = threading.Lock()  # Un solo volcado a la vez
+        self._pendientes = 0  # Escrituras sin volcar a disco
+        self._metricas = {'hits': 0, 'misses': 0, 'expirados': 0, 'desalojados': 0}
+
+        if self.archivo:
+            self._cargar_de_disco()
+            atexit.register(self.guardar_en_disco)
+
+    @staticmethod
+    def _clave(mensaje: str, contexto: str) -> str:
+        return f"{normalizar_mensaje(mensaje)}\x1f{contexto}"
+
+    def obtener(self, mensaje: str, contexto: str = '') -> Optional[Any]:
+        """Respuesta cacheada para (mensaje, contexto), o None si no está o expiró"""
+        clave = self._clave(mensaje, contexto)
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self._metricas['misses'] += 1
+                return None
+            if time.time() - entrada[0] > self.ttl:
+                del self._datos[clave]
+                self._metricas['expirados'] += 1
+                self._metricas['misses'] += 1
+                return None
+            self._datos.move_to_end(clave)
+            self._metricas['hits'] += 1
+            return entrada[1]
+
+    def guardar(self, mensaje: str, valor: Any, contexto: str = ''):
+        """Guarda la respuesta; desaloja la menos usada si se supera la capacidad"""
+        clave = self._clave(mensaje, contexto)
+        volcar = False
+        with self._lock:
+            self._datos[clave] = (time.time(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+                self._metricas['desalojados'] += 1
+            self._pendientes += 1
+            if self.archivo and self._pendientes >= LLM_CACHE_GUARDAR_CADA:
+                volcar = True
+        if volcar:
+            self.guardar_en_disco()
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    # =====================================================
+    # PERSISTENCIA
+    # =====================================================
+
+    def guardar_en_disco(self):
+        """Vuelca las entradas vigentes a JSON (escritura atómica con archivo temporal)"""
+        if not self.archivo:
+            return
+        with self._lock_disco:
+            with self._lock:
+                ahora = time.time()
+                entradas = [[clave, ts, valor] for clave, (ts, valor) in self._datos.items()
+                            if ahora - ts <= self.ttl]
+                self._pendientes = 0
+            temporal = f"{self.archivo}.tmp"
+            try:
+                with open(temporal, 'w', encoding='utf-8') as f:
+                    json.dump(entradas, f, ensure_ascii=False)
+                os.replace(temporal, self.archivo)
+                logger.debug(f"💾 Cache LLM '{self.nombre}': {len(entradas)} entradas guardadas")
+            except OSError as e:
+                logger.warning(f"⚠️ No se pudo guardar cache LLM '{self.nombre}': {e}")
+
+    def _cargar_de_disco(self):
+        if not os.path.exists(self.archivo):
+            return
+        try:
+            with open(self.archivo, encoding='utf-8') as f:
+                entradas = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Cache LLM '{self.nombre}' ilegible, se arranca vacío: {e}")
+            return
+        ahora = time.time()
+        with self._lock:
+            for clave, ts, valor in entradas[-self.capacidad:]:
+                if ahora - ts <= self.ttl:
+                    self._datos[clave] = (ts, valor)
+        logger.info(f"💾 Cache LLM '{self.nombre}': {len(self._datos)} entradas cargadas de disco")
+
+    def metricas(self) -> Dict:
+        """Métricas del cache (para /api/debug/status)"""
+        with self._lock:
+            datos = dict(self._metricas)
+            datos['entradas'] = len(self._datos)
+        consultas = datos['hits'] + datos['misses']
+        datos['hit_rate'] = round(datos['hits'] / consultas, 3) if consultas else 0.0
+        datos['capacidad'] = self.capacidad
+        datos['ttl'] = self.ttl
+        datos['persistente'] = bool(self.archivo)
+        return datos
+
+# =====================================================
+# CACHES COMPARTIDOS POR NOMBRE
+# =====================================================
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def obtener_cache_llm(nombre: str) -> CacheLLM:
+    """Cache compartido por nombre ('clasificacion', 'fallback', ...); persiste en LLM_CACHE_DIR si está configurado"""
+    with _caches_lock:
+        cache = _caches.get(nombre)
+        if cache is None:
+            archivo = None
+            if LLM_CACHE_DIR:
+                os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+                archivo = os.path.join(LLM_CACHE_DIR, f"cache_llm_{nombre}.json")
+            cache = CacheLLM(nombre, archivo=archivo)
+            _caches[nombre] = cache
+        return cache
+
+def metricas_caches_llm() -> Dict:
+    """Métricas de todos los caches LLM creados"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.nombre: cache.metricas() for cache in caches}
@@ -0,0 +1,97 @@
+"""
+CACHE DE OCUPACIÓN POR FECHA
+Guarda en memoria la ocupación {'HH:MM': ocupados} de cada día consultado
+para que las lecturas durante una conversación no vuelvan a Postgres.
+Se actualiza en el lugar (write-through) al reservar o liberar un turno
+y expira tras un TTL corto para absorber cambios hechos por otros procesos.
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# CONFIGURACIÓN
+# =====================================================
+
+CACHE_TTL = float(os.getenv('OCUPACION_CACHE_TTL', 30))  # Segundos de validez por fecha
+
+# =====================================================
+# CACHE
+# =====================================================
+
+class CacheOcupacion:
+    """
+    Cache thread-safe de ocupación por fecha con TTL.
+    Las entradas se devuelven como copias para que nadie modifique el cache por accidente.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL):
+        self.ttl = ttl
+        self._datos = {}  # fecha -> (timestamp, {'HH:MM': ocupados})
+        self._lock = threading.Lock()
+        self._metricas = {'hits': 0, 'misses': 0, 'actualizaciones': 0}
+
+    def obtener(self, fecha: str) -> Optional[Dict[str, int]]:
+        """Ocupación cacheada de la fecha, o None si no está o expiró"""
+        with self._lock:
+            entrada = self._datos.get(fecha)
+            if entrada is None or time.monotonic() - entrada[0] > self.ttl:
+                if entrada is not None:
+                    del self._datos[fecha]
+                self._metricas['misses'] += 1
+                return None
+            self._metricas['hits'] += 1
+            return dict(entrada[1])
+
+    def guardar(self, fecha: str, horarios: Dict[str, int]):
+        """Guarda (o refresca) la ocupación completa de una fecha"""
+        with self._lock:
+            self._datos[fecha] = (time.monotonic(), dict(horarios))
+
+    def registrar_reserva(self, fecha: str, hora: str):
+        """Write-through: suma un turno ocupado al slot si la fecha está cacheada"""
+        self._ajustar(fecha, hora, +1)
+
+    def registrar_liberacion(self, fecha: str, hora: str):
+        """Write-through: libera un turno del slot si la fecha está cacheada"""
+        self._ajustar(fecha, hora, -1)
+
+    def _ajustar(self, fecha: str, hora: str, delta: int):
+        with self._lock:
+            entrada = self._datos.get(fecha)
+            if entrada is None:
+                return  # Nada que actualizar: la próxima lectura irá a la BD
+            horarios = entrada[1]
+            if hora in horarios:
+                horarios[hora] = max(0, horarios[hora] + delta)
+                self._metricas['actualizaciones'] += 1
+                logger.debug(f"🗃️ Cache ocupación {fecha} {hora}: {horarios[hora]}")
+
+    def invalidar(self, fecha: str = None):
+        """Elimina una fecha del cache (o todo si no se indica fecha)"""
+        with self._lock:
+            if fecha is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(fecha, None)
+
+    def metricas(self) -> Dict:
+        """Métricas del cache (para /api/debug/status)"""
+        with self._lock:
+            datos = dict(self._metricas)
+            datos['fechas'] = len(self._datos)
+        consultas = datos['hits'] + datos['misses']
+        datos['hit_rate'] = round(datos['hits'] / consultas, 3) if consultas else 0.0
+        datos['ttl'] = self.ttl
+        return datos
+
+# =====================================================
+# INSTANCIA GLOBAL
+# =====================================================
+
+cache_ocupacion = CacheOcupacion()
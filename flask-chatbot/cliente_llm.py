@@ -0,0 +1,263 @@
+"""
+CLIENTE LLM COMPARTIDO
+Un solo punto de salida hacia LM Studio para todo el chatbot:
+- Una requests.Session por endpoint (keep-alive, conexiones reutilizadas)
+- Sondeo de salud en segundo plano de todas las URLs configuradas (GET /v1/models)
+- Circuit breaker por endpoint: tras varios fallos seguidos deja de recibir tráfico
+  durante un enfriamiento, y luego se prueba con una sola petición
+- Failover: cada petición va al primer endpoint sano, y si no conecta o responde 5xx
+  pasa al siguiente (un host lento no es un host caído: el timeout de lectura se propaga)
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# CONFIGURACIÓN
+# =====================================================
+
+# Múltiples URLs del LLM (en orden de preferencia); LM_STUDIO_URLS="url1,url2" para reemplazarlas
+LM_STUDIO_URLS = [url.strip() for url in os.getenv('LM_STUDIO_URLS', '').split(',') if url.strip()] or [
+    "http://localhost:1234/v1/chat/completions",  # Local primero
+    "http://192.168.3.118:1234/v1/chat/completions",  # Red local 1
+    "http://192.168.0.218:1234/v1/chat/completions",  # Red local 2
+]
+
+LLM_TIMEOUT_CONEXION = float(os.getenv('LLM_TIMEOUT_CONEXION', 1.0))  # Host caído: fallar rápido
+LLM_SONDEO_SEG = float(os.getenv('LLM_SONDEO_SEG', 15))  # Intervalo del sondeo de salud
+LLM_CB_FALLOS = int(os.getenv('LLM_CB_FALLOS', 3))  # Fallos seguidos para abrir el circuito
+LLM_CB_ENFRIAMIENTO = float(os.getenv('LLM_CB_ENFRIAMIENTO', 30))  # Segundos con el circuito abierto
+LLM_POOL_MAX = int(os.getenv('LLM_POOL_MAX', 8))  # Conexiones keep-alive por endpoint
+
+class LLMNoDisponible(Exception):
+    """Ningún endpoint del LLM pudo atender la petición"""
+
+# =====================================================
+# ENDPOINT CON CIRCUIT BREAKER
+# =====================================================
+
+class EndpointLLM:
+    """
+    Estado de un endpoint de LM Studio.
+    cerrado: recibe tráfico | abierto: se saltea hasta que vence el enfriamiento |
+    semiabierto: vencido el enfriamiento, se deja pasar una sola petición de prueba
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.url_modelos = url.replace('/v1/chat/completions', '/v1/models')
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=LLM_POOL_MAX))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=LLM_POOL_MAX))
+        self._lock = threading.Lock()
+        self.estado = 'cerrado'
+        self.fallos_seguidos = 0
+        self.abierto_hasta = 0.0
+        self._prueba_en_curso = False
+        self.metricas = {'peticiones': 0, 'exitos': 0, 'fallos': 0, 'aperturas': 0, 'latencia_ms': None}
+
+    def permite(self) -> bool:
+        """True si se le puede mandar tráfico (reserva la petición de prueba si está semiabierto)"""
+        with self._lock:
+            if self.estado != 'cerrado':
+                if time.monotonic() < self.abierto_hasta or self._prueba_en_curso:
+                    return False
+                self.estado = 'semiabierto'
+                self._prueba_en_curso = True
+            self.metricas['peticiones'] += 1
+            return True
+
+    def sano(self) -> bool:
+        with self._lock:
+            return self.estado == 'cerrado'
+
+    def registrar_exito(self, latencia: float):
+        with self._lock:
+            if self.estado != 'cerrado':
+                logger.info(f"✅ LLM recuperado: {self.url}")
+            self.estado = 'cerrado'
+            self.fallos_seguidos = 0
+            self._prueba_en_curso = False
+            self.metricas['exitos'] += 1
+            self.metricas['latencia_ms'] = round(latencia * 1000, 1)
+
+    def registrar_fallo(self, abrir: bool = False):
+        """Suma un fallo; abre el circuito al llegar a LLM_CB_FALLOS (o de inmediato si abrir=True)"""
+        with self._lock:
+            self.fallos_seguidos += 1
+            self.metricas['fallos'] += 1
+            self._prueba_en_curso = False
+            if abrir or self.estado == 'semiabierto' or self.fallos_seguidos >= LLM_CB_FALLOS:
+                if self.estado != 'abierto':
+                    self.metricas['aperturas'] += 1
+                    logger.warning(f"🔌 Circuito abierto para {self.url} ({self.fallos_seguidos} fallos)")
+                self.estado = 'abierto'
+                self.abierto_hasta = time.monotonic() + LLM_CB_ENFRIAMIENTO
+
+    def liberar(self):
+        """Termina la petición sin contarla como éxito ni como fallo (libera la prueba si estaba semiabierto)"""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def resumen(self) -> Dict:
+        with self._lock:
+            datos = dict(self.metricas)
+            datos['estado'] = self.estado
+            datos['fallos_seguidos'] = self.fallos_seguidos
+        return datos
+
+# =====================================================
+# CLIENTE
+# =====================================================
+
+class ClienteLLM:
+    """Cliente compartido con failover entre endpoints y sondeo de salud en segundo plano"""
+
+    def __init__(self, urls: List[str], sondeo_seg: float = LLM_SONDEO_SEG):
+        self.endpoints = [EndpointLLM(url) for url in urls]
+        self.sondeo_seg = sondeo_seg
+        self._detener = threading.Event()
+        self._hilo = None
+        self.metricas = {'peticiones': 0, 'failovers': 0, 'sin_endpoint': 0}
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    # =====================================================
+    # SALUD
+    # =====================================================
+
+    def sondear(self):
+        """Verifica todos los endpoints con GET /v1/models y actualiza sus circuitos"""
+        for endpoint in self.endpoints:
+            inicio = time.monotonic()
+            try:
+                response = endpoint.session.get(endpoint.url_modelos, timeout=(LLM_TIMEOUT_CONEXION, 2))
+                if response.status_code == 200:
+                    endpoint.registrar_exito(time.monotonic() - inicio)
+                    continue
+            except requests.RequestException:
+                pass
+            # Un sondeo fallido saca al endpoint de la rotación hasta el próximo sondeo exitoso
+            endpoint.registrar_fallo(abrir=True)
+
+    def iniciar_sondeo(self):
+        """Sondeo inicial (sincrónico) y luego periódico en un hilo daemon"""
+        if self._hilo is not None:
+            return
+        self.sondear()
+        self._hilo = threading.Thread(target=self._bucle_sondeo, name='llm-sondeo', daemon=True)
+        self._hilo.start()
+
+    def _bucle_sondeo(self):
+        while not self._detener.wait(self.sondeo_seg):
+            try:
+                self.sondear()
+            except Exception as e:
+                logger.warning(f"⚠️ Error en sondeo de LLM: {e}")
+
+    def detener(self):
+        self._detener.set()
+        for endpoint in self.endpoints:
+            endpoint.session.close()
+
+    def url_activa(self) -> Optional[str]:
+        """Primer endpoint sano (en orden de preferencia), o None si no hay ninguno"""
+        for endpoint in self.endpoints:
+            if endpoint.sano():
+                return endpoint.url
+        return None
+
+    def disponible(self) -> bool:
+        return self.url_activa() is not None
+
+    # =====================================================
+    # PETICIONES
+    # =====================================================
+
+    def post(self, payload: Dict, timeout: float) -> requests.Response:
+        """
+        POST al primer endpoint que acepte tráfico; si no conecta o responde 5xx pasa al siguiente.
+        Un timeout de lectura (host vivo pero lento) se propaga sin contar como fallo ni probar
+        otro endpoint, así una llamada nunca espera más de un `timeout`.
+        Lanza LLMNoDisponible si ninguno respondió.
+        """
+        with self._lock:
+            self.metricas['peticiones'] += 1
+        intentos = 0
+        for endpoint in self.endpoints:
+            if not endpoint.permite():
+                continue
+            if intentos:
+                with self._lock:
+                    self.metricas['failovers'] += 1
+                logger.info(f"🔀 Failover de LLM a {endpoint.url}")
+            intentos += 1
+            inicio = time.monotonic()
+            try:
+                response = endpoint.session.post(endpoint.url, json=payload,
+                                                 timeout=(LLM_TIMEOUT_CONEXION, timeout))
+            except requests.ConnectionError as e:
+                # Incluye ConnectTimeout: el host no aceptó la conexión
+                logger.warning(f"⚠️ LLM {endpoint.url} falló: {e}")
+                endpoint.registrar_fallo()
+                continue
+            except requests.RequestException:
+                endpoint.liberar()
+                raise
+            if response.status_code >= 500:
+                logger.warning(f"⚠️ LLM {endpoint.url} respondió HTTP {response.status_code}")
+                endpoint.registrar_fallo()
+                continue
+            endpoint.registrar_exito(time.monotonic() - inicio)
+            return response
+
+        with self._lock:
+            self.metricas['sin_endpoint'] += 1
+        raise LLMNoDisponible(f"Ningún endpoint del LLM disponible ({intentos} intentados)")
+
+    def resumen(self) -> Dict:
+        """Métricas del cliente y estado de cada endpoint (para /api/debug/status)"""
+        with self._lock:
+            datos = dict(self.metricas)
+        datos['url_activa'] = self.url_activa()
+        datos['endpoints'] = {endpoint.url: endpoint.resumen() for endpoint in self.endpoints}
+        return datos
+
+# =====================================================
+# INSTANCIA COMPARTIDA
+# =====================================================
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+def urls_con_preferida(url: str) -> List[str]:
+    """LM_STUDIO_URLS con `url` adelante: se la prefiere y el failover sigue por las demás"""
+    return [url] + [otra for otra in LM_STUDIO_URLS if otra != url]
+
+def obtener_cliente_llm(urls: Optional[List[str]] = None) -> ClienteLLM:
+    """Cliente compartido para esa lista de URLs (por defecto LM_STUDIO_URLS); arranca el sondeo la primera vez"""
+    clave = tuple(urls or LM_STUDIO_URLS)
+    with _clientes_lock:
+        cliente = _clientes.get(clave)
+        if cliente is None:
+            cliente = ClienteLLM(list(clave))
+            cliente.iniciar_sondeo()
+            _clientes[clave] = cliente
+        return cliente
+
+def metricas_clientes_llm() -> Dict:
+    """Resumen de todos los clientes creados"""
+    with _clientes_lock:
+        clientes = list(_clientes.values())
+    return {', '.join(cliente.urls): cliente.resumen() for cliente in clientes}
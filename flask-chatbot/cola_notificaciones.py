@@ -0,0 +1,492 @@
+"""
+COLA DE NOTIFICACIONES EN SEGUNDO PLANO
+Genera el QR, guarda el token de confirmación y envía el email fuera del
+hilo de la request: la respuesta "Turno confirmado" sale apenas se hace
+commit del turno.
+
+- Outbox persistente (tabla notificaciones_outbox) para no perder envíos
+  si el proceso se reinicia
+- Cada fila la reclama un solo proceso (UPDATE ... FOR UPDATE SKIP LOCKED):
+  con varios workers de gunicorn nadie reenvía lo que otro está enviando.
+  Una fila 'procesando' cuyo dueño dejó de renovarla por NOTIF_LEASE_SEG
+  vuelve a estar disponible
+- Workers acotados (NOTIF_WORKERS) consumiendo una cola en memoria acotada;
+  un hilo revisa el outbox cada NOTIF_POLL_SEG (pendientes de un reinicio y
+  reintentos cuyo proximo_intento ya llegó)
+- Reintentos con backoff exponencial hasta NOTIF_MAX_INTENTOS
+"""
+
+import os
+import sys
+import json
+import queue
+import threading
+import logging
+import traceback
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Módulos de notificaciones (qr_generator, email_sender)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'notificaciones'))
+
+# =====================================================
+# CONFIGURACIÓN
+# =====================================================
+
+NOTIF_WORKERS = int(os.getenv('NOTIF_WORKERS', 2))
+NOTIF_COLA_MAX = int(os.getenv('NOTIF_COLA_MAX', 500))
+NOTIF_MAX_INTENTOS = int(os.getenv('NOTIF_MAX_INTENTOS', 5))
+NOTIF_BACKOFF_BASE = float(os.getenv('NOTIF_BACKOFF_BASE', 5))  # Segundos; se duplica en cada intento
+NOTIF_BACKOFF_MAX = float(os.getenv('NOTIF_BACKOFF_MAX', 600))
+NOTIF_POLL_SEG = float(os.getenv('NOTIF_POLL_SEG', 5))  # Cada cuánto se revisa el outbox
+NOTIF_LEASE_SEG = float(os.getenv('NOTIF_LEASE_SEG', 300))  # Sin renovar por más que esto, otro proceso la retoma
+NOTIF_RECLAMO_LOTE = int(os.getenv('NOTIF_RECLAMO_LOTE', 50))  # Filas reclamadas por revisión
+
+TIPO_CONFIRMACION = 'confirmacion_turno'
+
+# =====================================================
+# OUTBOX (PERSISTENCIA)
+# =====================================================
+
+def _ejecutar_sql(sql: str, params: tuple = (), devolver: bool = False):
+    """Ejecuta una sentencia con una conexión del pool"""
+    from db_pool import obtener_conexion  # psycopg2 solo hace falta con la BD
+    conn = obtener_conexion()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        filas = cursor.fetchall() if devolver else None
+        conn.commit()
+        cursor.close()
+        return filas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+SQL_CREAR_OUTBOX = """
+    CREATE TABLE IF NOT EXISTS notificaciones_outbox (
+        id SERIAL PRIMARY KEY,
+        turno_id INTEGER,
+        tipo VARCHAR(50) NOT NULL,
+        payload JSONB NOT NULL,
+        estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+        intentos INTEGER NOT NULL DEFAULT 0,
+        proximo_intento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        reclamado TIMESTAMP,
+        ultimo_error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    ALTER TABLE notificaciones_outbox ADD COLUMN IF NOT EXISTS reclamado TIMESTAMP
+"""
+
+class OutboxPostgres:
+    """
+    Tabla notificaciones_outbox.
+    Estados: 'pendiente' (espera su proximo_intento), 'procesando' (reclamada;
+    `reclamado` es la última renovación), 'enviado', 'fallido'.
+    """
+
+    nombre = 'postgres'
+
+    def __init__(self, lease_seg: float = NOTIF_LEASE_SEG):
+        self.lease_seg = lease_seg
+
+    def preparar(self):
+        _ejecutar_sql(SQL_CREAR_OUTBOX)
+
+    def insertar(self, tipo: str, payload: Dict, turno_id: Optional[int]) -> int:
+        """Registra el trabajo ya reclamado por este proceso (va directo a la cola en memoria)"""
+        filas = _ejecutar_sql("""
+            INSERT INTO notificaciones_outbox (turno_id, tipo, payload, estado, reclamado)
+            VALUES (%s, %s, %s, 'procesando', CURRENT_TIMESTAMP)
+            RETURNING id
+        """, (turno_id, tipo, json.dumps(payload, default=str)), devolver=True)
+        return filas[0][0]
+
+    def reclamar(self, limite: int) -> List[Dict]:
+        """Pendientes cuyo proximo_intento llegó y 'procesando' abandonadas; las marca como propias"""
+        filas = _ejecutar_sql("""
+            UPDATE notificaciones_outbox
+            SET estado = 'procesando', reclamado = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT id FROM notificaciones_outbox
+                WHERE (estado = 'pendiente' AND proximo_intento <= CURRENT_TIMESTAMP)
+                   OR (estado = 'procesando' AND reclamado < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, tipo, payload, intentos
+        """, (self.lease_seg, limite), devolver=True)
+        trabajos = []
+        for outbox_id, tipo, payload, intentos in filas:
+            if isinstance(payload, str):
+                payload = json.loads(payload)
+            trabajos.append({'id': outbox_id, 'tipo': tipo, 'payload': payload, 'intentos': intentos})
+        return trabajos
+
+    def marcar(self, outbox_id: int, estado: str, intentos: int = None, error: str = None, espera: float = 0):
+        """Cambia el estado; 'procesando' renueva el reclamo y 'pendiente' espera `espera` segundos"""
+        _ejecutar_sql("""
+            UPDATE notificaciones_outbox
+            SET estado = %s,
+                intentos = COALESCE(%s, intentos),
+                ultimo_error = COALESCE(%s, ultimo_error),
+                proximo_intento = CURRENT_TIMESTAMP + (%s * INTERVAL '1 second'),
+                reclamado = CASE WHEN %s = 'procesando' THEN CURRENT_TIMESTAMP ELSE reclamado END,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (estado, intentos, error, espera, estado, outbox_id))
+
+class OutboxMemoria:
+    """Mismo contrato que OutboxPostgres dentro del proceso (sin BD, o si la tabla no está disponible)"""
+
+    nombre = 'memoria'
+
+    def __init__(self, lease_seg: float = NOTIF_LEASE_SEG):
+        self.lease_seg = lease_seg
+        self._filas = {}  # id -> dict con las columnas de notificaciones_outbox
+        self._siguiente_id = 1
+        self._lock = threading.Lock()
+
+    def preparar(self):
+        pass
+
+    def insertar(self, tipo: str, payload: Dict, turno_id: Optional[int]) -> int:
+        with self._lock:
+            outbox_id = self._siguiente_id
+            self._siguiente_id += 1
+            self._filas[outbox_id] = {'tipo': tipo, 'payload': payload, 'turno_id': turno_id,
+                                      'estado': 'procesando', 'intentos': 0, 'proximo_intento': 0.0,
+                                      'reclamado': time.monotonic(), 'ultimo_error': None}
+        return outbox_id
+
+    def reclamar(self, limite: int) -> List[Dict]:
+        ahora = time.monotonic()
+        trabajos = []
+        with self._lock:
+            for outbox_id, fila in self._filas.items():
+                if len(trabajos) >= limite:
+                    break
+                if ((fila['estado'] == 'pendiente' and fila['proximo_intento'] <= ahora) or
+                        (fila['estado'] == 'procesando' and fila['reclamado'] < ahora - self.lease_seg)):
+                    fila['estado'], fila['reclamado'] = 'procesando', ahora
+                    trabajos.append({'id': outbox_id, 'tipo': fila['tipo'], 'payload': fila['payload'],
+                                     'intentos': fila['intentos']})
+        return trabajos
+
+    def marcar(self, outbox_id: int, estado: str, intentos: int = None, error: str = None, espera: float = 0):
+        with self._lock:
+            fila = self._filas.get(outbox_id)
+            if fila is None:
+                return
+            ahora = time.monotonic()
+            fila['estado'] = estado
+            if intentos is not None:
+                fila['intentos'] = intentos
+            if error is not None:
+                fila['ultimo_error'] = error
+            fila['proximo_intento'] = ahora + espera
+            if estado == 'procesando':
+                fila['reclamado'] = ahora
+
+    def estado(self, outbox_id: int) -> Optional[Dict]:
+        """Copia de la fila (para tests y diagnóstico)"""
+        with self._lock:
+            fila = self._filas.get(outbox_id)
+            return dict(fila) if fila else None
+
+# =====================================================
+# HANDLER: CONFIRMACIÓN DE TURNO (QR + TOKEN + EMAIL)
+# =====================================================
+
+def _enviar_confirmacion(payload: Dict):
+    """
+    Genera el QR, guarda el token en turnos y envía el email.
+    Lanza excepción si el envío falla para que la cola reintente.
+    """
+    from qr_generator import get_qr_generator
+
+    turno_data_qr = payload['turno_data']
+    turno_id = turno_data_qr['turno_id']
+    email_destino = payload['email']
+
+    # Obtener URL base desde variable de entorno (para Cloudflare/ngrok/producción)
+    base_url = os.getenv('BASE_URL', 'http://localhost:5000')
+    qr_gen = get_qr_generator(base_url)  # Encoder compartido (versión fija, sin fit)
+    qr_data = qr_gen.generate_qr_confirmation(turno_data_qr)
+    token = qr_data['token']
+    logger.info(f"✅ QR generado para turno {turno_id}, token: {token[:10]}...")
+
+    # Guardar el token en la BD para confirmación
+    try:
+        _ejecutar_sql("""
+            UPDATE turnos
+            SET token_confirmacion = %s
+            WHERE id = %s
+        """, (token, turno_id))
+        logger.info("✅ Token de confirmación guardado en BD")
+    except Exception as e_token:
+        logger.warning(f"⚠️ No se pudo guardar token en BD (puede que la columna no exista): {e_token}")
+
+    smtp_email = os.getenv('SMTP_EMAIL')
+    smtp_password = os.getenv('SMTP_PASSWORD')
+    if not (smtp_email and smtp_password):
+        logger.warning("⚠️ Credenciales de email no configuradas. Email no enviado.")
+        return
+
+    email_sender = _obtener_email_sender(smtp_email, smtp_password)
+    if not email_sender.send_confirmation_email(email_destino, turno_data_qr, qr_data):
+        raise RuntimeError(f"envío SMTP fallido a {email_destino}")
+    logger.info(f"✅ Email enviado exitosamente a {email_destino}")
+
+_email_sender = None
+_email_sender_lock = threading.Lock()
+
+def _obtener_email_sender(smtp_email: str, smtp_password: str):
+    """Sender SMTP compartido por los workers, con la sesión abierta entre envíos"""
+    global _email_sender
+    with _email_sender_lock:
+        if _email_sender is None or _email_sender.email != smtp_email:
+            from email_sender import EmailNotificationSender
+            _email_sender = EmailNotificationSender(
+                smtp_server=os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
+                smtp_port=int(os.getenv('SMTP_PORT', 587)),
+                email=smtp_email,
+                password=smtp_password,
+                persistent=True
+            )
+        return _email_sender
+
+HANDLERS = {
+    TIPO_CONFIRMACION: _enviar_confirmacion,
+}
+
+# =====================================================
+# COLA
+# =====================================================
+
+class ColaNotificaciones:
+    """
+    Cola acotada de notificaciones con workers en segundo plano.
+    Cada trabajo es un dict {'id': outbox_id, 'tipo', 'payload', 'intentos'}.
+    """
+
+    def __init__(self, workers: int = NOTIF_WORKERS, max_cola: int = NOTIF_COLA_MAX,
+                 max_intentos: int = NOTIF_MAX_INTENTOS, backoff_base: float = NOTIF_BACKOFF_BASE,
+                 backoff_max: float = NOTIF_BACKOFF_MAX, persistente: bool = True,
+                 outbox=None, poll_seg: float = NOTIF_POLL_SEG):
+        self.workers = workers
+        self.max_intentos = max_intentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_seg = poll_seg
+        self.outbox = outbox if outbox is not None else (OutboxPostgres() if persistente else OutboxMemoria())
+
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._hilos = []
+        self._lock = threading.Lock()
+        self._iniciada = False
+        self._detener = threading.Event()
+        self._en_curso = set()  # ids en la cola en memoria o en un worker: no se encolan dos veces
+
+        self._metricas = {
+            'encolados': 0,
+            'enviados': 0,
+            'reintentos': 0,
+            'fallidos': 0,
+            'recuperados': 0,
+            'descartados_cola_llena': 0,
+        }
+
+    # ---------- ciclo de vida ----------
+
+    def iniciar(self):
+        """Prepara el outbox y arranca los workers y el hilo que revisa el outbox (idempotente)"""
+        with self._lock:
+            if self._iniciada:
+                return
+            self._iniciada = True
+
+        try:
+            self.outbox.preparar()
+        except Exception as e:
+            logger.warning(f"⚠️ Outbox de notificaciones no disponible, cola solo en memoria: {e}")
+            self.outbox = OutboxMemoria()
+
+        for i in range(self.workers):
+            hilo = threading.Thread(target=self._bucle_worker, name=f"notif-worker-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        hilo = threading.Thread(target=self._bucle_outbox, name="notif-outbox", daemon=True)
+        hilo.start()
+        self._hilos.append(hilo)
+        logger.info(f"📬 Cola de notificaciones iniciada ({self.workers} workers, outbox {self.outbox.nombre})")
+
+    def detener(self):
+        """Deja de revisar el outbox (los workers son daemon)"""
+        self._detener.set()
+
+    def _bucle_outbox(self):
+        # La primera revisión es inmediata: recupera lo que quedó de antes de un reinicio
+        while True:
+            try:
+                self.recuperar()
+            except Exception as e:
+                logger.warning(f"⚠️ Error revisando outbox de notificaciones: {e}")
+            if self._detener.wait(self.poll_seg):
+                return
+
+    def recuperar(self) -> int:
+        """Reclama del outbox los trabajos listos para (re)intentar y los encola; devuelve cuántos"""
+        trabajos = self.outbox.reclamar(NOTIF_RECLAMO_LOTE)
+        recuperados = 0
+        for trabajo in trabajos:
+            with self._lock:
+                if trabajo['id'] in self._en_curso:
+                    continue  # Ya está en esta cola (reclamo vencido mientras esperaba)
+            if self._poner(trabajo):
+                recuperados += 1
+        if recuperados:
+            with self._lock:
+                self._metricas['recuperados'] += recuperados
+            logger.info(f"📬 {recuperados} notificaciones recuperadas del outbox")
+        return recuperados
+
+    # ---------- API ----------
+
+    def encolar(self, tipo: str, payload: Dict, turno_id: Optional[int] = None) -> Optional[int]:
+        """
+        Registra la notificación en el outbox (ya reclamada) y la pone en la cola.
+        Retorna el id del outbox (None si no se pudo registrar).
+        """
+        self.iniciar()
+
+        try:
+            outbox_id = self.outbox.insertar(tipo, payload, turno_id)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo registrar en outbox, se encola solo en memoria: {e}")
+            outbox_id = None
+
+        with self._lock:
+            self._metricas['encolados'] += 1
+        self._poner({'id': outbox_id, 'tipo': tipo, 'payload': payload, 'intentos': 0})
+        return outbox_id
+
+    def metricas(self) -> Dict:
+        """Métricas de la cola (para /api/debug/status)"""
+        with self._lock:
+            datos = dict(self._metricas)
+        datos['en_cola'] = self._cola.qsize()
+        datos['workers'] = self.workers
+        datos['outbox'] = self.outbox.nombre
+        return datos
+
+    # ---------- internos ----------
+
+    def _poner(self, trabajo: Dict) -> bool:
+        outbox_id = trabajo['id']
+        with self._lock:
+            if outbox_id is not None:
+                self._en_curso.add(outbox_id)
+        try:
+            self._cola.put_nowait(trabajo)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._en_curso.discard(outbox_id)
+                self._metricas['descartados_cola_llena'] += 1
+            logger.error(f"❌ Cola de notificaciones llena, trabajo {outbox_id} queda en outbox")
+            # Se libera el reclamo: lo retoma la próxima revisión (de este u otro proceso)
+            self._marcar(outbox_id, 'pendiente')
+            return False
+
+    def _bucle_worker(self):
+        while True:
+            trabajo = self._cola.get()
+            try:
+                self._procesar(trabajo)
+            except Exception as e:
+                logger.error(f"❌ Error inesperado en worker de notificaciones: {e}")
+            finally:
+                with self._lock:
+                    self._en_curso.discard(trabajo['id'])
+                self._cola.task_done()
+
+    def _procesar(self, trabajo: Dict):
+        outbox_id = trabajo['id']
+        handler = HANDLERS.get(trabajo['tipo'])
+        if handler is None:
+            logger.error(f"❌ Tipo de notificación desconocido: {trabajo['tipo']}")
+            self._marcar(outbox_id, 'fallido', error='tipo desconocido')
+            return
+
+        self._marcar(outbox_id, 'procesando')  # Renueva el reclamo
+        try:
+            handler(trabajo['payload'])
+        except Exception as e:
+            trabajo['intentos'] += 1
+            error = f"{e}"
+            if trabajo['intentos'] >= self.max_intentos:
+                with self._lock:
+                    self._metricas['fallidos'] += 1
+                logger.error(f"❌ Notificación {outbox_id} fallida tras {trabajo['intentos']} intentos: {error}")
+                logger.debug(traceback.format_exc())
+                self._marcar(outbox_id, 'fallido', intentos=trabajo['intentos'], error=error)
+                return
+
+            espera = min(self.backoff_max, self.backoff_base * (2 ** (trabajo['intentos'] - 1)))
+            with self._lock:
+                self._metricas['reintentos'] += 1
+            logger.warning(f"⚠️ Notificación {outbox_id} falló (intento {trabajo['intentos']}), "
+                           f"reintento en {espera:.0f}s: {error}")
+            if outbox_id is None:
+                # Sin fila en el outbox no hay quien lo retome: se reencola en memoria
+                temporizador = threading.Timer(espera, self._poner, args=(trabajo,))
+                temporizador.daemon = True
+                temporizador.start()
+                return
+            # Vuelve a 'pendiente' con su proximo_intento: lo reclama la revisión del outbox cuando toque
+            self._marcar(outbox_id, 'pendiente', intentos=trabajo['intentos'], error=error, espera=espera)
+            return
+
+        with self._lock:
+            self._metricas['enviados'] += 1
+        self._marcar(outbox_id, 'enviado', intentos=trabajo['intentos'] + 1)
+
+    def _marcar(self, outbox_id: Optional[int], estado: str, intentos: int = None,
+                error: str = None, espera: float = 0):
+        """Actualiza el estado del trabajo en el outbox (si existe)"""
+        if outbox_id is None:
+            return
+        try:
+            self.outbox.marcar(outbox_id, estado, intentos=intentos, error=error, espera=espera)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo actualizar outbox {outbox_id}: {e}")
+
+# =====================================================
+# INSTANCIA GLOBAL
+# =====================================================
+
+cola_notificaciones = ColaNotificaciones()
+
+def encolar_confirmacion(turno_data: Dict, email: str) -> Optional[int]:
+    """
+    Encola QR + token + email de confirmación de un turno recién guardado.
+    turno_data debe incluir 'turno_id'.
+    """
+    payload = {'turno_data': turno_data, 'email': email}
+    return cola_notificaciones.encolar(TIPO_CONFIRMACION, payload, turno_id=turno_data.get('turno_id'))
+
+def iniciar_notificaciones():
+    """Arranca la cola compartida (app.py lo llama al iniciar, no en la primera reserva)"""
+    cola_notificaciones.iniciar()
+
+def metricas_notificaciones() -> Dict:
+    """Métricas de la cola compartida"""
+    return cola_notificaciones.metricas()
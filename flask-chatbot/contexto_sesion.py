@@ -0,0 +1,155 @@
+"""
+CONTEXTO DE SESIÓN
+SessionContext con esquema fijo (__slots__) y codificación versionada.
+- Un atributo por campo del esquema, sin __dict__ por instancia: menos memoria
+  por sesión viva y un error inmediato si alguien asigna un campo no declarado
+- codificar(): JSON posicional [versión, valor1, valor2, ...] en el orden de
+  ESQUEMA_SESION, sin los valores por defecto del final
+- decodificar(): entiende cualquier versión de ESQUEMAS (y el dict por nombre
+  que guardaba el backend antes de versionar el esquema)
+- to_dict() se arma una vez y se reutiliza hasta que cambie un campo de la respuesta
+"""
+
+import json
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# ESQUEMA
+# =====================================================
+
+# El orden es el formato: los campos nuevos se agregan AL FINAL y suben ESQUEMA_VERSION
+ESQUEMA_VERSION = 1
+ESQUEMA_SESION = (
+    ('nombre', None),
+    ('cedula', None),
+    ('tipo_tramite', None),  # 'primera_vez', 'perdida', 'renovacion', 'extranjero'
+    ('fecha', None),
+    ('franja_horaria', None),  # 'manana', 'tarde'
+    ('hora', None),
+    ('hora_recomendada', None),  # Última hora recomendada
+    ('fecha_recomendada', None),  # Última fecha recomendada
+    ('proxima_semana', False),  # Flag para "próxima semana"
+    ('email', None),
+    ('intent_actual', None),
+    ('ultimo_intent', None),  # Intent anterior, para contexto
+    ('ultimo_mensaje', None),
+    ('conversacion_historial', []),
+    ('datos_difusos', {}),
+    ('ultimo_intent_confianza', 0.0),
+    ('campo_en_cambio', None),  # Qué campo se está cambiando
+    ('flujo_activo', None),  # Intent del flujo guiado en curso (antes se agregaba sin declarar)
+)
+
+CAMPOS_SESION = tuple(campo for campo, _ in ESQUEMA_SESION)
+DEFAULTS_SESION = tuple(default for _, default in ESQUEMA_SESION)
+_CAMPOS_SESION = frozenset(CAMPOS_SESION)
+
+# Campos de cada versión del esquema, para leer sesiones guardadas por versiones anteriores
+ESQUEMAS = {1: CAMPOS_SESION}
+
+# Lo que viaja en cada respuesta ('contexto') y en /api/debug/context
+CAMPOS_RESPUESTA = ('nombre', 'cedula', 'fecha', 'hora', 'email', 'intent_actual',
+                    'franja_horaria', 'proxima_semana', 'fecha_recomendada')
+_CAMPOS_RESPUESTA = frozenset(CAMPOS_RESPUESTA)
+
+_MUTABLES = {'conversacion_historial': list, 'datos_difusos': dict}  # Uno nuevo por sesión
+_ACUMULATIVOS = frozenset({'conversacion_historial'})  # Listas a las que solo se agrega al final
+
+# =====================================================
+# CONTEXTO
+# =====================================================
+
+class SessionContext:
+    """Contexto completo de una sesión de usuario"""
+
+    __slots__ = ('session_id',) + CAMPOS_SESION + ('_version', '_base', '_respuesta')
+
+    def __init__(self, session_id: str):
+        asignar = object.__setattr__
+        asignar(self, 'session_id', session_id)
+        for campo, default in ESQUEMA_SESION:
+            asignar(self, campo, _MUTABLES[campo]() if campo in _MUTABLES else default)
+        asignar(self, '_version', 0)  # Versión leída del backend compartido (0 = nunca guardada)
+        asignar(self, '_base', None)  # Codificación tal como se leyó / guardó por última vez
+        asignar(self, '_respuesta', None)  # to_dict() cacheado
+
+    def __setattr__(self, campo: str, valor):
+        object.__setattr__(self, campo, valor)
+        if campo in _CAMPOS_RESPUESTA:
+            object.__setattr__(self, '_respuesta', None)
+
+    def actualizar(self, **kwargs):
+        """Actualiza el contexto con nuevos datos"""
+        for key, value in kwargs.items():
+            if key in CAMPOS_SESION and value is not None:
+                setattr(self, key, value)
+                logger.info(f"📝 Contexto actualizado: {key} = {value}")
+
+    def tiene_datos_completos(self) -> bool:
+        """Verifica si tiene todos los datos para agendar"""
+        return all([self.nombre, self.cedula, self.fecha, self.hora, self.email])
+
+    def to_dict(self) -> Dict:
+        """Campos de la respuesta; el dict se reutiliza mientras no cambien (no modificarlo)"""
+        if self._respuesta is None:
+            object.__setattr__(self, '_respuesta', {campo: getattr(self, campo) for campo in CAMPOS_RESPUESTA})
+        return self._respuesta
+
+    def campos(self) -> Dict:
+        """Todos los campos del esquema por nombre"""
+        return {campo: getattr(self, campo) for campo in CAMPOS_SESION}
+
+    # =====================================================
+    # CODIFICACIÓN
+    # =====================================================
+
+    def codificar(self) -> str:
+        """JSON compacto [ESQUEMA_VERSION, valores...] sin los defaults del final"""
+        valores = [getattr(self, campo) for campo in CAMPOS_SESION]
+        fin = len(valores)
+        while fin and valores[fin - 1] == DEFAULTS_SESION[fin - 1]:
+            fin -= 1
+        return json.dumps([ESQUEMA_VERSION] + valores[:fin], separators=(',', ':'), ensure_ascii=False, default=str)
+
+    @classmethod
+    def decodificar(cls, session_id: str, datos: Optional[str]) -> 'SessionContext':
+        """Contexto a partir de codificar(); None da un contexto nuevo"""
+        contexto = cls(session_id)
+        if not datos:
+            return contexto
+        cargado = json.loads(datos)
+        if isinstance(cargado, dict):
+            pares = cargado.items()  # Formato por nombre, previo al esquema versionado
+        else:
+            esquema = ESQUEMAS.get(cargado[0])
+            if esquema is None:
+                raise ValueError(f"Versión de esquema de sesión desconocida: {cargado[0]}")
+            pares = zip(esquema, cargado[1:])
+        asignar = object.__setattr__
+        for campo, valor in pares:
+            if campo in _CAMPOS_SESION:
+                asignar(contexto, campo, valor)  # Los campos que ya no existen se descartan
+        return contexto
+
+    def fusionar(self, base: Optional[str], remoto: Optional[str]):
+        """
+        Fusión de 3 vías tras un conflicto de versión: los campos que este mensaje
+        cambió respecto de `base` se conservan; el resto se toma de `remoto`.
+        En las listas acumulativas (conversacion_historial) se conservan ambos lados:
+        lo que agregó el otro proceso y, después, lo que agregó este mensaje.
+        """
+        anterior = SessionContext.decodificar(self.session_id, base)
+        otro = SessionContext.decodificar(self.session_id, remoto)
+        for campo in CAMPOS_SESION:
+            mio, previo, suyo = getattr(self, campo), getattr(anterior, campo), getattr(otro, campo)
+            if campo in _ACUMULATIVOS and _extiende(mio, previo) and _extiende(suyo, previo):
+                setattr(self, campo, suyo + mio[len(previo):])
+            elif mio == previo:
+                setattr(self, campo, suyo)
+
+def _extiende(lista, prefijo) -> bool:
+    """True si `lista` es `prefijo` con entradas agregadas al final"""
+    return isinstance(lista, list) and isinstance(prefijo, list) and lista[:len(prefijo)] == prefijo
@@ -7,8 +7,8 @@ Gestiona la integración de GitHub Copilot como modelo principal de respuesta
 import logging
 from typing import Dict, Optional, Tuple, List
 from datetime import datetime, date, timedelta
-import psycopg2
 import re
+from db_pool import obtener_conexion
 from motor_difuso import (
     calcular_espera,
     analizar_disponibilidad_dia,
@@ -38,18 +38,10 @@ def format_fecha_es(fecha: date, con_anio: bool = False) -> str:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configuración BD
-DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'chatbotdb',
-    'user': 'botuser',
-    'password': 'root'
-}
-
 def get_db_connection():
-    """Obtiene conexión a la base de datos"""
+    """Obtiene conexión a la base de datos (del pool compartido)"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = obtener_conexion()
         return conn
     except Exception as e:
         logger.error(f"Error conectando a BD: {e}")
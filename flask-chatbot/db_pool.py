@@ -0,0 +1,250 @@
+"""
+POOL DE CONEXIONES A POSTGRESQL
+Acceso compartido a la base de datos para todo el proceso (orquestador, app, copilot)
+Evita abrir/cerrar una conexión TCP+auth por cada consulta
+"""
+
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# CONFIGURACIÓN
+# =====================================================
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'database': os.getenv('DB_NAME', 'chatbotdb'),
+    'user': os.getenv('DB_USER', 'botuser'),
+    'password': os.getenv('DB_PASSWORD', 'root')
+}
+
+POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))  # Segundos esperando una conexión libre
+POOL_HEALTHCHECK = float(os.getenv('DB_POOL_HEALTHCHECK', 30))  # Verificar conexiones ociosas > N seg
+
+# =====================================================
+# CONEXIÓN DEVUELTA POR EL POOL
+# =====================================================
+
+class ConexionPooled:
+    """
+    Envoltorio de una conexión del pool.
+    Se usa igual que una conexión psycopg2, pero close() la devuelve
+    al pool en vez de cerrar el socket.
+    """
+
+    def __init__(self, pool: 'PoolConexiones', conn):
+        self._pool = pool
+        self._conn = conn
+
+    def close(self):
+        """Devuelve la conexión al pool"""
+        if self._conn is not None:
+            self._pool.liberar(self._conn)
+            self._conn = None
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    def __getattr__(self, nombre):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("conexión ya devuelta al pool")
+        return getattr(self._conn, nombre)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._conn is not None:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        self.close()
+        return False
+
+# =====================================================
+# POOL
+# =====================================================
+
+class PoolConexiones:
+    """
+    Pool de conexiones thread-safe con tamaño min/max configurable,
+    espera acotada cuando está lleno, health check de conexiones ociosas
+    y métricas de espera.
+    """
+
+    def __init__(self, config: Dict = None, minconn: int = POOL_MIN, maxconn: int = POOL_MAX,
+                 timeout: float = POOL_TIMEOUT, healthcheck: float = POOL_HEALTHCHECK):
+        self.config = config or DB_CONFIG
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck = healthcheck
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._ultimo_uso = {}  # id(conn) -> timestamp de devolución
+
+        self._metricas = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'descartadas': 0,
+            'espera_total_ms': 0.0,
+            'espera_max_ms': 0.0,
+        }
+
+    def _asegurar_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self.config)
+                    logger.info(f"🗄️ Pool de conexiones creado (min={self.minconn}, max={self.maxconn})")
+        return self._pool
+
+    def _esta_sana(self, conn) -> bool:
+        """Verifica la conexión si estuvo ociosa más de `healthcheck` segundos"""
+        if conn.closed:
+            return False
+        ultimo = self._ultimo_uso.get(id(conn))
+        if ultimo is not None and time.monotonic() - ultimo < self.healthcheck:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def obtener(self, timeout: float = None) -> ConexionPooled:
+        """
+        Obtiene una conexión del pool. Si todas están en uso espera hasta
+        `timeout` segundos y luego lanza psycopg2.pool.PoolError.
+        """
+        espera = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+
+        if not self._slots.acquire(timeout=espera):
+            with self._lock:
+                self._metricas['timeouts'] += 1
+            logger.error(f"❌ Pool agotado: sin conexión libre tras {espera:.1f}s")
+            raise pg_pool.PoolError("pool de conexiones agotado")
+
+        try:
+            pool = self._asegurar_pool()
+            conn = pool.getconn()
+            if not self._esta_sana(conn):
+                logger.warning("⚠️ Conexión del pool inválida, reemplazando")
+                self._descartar(conn)
+                conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        espera_ms = (time.monotonic() - inicio) * 1000
+        with self._lock:
+            self._metricas['checkouts'] += 1
+            self._metricas['espera_total_ms'] += espera_ms
+            self._metricas['espera_max_ms'] = max(self._metricas['espera_max_ms'], espera_ms)
+
+        return ConexionPooled(self, conn)
+
+    def liberar(self, conn):
+        """Devuelve una conexión cruda al pool (deshace transacción abierta)"""
+        try:
+            if conn.closed:
+                self._descartar(conn)
+                return
+            if conn.status != psycopg2.extensions.STATUS_READY:
+                conn.rollback()
+            self._ultimo_uso[id(conn)] = time.monotonic()
+            self._pool.putconn(conn)
+        except Exception as e:
+            logger.warning(f"⚠️ Error devolviendo conexión al pool: {e}")
+            self._descartar(conn)
+        finally:
+            self._slots.release()
+
+    def _descartar(self, conn):
+        self._ultimo_uso.pop(id(conn), None)
+        with self._lock:
+            self._metricas['descartadas'] += 1
+        try:
+            self._pool.putconn(conn, close=True)
+        except Exception:
+            pass
+
+    def metricas(self) -> Dict:
+        """Métricas del pool (para /api/debug/status)"""
+        with self._lock:
+            datos = dict(self._metricas)
+        checkouts = datos['checkouts']
+        datos['espera_promedio_ms'] = round(datos['espera_total_ms'] / checkouts, 2) if checkouts else 0.0
+        datos['espera_total_ms'] = round(datos['espera_total_ms'], 2)
+        datos['espera_max_ms'] = round(datos['espera_max_ms'], 2)
+        datos['min'] = self.minconn
+        datos['max'] = self.maxconn
+        if self._pool is not None:
+            datos['en_uso'] = len(self._pool._used)
+            datos['libres'] = len(self._pool._pool)
+        else:
+            datos['en_uso'] = 0
+            datos['libres'] = 0
+        return datos
+
+    def cerrar(self):
+        """Cierra todas las conexiones del pool"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._ultimo_uso.clear()
+                logger.info("🗄️ Pool de conexiones cerrado")
+
+# =====================================================
+# INSTANCIA GLOBAL
+# =====================================================
+
+pool_conexiones = PoolConexiones()
+
+# =====================================================
+# FUNCIONES PÚBLICAS
+# =====================================================
+
+def obtener_conexion(timeout: float = None) -> ConexionPooled:
+    """
+    Obtiene una conexión compartida. Llamar a conn.close() la devuelve al pool.
+    """
+    return pool_conexiones.obtener(timeout)
+
+@contextmanager
+def conexion(timeout: float = None):
+    """
+    Context manager: hace commit si el bloque termina bien, rollback si falla,
+    y siempre devuelve la conexión al pool.
+    """
+    conn = pool_conexiones.obtener(timeout)
+    with conn:
+        yield conn
+
+def metricas_pool() -> Dict:
+    """Métricas del pool compartido"""
+    return pool_conexiones.metricas()
+
+def cerrar_pool():
+    """Cierra el pool compartido"""
+    pool_conexiones.cerrar()
@@ -1,12 +1,13 @@
 
 
-import requests
 import logging
 from typing import Tuple, Optional, List, Dict
 import re
 import json
 import os
 from pathlib import Path
+from cache_llm import obtener_cache_llm
+from cliente_llm import obtener_cliente_llm
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -332,27 +333,26 @@ def _try_parse_json(s: str) -> Optional[Dict]:
 class LLMIntentClassifier:
     """Clasificador de intents usando LM Studio con fallback inteligente"""
     
-    def __init__(self, model_url: str = LM_STUDIO_URL, temperature: float = 0.1):
-        self.model_url = model_url
+    def __init__(self, model_url: Optional[str] = None, temperature: float = 0.1):
+        # Sin model_url se usa el cliente compartido con todas las URLs (failover);
+        # con model_url, un cliente solo para esa URL
+        self.cliente = obtener_cliente_llm([model_url] if model_url else None)
+        self.model_url = model_url or self.cliente.urls[0]
         self.temperature = temperature
         self.system_prompt = generar_system_prompt()
-        self.available = self._check_availability()
+    
+    @property
+    def available(self) -> bool:
+        """Hay algún endpoint sano (según el sondeo en segundo plano)"""
+        return self._check_availability()
     
     def _check_availability(self) -> bool:
         """Verifica si LM Studio está disponible"""
-        try:
-            base_url = self.model_url.replace("/v1/chat/completions", "")
-            response = requests.get(f"{base_url}/v1/models", timeout=2)
-            
-            if response.status_code == 200:
-                logger.info("✅ LM Studio está disponible")
-                return True
-            else:
-                logger.warning("⚠️ LM Studio no responde correctamente")
-                return False
-        except Exception as e:
-            logger.warning(f"⚠️ LM Studio no disponible: {e}")
+        url = self.cliente.url_activa()
+        if url is None:
+            logger.warning("⚠️ LM Studio no disponible")
             return False
+        return True
     
     def _generar_prompt_con_contexto_completo(self, user_message: str) -> str:
         """
@@ -422,6 +422,13 @@ class LLMIntentClassifier:
             logger.warning("LM Studio no disponible, usando nlu_fallback")
             return ("nlu_fallback", 0.3)
 
+        # 💾 Misma consulta ya respondida por el modelo
+        cache = obtener_cache_llm('llm_classifier')
+        cacheado = cache.obtener(user_message)
+        if cacheado is not None:
+            logger.info(f"💾 LLM desde cache: '{user_message}' → {cacheado[0]}")
+            return (cacheado[0], cacheado[1])
+
         # 3️⃣ Consulta al modelo local CON CONTEXTO COMPLETO DEL PROYECTO
         try:
             # Construir prompt enriquecido con todo el contexto del proyecto
@@ -437,7 +444,7 @@ class LLMIntentClassifier:
                 "stream": False
             }
 
-            response = requests.post(self.model_url, json=payload, timeout=15)
+            response = self.cliente.post(payload, timeout=15)
             if response.status_code != 200:
                 logger.error(f"Error en LM Studio: {response.status_code}")
                 return ("nlu_fallback", 0.4)
@@ -456,9 +463,11 @@ class LLMIntentClassifier:
 
             if intent not in INTENTS_DISPONIBLES:
                 logger.warning(f"Intent fuera de catálogo: {intent}")
+                cache.guardar(user_message, ["nlu_fallback", 0.45])
                 return ("nlu_fallback", 0.45)
 
             logger.info(f"✅ LLM clasificó '{user_message}' → {intent} (conf {conf:.2f})")
+            cache.guardar(user_message, [intent, conf])
             return (intent, conf)
 
         except Exception as e:
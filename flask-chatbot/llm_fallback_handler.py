@@ -2,10 +2,12 @@
 import requests
 import logging
 from typing import Optional
+from cache_llm import obtener_cache_llm
+from cliente_llm import obtener_cliente_llm, urls_con_preferida
 
 logger = logging.getLogger(__name__)
 
-LM_STUDIO_URL = "http://192.168.3.118:1234/v1/chat/completions"
+LM_STUDIO_URL = "http://192.168.3.118:1234/v1/chat/completions"  # Preferida; el cliente cae a las demás LM_STUDIO_URLS
 
 # =====================================================
 # ✅ PROMPT MEJORADO CON CONTEXTO ESPECÍFICO
@@ -128,6 +130,12 @@ def generar_respuesta_llm_fallback(mensaje_usuario: str) -> Optional[str]:
     Returns:
         Respuesta del LLM o None si falla
     """
+    cache = obtener_cache_llm('fallback')
+    cacheada = cache.obtener(mensaje_usuario)
+    if cacheada is not None:
+        logger.info(f"💾 Respuesta LLM desde cache: '{mensaje_usuario}'")
+        return cacheada
+    
     try:
         payload = {
             "messages": [
@@ -150,11 +158,7 @@ def generar_respuesta_llm_fallback(mensaje_usuario: str) -> Optional[str]:
         
         logger.info(f"🤖 Consultando LLM para: '{mensaje_usuario}'")
         
-        response = requests.post(
-            LM_STUDIO_URL,
-            json=payload,
-            timeout=10
-        )
+        response = obtener_cliente_llm(urls_con_preferida(LM_STUDIO_URL)).post(payload, timeout=10)
         
         if response.status_code == 200:
             result = response.json()
@@ -163,6 +167,7 @@ def generar_respuesta_llm_fallback(mensaje_usuario: str) -> Optional[str]:
             # Validar que la respuesta tenga sentido
             if len(respuesta) > 10:  # Respuesta mínima válida
                 logger.info(f"✅ LLM respondió: {respuesta[:60]}...")
+                cache.guardar(mensaje_usuario, respuesta)
                 return respuesta
             else:
                 logger.warning(f"⚠️ Respuesta del LLM muy corta: '{respuesta}'")
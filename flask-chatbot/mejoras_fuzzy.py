@@ -1,21 +1,80 @@
 """
 Mejoras al Motor Difuso:
-1. Corrección ortográfica con FuzzyWuzzy
+1. Corrección ortográfica con índice de borrados (estilo SymSpell)
 2. Detección de oraciones compuestas
 3. Priorización por contexto
 """
 
+import os
 import re
-from typing import Dict, List, Tuple, Optional
-from fuzzywuzzy import fuzz, process
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple, Optional
 
 # =====================================================
 # MEJORA 1: CORRECCIÓN ORTOGRÁFICA
 # =====================================================
 
+CORRECTOR_MAX_BORRADOS = int(os.getenv('CORRECTOR_MAX_BORRADOS', 2))  # Letras borradas por lado en el índice
+CORRECTOR_MEMO_MAX = int(os.getenv('CORRECTOR_MEMO_MAX', 10000))  # Palabras corregidas memorizadas
+
+RE_NO_ALFANUMERICO = re.compile(r'(?ui)\W')
+
+def _procesar(texto: str) -> str:
+    """Mismo preprocesado que fuzzywuzzy (full_process): solo letras/números, minúsculas, sin bordes"""
+    return RE_NO_ALFANUMERICO.sub(' ', texto).lower().strip()
+
+def _mascaras(texto: str) -> Dict[str, int]:
+    """Bit i encendido en la máscara de c si texto[i] == c"""
+    mascaras = {}
+    for i, caracter in enumerate(texto):
+        mascaras[caracter] = mascaras.get(caracter, 0) | (1 << i)
+    return mascaras
+
+def _largo_lcs(mascaras: Dict[str, int], largo: int, otro: str) -> int:
+    """
+    Largo de la subsecuencia común más larga entre el texto de `mascaras` y `otro`,
+    bit-paralelo (Hyyrö): una suma y tres operaciones de bits por letra de `otro`.
+    """
+    todos = (1 << largo) - 1
+    v = todos
+    for caracter in otro:
+        u = v & mascaras.get(caracter, 0)
+        v = ((v + u) | (v - u)) & todos
+    return largo - bin(v).count('1')
+
+def _puntaje(largo_lcs: int, total: int) -> int:
+    # distancia indel = total - 2 * lcs
+    distancia = total - 2 * largo_lcs
+    return int(round(100 * ((total - distancia) / total)))
+
+def similitud(a: str, b: str) -> int:
+    """
+    Similitud 0-100 igual a fuzz.ratio con python-Levenshtein:
+    100 * (1 - distancia / (len(a) + len(b))), con distancia de inserciones/borrados.
+    """
+    if a == b:
+        return 100
+    if not a or not b:
+        return 0
+    return _puntaje(_largo_lcs(_mascaras(a), len(a), b), len(a) + len(b))
+
+def _borrados(palabra: str, profundidad: int) -> set:
+    """La palabra y todas sus variantes con hasta `profundidad` letras borradas"""
+    variantes = {palabra}
+    frontera = {palabra}
+    for _ in range(profundidad):
+        frontera = {p[:i] + p[i + 1:] for p in frontera for i in range(len(p))}
+        variantes |= frontera
+    return variantes
+
 class CorrectOrOrtografico:
     """
-    Corrige errores ortográficos usando distancia de edición (Levenshtein)
+    Corrige errores ortográficos usando distancia de edición (Levenshtein).
+    
+    En vez de comparar contra todo el diccionario, arma una sola vez un índice
+    variante-con-borrados -> palabras (SymSpell): dos palabras a <= N borrados
+    por lado comparten alguna variante, así que solo se mide la similitud
+    de esos candidatos. Cubre cualquier error de hasta N ediciones.
     """
     
     def __init__(self):
@@ -86,41 +145,100 @@ class CorrectOrOrtografico:
             'kuando': 'cuando',
             'ajendarme': 'agendar',
         }
+        
+        self._construir_indice()
     
-    def corregir_palabra(self, palabra: str, umbral: int = 80) -> str:
+    # =====================================================
+    # ÍNDICE DE BORRADOS
+    # =====================================================
+    
+    def _construir_indice(self):
+        """Índice variante -> posiciones en diccionario_base (la posición desempata como extractOne)"""
+        self._palabras = []  # Palabras procesadas, en orden de diccionario_base
+        self._originales = []
+        self._posiciones = {}
+        self._conocidas = set()
+        self._indice_borrados = {}
+        for palabra in self.diccionario_base:
+            self._indexar(palabra)
+        self._corregir_memo = lru_cache(maxsize=CORRECTOR_MEMO_MAX)(self._buscar_correccion)
+    
+    def _indexar(self, palabra: str):
+        self._conocidas.add(palabra)
+        procesada = _procesar(palabra)
+        if procesada in self._posiciones:
+            return  # Repetida: gana la primera aparición
+        posicion = len(self._palabras)
+        self._palabras.append(procesada)
+        self._originales.append(palabra)
+        self._posiciones[procesada] = posicion
+        for variante in _borrados(procesada, CORRECTOR_MAX_BORRADOS):
+            self._indice_borrados.setdefault(variante, []).append(posicion)
+    
+    def agregar_palabras(self, palabras: Iterable[str]):
+        """Suma palabras al diccionario (e índice) y descarta las correcciones memorizadas"""
+        for palabra in palabras:
+            self.diccionario_base.append(palabra)
+            self._indexar(palabra)
+        self._corregir_memo = lru_cache(maxsize=CORRECTOR_MEMO_MAX)(self._buscar_correccion)
+    
+    def buscar_similar(self, palabra: str, umbral: int = 0) -> Tuple[Optional[str], int]:
         """
-        Corrige una palabra usando distancia de Levenshtein.
-        
-        Args:
-            palabra: Palabra a corregir
-            umbral: Umbral de similitud (0-100)
-        
-        Returns:
-            Palabra corregida o la original si no hay match
+        Palabra del diccionario más similar (como process.extractOne con fuzz.ratio).
+        Con `umbral` se saltean los candidatos que por largo no pueden alcanzarlo.
         """
-        palabra_lower = palabra.lower()
-        
+        procesada = _procesar(palabra)
+        if not procesada:
+            return None, 0
+        candidatos = set()
+        for variante in _borrados(procesada, CORRECTOR_MAX_BORRADOS):
+            candidatos.update(self._indice_borrados.get(variante, ()))
+        largo = len(procesada)
+        mascaras = _mascaras(procesada)
+        mejor, mejor_score = None, 0
+        for posicion in sorted(candidatos):
+            candidata = self._palabras[posicion]
+            # Cota superior: todas las letras de la más corta en común
+            cota = 100 * 2 * min(largo, len(candidata)) / (largo + len(candidata))
+            if cota < umbral or round(cota) <= mejor_score:
+                continue
+            score = 100 if candidata == procesada else _puntaje(_largo_lcs(mascaras, largo, candidata),
+                                                                 largo + len(candidata))
+            if score > mejor_score:
+                mejor, mejor_score = self._originales[posicion], score
+        return mejor, mejor_score
+    
+    def _buscar_correccion(self, palabra_lower: str, umbral: int) -> Optional[str]:
+        """Corrección de una palabra en minúsculas, o None si se deja como está (memorizado)"""
         # 1. Revisar correcciones manuales primero
         if palabra_lower in self.correcciones_manuales:
             return self.correcciones_manuales[palabra_lower]
         
         # 2. Si la palabra está en el diccionario, no corregir
-        if palabra_lower in self.diccionario_base:
-            return palabra
+        if palabra_lower in self._conocidas:
+            return None
         
         # 3. Buscar la palabra más similar
-        resultado = process.extractOne(
-            palabra_lower, 
-            self.diccionario_base,
-            scorer=fuzz.ratio
-        )
-        
-        if resultado and resultado[1] >= umbral:
-            palabra_corregida = resultado[0]
+        palabra_corregida, score = self.buscar_similar(palabra_lower, umbral)
+        if palabra_corregida is not None and score >= umbral:
             return palabra_corregida
         
-        # 4. Si no hay match, devolver original
-        return palabra
+        # 4. Si no hay match, dejar la original
+        return None
+    
+    def corregir_palabra(self, palabra: str, umbral: int = 80) -> str:
+        """
+        Corrige una palabra usando distancia de Levenshtein.
+        
+        Args:
+            palabra: Palabra a corregir
+            umbral: Umbral de similitud (0-100)
+        
+        Returns:
+            Palabra corregida o la original si no hay match
+        """
+        palabra_corregida = self._corregir_memo(palabra.lower(), umbral)
+        return palabra if palabra_corregida is None else palabra_corregida
     
     def corregir_mensaje(self, mensaje: str, umbral: int = 75) -> Tuple[str, List[str]]:
         """
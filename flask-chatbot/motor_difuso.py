@@ -1,9 +1,19 @@
 import numpy as np
 import skfuzzy as fuzz
 from skfuzzy import control as ctrl
+from skfuzzy.control.controlsystem import RuleOrderGenerator
+from skfuzzy.control.term import TermAggregate
+import os
+import hashlib
+import itertools
 import logging
 import datetime
-from typing import Tuple, Dict, List
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Tuple, Dict, List, Sequence
+
+from proveedor_ocupacion import obtener_proveedor_ocupacion
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -99,17 +109,357 @@ rec_regla6 = ctrl.Rule(ocupacion['baja'], recomendacion['alta'])
 rec_regla7 = ctrl.Rule(hora_dia['temprano'], recomendacion['alta'])
 rec_regla8 = ctrl.Rule(hora_dia['mediodia'], recomendacion['muy_baja'])
 
+# =====================================================
+# SISTEMAS DE CONTROL COMPILADOS
+# =====================================================
+
+class SistemaDifusoCompilado(ctrl.ControlSystem):
+    """
+    ControlSystem que calcula el orden de disparo de las reglas una sola vez.
+    skfuzzy arma un RuleOrderGenerator nuevo en cada acceso a `rules`, así que
+    rehace el grafo de reglas (networkx) en cada compute(): ~90% del tiempo.
+    """
+
+    @property
+    def rules(self):
+        orden = getattr(self, '_orden_reglas', None)
+        if orden is None or orden[0] is not self.graph:
+            # Se recalcula solo si cambia el grafo (addrule)
+            orden = (self.graph, list(RuleOrderGenerator(self)))
+            self._orden_reglas = orden
+        return iter(orden[1])
+
 # Sistemas de control
-sistema_espera = ctrl.ControlSystem([
+sistema_espera = SistemaDifusoCompilado([
     regla1, regla2, regla3, regla4, regla5, regla6, regla7, regla8, regla9,
     regla10, regla11, regla12, regla13, regla14, regla15
 ])
 
-sistema_recomendacion = ctrl.ControlSystem([
+sistema_recomendacion = SistemaDifusoCompilado([
     rec_regla1, rec_regla2, rec_regla3, rec_regla4, 
     rec_regla5, rec_regla6, rec_regla7, rec_regla8
 ])
 
+# =====================================================
+# SIMULACIONES REUTILIZABLES
+# =====================================================
+
+# skfuzzy guarda el estado de cada simulación dentro de las variables difusas
+# (compartidas por ambos sistemas), así que las simulaciones se serializan con
+# un solo lock. Reusar la simulación además acota la memoria: una simulación
+# nueva por llamada deja su estado en las variables y nunca se limpia.
+_lock_simulaciones = threading.Lock()
+_simulaciones = {}
+
+def _simulacion(sistema: ctrl.ControlSystem) -> ctrl.ControlSystemSimulation:
+    """Simulación 'caliente' del sistema (llamar con _lock_simulaciones tomado)"""
+    simulacion = _simulaciones.get(id(sistema))
+    if simulacion is None:
+        simulacion = ctrl.ControlSystemSimulation(sistema)
+        _simulaciones[id(sistema)] = simulacion
+    return simulacion
+
+def _evaluar(sistema: ctrl.ControlSystem, entradas: Dict[str, float], salida: str) -> float:
+    """Evalúa el sistema con la simulación reutilizable y devuelve la salida defuzzificada"""
+    with _lock_simulaciones:
+        simulacion = _simulacion(sistema)
+        try:
+            for nombre, valor in entradas.items():
+                simulacion.input[nombre] = valor
+            simulacion.compute()
+            return simulacion.output[salida]
+        except Exception:
+            # Estado incierto tras el error: la próxima llamada arranca con una simulación nueva
+            _simulaciones.pop(id(sistema), None)
+            raise
+
+# =====================================================
+# EVALUACIÓN VECTORIZADA (BATCH)
+# =====================================================
+
+FILAS_POR_BLOQUE = 1024  # Puntos por bloque al defuzzificar (acota la memoria)
+
+class SistemaVectorizado:
+    """
+    Inferencia Mamdani de un ControlSystem sobre arreglos NumPy, todos los puntos a la vez:
+    fuzzificación, reglas (AND/OR del sistema, NOT = 1 - x), acumulación y centroide.
+    Reproduce a skfuzzy: la salida se muestrea en el universo más los puntos de corte
+    de cada término, y el centroide se integra por tramos lineales.
+    Devuelve NaN donde ninguna regla se activa (skfuzzy no produce salida ahí).
+    """
+
+    def __init__(self, sistema: ctrl.ControlSystem, salida: str, nombres: Sequence[str]):
+        self.sistema = sistema
+        self.nombres = tuple(nombres)
+        antecedentes = {a.label: a for a in sistema.antecedents}
+        self.antecedentes = [antecedentes[nombre] for nombre in self.nombres]
+        consecuente = next(c for c in sistema.consequents if c.label == salida)
+        self.universo = np.asarray(consecuente.universe, dtype=float)
+        self.acumulacion = consecuente.accumulation_method
+        self.reglas = [regla for regla in sistema.rules
+                       if any(c.term.parent is consecuente for c in regla.consequent)]
+
+        # Términos de salida usados por alguna regla (los demás no participan en skfuzzy)
+        usados = []
+        for regla in self.reglas:
+            for c in regla.consequent:
+                if c.term.parent is consecuente and c.term not in usados:
+                    usados.append(c.term)
+        self.terminos_salida = usados
+        self.mf_salida = np.array([np.asarray(t.mf, dtype=float) for t in usados])
+
+    def _grado(self, antecedente, regla, pertenencias: Dict) -> np.ndarray:
+        """Grado de activación del antecedente de una regla para todos los puntos"""
+        if isinstance(antecedente, TermAggregate):
+            if antecedente.kind == 'not':
+                return 1.0 - self._grado(antecedente.term1, regla, pertenencias)
+            a = self._grado(antecedente.term1, regla, pertenencias)
+            b = self._grado(antecedente.term2, regla, pertenencias)
+            return regla.and_func(a, b) if antecedente.kind == 'and' else regla.or_func(a, b)
+
+        clave = (antecedente.parent.label, antecedente.label)
+        if clave not in pertenencias:
+            variable = antecedente.parent
+            entrada = pertenencias[variable.label]
+            pertenencias[clave] = np.interp(entrada, variable.universe, antecedente.mf, left=0.0, right=0.0)
+        return pertenencias[clave]
+
+    def evaluar(self, *entradas) -> np.ndarray:
+        """Salida defuzzificada para cada punto (entradas escalares o arreglos, se recortan al universo)"""
+        entradas = np.broadcast_arrays(*[np.asarray(e, dtype=float) for e in entradas])
+        forma = entradas[0].shape
+
+        pertenencias = {}
+        for variable, entrada in zip(self.antecedentes, entradas):
+            pertenencias[variable.label] = np.clip(entrada.ravel(), variable.universe.min(), variable.universe.max())
+
+        # Corte (activación acumulada) de cada término de salida: (términos, puntos)
+        cortes = [None] * len(self.terminos_salida)
+        for regla in self.reglas:
+            activacion = self._grado(regla.antecedent, regla, pertenencias)
+            for c in regla.consequent:
+                if c.term not in self.terminos_salida:
+                    continue
+                t = self.terminos_salida.index(c.term)
+                valor = activacion * c.weight
+                cortes[t] = valor if cortes[t] is None else self.acumulacion(valor, cortes[t])
+        cortes = np.array(cortes)
+
+        resultado = np.empty(cortes.shape[1])
+        for inicio in range(0, len(resultado), FILAS_POR_BLOQUE):
+            resultado[inicio:inicio + FILAS_POR_BLOQUE] = self._centroide(cortes[:, inicio:inicio + FILAS_POR_BLOQUE].T)
+        return resultado.reshape(forma)
+
+    def _centroide(self, cortes: np.ndarray) -> np.ndarray:
+        """Centroide de max_t(min(corte_t, mf_t)) para un bloque de puntos; cortes: (puntos, términos)"""
+        x, mf = self.universo, self.mf_salida
+        filas = cortes.shape[0]
+
+        # Puntos donde cada mf cruza su nivel de corte (igual que _interp_universe_fast de skfuzzy)
+        nivel = cortes[:, :, None]
+        sobre = np.where(nivel == 0, mf[None] > nivel, mf[None] >= nivel)
+        cruza = sobre[:, :, 1:] != sobre[:, :, :-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cruces = x[:-1] + (nivel - mf[None, :, :-1]) * np.diff(x) / np.diff(mf, axis=1)[None]
+        cruces = np.where(cruza, cruces, x[-1])  # Sin cruce: punto repetido, tramo de ancho cero
+
+        puntos = np.sort(np.concatenate([np.broadcast_to(x, (filas, len(x))),
+                                         cruces.reshape(filas, -1)], axis=1), axis=1)
+
+        salida = np.zeros_like(puntos)
+        for t in range(mf.shape[0]):
+            np.maximum(salida, np.minimum(cortes[:, t, None], np.interp(puntos, x, mf[t])), out=salida)
+
+        # Centroide exacto por tramos lineales (trapecios)
+        ancho = np.diff(puntos, axis=1)
+        y1, y2 = salida[:, :-1], salida[:, 1:]
+        area = 0.5 * ancho * (y1 + y2)
+        momento = ancho * ancho * (y1 + 2.0 * y2) / 6.0 + puntos[:, :-1] * area
+        area_total = area.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            centroide = momento.sum(axis=1) / np.fmax(area_total, np.finfo(float).eps)
+        return np.where(salida.sum(axis=1) == 0, np.nan, centroide)
+
+vectorizado_espera = SistemaVectorizado(sistema_espera, 'espera', ('ocupacion', 'urgencia', 'hora_dia'))
+vectorizado_recomendacion = SistemaVectorizado(sistema_recomendacion, 'recomendacion', ('ocupacion', 'hora_dia'))
+
+def calcular_espera_batch(ocupaciones, urgencias, horas) -> np.ndarray:
+    """
+    Tiempo de espera (min) para muchos puntos en una sola evaluación vectorizada.
+    Mismo resultado que calcular_espera punto a punto (incluido el respaldo).
+    """
+    ocupaciones, urgencias, horas = np.broadcast_arrays(
+        np.clip(np.asarray(ocupaciones, dtype=float), 0, 100),
+        np.clip(np.asarray(urgencias, dtype=float), 0, 10),
+        np.clip(np.asarray(horas, dtype=float), 7, 17))
+    resultado = vectorizado_espera.evaluar(ocupaciones, urgencias, horas)
+    respaldo = np.clip(ocupaciones * 0.8 + urgencias * 3, 5, 120)
+    return np.round(np.where(np.isnan(resultado), respaldo, resultado), 1)
+
+def evaluar_recomendacion_batch(ocupaciones, horas) -> np.ndarray:
+    """
+    Puntuación de recomendación (0-100) para muchos puntos en una sola evaluación vectorizada.
+    Mismo resultado que evaluar_recomendacion punto a punto (incluido el respaldo).
+    """
+    ocupaciones, horas = np.broadcast_arrays(
+        np.clip(np.asarray(ocupaciones, dtype=float), 0, 100),
+        np.clip(np.asarray(horas, dtype=float), 7, 17))
+    resultado = vectorizado_recomendacion.evaluar(ocupaciones, horas)
+    return np.round(np.where(np.isnan(resultado), 100 - ocupaciones, resultado), 1)
+
+# =====================================================
+# MODO LUT (TABLAS PRECALCULADAS)
+# =====================================================
+
+MOTOR_DIFUSO_LUT = os.getenv('MOTOR_DIFUSO_LUT', '0') == '1'  # Consultar tablas interpoladas en vez de skfuzzy
+MOTOR_DIFUSO_LUT_DIR = os.getenv('MOTOR_DIFUSO_LUT_DIR', '')  # Carpeta para los .npy ('' = solo memoria)
+
+# Grillas (mismo orden que las entradas). Pasos medidos contra skfuzzy exacto:
+# error medio ~0.2 min en espera y ~0.1 puntos en recomendación (tests/test_motor_difuso_lut.py)
+EJES_ESPERA = (
+    np.linspace(0, 100, 101),   # ocupacion, paso 1
+    np.linspace(0, 10, 21),     # urgencia, paso 0.5
+    np.linspace(7, 17, 41),     # hora_dia, paso 0.25
+)
+EJES_RECOMENDACION = (
+    np.linspace(0, 100, 101),   # ocupacion, paso 1
+    np.linspace(7, 17, 81),     # hora_dia, paso 0.125
+)
+
+class TablaDifusa:
+    """
+    Salida defuzzificada precalculada sobre una grilla regular, consultada con
+    interpolación multilineal vectorizada (trilineal para espera, bilineal para recomendación).
+    Los nodos donde ninguna regla se activa valen NaN: las consultas cuya celda toca
+    uno de esos nodos (salto al valor de respaldo) se evalúan con la función exacta.
+    """
+
+    def __init__(self, ejes: Sequence[np.ndarray], valores: np.ndarray,
+                 exacta: Callable[..., float]):
+        self.ejes = tuple(ejes)
+        self.valores = valores
+        self.exacta = exacta
+
+    def interpolar(self, *entradas) -> np.ndarray:
+        """Valor interpolado para cada punto (las entradas se recortan a la grilla)"""
+        entradas = np.broadcast_arrays(*[np.asarray(e, dtype=float) for e in entradas])
+        forma = entradas[0].shape
+
+        indices, pesos, puntos = [], [], []
+        for eje, entrada in zip(self.ejes, entradas):
+            x = np.clip(entrada.ravel(), eje[0], eje[-1])
+            i = np.clip(np.searchsorted(eje, x, side='right') - 1, 0, len(eje) - 2)
+            indices.append(i)
+            pesos.append((x - eje[i]) / (eje[i + 1] - eje[i]))
+            puntos.append(x)
+
+        resultado = np.zeros(len(indices[0]))
+        for esquina in itertools.product((0, 1), repeat=len(self.ejes)):
+            peso = np.ones_like(resultado)
+            for d, lado in enumerate(esquina):
+                peso *= pesos[d] if lado else 1 - pesos[d]
+            resultado += peso * self.valores[tuple(i + lado for i, lado in zip(indices, esquina))]
+
+        # Celdas con algún nodo sin reglas activas: evaluación exacta punto a punto
+        for k in np.flatnonzero(np.isnan(resultado)):
+            resultado[k] = self.exacta(*(p[k] for p in puntos))
+
+        return resultado.reshape(forma)
+
+def _salida_exacta(sistema: ctrl.ControlSystem, entradas: Dict[str, float], salida: str) -> float:
+    """Salida exacta de skfuzzy, o NaN si ninguna regla se activa"""
+    try:
+        return float(_evaluar(sistema, entradas, salida))
+    except Exception:
+        return np.nan
+
+def _espera_exacta(ocupacion_valor: float, urgencia_valor: float, hora_valor: float) -> float:
+    resultado = _salida_exacta(sistema_espera, {
+        'ocupacion': ocupacion_valor, 'urgencia': urgencia_valor, 'hora_dia': hora_valor
+    }, 'espera')
+    if np.isnan(resultado):
+        # Mismo respaldo que calcular_espera
+        resultado = min(120, max(5, ocupacion_valor * 0.8 + urgencia_valor * 3))
+    return resultado
+
+def _recomendacion_exacta(ocupacion_valor: float, hora_valor: float) -> float:
+    resultado = _salida_exacta(sistema_recomendacion, {
+        'ocupacion': ocupacion_valor, 'hora_dia': hora_valor
+    }, 'recomendacion')
+    if np.isnan(resultado):
+        # Mismo respaldo que evaluar_recomendacion
+        resultado = 100 - ocupacion_valor
+    return resultado
+
+def _firma_tabla(sistema: ctrl.ControlSystem, ejes: Sequence[np.ndarray]) -> str:
+    """Hash de reglas, funciones de pertenencia y grilla: si algo cambia, el .npy no se reutiliza"""
+    firma = hashlib.md5()
+    for regla in sistema.rules:
+        firma.update(str(regla).encode('utf-8'))
+    for variable in sorted(sistema.fuzzy_variables, key=lambda v: v.label):
+        firma.update(variable.label.encode('utf-8'))
+        for nombre, termino in sorted(variable.terms.items()):
+            firma.update(nombre.encode('utf-8'))
+            firma.update(np.ascontiguousarray(termino.mf, dtype=float).tobytes())
+    for eje in ejes:
+        firma.update(np.ascontiguousarray(eje, dtype=float).tobytes())
+    return firma.hexdigest()[:12]
+
+def _construir_tabla(nombre: str, vectorizado: SistemaVectorizado, ejes: Sequence[np.ndarray],
+                     exacta: Callable[..., float]) -> TablaDifusa:
+    """Carga la tabla del .npy en MOTOR_DIFUSO_LUT_DIR si coincide la firma; si no, la calcula y la guarda"""
+    forma = tuple(len(eje) for eje in ejes)
+    archivo = None
+    if MOTOR_DIFUSO_LUT_DIR:
+        archivo = os.path.join(MOTOR_DIFUSO_LUT_DIR, f"lut_{nombre}_{_firma_tabla(vectorizado.sistema, ejes)}.npy")
+        if os.path.exists(archivo):
+            try:
+                valores = np.load(archivo)
+                if valores.shape == forma:
+                    logger.info(f"📦 Tabla difusa '{nombre}' cargada de {archivo}")
+                    return TablaDifusa(ejes, valores, exacta)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Tabla difusa '{nombre}' ilegible, se recalcula: {e}")
+
+    # Todos los nodos de la grilla en una sola evaluación vectorizada (NaN donde no hay reglas activas)
+    inicio = time.perf_counter()
+    valores = vectorizado.evaluar(*np.meshgrid(*ejes, indexing='ij'))
+    segundos = time.perf_counter() - inicio
+    logger.info(f"🧮 Tabla difusa '{nombre}' calculada: {valores.size} nodos en {segundos:.1f}s")
+
+    if archivo:
+        try:
+            os.makedirs(MOTOR_DIFUSO_LUT_DIR, exist_ok=True)
+            temporal = f"{archivo}.tmp"
+            with open(temporal, 'wb') as f:
+                np.save(f, valores)
+            os.replace(temporal, archivo)
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo guardar la tabla difusa '{nombre}': {e}")
+
+    return TablaDifusa(ejes, valores, exacta)
+
+_tablas_lut = {}
+_lock_tablas = threading.Lock()
+
+def obtener_tablas_lut() -> Dict[str, TablaDifusa]:
+    """Tablas de espera y recomendación (se construyen la primera vez)"""
+    with _lock_tablas:
+        if not _tablas_lut:
+            _tablas_lut['espera'] = _construir_tabla(
+                'espera', vectorizado_espera, EJES_ESPERA, _espera_exacta)
+            _tablas_lut['recomendacion'] = _construir_tabla(
+                'recomendacion', vectorizado_recomendacion, EJES_RECOMENDACION, _recomendacion_exacta)
+        return _tablas_lut
+
+def calcular_espera_lut(ocupaciones, urgencias, horas) -> np.ndarray:
+    """Tiempo de espera (min) por tabla interpolada; acepta escalares o arreglos NumPy"""
+    return np.round(obtener_tablas_lut()['espera'].interpolar(ocupaciones, urgencias, horas), 1)
+
+def evaluar_recomendacion_lut(ocupaciones, horas) -> np.ndarray:
+    """Puntuación de recomendación (0-100) por tabla interpolada; acepta escalares o arreglos NumPy"""
+    return np.round(obtener_tablas_lut()['recomendacion'].interpolar(ocupaciones, horas), 1)
+
 # =====================================================
 # FUNCIONES PRINCIPALES
 # =====================================================
@@ -127,20 +477,19 @@ def calcular_espera(ocupacion_valor: float, urgencia_valor: float, hora_valor: f
         float: Tiempo de espera en minutos
     """
     try:
-        simulacion = ctrl.ControlSystemSimulation(sistema_espera)
-        
         # Validar rangos de entrada
         ocupacion_valor = max(0, min(100, ocupacion_valor))
         urgencia_valor = max(0, min(10, urgencia_valor))
         hora_valor = max(7, min(17, hora_valor))
         
-        simulacion.input['ocupacion'] = ocupacion_valor
-        simulacion.input['urgencia'] = urgencia_valor
-        simulacion.input['hora_dia'] = hora_valor
-        
-        simulacion.compute()
+        if MOTOR_DIFUSO_LUT:
+            return float(calcular_espera_lut(ocupacion_valor, urgencia_valor, hora_valor))
         
-        resultado = simulacion.output['espera']
+        resultado = _evaluar(sistema_espera, {
+            'ocupacion': ocupacion_valor,
+            'urgencia': urgencia_valor,
+            'hora_dia': hora_valor
+        }, 'espera')
         return round(resultado, 1)
         
     except Exception as e:
@@ -161,18 +510,17 @@ def evaluar_recomendacion(ocupacion_valor: float, hora_valor: float = 12) -> flo
         float: Puntuación de recomendación (0-100)
     """
     try:
-        simulacion = ctrl.ControlSystemSimulation(sistema_recomendacion)
-        
         # Validar rangos
         ocupacion_valor = max(0, min(100, ocupacion_valor))
         hora_valor = max(7, min(17, hora_valor))
         
-        simulacion.input['ocupacion'] = ocupacion_valor
-        simulacion.input['hora_dia'] = hora_valor
+        if MOTOR_DIFUSO_LUT:
+            return float(evaluar_recomendacion_lut(ocupacion_valor, hora_valor))
         
-        simulacion.compute()
-        
-        resultado = simulacion.output['recomendacion']
+        resultado = _evaluar(sistema_recomendacion, {
+            'ocupacion': ocupacion_valor,
+            'hora_dia': hora_valor
+        }, 'recomendacion')
         return round(resultado, 1)
         
     except Exception as e:
@@ -180,37 +528,84 @@ def evaluar_recomendacion(ocupacion_valor: float, hora_valor: float = 12) -> flo
         # Fallback simple: mejor puntuación = menor ocupación
         return round(100 - ocupacion_valor, 1)
 
+# Solo horarios de atención (proveedor_ocupacion.HORARIOS_ATENCION, 07:00-15:00): la tarde
+# llegaba a 16:30 y mezclaba ocupación real con el patrón fijo para horarios que no se reservan
+FRANJAS_DIA = {
+    'temprano': {'rango': '07:00-09:00', 'horas': [7, 7.5, 8, 8.5, 9]},
+    'manana': {'rango': '09:30-11:30', 'horas': [9.5, 10, 10.5, 11, 11.5]},
+    'mediodia': {'rango': '12:00-14:00', 'horas': [12, 12.5, 13, 13.5, 14]},
+    'tarde': {'rango': '14:30-15:00', 'horas': [14.5, 15]}
+}
+
+MEMO_FRANJAS_MAX = int(os.getenv('MOTOR_DIFUSO_MEMO_FRANJAS', 512))  # Análisis (fecha, franja) memorizados
+
+_memo_franjas = OrderedDict()  # (fecha, franja, lut) -> (ocupaciones, resultado)
+_lock_memo = threading.Lock()
+
+def _copiar_resultado(resultado: Dict) -> Dict:
+    return dict(resultado, horarios_sugeridos=list(resultado['horarios_sugeridos']))
+
 def analizar_disponibilidad_dia(fecha: datetime.date) -> Dict[str, Dict]:
     """
     Analiza la disponibilidad completa de un día usando lógica difusa
     
+    La ocupación viene del proveedor configurado (turnos reales / perfil histórico),
+    así que el resultado es reproducible y se memoriza por (fecha, franja) mientras
+    la ocupación de la franja no cambie.
+    
     Args:
         fecha: Fecha a analizar
     
     Returns:
         Dict con análisis por franjas horarias
     """
-    franjas = {
-        'temprano': {'rango': '07:00-09:00', 'horas': [7, 7.5, 8, 8.5, 9]},
-        'manana': {'rango': '09:30-11:30', 'horas': [9.5, 10, 10.5, 11, 11.5]},
-        'mediodia': {'rango': '12:00-14:00', 'horas': [12, 12.5, 13, 13.5, 14]},
-        'tarde': {'rango': '14:30-16:30', 'horas': [14.5, 15, 15.5, 16, 16.5]}
-    }
+    franjas = FRANJAS_DIA
     
     resultados = {}
+    urgencia = 5  # Nivel medio por defecto
     
-    for nombre_franja, datos in franjas.items():
+    # Ocupación de todos los horarios del día en una sola consulta al proveedor
+    todas_horas = [h for datos in franjas.values() for h in datos['horas']]
+    valores = iter(obtener_proveedor_ocupacion().ocupaciones_dia(fecha, todas_horas))
+    ocupaciones = {
+        nombre_franja: tuple(next(valores) for _ in datos['horas'])
+        for nombre_franja, datos in franjas.items()
+    }
+    
+    # Franjas ya analizadas con la misma ocupación se sirven de la memoria
+    pendientes = []
+    with _lock_memo:
+        for nombre_franja in franjas:
+            clave = (fecha, nombre_franja, MOTOR_DIFUSO_LUT)
+            memorizado = _memo_franjas.get(clave)
+            if memorizado is not None and memorizado[0] == ocupaciones[nombre_franja]:
+                _memo_franjas.move_to_end(clave)
+                resultados[nombre_franja] = _copiar_resultado(memorizado[1])
+            else:
+                pendientes.append(nombre_franja)
+    if not pendientes:
+        return resultados
+    
+    # Las franjas pendientes en una sola evaluación (tablas interpoladas o inferencia vectorizada)
+    todas_ocupaciones = np.array([o for nombre_franja in pendientes for o in ocupaciones[nombre_franja]])
+    todas_horas = np.array([h for nombre_franja in pendientes for h in franjas[nombre_franja]['horas']])
+    if MOTOR_DIFUSO_LUT:
+        esperas = calcular_espera_lut(todas_ocupaciones, urgencia, todas_horas)
+        recomendaciones = evaluar_recomendacion_lut(todas_ocupaciones, todas_horas)
+    else:
+        esperas = calcular_espera_batch(todas_ocupaciones, urgencia, todas_horas)
+        recomendaciones = evaluar_recomendacion_batch(todas_ocupaciones, todas_horas)
+    esperas, recomendaciones = iter(esperas.tolist()), iter(recomendaciones.tolist())
+    
+    for nombre_franja in pendientes:
+        datos = franjas[nombre_franja]
         ocupacion_promedio = 0
         recomendacion_promedio = 0
         espera_promedio = 0
         
-        for hora_decimal in datos['horas']:
-            # Simular ocupación basada en patrones reales
-            ocupacion = simular_ocupacion(fecha, hora_decimal)
-            urgencia = 5  # Nivel medio por defecto
-            
-            espera_tiempo = calcular_espera(ocupacion, urgencia, hora_decimal)
-            recomendacion_score = evaluar_recomendacion(ocupacion, hora_decimal)
+        for ocupacion in ocupaciones[nombre_franja]:
+            espera_tiempo = next(esperas)
+            recomendacion_score = next(recomendaciones)
             
             ocupacion_promedio += ocupacion
             espera_promedio += espera_tiempo
@@ -229,37 +624,23 @@ def analizar_disponibilidad_dia(fecha: datetime.date) -> Dict[str, Dict]:
             'horarios_sugeridos': generar_horarios_especificos(datos['horas'][:3])
         }
     
-    return resultados
+    with _lock_memo:
+        for nombre_franja in pendientes:
+            clave = (fecha, nombre_franja, MOTOR_DIFUSO_LUT)
+            _memo_franjas[clave] = (ocupaciones[nombre_franja], _copiar_resultado(resultados[nombre_franja]))
+            _memo_franjas.move_to_end(clave)
+        while len(_memo_franjas) > MEMO_FRANJAS_MAX:
+            _memo_franjas.popitem(last=False)
+    
+    # Mismo orden de franjas que antes aunque algunas vinieran de la memoria
+    return {nombre_franja: resultados[nombre_franja] for nombre_franja in franjas}
 
 def simular_ocupacion(fecha: datetime.date, hora_decimal: float) -> float:
     """
-    Simula ocupación realista basada en patrones de oficinas públicas
+    Ocupación estimada (0-100) de un horario según el proveedor configurado.
+    Se mantiene por compatibilidad: ya no tiene componente aleatoria.
     """
-    hora = int(hora_decimal)
-    dia_semana = fecha.weekday()  # 0=lunes, 6=domingo
-    
-    # Factores base por hora
-    factores_hora = {
-        7: 25, 8: 45, 9: 70, 10: 85, 11: 90,
-        12: 95, 13: 100, 14: 95, 15: 80, 16: 60, 17: 40
-    }
-    
-    factor_hora = factores_hora.get(hora, 50)
-    
-    # Ajustes por día de la semana
-    if dia_semana == 0:  # Lunes
-        factor_hora *= 1.2
-    elif dia_semana == 4:  # Viernes
-        factor_hora *= 1.1
-    elif dia_semana in [1, 2, 3]:  # Martes a jueves
-        factor_hora *= 0.9
-    
-    # Variación aleatoria pequeña
-    import random
-    variacion = random.uniform(-10, 10)
-    
-    ocupacion_final = factor_hora + variacion
-    return max(0, min(100, ocupacion_final))
+    return obtener_proveedor_ocupacion().ocupacion(fecha, hora_decimal)
 
 def generar_horarios_especificos(horas_decimales: List[float]) -> List[str]:
     """
@@ -373,5 +754,9 @@ def test_motor_difuso():
         print(f"  -> Espera: {espera_resultado} min, Recomendación: {rec_resultado}/100")
         print()
 
+# Modo LUT: las tablas se cargan/calculan al arrancar y no en la primera consulta
+if MOTOR_DIFUSO_LUT:
+    obtener_tablas_lut()
+
 if __name__ == "__main__":
     test_motor_difuso()
\ No newline at end of file
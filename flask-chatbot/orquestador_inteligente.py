@@ -8,10 +8,12 @@ import requests
 import logging
 from typing import Dict, Optional, Tuple, List
 from datetime import datetime, date, timedelta
-import psycopg2
 import re
 import traceback
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 import random
 import string
 from dotenv import load_dotenv
@@ -21,9 +23,22 @@ from copilot_handler import procesar_mensaje_copilot
 from razonamiento_difuso import (
     clasificar_con_logica_difusa, 
     obtener_membresias_difusas,
-    agregar_scores_difusos
+    agregar_scores_difusos,
+    fuzzy_reasoner
 )
 from clasificador_hibrido import clasificar_con_fusion_difusa
+from db_pool import obtener_conexion
+from cache_ocupacion import cache_ocupacion
+from proveedor_ocupacion import CAPACIDAD_POR_HORARIO
+from cola_notificaciones import encolar_confirmacion
+from automata_frases import AutomataFrases, plegar_acentos
+from cache_llm import obtener_cache_llm
+from cliente_llm import obtener_cliente_llm, LM_STUDIO_URLS
+from almacen_sesiones import AlmacenSesiones
+from contexto_sesion import SessionContext
+from analisis_mensaje import AnalisisMensaje
+from parser_temporal import GRUPOS_TEMPORALES
+from backend_sesiones import crear_backend_sesiones, ConflictoVersion, SESIONES_REINTENTOS
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -38,19 +53,14 @@ logger = logging.getLogger(__name__)
 RASA_URL = "http://localhost:5005/webhooks/rest/webhook"  # Fallback
 USE_COPILOT = True  # Usar GitHub Copilot como modelo principal
 
-# Múltiples URLs del LLM (probar en orden)
-LM_STUDIO_URLS = [
-    "http://localhost:1234/v1/chat/completions",  # Local primero
-    "http://192.168.3.118:1234/v1/chat/completions",  # Red local 1
-    "http://192.168.0.218:1234/v1/chat/completions",  # Red local 2
-]
-
-DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'chatbotdb',
-    'user': 'botuser',
-    'password': 'root'
-}
+# Múltiples URLs del LLM (probar en orden): LM_STUDIO_URLS en cliente_llm.py,
+# que además mantiene sesiones keep-alive, sondeo de salud y circuit breaker
+
+# Clasificación especulativa: el LLM arranca en paralelo con fuzzy y se decide
+# con lo que haya llegado al vencer el presupuesto de latencia por mensaje
+LLM_ESPECULATIVO = os.getenv('LLM_ESPECULATIVO', '0') == '1'
+LLM_PRESUPUESTO_MS = float(os.getenv('LLM_PRESUPUESTO_MS', 1500))
+LLM_WORKERS = int(os.getenv('LLM_WORKERS', 4))
 
 # Importar módulos con manejo de errores
 try:
@@ -70,62 +80,66 @@ except ImportError as e:
 # CONTEXTO DE SESIONES
 # =====================================================
 
-SESSION_CONTEXTS = {}
-
-class SessionContext:
-    """Contexto completo de una sesión de usuario"""
-    
-    def __init__(self, session_id: str):
-        self.session_id = session_id
-        self.nombre = None
-        self.cedula = None
-        self.tipo_tramite = None  # 'primera_vez', 'perdida', 'renovacion', 'extranjero'
-        self.fecha = None
-        self.franja_horaria = None  # 'manana', 'tarde'
-        self.hora = None
-        self.hora_recomendada = None  # Guardar última hora recomendada
-        self.fecha_recomendada = None  # 🔥 NUEVO: Guardar última fecha recomendada
-        self.proxima_semana = False  # 🔥 NUEVO: Flag para "próxima semana"
-        self.email = None
-        self.intent_actual = None
-        self.ultimo_intent = None  # 🔥 NUEVO: Guardar intent anterior para contexto
-        self.ultimo_mensaje = None
-        self.conversacion_historial = []
-        self.datos_difusos = {}
-        self.ultimo_intent_confianza = 0.0
-        self.campo_en_cambio = None  # Rastrear qué campo se está cambiando
-        
-    def actualizar(self, **kwargs):
-        """Actualiza el contexto con nuevos datos"""
-        for key, value in kwargs.items():
-            if hasattr(self, key) and value is not None:
-                setattr(self, key, value)
-                logger.info(f"📝 Contexto actualizado: {key} = {value}")
-    
-    def tiene_datos_completos(self) -> bool:
-        """Verifica si tiene todos los datos para agendar"""
-        return all([self.nombre, self.cedula, self.fecha, self.hora, self.email])
-    
-    def to_dict(self) -> Dict:
-        """Convierte el contexto a diccionario"""
-        return {
-            'nombre': self.nombre,
-            'cedula': self.cedula,
-            'fecha': self.fecha,
-            'hora': self.hora,
-            'email': self.email,
-            'intent_actual': self.intent_actual,
-            'franja_horaria': self.franja_horaria,
-            'proxima_semana': self.proxima_semana,  # 🔥 NUEVO
-            'fecha_recomendada': self.fecha_recomendada  # 🔥 NUEVO
-        }
+# LRU con expiración por inactividad (SESIONES_MAX / SESIONES_TTL): se usa como un dict
+# Con un backend compartido es solo un cache local de contextos ya decodificados
+SESSION_CONTEXTS = AlmacenSesiones()
+
+# SESIONES_BACKEND=memoria (None): los contextos viven solo en este proceso
+# postgres / redis: se cargan y guardan por mensaje para repartir entre workers
+backend_sesiones = crear_backend_sesiones()
 
 def get_or_create_context(session_id: str) -> SessionContext:
     """Obtiene o crea contexto de sesión"""
-    if session_id not in SESSION_CONTEXTS:
-        SESSION_CONTEXTS[session_id] = SessionContext(session_id)
+    if backend_sesiones is not None:
+        return _cargar_contexto(session_id)
+    contexto, creado = SESSION_CONTEXTS.obtener_o_crear(session_id, SessionContext)
+    if creado:
         logger.info(f"🆕 Nuevo contexto creado para: {session_id}")
-    return SESSION_CONTEXTS[session_id]
+    return contexto
+
+def _cargar_contexto(session_id: str) -> SessionContext:
+    """
+    Lee el contexto del backend compartido. Si la versión coincide con la del
+    objeto que ya tenemos en el cache local se reutiliza sin decodificar.
+    """
+    guardado = backend_sesiones.cargar(session_id)
+    local = SESSION_CONTEXTS.get(session_id)
+    if guardado is None:
+        contexto = SessionContext(session_id)
+        contexto._base = contexto.codificar()
+        logger.info(f"🆕 Nuevo contexto creado para: {session_id}")
+    elif local is not None and local._version == guardado[0]:
+        contexto = local
+    else:
+        contexto = SessionContext.decodificar(session_id, guardado[1])
+        contexto._version, contexto._base = guardado
+    SESSION_CONTEXTS[session_id] = contexto
+    return contexto
+
+def guardar_contexto(contexto: SessionContext):
+    """
+    Guarda el contexto en el backend compartido con versionado optimista.
+    Si otro worker guardó un mensaje concurrente, fusiona campo a campo y reintenta.
+    """
+    if backend_sesiones is None:
+        return  # En memoria el objeto ya es el estado vivo
+    try:
+        for _ in range(SESIONES_REINTENTOS + 1):
+            datos = contexto.codificar()
+            if datos == contexto._base:
+                return  # Nada cambió en este mensaje
+            try:
+                contexto._version = backend_sesiones.guardar(contexto.session_id, datos, contexto._version)
+                contexto._base = datos
+                return
+            except ConflictoVersion:
+                version, remoto = backend_sesiones.cargar(contexto.session_id) or (0, None)
+                logger.info(f"🔀 Conflicto de versión en {contexto.session_id}: fusionando con v{version}")
+                contexto.fusionar(contexto._base, remoto)
+                contexto._version, contexto._base = version, remoto
+        logger.error(f"❌ No se pudo guardar el contexto de {contexto.session_id} tras {SESIONES_REINTENTOS} fusiones")
+    except Exception as e:
+        logger.error(f"❌ Error guardando contexto de {contexto.session_id}: {e}")
 
 # =====================================================
 # GENERADOR DE CÓDIGO ÚNICO
@@ -141,6 +155,533 @@ def generar_codigo_turno() -> str:
     logger.info(f"🎫 Código generado: {codigo}")
     return codigo
 
+# =====================================================
+# PATRONES REGEX PRECOMPILADOS
+# =====================================================
+# Se compilan una sola vez al importar el módulo; clasificar() y
+# extraer_entidades() solo llaman a .search()/.match()/.sub() sobre ellos
+
+# Emails y grupos numéricos los busca analisis_mensaje: AnalisisMensaje guarda
+# sus matches (con span) una vez por mensaje. Las fechas y horas que extrae
+# extraer_entidades() las reconoce parser_temporal (una sola gramática compilada)
+
+# Horas
+RE_HORA_NUMERICA_FRACCION = re.compile(r'\b\d{1,2}(:\d{2})?(\s+(y\s+media|y\s+cuarto))?\b')
+RE_NUMERO_HORA = re.compile(r'\b([0-9]{1,2}):?([0-9]{2})?\b')
+RE_SOLO_LAS_HORA = re.compile(r'^(para\s+)?(a\s+)?las?\s+[0-9]{1,2}(:[0-9]{2})?$')
+RE_SOLO_HORA = re.compile(r'^[0-9]{1,2}(:[0-9]{2})?$')
+RE_NUMERO_CORTO_SOLO = re.compile(r'^\s*\d{1,2}\s*$')
+RE_LAS_NUMERO = re.compile(r'\b(las|para\s+las|a\s+las)\s*\d{1,2}\b')
+RE_PREGUNTA_HORARIOS = re.compile(r'\b(que|qu[eé]|cuales|cu[aá]les|cual|cu[aá]l)\s+(horarios|horas|hora)\b')
+RE_VERBOS_ATENCION = re.compile(r'\b(cierran|abren|atienden|trabajan|est[aá]n|hay|tienen)\b')
+
+# "1 y media", "09:00", "las 9", "mediodía"... (cuando el flujo espera una hora)
+RE_PARECE_HORA = re.compile('|'.join([
+    r'\b\d{1,2}:\d{2}\b',  # 09:00, 14:30
+    r'\b\d{1,2}\s+(y\s+media|y\s+cuarto|menos\s+cuarto)\b',  # 1 y media
+    r'\b(una|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce)\s+(y\s+media|y\s+cuarto|menos\s+cuarto)\b',  # una y media
+    r'\b(las\s+)?\d{1,2}(:\d{2})?\s*(am|pm|hs)?\b',  # las 9, 9 am, 9 hs
+    r'\bmediod[ií]a\b',  # mediodía
+    r'\btemprano\b'  # temprano
+]))
+
+# Fechas
+RE_FECHA_DD_MM = re.compile(r'\b\d{1,2}[/-]\d{1,2}\b')
+RE_FECHA_DD_DE_MES = re.compile(r'\b\d{1,2}\s+(?:de\s+)?(?:ene|feb|mar|abr|may|jun|jul|ago|sep|sept|oct|nov|dic|enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\b')
+
+# Cédulas
+RE_CEDULA_SOLO_DIGITOS = re.compile(r'^\d{5,8}$')
+RE_CEDULA_SOLO_PUNTOS = re.compile(r'^\d{1,2}\.\d{3}\.\d{3}$')
+RE_CEDULA_SOLO_ESPACIOS = re.compile(r'^\d{1,2}\s\d{3}\s\d{3}$')
+RE_DIGITOS_CEDULA = re.compile(r'\d{5,8}')
+RE_CEDULA_EXPLICITA = re.compile(r'(?:mi\s+)?c[eé]dula\s+(?:es|:)?\s*([\d\.\s]+)')
+RE_DIGITOS_ESPACIADOS = re.compile(r'^(\d\s+){4,}')
+RE_CEDULA_PUNTOS = re.compile(r'\b(\d{1,2}\.\d{3}\.\d{3})\b')
+RE_CEDULA_ESPACIOS = re.compile(r'\b(\d{1,2}\s\d{3}\s\d{3})\b')
+RE_CEDULA_DIGITOS = re.compile(r'\b(\d{5,8})\b')
+RE_ESPACIOS_Y_PUNTOS = re.compile(r'[\s\.]')
+RE_PUNTO = re.compile(r'\.')
+RE_ESPACIO = re.compile(r'\s')
+
+# Nombres
+RE_NOMBRE_INICIAL_SEPARADOR = re.compile(r'^([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){1,3})(?:\s*[,:]|\s+\d)')
+RE_NOMBRE_SOY = re.compile(r'\b(?:soy|me\s+llamo)\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){1,3})', re.IGNORECASE)
+RE_NOMBRE_Y_CEDULA = re.compile(r'^([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)\s+(\d{5,8})')
+RE_NOMBRE_CI_CEDULA = re.compile(r'^([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){1,3}),?\s+(?:CI|ci)\s+(\d{5,8})')
+RE_ME_LLAMO = re.compile(r'(me\s+llamo|mi\s+nombre\s+es|soy)\s+(.+)', re.IGNORECASE)
+RE_NOMBRE_INICIAL_COMA = re.compile(r'^([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){1,3})(?:\s*,|\s+\d)')
+RE_COMA_PUNTO_FINAL = re.compile(r'[,.]$')
+RE_PUNTUACION_FINAL = re.compile(r'[.,!?]$')
+RE_DESDE_COMA = re.compile(r',.*')
+RE_COLA_Y_QUIERO = re.compile(r'\s+(y\s+(quiero|necesito|voy\s+a|queria|quisiera).*)$', re.IGNORECASE)
+RE_COLA_NOMAS = re.compile(r'\s+(nomas|no\s+mas)$', re.IGNORECASE)
+RE_PREFIJO_SOLO = re.compile(r'^(no\s+)?solo\s+', re.IGNORECASE)
+RE_COLA_PREPOSICION = re.compile(r'\s+(para|de|con|en|a|por).+$', re.IGNORECASE)
+RE_SOLO_DIGITOS_PUNTOS = re.compile(r'^[\d\s\.]+$')
+RE_PATRON_NUMERICO = re.compile(r'^\d+[\s\.]*\d+')
+
+# =====================================================
+# FRASES CLAVE DEL CLASIFICADOR (AUTÓMATA AHO-CORASICK)
+# =====================================================
+# Listas que clasificar() revisaba con `any(frase in mensaje_lower ...)`.
+# Todas se indexan en AUTOMATA_FRASES: un solo recorrido del mensaje
+# devuelve los grupos presentes y las reglas consultan `'grupo' in frases`.
+# El autómata compara sin acentos ni ñ: alcanza con una variante de cada frase.
+
+# Comparaciones exactas (lookup directo, no pasan por el autómata)
+COMANDOS_ADMIN = frozenset([
+    'modo desarrollador', 'modo dev', 'dashboard', 
+    'panel admin', 'administrador', 'panel de control',
+    'admin panel', 'dev mode', 'admin'
+])
+
+FRASES_CORTAS_AMBIGUAS = {
+    'hoy': 'consultar_disponibilidad',
+    'que hay hoy': 'consultar_disponibilidad',
+    'que hay hoy?': 'consultar_disponibilidad',
+    'hay para hoy': 'consultar_disponibilidad',
+    'hay para hoy?': 'consultar_disponibilidad',
+    'hay horarios disponibles de tarde?': 'consultar_disponibilidad',
+    'de tarde hay?': 'consultar_disponibilidad',
+    'de tarde hay': 'consultar_disponibilidad',
+    'hay horarios disponibles de tarde': 'consultar_disponibilidad',
+    'que costo tiene?': 'consultar_costo',
+    'que costo tiene': 'consultar_costo',
+    'cuanto cuesta?': 'consultar_costo',
+    'cuanto cuesta': 'consultar_costo',
+    'mañana': 'informar_fecha',
+    'dia siguiente': 'informar_fecha',
+    'día siguiente': 'informar_fecha',
+    'al dia siguiente': 'informar_fecha',
+    'el dia siguiente': 'informar_fecha',
+    'para hoy': 'consultar_disponibilidad',
+    'dame uno': 'agendar_turno',  # Usuario pidiendo turno (cualquiera)
+    'el mejor': 'frase_ambigua',
+    'el que sea': 'frase_ambigua',
+    'cual seria': 'frase_ambigua',
+    'cual seria?': 'frase_ambigua',
+    'ese mismo': 'frase_ambigua',
+    'lo que tengan': 'frase_ambigua',
+    'cualquiera me sirve': 'frase_ambigua',
+    'lo antes posible': 'frase_ambigua',
+    'temprano': 'frase_ambigua',
+    'que me recomiendas': 'frase_ambigua',
+    'que me recomiendas?': 'frase_ambigua',
+    'antes de las 10': 'frase_ambigua',
+    'mba epa, como hago': 'greet',
+    'mba epa, como hago?': 'greet',
+    'ola kmo estas': 'greet',
+    'para hoy no estan': 'consultar_disponibilidad',
+    'para hoy no están': 'consultar_disponibilidad',
+    'para hoy no estan?': 'consultar_disponibilidad',
+    'para hoy no están?': 'consultar_disponibilidad',
+    'que dia me recomendas': 'consultar_disponibilidad',
+    'que dia me recomendas?': 'consultar_disponibilidad',
+    'q onda, hay turnos?': 'consultar_disponibilidad',
+    'q onda hay turnos': 'consultar_disponibilidad',
+    'ncs turno xfa': 'agendar_turno',
+    'info x favor': 'consultar_requisitos',
+    'reservar una cita': 'agendar_turno',
+    'tlf de contacto?': 'consultar_ubicacion',
+    'tlf de contacto': 'consultar_ubicacion',
+    'a que numero puedo llamar?': 'consultar_ubicacion',
+    'a que numero puedo llamar': 'consultar_ubicacion',
+    'cual es numero de contacto?': 'consultar_ubicacion',
+    'cual es numero de contacto': 'consultar_ubicacion',
+    'tienen numero de contacto?': 'consultar_ubicacion',
+    'tienen numero de contacto': 'consultar_ubicacion',
+    'numero de contacto?': 'consultar_ubicacion',
+    'numero de contacto': 'consultar_ubicacion',
+    'numero de telefono?': 'consultar_ubicacion',
+    'numero de telefono': 'consultar_ubicacion',
+    'hay algun numero de contacto?': 'consultar_ubicacion',
+    'hay algun numero de contacto': 'consultar_ubicacion',
+    'tienen un numero de contacto?': 'consultar_ubicacion',
+    'tienen un numero de contacto': 'consultar_ubicacion',
+    'puedo llamar?': 'consultar_ubicacion',
+    'puedo llamar': 'consultar_ubicacion',
+    'tienen un numero que pueda llamar?': 'consultar_ubicacion',
+    'tienen un numero que pueda llamar': 'consultar_ubicacion',
+    'hay numero?': 'consultar_ubicacion',
+    'hay numero': 'consultar_ubicacion',
+    'tienen numero?': 'consultar_ubicacion',
+    'tienen numero': 'consultar_ubicacion',
+}
+
+# Respuesta con un solo campo después de "aclaracion_cambio" (se busca como subcadena, en este orden)
+CAMPOS_ACLARACION_CAMBIO = {
+    'nombre': 'informar_nombre',
+    'cedula': 'informar_cedula',
+    'cédula': 'informar_cedula',
+    'fecha': 'consultar_disponibilidad',
+    'dia': 'consultar_disponibilidad',
+    'día': 'consultar_disponibilidad',
+    'hora': 'consultar_disponibilidad',
+    'horario': 'consultar_disponibilidad',
+    'email': 'informar_email',
+    'correo': 'informar_email',
+    'mail': 'informar_email'
+}
+
+ACEPTACIONES_SIMPLES = frozenset(['perfecto', 'ok', 'vale', 'bien', 'si', 'sí', 'acepto', 'dale', 'bueno', 'genial'])
+
+CONFIRMACIONES_SIMPLES = frozenset([
+    'esta bien', 'está bien', 'ok', 'vale', 'si', 'sí', 'perfecto', 'de acuerdo',
+    'confirmo', 'confirmado', 'confirm', 'acepto'
+])
+
+NEGACIONES_SIN_CEDULA_SIMPLES = frozenset(['no tengo', 'no tengo nada', 'nada'])
+
+# Comparaciones por palabra
+PALABRAS_PROHIBIDAS_NOMBRE_CAPITALIZADO = frozenset([
+    'Yo', 'Tu', 'El', 'Ella', 'Ok', 'Perfecto', 'Entonces', 'Lunes', 'Martes', 'Miercoles', 'Jueves', 'Viernes'
+])
+
+PALABRAS_HORA_TEXTO = frozenset([
+    'una', 'dos', 'tres', 'cuatro', 'cinco', 'seis', 'siete', 'ocho', 
+    'nueve', 'diez', 'once', 'doce', 'media', 'cuarto', 'menos'
+])
+
+# Palabras comunes que NO son nombres (más específica)
+# Solo palabras que definitivamente NO pueden ser parte de un nombre
+PALABRAS_PROHIBIDAS = frozenset([
+    'yo', 'tu', 'el', 'ella', 'nosotros', 'ustedes', 'ellos',
+    'no', 'nada', 'algo', 'todo', 'nadie', 'alguien',
+    'se', 'me', 'te', 'le', 'nos', 'les', 'lo', 'la', 'los', 'las',
+    'este', 'esta', 'estos', 'estas', 'ese', 'esa', 'esos', 'esas',
+    'muy', 'mucho', 'poco', 'mas', 'menos', 'bien', 'mal',
+    'loco', 'loca', 'tonto', 'tonta', 'raro', 'rara',
+    'cosa', 'cosas', 'malo', 'mala', 
+    'macaco', 'mono', 'gorila', 'gorilla', 'animal', 'volador', 'voladora',
+    'idiota', 'estupido', 'estúpido', 'bobo', 'boba', 'insano', 'insana',
+    'payaso', 'ridiculo', 'ridículo', 'absurdo', 'absurda',
+    'gaga', 'total', 'pepe', 'test', 'prueba', 'fake', 'falso'
+])
+
+# Subcadenas (indexadas en el autómata)
+SALUDOS_SIMPLES = ('hola', 'buenos dias', 'buenos días', 'buen dia', 'buen día', 
+                   'buenas tardes', 'buenas', 'que tal', 'qué tal', 'hey', 'hi')
+
+FRASES_CORRECCION_DATOS = ('esta mal', 'está mal', 'es incorrecto', 'no es correcto')
+MENCIONES_DATO_PROPIO = ('mi nombre', 'mi email', 'mi cedula', 'mi cédula')
+FRASES_CORRECCION_EXPLICITA = ('dije', 'yo dije', 'habia dicho', 'había dicho')
+
+FRASES_ACEPTA_RECOMENDACION = (
+    'esta bien', 'está bien', 'ok', 'vale', 'acepto', 'perfecto',
+    'me parece bien', 'si esa', 'sí esa', 'esa hora',
+    'la hora que recomiendas', 'la que recomiendas',
+    'ese horario', 'ese', 'esa', 'si', 'sí',
+    'dale', 'bueno', 'bien', 'genial', 'excelente',
+    'me sirve', 'me viene bien', 'prefiero ese'
+)
+FRASES_RECOMENDACION_PREVIA = ('ya me recomendaste', 'ya me dijiste', 'ya me diste', 'tu recomendacion', 'tu recomendación')
+FRASES_PIDE_RECOMENDACION = (
+    'recomiendame un horario', 'recomiéndame un horario',
+    'recomiendame uno', 'recomiéndame uno',
+    'que horario me recomiendas', 'qué horario me recomiendas',
+    'cual me recomiendas', 'cuál me recomiendas',
+    'sugerime uno', 'sugiéreme uno',
+    'dame uno', 'elegí uno', 'elegi uno'
+)
+
+DIAS_SEMANA = ('lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'domingo')
+DIAS_HABILES = ('lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado')
+REFERENCIAS_RELATIVAS = ('manana', 'hoy', 'pasado')
+REFERENCIAS_SEMANA = ('proxima semana', 'esta semana', 'semana que viene')
+REFERENCIAS_PROXIMA_SEMANA = ('proxima semana', 'siguiente semana', 'semana que viene')
+REFERENCIAS_MANANA = ('manana', 'ma�ana')
+
+FRASES_CAMBIO_HORA = (
+    'cambiar de horario', 'cambiar el horario', 'cambiar la hora',
+    'cambiar de hora', 'modificar', 'actualizar',
+    'quiero cambiar', 'puedo cambiar', 'mejor para las'
+)
+FRASES_CAMBIO_FECHA = (
+    'cambiar mi turno para', 'cambiar para',
+    'mejor para el', 'prefiero el',
+    'puedo cambiar para', 'mover para'
+)
+
+# Multi-intent: consulta + pedido de turno en la misma oración
+FRASES_PIDE_TURNO = ('necesito turno', 'quiero turno', 'sacar turno', 'agendar turno', 'necesito sacar')
+CONSULTA_HORARIO = ('horario', 'horarios', 'qué hora', 'que hora')
+CONSULTA_REQUISITOS = ('requisito', 'documento', 'qué necesito', 'que necesito')
+CONSULTA_COSTO = ('cuesta', 'costo', 'cuánto', 'cuanto', 'precio')
+CONSULTA_DEMORA = ('demora', 'tarda', 'tiempo')
+
+TRAMITES_NO_CEDULA = (
+    'pasaporte', 'licencia', 'licencia de conducir',
+    'antecedentes', 'certificado', 'apostilla',
+    'visa', 'permiso', 'registro', 'inscripcion', 'inscripción',
+    'partida', 'acta', 'matrimonio', 'nacimiento', 'defuncion', 'defunción',
+    'divorcio', 'adopcion', 'adopción', 'titulo', 'título'
+)
+PREGUNTA_TRAMITES_GENERAL = ('qué trámites', 'que tramites', 'qué hacen', 'que hacen')
+PATRONES_PREGUNTA_TRAMITES = (
+    'qué trámites', 'que tramites', 'que trámites', 'qué tramites',
+    'qué servicios', 'que servicios',
+    'qué hacen', 'que hacen',
+    'para qué sirve', 'para que sirve',
+    'qué se puede hacer', 'que se puede hacer',
+    'qué tipo de trámites', 'que tipo de tramites',
+    'cuáles son los trámites', 'cuales son los tramites',
+    'qué documentos tramitan', 'que documentos tramitan'
+)
+PATRONES_PREGUNTA_REQUISITOS = (
+    'qué necesito', 'que necesito',
+    'qué documentos', 'que documentos',
+    'cuáles son los requisitos', 'cuales son los requisitos',
+    'qué requisitos', 'que requisitos',
+    'qué debo llevar', 'que debo llevar',
+    'qué tengo que llevar', 'que tengo que llevar',
+    'qué hay que llevar', 'que hay que llevar',
+    'necesito saber qué', 'necesito saber que'
+)
+
+FRASES_OTRO_TURNO = (
+    'otro turno', 'otro turno más', 'un turno más',
+    'quiero otro turno', 'necesito otro turno',
+    'agendar otro turno', 'sacar otro turno',
+    'nuevo turno', 'un nuevo turno',
+    'turno para otra persona', 'turno diferente',
+    'con otro nombre'
+)
+PALABRAS_TRANSICION = ('entonces', 'ok', 'dale', 'perfecto', 'bueno')
+PALABRAS_TURNO = ('quiero turno', 'necesito turno', 'turno', 'agendar', 'sacar turno')
+
+FRASES_CORRECCION_NOMBRE = ('no mi nombre es', 'no, mi nombre es', 'no mi nombre', 'no, mi nombre', 'no solo', 'no, solo')
+FRASES_ESTA_MAL = (
+    'esta mal', 'está mal', 'agarraste mal', 'tomaste mal', 
+    'es incorrecto', 'no es correcto', 'esta equivocado',
+    'está equivocado', 'no esta bien', 'no está bien'
+)
+
+# Campos mencionados en correcciones/cambios
+CAMPO_NOMBRE = ('nombre', 'nombres', 'mi nombre')
+CAMPO_CEDULA = ('cedula', 'cédula', 'ci', 'documento')
+CAMPO_EMAIL = ('email', 'correo', 'mail', 'e-mail')
+CAMPO_FECHA = ('fecha', 'dia', 'día')
+CAMPO_HORA = ('hora', 'horario')
+
+NEGACIONES_CAMBIO = ('no quiero cambiar', 'no cambiar', 'no quiero modificar', 'no modificar')
+VERBOS_CAMBIO = ('cambiar', 'modificar', 'corregir')
+VERBOS_ELECCION_HORA = ('cambiar', 'mejor', 'prefiero', 'quiero')
+
+FRASES_CONFIRMACION = (
+    'si confirmo', 'sí confirmo', 'si acepto', 'sí acepto', 
+    'todo bien', 'esta todo bien', 'está todo bien',
+    'confirmame', 'confírmame', 'confirma el turno',
+    'confirmar el turno', 'confirmar turno',
+    'agendar', 'agenda', 'agendame', 'agéndame'
+)
+
+# Tipo de trámite cuando se pregunta por la cédula
+FRASES_PRIMERA_VEZ = (
+    'primera vez', '1ra vez', 'primer tramite', 
+    'no tengo cedula', 'no tengo cédula', 
+    'todavia no tengo', 'todavía no tengo', 
+    'aun no tengo', 'aún no tengo',
+    'es para mi hijo', 'es para mi hija', 'es para mi niño', 'es para mi niña',
+    'para su primera cedula', 'para su primera cédula',
+    'su primera cedula', 'su primera cédula',
+    'primera cedula', 'primera cédula'
+)
+FRASES_PERDIDA = (
+    'se me perdio', 'se me perdió', 'perdi', 'perdí', 'me la robaron', 'me robaron',
+    'se me extravió', 'se me extravi', 'extravio', 'extravío', 'robo'
+)
+FRASES_EXTRANJERO = (
+    'soy extranjero', 'soy extranjera', 
+    'extranjero', 'extranjera', 
+    'no soy paraguayo', 'no soy paraguaya',
+    'no soy de paraguay', 'no soy paraguaya', 
+    'vengo de', 'soy de otro pais', 'soy de otro país',
+    'extranjeria', 'extranjería',
+    'residente extranjero', 'residente extranjera',
+    'de otro pais', 'de otro país',
+    'ciudadano extranjero', 'ciudadana extranjera'
+)
+
+FRASES_DISPONIBILIDAD_SEMANA = (
+    'que dias disponibles', 'qué días disponibles', 'que otros dias',
+    'qué otros días', 'dias disponibles de la proxima semana',
+    'días disponibles de la próxima semana', 'disponibilidad para la proxima semana',
+    'disponibilidad de la proxima semana', 'hay disponibilidad para la proxima semana',
+    'dame los dias', 'cuales son los dias', 'cuáles son los días',
+    'ver disponibilidad', 'mostrar disponibilidad',
+    'hay mas dias', 'hay más días', 'hay otros dias', 'hay otros días',
+    'mas dias disponibles', 'más días disponibles', 'otros dias disponibles'
+)
+FRASES_PREFERENCIA_HORARIO = (
+    'no puedo por la mañana', 'no puedo de mañana', 'no puedo en la mañana',
+    'no puedo por la tarde', 'no puedo de tarde', 'no puedo en la tarde',
+    'después del mediodía', 'despues del mediodia', 'pasado el mediodía',
+    'por la tarde', 'de tarde', 'en la tarde',
+    'turnos para mañana por la tarde', 'turnos de mañana por la tarde',
+    'horarios por la tarde', 'horarios de tarde', 'disponibilidad por la tarde'
+)
+
+PALABRAS_NEGACION_SIN_CEDULA = (
+    'se me perdio', 'se me perdió', 'perdi mi cedula', 'perdí mi cédula',
+    'no tengo cedula', 'no tengo cédula', 'sin cedula', 'sin cédula',
+    'no la tengo', 'me la robaron', 'se me extravió', 'se me extravi',
+    'todavia no tengo', 'todavía no tengo', 'aun no tengo', 'aún no tengo'
+)
+PALABRAS_PIDE_TURNO_SIN_CEDULA = ('turno', 'agendar', 'cita', 'necesito')
+FRASES_SIN_EMAIL = ('no tengo email', 'no tengo correo', 'sin email', 'sin correo', 'no tengo mail')
+
+# Palabras clave de intents de ACCIÓN (no son nombres)
+PALABRAS_ACCION = (
+    'agendar', 'turno', 'cita', 'horario', 'disponibilidad', 
+    'requisitos', 'ubicacion', 'ubicación', 'direccion', 'dirección',
+    'costo', 'precio', 'cuanto', 'cuánto', 'pagar',
+    'consultar', 'ver', 'necesito', 'información', 'informacion',
+    'oficina', 'ofi', 'queda', 'keda', 'esta', 'esta ubicada', 'como llego',
+    'ayuda', 'ayudar', 'puedes', 'necesitas', 'hacer',
+    'tienen', 'hay', 'libre', 'disponible', 'gente', 'espacio',
+    'recomendas', 'recomiendas', 'asi', 'así', 'llamo', 'poder', 'cuando',
+    'adonde', 'donde', 'contactar', 'cancelar', 'cancelo'
+)
+
+PALABRAS_FECHA = (
+    'manana', 'ma�ana', 'hoy', 'lunes', 'martes', 'miercoles',
+    'jueves', 'viernes', 'sabado', 'domingo', 
+    'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio',
+    'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre',
+    # Abreviaturas de meses
+    'ene', 'feb', 'mar', 'abr', 'may', 'jun', 
+    'jul', 'ago', 'sep', 'sept', 'oct', 'nov', 'dic',
+    'pasado'
+)
+
+KEYWORDS_DIFUSAS = frozenset(fuzzy_reasoner.keyword_index)
+
+# Grupo -> frases; el nombre del grupo es el que consultan las reglas de clasificar()
+AUTOMATA_FRASES = AutomataFrases({
+    'campo_aclaracion': CAMPOS_ACLARACION_CAMBIO,
+    'saludo': SALUDOS_SIMPLES,
+    'correccion_datos': FRASES_CORRECCION_DATOS,
+    'dato_propio': MENCIONES_DATO_PROPIO,
+    'correccion_explicita': FRASES_CORRECCION_EXPLICITA,
+    'acepta_recomendacion': FRASES_ACEPTA_RECOMENDACION,
+    'recomendacion_previa': FRASES_RECOMENDACION_PREVIA,
+    'pide_recomendacion': FRASES_PIDE_RECOMENDACION,
+    'dia_semana': DIAS_SEMANA,
+    'dia_habil': DIAS_HABILES,
+    'referencia_relativa': REFERENCIAS_RELATIVAS,
+    'referencia_semana': REFERENCIAS_SEMANA,
+    'proxima_semana': REFERENCIAS_PROXIMA_SEMANA,
+    'manana': REFERENCIAS_MANANA,
+    'cambio_hora': FRASES_CAMBIO_HORA,
+    'cambio_fecha': FRASES_CAMBIO_FECHA,
+    'pide_turno': FRASES_PIDE_TURNO,
+    'consulta_horario': CONSULTA_HORARIO,
+    'consulta_requisitos': CONSULTA_REQUISITOS,
+    'consulta_costo': CONSULTA_COSTO,
+    'consulta_demora': CONSULTA_DEMORA,
+    'tramite_no_cedula': TRAMITES_NO_CEDULA,
+    'pregunta_tramites_general': PREGUNTA_TRAMITES_GENERAL,
+    'pregunta_tramites': PATRONES_PREGUNTA_TRAMITES,
+    'pregunta_requisitos': PATRONES_PREGUNTA_REQUISITOS,
+    'otro_turno': FRASES_OTRO_TURNO,
+    'transicion': PALABRAS_TRANSICION,
+    'turno': PALABRAS_TURNO,
+    'correccion_nombre': FRASES_CORRECCION_NOMBRE,
+    'esta_mal': FRASES_ESTA_MAL,
+    'campo_nombre': CAMPO_NOMBRE,
+    'campo_cedula': CAMPO_CEDULA,
+    'campo_email': CAMPO_EMAIL,
+    'campo_fecha': CAMPO_FECHA,
+    'campo_hora': CAMPO_HORA,
+    'negacion_cambio': NEGACIONES_CAMBIO,
+    'verbo_cambio': VERBOS_CAMBIO,
+    'eleccion_hora': VERBOS_ELECCION_HORA,
+    'confirmacion': FRASES_CONFIRMACION,
+    'primera_vez': FRASES_PRIMERA_VEZ,
+    'perdida': FRASES_PERDIDA,
+    'extranjero': FRASES_EXTRANJERO,
+    'disponibilidad_semana': FRASES_DISPONIBILIDAD_SEMANA,
+    'preferencia_horario': FRASES_PREFERENCIA_HORARIO,
+    'negacion_sin_cedula': PALABRAS_NEGACION_SIN_CEDULA,
+    'turno_sin_cedula': PALABRAS_PIDE_TURNO_SIN_CEDULA,
+    'sin_email': FRASES_SIN_EMAIL,
+    'accion': PALABRAS_ACCION,
+    'fecha': PALABRAS_FECHA,
+    # Keywords del razonador difuso: el mismo recorrido le sirve a clasificar_con_logica_difusa
+    'keyword_difusa': KEYWORDS_DIFUSAS,
+    # Palabras clave de fechas y horas (grupos tiempo_*): las usa AnalisisMensaje.fecha_hora()
+    **GRUPOS_TEMPORALES,
+}, sin_acentos=True)
+
+def analizar_mensaje(mensaje: str) -> AnalisisMensaje:
+    """Análisis compartido por todas las etapas de un mensaje (ver analisis_mensaje.py)"""
+    return AnalisisMensaje(mensaje, AUTOMATA_FRASES)
+
+# =====================================================
+# CASCADA DE CLASIFICACIÓN (banda de incertidumbre + métricas)
+# =====================================================
+
+# Confianza que devuelve _clasificar_con_llm cuando reconoce el intent (0.0 si no)
+CONFIANZA_LLM = 0.85
+
+# Por encima de estos umbrales la decisión final (Prioridades 1-10 de la cascada)
+# no depende de la respuesta del LLM, porque CONFIANZA_LLM nunca supera 0.92 (Prioridad 5):
+# - regex > 0.70 → gana regex (Prioridades 1, 3, 4 o 6)
+# - fuzzy > 0.40 → gana fuzzy (Prioridades 1, 2, 4, 7 u 8)
+UMBRAL_REGEX_SIN_LLM = 0.70
+UMBRAL_FUZZY_SIN_LLM = 0.40
+
+def en_banda_incierta(confianza_patron: float, confianza_fuzzy: float) -> bool:
+    """True si regex y fuzzy no alcanzan para decidir y vale la pena consultar al LLM"""
+    return confianza_patron <= UMBRAL_REGEX_SIN_LLM and confianza_fuzzy <= UMBRAL_FUZZY_SIN_LLM
+
+class MetricasCascada:
+    """
+    Contadores thread-safe de en qué etapa se resolvió cada mensaje:
+    - contexto: reglas contextuales / frases clave
+    - regex_directo: regex con confianza > 0.92 (o corrección a cédula)
+    - local: regex + fuzzy deciden, LLM omitido
+    - llm: se consultó al LLM (banda de incertidumbre)
+    - llm_tarde: el LLM especulativo no respondió dentro del presupuesto
+    - llm_no_disponible: hacía falta el LLM pero no hay ninguno
+    Además cuenta las respuestas especulativas descartadas (llm_descartadas) y,
+    por mensaje clasificado, la fuente de la decisión y el estado del LLM.
+    """
+
+    ETAPAS = ('contexto', 'regex_directo', 'local', 'llm', 'llm_tarde', 'llm_no_disponible')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = dict.fromkeys(('mensajes', 'llm_descartadas') + self.ETAPAS, 0)
+        self._fuentes = {}  # fuente_decision -> mensajes
+        self._estados_llm = {}  # a_tiempo / fuera_de_presupuesto / omitido / ... -> mensajes
+
+    def registrar(self, etapa: str):
+        with self._lock:
+            self._contadores[etapa] += 1
+
+    def registrar_decision(self, fuente: str, estado_llm: str):
+        with self._lock:
+            self._fuentes[fuente] = self._fuentes.get(fuente, 0) + 1
+            self._estados_llm[estado_llm] = self._estados_llm.get(estado_llm, 0) + 1
+
+    def metricas(self) -> Dict:
+        """Conteos y tasa por etapa (para /api/debug/status)"""
+        with self._lock:
+            datos = dict(self._contadores)
+            datos['fuentes'] = dict(self._fuentes)
+            datos['estados_llm'] = dict(self._estados_llm)
+        mensajes = datos['mensajes']
+        datos['tasas'] = {
+            etapa: round(datos[etapa] / mensajes, 3) if mensajes else 0.0
+            for etapa in self.ETAPAS
+        }
+        # Mensajes que llegaron al pipeline y no pagaron el round-trip al LLM
+        datos['llm_evitadas'] = datos['regex_directo'] + datos['local']
+        return datos
+
+metricas_cascada = MetricasCascada()
+
 # =====================================================
 # CLASIFICADOR DE INTENTS MEJORADO
 # =====================================================
@@ -487,145 +1028,84 @@ class ClasificadorIntentsMejorado:
     }
     
     def __init__(self):
-        self.llm_url = self._encontrar_llm_disponible()
-        logger.info(f"🔧 Clasificador inicializado (LLM: {self.llm_url or 'No disponible'})")
+        self.cliente_llm = obtener_cliente_llm(LM_STUDIO_URLS)
+        self._llm_disponible = None  # Último estado logueado: solo se avisa cuando cambia
+        # Pool para el modo especulativo (None = LLM secuencial, como siempre)
+        self._executor_llm = (
+            ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix='llm-especulativo')
+            if LLM_ESPECULATIVO else None
+        )
+        logger.info(f"🔧 Clasificador inicializado (LLM: {self.llm_url or 'No disponible'}, especulativo: {LLM_ESPECULATIVO})")
+    
+    @property
+    def llm_url(self) -> Optional[str]:
+        """URL del LLM que atiende ahora (cambia sola si el endpoint cae o se recupera)"""
+        return self._encontrar_llm_disponible()
     
     def _encontrar_llm_disponible(self) -> Optional[str]:
-        """Encuentra una URL del LLM que funcione"""
-        for url in LM_STUDIO_URLS:
-            try:
-                response = requests.get(url.replace('/v1/chat/completions', '/v1/models'), timeout=2)
-                if response.status_code == 200:
-                    logger.info(f"✅ LLM encontrado en: {url}")
-                    return url
-            except:
-                continue
-        logger.warning("⚠️ No se encontró LLM Studio disponible")
-        return None
+        """Primer endpoint sano según el sondeo en segundo plano del cliente compartido"""
+        url = self.cliente_llm.url_activa()
+        disponible = url is not None
+        if disponible != self._llm_disponible:
+            self._llm_disponible = disponible
+            if disponible:
+                logger.info(f"✅ LLM Studio disponible en {url}")
+            else:
+                logger.warning("⚠️ No se encontró LLM Studio disponible")
+        return url
     
-    def clasificar(self, mensaje: str, contexto: SessionContext):
+    def clasificar(self, mensaje: str, contexto: SessionContext, analisis: AnalisisMensaje = None):
         """
-        Clasifica el intent del mensaje usando múltiples métodos
+        Clasifica el intent del mensaje usando múltiples métodos:
+        1. Reglas de contexto y frases clave
+        2. Cascada regex → fuzzy → LLM (el LLM solo si los locales no alcanzan)
         
         Returns:
-            (intent, confidence) o (intent, confidence, metadata) si hay multi-intent
+            (intent, confidence, metadata). metadata siempre trae fuente_decision,
+            llm y latencia_ms; multi_intent/siguiente_intent si corresponde.
         """
-        mensaje_lower = mensaje.lower().strip()
+        inicio = time.monotonic()
+        metricas_cascada.registrar('mensajes')
+        if analisis is None:
+            analisis = analizar_mensaje(mensaje)
+        
+        resultado = self._clasificar_por_contexto(mensaje, contexto, analisis)
+        if resultado is not None:
+            metricas_cascada.registrar('contexto')
+            metadata = resultado[2] if len(resultado) == 3 else None
+            return self._resultado(resultado[0], resultado[1], 'contexto', 'omitido', inicio, metadata)
+        
+        return self._clasificar_en_cascada(mensaje, analisis, contexto)
+    
+    def _clasificar_por_contexto(self, mensaje: str, contexto: SessionContext, analisis: AnalisisMensaje = None):
+        """Reglas contextuales y de frases clave. Devuelve None si ninguna aplica"""
+        if analisis is None:
+            analisis = analizar_mensaje(mensaje)
+        mensaje_lower = analisis.normalizado
         
         # ========================================================
         # DETECCIÓN PRIORITARIA: Comandos de administrador
         # ========================================================
-        comandos_admin = [
-            'modo desarrollador', 'modo dev', 'dashboard', 
-            'panel admin', 'administrador', 'panel de control',
-            'admin panel', 'dev mode', 'admin'
-        ]
-        
-        if mensaje_lower in comandos_admin:
+        if mensaje_lower in COMANDOS_ADMIN:
             logger.info(f"🔧 Comando de administrador detectado: '{mensaje_lower}'")
             return ("modo_desarrollador", 0.99)
         
         # DETECCIÓN ESPECIAL: Frases muy cortas ambiguas (1-3 palabras)
-        frases_cortas_ambiguas = {
-            'hoy': 'consultar_disponibilidad',
-            'que hay hoy': 'consultar_disponibilidad',
-            'que hay hoy?': 'consultar_disponibilidad',
-            'hay para hoy': 'consultar_disponibilidad',
-            'hay para hoy?': 'consultar_disponibilidad',
-            'hay horarios disponibles de tarde?': 'consultar_disponibilidad',
-            'de tarde hay?': 'consultar_disponibilidad',
-            'de tarde hay': 'consultar_disponibilidad',
-            'hay horarios disponibles de tarde': 'consultar_disponibilidad',
-            'que costo tiene?': 'consultar_costo',
-            'que costo tiene': 'consultar_costo',
-            'cuanto cuesta?': 'consultar_costo',
-            'cuanto cuesta': 'consultar_costo',
-            'mañana': 'informar_fecha',
-            'dia siguiente': 'informar_fecha',
-            'día siguiente': 'informar_fecha',
-            'al dia siguiente': 'informar_fecha',
-            'el dia siguiente': 'informar_fecha',
-            'para hoy': 'consultar_disponibilidad',
-            'dame uno': 'agendar_turno',  # Usuario pidiendo turno (cualquiera)
-            'el mejor': 'frase_ambigua',
-            'el que sea': 'frase_ambigua',
-            'cual seria': 'frase_ambigua',
-            'cual seria?': 'frase_ambigua',
-            'ese mismo': 'frase_ambigua',
-            'lo que tengan': 'frase_ambigua',
-            'cualquiera me sirve': 'frase_ambigua',
-            'lo antes posible': 'frase_ambigua',
-            'temprano': 'frase_ambigua',
-            'que me recomiendas': 'frase_ambigua',
-            'que me recomiendas?': 'frase_ambigua',
-            'antes de las 10': 'frase_ambigua',
-            'mba epa, como hago': 'greet',
-            'mba epa, como hago?': 'greet',
-            'ola kmo estas': 'greet',
-            'para hoy no estan': 'consultar_disponibilidad',
-            'para hoy no están': 'consultar_disponibilidad',
-            'para hoy no estan?': 'consultar_disponibilidad',
-            'para hoy no están?': 'consultar_disponibilidad',
-            'que dia me recomendas': 'consultar_disponibilidad',
-            'que dia me recomendas?': 'consultar_disponibilidad',
-            'q onda, hay turnos?': 'consultar_disponibilidad',
-            'q onda hay turnos': 'consultar_disponibilidad',
-            'ncs turno xfa': 'agendar_turno',
-            'info x favor': 'consultar_requisitos',
-            'reservar una cita': 'agendar_turno',
-            'tlf de contacto?': 'consultar_ubicacion',
-            'tlf de contacto': 'consultar_ubicacion',
-            'a que numero puedo llamar?': 'consultar_ubicacion',
-            'a que numero puedo llamar': 'consultar_ubicacion',
-            'cual es numero de contacto?': 'consultar_ubicacion',
-            'cual es numero de contacto': 'consultar_ubicacion',
-            'tienen numero de contacto?': 'consultar_ubicacion',
-            'tienen numero de contacto': 'consultar_ubicacion',
-            'numero de contacto?': 'consultar_ubicacion',
-            'numero de contacto': 'consultar_ubicacion',
-            'numero de telefono?': 'consultar_ubicacion',
-            'numero de telefono': 'consultar_ubicacion',
-            'hay algun numero de contacto?': 'consultar_ubicacion',
-            'hay algun numero de contacto': 'consultar_ubicacion',
-            'tienen un numero de contacto?': 'consultar_ubicacion',
-            'tienen un numero de contacto': 'consultar_ubicacion',
-            'puedo llamar?': 'consultar_ubicacion',
-            'puedo llamar': 'consultar_ubicacion',
-            'tienen un numero que pueda llamar?': 'consultar_ubicacion',
-            'tienen un numero que pueda llamar': 'consultar_ubicacion',
-            'hay numero?': 'consultar_ubicacion',
-            'hay numero': 'consultar_ubicacion',
-            'tienen numero?': 'consultar_ubicacion',
-            'tienen numero': 'consultar_ubicacion',
-        }
-        
-        if mensaje_lower in frases_cortas_ambiguas:
-            intent_especial = frases_cortas_ambiguas[mensaje_lower]
+        if mensaje_lower in FRASES_CORTAS_AMBIGUAS:
+            intent_especial = FRASES_CORTAS_AMBIGUAS[mensaje_lower]
             logger.info(f"🎯 Frase corta ambigua detectada: {intent_especial} (0.93)")
             return (intent_especial, 0.93)
         
+        # Un solo recorrido del mensaje: todas las frases clave presentes (ver AUTOMATA_FRASES)
+        frases = analisis.frases
+        
         # 🔥 NUEVO: Si usuario acaba de recibir "aclaracion_cambio" y responde con un campo, interpretar como cambio
         if hasattr(contexto, 'ultimo_intent') and contexto.ultimo_intent == 'aclaracion_cambio':
-            # Usuario respondió con un solo campo
-            campos_validos = {
-                'nombre': 'informar_nombre',
-                'cedula': 'informar_cedula',
-                'cédula': 'informar_cedula',
-                'fecha': 'consultar_disponibilidad',
-                'dia': 'consultar_disponibilidad',
-                'día': 'consultar_disponibilidad',
-                'hora': 'consultar_disponibilidad',
-                'horario': 'consultar_disponibilidad',
-                'email': 'informar_email',
-                'correo': 'informar_email',
-                'mail': 'informar_email'
-            }
-            
             # Si el mensaje es solo un campo (1-2 palabras)
-            palabras = mensaje_lower.strip().split()
+            palabras = analisis.tokens
             if len(palabras) <= 2:
-                for campo, intent_cambio in campos_validos.items():
-                    if campo in mensaje_lower:
+                for campo, intent_cambio in CAMPOS_ACLARACION_CAMBIO.items():
+                    if plegar_acentos(campo) in frases.frases:
                         logger.info(f"🔄 [CONTEXTO] Usuario respondió '{campo}' después de aclaracion_cambio → {intent_cambio}")
                         # Resetear el campo correspondiente
                         if 'nombre' in campo:
@@ -647,23 +1127,23 @@ class ClasificadorIntentsMejorado:
         # =================================================================
         
         # Detectar correcciones de datos ("mi nombre esta mal, es...", "dije para las X")
-        if any(frase in mensaje_lower for frase in ['esta mal', 'está mal', 'es incorrecto', 'no es correcto']):
+        if 'correccion_datos' in frases:
             # Verificar si menciona nombre/email/cedula y luego da un valor
-            if ('mi nombre' in mensaje_lower or 'mi email' in mensaje_lower or 'mi cedula' in mensaje_lower or 'mi cédula' in mensaje_lower):
+            if 'dato_propio' in frases:
                 logger.info(f"🎯 [CONTEXTO] Usuario corrige datos → negacion")
                 return ("negacion", 0.96)
         
         # Detectar corrección explícita ("dije para...", "yo dije...")
-        if any(frase in mensaje_lower for frase in ['dije', 'yo dije', 'habia dicho', 'había dicho']):
+        if 'correccion_explicita' in frases:
             # Verificar si da una hora o fecha nueva
-            if re.search(r'\b\d{1,2}(:\d{2})?(\s+(y\s+media|y\s+cuarto))?\b', mensaje):
+            if RE_HORA_NUMERICA_FRACCION.search(mensaje):
                 logger.info(f"🎯 [CONTEXTO] Usuario corrige hora → negacion")
                 return ("negacion", 0.96)
         
         # Detectar EMAIL cuando el sistema lo pidió (completo o incompleto)
         if contexto.fecha and contexto.hora and not contexto.email:
             # Email completo válido
-            if re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', mensaje):
+            if analisis.email:
                 logger.info(f"🎯 [CONTEXTO] Usuario proporciona email válido → informar_email")
                 return ("informar_email", 0.98)
             # 🔥 FIX: Email incompleto (tiene @ pero no dominio completo)
@@ -675,21 +1155,12 @@ class ClasificadorIntentsMejorado:
         # Detectar ANTES de que el LLM se confunda
         if contexto.nombre and contexto.cedula and contexto.fecha and not contexto.hora:
             # Patrones de hora: "1 y media", "09:00", "nueve", "9", etc.
-            patrones_hora = [
-                r'\b\d{1,2}:\d{2}\b',  # 09:00, 14:30
-                r'\b\d{1,2}\s+(y\s+media|y\s+cuarto|menos\s+cuarto)\b',  # 1 y media
-                r'\b(una|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce)\s+(y\s+media|y\s+cuarto|menos\s+cuarto)\b',  # una y media
-                r'\b(las\s+)?\d{1,2}(:\d{2})?\s*(am|pm|hs)?\b',  # las 9, 9 am, 9 hs
-                r'\bmediod[ií]a\b',  # mediodía
-                r'\btemprano\b'  # temprano
-            ]
-            
-            if any(re.search(patron, mensaje_lower) for patron in patrones_hora):
+            if RE_PARECE_HORA.search(mensaje_lower):
                 logger.info(f"🎯 [CONTEXTO PRIORITARIO] Mensaje parece hora cuando espera hora → elegir_horario (0.98)")
                 return ("elegir_horario", 0.98)
             
             # También detectar números sueltos que podrían ser hora (1-15)
-            palabras = mensaje_lower.strip().split()
+            palabras = analisis.tokens
             if len(palabras) <= 3:  # Mensaje corto
                 for palabra in palabras:
                     if palabra.isdigit() and 1 <= int(palabra) <= 15:
@@ -699,37 +1170,23 @@ class ClasificadorIntentsMejorado:
         # Detectar ACEPTACIÓN de hora recomendada (ANTES de confirmación final)
         if contexto.hora_recomendada and not contexto.hora:
             # Frases de aceptación de recomendación
-            if any(frase in mensaje_lower for frase in [
-                'esta bien', 'está bien', 'ok', 'vale', 'acepto', 'perfecto',
-                'me parece bien', 'si esa', 'sí esa', 'esa hora',
-                'la hora que recomiendas', 'la que recomiendas',
-                'ese horario', 'ese', 'esa', 'si', 'sí',
-                'dale', 'bueno', 'bien', 'genial', 'excelente',
-                'me sirve', 'me viene bien', 'prefiero ese'
-            ]):
+            if 'acepta_recomendacion' in frases:
                 logger.info(f"🎯 [CONTEXTO] Usuario acepta hora recomendada '{contexto.hora_recomendada}' → elegir_horario")
                 return ("elegir_horario", 0.97)
         
         # Detectar "perfecto" cuando tiene hora_recomendada Y fecha
         if contexto.hora_recomendada and contexto.fecha and not contexto.hora:
-            if mensaje_lower.strip() in ['perfecto', 'ok', 'vale', 'bien', 'si', 'sí', 'acepto', 'dale', 'bueno', 'genial']:
+            if mensaje_lower.strip() in ACEPTACIONES_SIMPLES:
                 logger.info(f"🎯 [CONTEXTO] Usuario acepta recomendación simple '{contexto.hora_recomendada}' → elegir_horario")
                 return ("elegir_horario", 0.97)
             # Detectar "ya me recomendaste" como aceptación implícita
-            if any(frase in mensaje_lower for frase in ['ya me recomendaste', 'ya me dijiste', 'ya me diste', 'tu recomendacion', 'tu recomendación']):
+            if 'recomendacion_previa' in frases:
                 logger.info(f"🎯 [CONTEXTO] Usuario acepta recomendación implícitamente '{contexto.hora_recomendada}' → elegir_horario")
                 return ("elegir_horario", 0.96)
         
         # 🔥 NUEVO: Detectar "recomiéndame un horario" cuando ya mostró disponibilidad
         if contexto.fecha and not contexto.hora:
-            if any(frase in mensaje_lower for frase in [
-                'recomiendame un horario', 'recomiéndame un horario',
-                'recomiendame uno', 'recomiéndame uno',
-                'que horario me recomiendas', 'qué horario me recomiendas',
-                'cual me recomiendas', 'cuál me recomiendas',
-                'sugerime uno', 'sugiéreme uno',
-                'dame uno', 'elegí uno', 'elegi uno'
-            ]):
+            if 'pide_recomendacion' in frases:
                 logger.info(f"🎯 [CONTEXTO] Usuario pide recomendación de horario → frase_ambigua")
                 return ("frase_ambigua", 0.97)  # Usaremos frase_ambigua para asignar automáticamente
         
@@ -740,34 +1197,29 @@ class ClasificadorIntentsMejorado:
             not contexto.fecha):  # Aún no tiene fecha asignada
             
             # Detectar días de la semana aislados
-            dias_semana = ['lunes', 'martes', 'miercoles', 'miércoles', 'jueves', 'viernes', 'sabado', 'sábado', 'domingo']
-            palabras = mensaje_lower.strip().split()
+            palabras = analisis.tokens
             
             # Si el mensaje es corto (1-4 palabras) y contiene referencia temporal
             if len(palabras) <= 4:
                 # "para el jueves", "el próximo jueves", "jueves", etc.
-                if any(dia in mensaje_lower for dia in dias_semana):
+                if 'dia_semana' in frases:
                     logger.info(f"🎯 [CONTEXTO] Referencia temporal aislada en flujo de agendamiento → agendar_turno")
                     return ("agendar_turno", 0.96)
                 # "mañana", "pasado mañana", "hoy"
-                if any(palabra in mensaje_lower for palabra in ['mañana', 'manana', 'hoy', 'pasado']):
+                if 'referencia_relativa' in frases:
                     logger.info(f"🎯 [CONTEXTO] Referencia temporal relativa en flujo → agendar_turno")
                     return ("agendar_turno", 0.96)
                 # "próxima semana", "esta semana"
-                if any(frase in mensaje_lower for frase in ['proxima semana', 'próxima semana', 'esta semana', 'semana que viene']):
+                if 'referencia_semana' in frases:
                     logger.info(f"🎯 [CONTEXTO] Referencia a semana en flujo → agendar_turno")
                     return ("agendar_turno", 0.96)
         
         # Detectar CAMBIO de hora cuando YA tiene hora asignada
         if contexto.hora:
             # Frases que indican cambiar/modificar hora
-            if any(frase in mensaje_lower for frase in [
-                'cambiar de horario', 'cambiar el horario', 'cambiar la hora',
-                'cambiar de hora', 'modificar', 'actualizar',
-                'quiero cambiar', 'puedo cambiar', 'mejor para las'
-            ]):
+            if 'cambio_hora' in frases:
                 # Y tiene una hora en el mensaje
-                if re.search(r'\b([0-9]{1,2}):?([0-9]{2})?\b', mensaje):
+                if RE_NUMERO_HORA.search(mensaje):
                     logger.info(f"🎯 [CONTEXTO] Usuario cambia hora existente → elegir_horario")
                     return ("elegir_horario", 0.96)
         
@@ -777,20 +1229,19 @@ class ClasificadorIntentsMejorado:
         # Ejemplo: "qué horarios tienen mañana? Necesito sacar turno"
         # ====================================================================================
         tiene_pregunta = '?' in mensaje
-        tiene_turno = any(palabra in mensaje_lower for palabra in 
-                         ['necesito turno', 'quiero turno', 'sacar turno', 'agendar turno', 'necesito sacar'])
+        tiene_turno = 'pide_turno' in frases
         
         if tiene_pregunta and tiene_turno:
             # Detectar tipo de consulta en la pregunta
             consulta_intent = None
             
-            if any(palabra in mensaje_lower for palabra in ['horario', 'horarios', 'qué hora', 'que hora']):
+            if 'consulta_horario' in frases:
                 consulta_intent = 'consultar_disponibilidad'
-            elif any(palabra in mensaje_lower for palabra in ['requisito', 'documento', 'qué necesito', 'que necesito']):
+            elif 'consulta_requisitos' in frases:
                 consulta_intent = 'consultar_requisitos'
-            elif any(palabra in mensaje_lower for palabra in ['cuesta', 'costo', 'cuánto', 'cuanto', 'precio']):
+            elif 'consulta_costo' in frases:
                 consulta_intent = 'consultar_costo'
-            elif any(palabra in mensaje_lower for palabra in ['demora', 'tarda', 'tiempo']):
+            elif 'consulta_demora' in frases:
                 consulta_intent = 'consulta_tiempo_espera'
             
             if consulta_intent:
@@ -802,13 +1253,12 @@ class ClasificadorIntentsMejorado:
         # PERO: NO si ya tiene nombre y está esperando otra cosa (hora, fecha, etc.)
         if contexto.nombre is None and contexto.cedula is None:
             # Si el mensaje tiene 2-4 palabras y empiezan con mayúscula → probablemente sea nombre
-            palabras = mensaje.split()
+            palabras = analisis.tokens_originales
             if 2 <= len(palabras) <= 4:
                 # Verificar que todas las palabras empiecen con mayúscula (típico de nombres)
                 if all(palabra[0].isupper() for palabra in palabras if palabra):
                     # Verificar que no contenga números ni palabras prohibidas
-                    palabras_prohibidas_set = {'Yo', 'Tu', 'El', 'Ella', 'Ok', 'Perfecto', 'Entonces', 'Lunes', 'Martes', 'Miercoles', 'Jueves', 'Viernes'}
-                    if not any(palabra in palabras_prohibidas_set for palabra in palabras):
+                    if not any(palabra in PALABRAS_PROHIBIDAS_NOMBRE_CAPITALIZADO for palabra in palabras):
                         if not any(char.isdigit() for char in mensaje):
                             logger.info(f"🎯 [CONTEXTO] Mensaje parece nombre (2-4 palabras capitalizadas) → informar_nombre")
                             return ("informar_nombre", 0.94)
@@ -817,87 +1267,47 @@ class ClasificadorIntentsMejorado:
         # NO interpretar como nombre (puede ser error de capitalización de hora)
         elif contexto.nombre and (contexto.cedula or contexto.fecha):
             # Si el mensaje parece hora pero está capitalizado: "Una Y Media"
-            palabras = mensaje.split()
+            palabras = analisis.tokens_originales
             if len(palabras) <= 4:
                 # Verificar si contiene palabras de hora
-                palabras_hora = ['una', 'dos', 'tres', 'cuatro', 'cinco', 'seis', 'siete', 'ocho', 
-                                'nueve', 'diez', 'once', 'doce', 'media', 'cuarto', 'menos']
-                if any(palabra.lower() in palabras_hora for palabra in palabras):
+                if any(palabra.lower() in PALABRAS_HORA_TEXTO for palabra in palabras):
                     logger.info(f"🎯 [PROTECCIÓN] Mensaje parece hora capitalizada, no nombre → elegir_horario")
                     return ("elegir_horario", 0.95)
         
         # 🔥 PRIORIDAD ALTA: Detectar saludo al inicio de conversación (SIN DATOS)
         if not contexto.nombre and not contexto.cedula and not contexto.fecha:
-            saludos_simples = ['hola', 'buenos dias', 'buenos días', 'buen dia', 'buen día', 
-                              'buenas tardes', 'buenas', 'que tal', 'qué tal', 'hey', 'hi']
-            
             # Si el mensaje es SOLO un saludo (o saludo + "quiero")
-            palabras_msg = mensaje_lower.split()
+            palabras_msg = analisis.tokens
             if len(palabras_msg) <= 3:
-                if any(saludo == mensaje_lower for saludo in saludos_simples):
+                if mensaje_lower in SALUDOS_SIMPLES:
                     logger.info(f"🎯 [CONTEXTO] Saludo simple al inicio → greet")
                     return ("greet", 0.97)
-                elif any(saludo in mensaje_lower for saludo in saludos_simples) and len(palabras_msg) <= 2:
+                elif 'saludo' in frases and len(palabras_msg) <= 2:
                     logger.info(f"🎯 [CONTEXTO] Saludo corto al inicio → greet")
                     return ("greet", 0.95)
         
         # 🔥 NUEVO: Detectar TRÁMITES que NO sean cédulas (RECHAZAR)
-        tramites_no_cedula = [
-            'pasaporte', 'licencia', 'licencia de conducir',
-            'antecedentes', 'certificado', 'apostilla',
-            'visa', 'permiso', 'registro', 'inscripcion', 'inscripción',
-            'partida', 'acta', 'matrimonio', 'nacimiento', 'defuncion', 'defunción',
-            'divorcio', 'adopcion', 'adopción', 'titulo', 'título'
-        ]
-        
         # Detectar si menciona algún trámite NO relacionado con cédula
-        if any(tramite in mensaje_lower for tramite in tramites_no_cedula):
+        if 'tramite_no_cedula' in frases:
             # Pero NO rechazar si está preguntando sobre trámites en general
-            if not any(patron in mensaje_lower for patron in ['qué trámites', 'que tramites', 'qué hacen', 'que hacen']):
+            if 'pregunta_tramites_general' not in frases:
                 logger.info(f"🚫 [RECHAZO] Trámite no relacionado con cédulas → tramite_fuera_alcance (0.96)")
                 return ("tramite_fuera_alcance", 0.96)
         
         # 🔥 NUEVO: Detectar preguntas sobre QUÉ TRÁMITES/SERVICIOS HACEN
-        patrones_pregunta_tramites = [
-            'qué trámites', 'que tramites', 'que trámites', 'qué tramites',
-            'qué servicios', 'que servicios',
-            'qué hacen', 'que hacen',
-            'para qué sirve', 'para que sirve',
-            'qué se puede hacer', 'que se puede hacer',
-            'qué tipo de trámites', 'que tipo de tramites',
-            'cuáles son los trámites', 'cuales son los tramites',
-            'qué documentos tramitan', 'que documentos tramitan'
-        ]
-        if any(patron in mensaje_lower for patron in patrones_pregunta_tramites):
+        if 'pregunta_tramites' in frases:
             logger.info(f"🎯 [PATRON] Pregunta sobre qué trámites hacen → consultar_tramites (0.94)")
             return ("consultar_tramites", 0.94)
         
         # 🔥 FIX CONV #16: Priorizar "qué necesito" sobre "necesito" genérico
         # Detectar PREGUNTAS sobre requisitos (no solo la palabra "necesito")
-        patrones_pregunta_requisitos = [
-            'qué necesito', 'que necesito',
-            'qué documentos', 'que documentos',
-            'cuáles son los requisitos', 'cuales son los requisitos',
-            'qué requisitos', 'que requisitos',
-            'qué debo llevar', 'que debo llevar',
-            'qué tengo que llevar', 'que tengo que llevar',
-            'qué hay que llevar', 'que hay que llevar',
-            'necesito saber qué', 'necesito saber que'
-        ]
-        if any(patron in mensaje_lower for patron in patrones_pregunta_requisitos):
+        if 'pregunta_requisitos' in frases:
             logger.info(f"🎯 [PATRON] Pregunta sobre requisitos → consultar_requisitos (0.93)")
             return ("consultar_requisitos", 0.93)
         
         # 🔥 NUEVO: Detectar "otro turno" / "nuevo turno" después de confirmar → resetear contexto
         if contexto.tiene_datos_completos() or (contexto.nombre and contexto.cedula):
-            if any(frase in mensaje_lower for frase in [
-                'otro turno', 'otro turno más', 'un turno más',
-                'quiero otro turno', 'necesito otro turno',
-                'agendar otro turno', 'sacar otro turno',
-                'nuevo turno', 'un nuevo turno',
-                'turno para otra persona', 'turno diferente',
-                'con otro nombre'
-            ]):
+            if 'otro_turno' in frases:
                 logger.info(f"🎯 [CONTEXTO] Usuario quiere agendar OTRO turno → resetear contexto")
                 # Resetear TODO el contexto para empezar de cero
                 contexto.nombre = None
@@ -911,10 +1321,8 @@ class ClasificadorIntentsMejorado:
                 return ("agendar_turno", 0.98)
         
         # 🔥 FIX: Detectar "entonces/ok/dale quiero turno" (después de consultas)
-        palabras_transicion = ['entonces', 'ok', 'dale', 'perfecto', 'bueno']
-        if any(trans in mensaje_lower for trans in palabras_transicion):
-            palabras_turno = ['quiero turno', 'necesito turno', 'turno', 'agendar', 'sacar turno']
-            if any(palabra in mensaje_lower for palabra in palabras_turno):
+        if 'transicion' in frases:
+            if 'turno' in frases:
                 # Solo si NO tenemos datos aún (significa que viene de consulta)
                 if not contexto.nombre:
                     logger.info(f"🎯 [PATRON] Transición + turno (después de consulta) → agendar_turno (0.92)")
@@ -923,13 +1331,9 @@ class ClasificadorIntentsMejorado:
         # Detectar CAMBIO de fecha cuando YA tiene fecha asignada
         if contexto.fecha:
             # Frases que indican cambiar fecha
-            if any(frase in mensaje_lower for frase in [
-                'cambiar mi turno para', 'cambiar para',
-                'mejor para el', 'prefiero el',
-                'puedo cambiar para', 'mover para'
-            ]):
+            if 'cambio_fecha' in frases:
                 # Y tiene un día de la semana o fecha
-                if any(dia in mensaje_lower for dia in ['lunes', 'martes', 'miercoles', 'miércoles', 'jueves', 'viernes', 'sabado', 'sábado']):
+                if 'dia_habil' in frases:
                     logger.info(f"🎯 [CONTEXTO] Usuario cambia fecha existente → consultar_disponibilidad")
                     return ("consultar_disponibilidad", 0.96)
         
@@ -939,9 +1343,7 @@ class ClasificadorIntentsMejorado:
         # ==========================================
         if contexto.nombre:  # Solo si ya tiene un nombre guardado
             # Detectar intentos de corrección del nombre
-            if any(patron in mensaje_lower for patron in ['no mi nombre es', 'no, mi nombre es', 
-                                                          'no mi nombre', 'no, mi nombre',
-                                                          'no solo', 'no, solo']):
+            if 'correccion_nombre' in frases:
                 logger.info(f"🔄 [CORRECCION] Usuario corrige su nombre")
                 contexto.nombre = None  # Resetear para capturar el nuevo
                 contexto.campo_en_cambio = 'nombre'
@@ -949,32 +1351,30 @@ class ClasificadorIntentsMejorado:
         
         # 🔥 NUEVO: Detectar "está mal", "agarraste mal", "es incorrecto"
         # ==========================================
-        if any(frase in mensaje_lower for frase in ['esta mal', 'está mal', 'agarraste mal', 'tomaste mal', 
-                                                      'es incorrecto', 'no es correcto', 'esta equivocado',
-                                                      'está equivocado', 'no esta bien', 'no está bien']):
+        if 'esta_mal' in frases:
             # Detectar qué campo está mal
-            if any(palabra in mensaje_lower for palabra in ['nombre', 'nombres', 'mi nombre']):
+            if 'campo_nombre' in frases:
                 logger.info(f"🔄 [ERROR DETECTADO] Usuario dice que el nombre está mal")
                 contexto.nombre = None
                 contexto.campo_en_cambio = 'nombre'
                 return ("informar_nombre", 0.98)
-            elif any(palabra in mensaje_lower for palabra in ['cedula', 'cédula', 'ci', 'documento']):
+            elif 'campo_cedula' in frases:
                 logger.info(f"🔄 [ERROR DETECTADO] Usuario dice que la cédula está mal")
                 contexto.cedula = None
                 contexto.campo_en_cambio = 'cedula'
                 return ("informar_cedula", 0.98)
-            elif any(palabra in mensaje_lower for palabra in ['email', 'correo', 'mail']):
+            elif 'campo_email' in frases:
                 logger.info(f"🔄 [ERROR DETECTADO] Usuario dice que el email está mal")
                 contexto.email = None
                 contexto.campo_en_cambio = 'email'
                 return ("informar_email", 0.98)
-            elif any(palabra in mensaje_lower for palabra in ['fecha', 'dia', 'día']):
+            elif 'campo_fecha' in frases:
                 logger.info(f"🔄 [ERROR DETECTADO] Usuario dice que la fecha está mal")
                 contexto.fecha = None
                 contexto.hora = None
                 contexto.campo_en_cambio = 'fecha'
                 return ("consultar_disponibilidad", 0.98)
-            elif any(palabra in mensaje_lower for palabra in ['hora', 'horario']):
+            elif 'campo_hora' in frases:
                 logger.info(f"🔄 [ERROR DETECTADO] Usuario dice que la hora está mal")
                 contexto.hora = None
                 contexto.campo_en_cambio = 'hora'
@@ -988,20 +1388,19 @@ class ClasificadorIntentsMejorado:
         # DETECCIÓN CRÍTICA: "Cambiar [campo]" en resumen
         # ==========================================
         # 🔥 FIX: Detectar NEGACIÓN antes de "cambiar" ("no quiero cambiar")
-        es_negacion = any(neg in mensaje_lower for neg in ['no quiero cambiar', 'no cambiar', 'no quiero modificar', 'no modificar'])
+        es_negacion = 'negacion_cambio' in frases
         
         # Detectar "Cambiar email", "Cambiar hora", etc.
-        if (('cambiar' in mensaje_lower or 'modificar' in mensaje_lower or 'corregir' in mensaje_lower) 
-            and not es_negacion):
+        if 'verbo_cambio' in frases and not es_negacion:
             # Cambiar EMAIL
-            if any(palabra in mensaje_lower for palabra in ['email', 'correo', 'mail', 'e-mail']):
+            if 'campo_email' in frases:
                 logger.info(f"🔄 [CAMBIO] Usuario quiere cambiar email → resetear email")
                 contexto.email = None
                 contexto.campo_en_cambio = 'email'  # Marcar que estamos cambiando
                 return ("informar_email", 0.98)
             
             # Cambiar HORA (sin especificar "cambiar fecha")
-            elif any(palabra in mensaje_lower for palabra in ['hora', 'horario']) and not any(p in mensaje_lower for p in ['fecha', 'dia', 'día']):
+            elif 'campo_hora' in frases and 'campo_fecha' not in frases:
                 logger.info(f"🔄 [CAMBIO] Usuario quiere cambiar SOLO hora → mostrar horarios")
                 contexto.hora = None
                 contexto.campo_en_cambio = 'hora'  # Marcar que estamos cambiando
@@ -1009,9 +1408,9 @@ class ClasificadorIntentsMejorado:
                 return ("elegir_horario", 0.98)
             
             # Cambiar FECHA
-            elif any(palabra in mensaje_lower for palabra in ['fecha', 'dia', 'día']):
+            elif 'campo_fecha' in frases:
                 # 🔥 MEJORADO: Detectar si YA especifica "para mañana" o una fecha específica
-                if 'mañana' in mensaje_lower or 'ma�ana' in mensaje_lower:
+                if 'manana' in frases:
                     logger.info(f"🔄 [CAMBIO] Usuario quiere cambiar fecha para MAÑANA")
                     # Calcular mañana
                     manana = datetime.now() + timedelta(days=1)
@@ -1030,14 +1429,14 @@ class ClasificadorIntentsMejorado:
                     return ("consultar_disponibilidad", 0.98)
             
             # Cambiar NOMBRE
-            elif any(palabra in mensaje_lower for palabra in ['nombre', 'nombres']):
+            elif 'campo_nombre' in frases:
                 logger.info(f"🔄 [CAMBIO] Usuario quiere cambiar nombre → resetear nombre")
                 contexto.nombre = None
                 contexto.campo_en_cambio = 'nombre'  # Marcar que estamos cambiando
                 return ("informar_nombre", 0.98)
             
             # Cambiar CÉDULA
-            elif any(palabra in mensaje_lower for palabra in ['cedula', 'cédula', 'ci', 'documento']):
+            elif 'campo_cedula' in frases:
                 logger.info(f"🔄 [CAMBIO] Usuario quiere cambiar cédula → resetear cédula")
                 contexto.cedula = None
                 contexto.campo_en_cambio = 'cedula'  # Marcar que estamos cambiando
@@ -1045,7 +1444,7 @@ class ClasificadorIntentsMejorado:
                 return ("informar_cedula", 0.98)
             
             # Cambiar EMAIL
-            elif any(palabra in mensaje_lower for palabra in ['email', 'correo', 'mail']):
+            elif 'campo_email' in frases:
                 logger.info(f"🔄 [CAMBIO] Usuario quiere cambiar email → resetear email")
                 contexto.email = None
                 return ("informar_email", 0.98)
@@ -1061,92 +1460,58 @@ class ClasificadorIntentsMejorado:
             mensaje_limpio = mensaje_lower.strip()
             
             # Confirmación directa con palabras clave
-            if mensaje_limpio in ['esta bien', 'está bien', 'ok', 'vale', 'si', 'sí', 'perfecto', 'de acuerdo', 'confirmo', 'confirmado', 'confirm', 'acepto']:
+            if mensaje_limpio in CONFIRMACIONES_SIMPLES:
                 logger.info(f"🎯 [CONTEXTO] Usuario confirma turno → affirm (msg: '{mensaje_limpio}')")
                 return ("affirm", 0.97)
             
             # Frases de confirmación más complejas
-            if any(frase in mensaje_lower for frase in ['si confirmo', 'sí confirmo', 'si acepto', 'sí acepto', 
-                                                         'todo bien', 'esta todo bien', 'está todo bien',
-                                                         'confirmame', 'confírmame', 'confirma el turno',
-                                                         'confirmar el turno', 'confirmar turno',
-                                                         'agendar', 'agenda', 'agendame', 'agéndame']):
+            if 'confirmacion' in frases:
                 logger.info(f"🎯 [CONTEXTO] Usuario confirma turno con frase → affirm")
                 return ("affirm", 0.97)
         
         # Detectar cambio de hora cuando ya tiene fecha PERO NO hora
         if contexto.fecha and not contexto.hora:
             # Frases que indican elegir/cambiar hora
-            if any(palabra in mensaje_lower for palabra in ['cambiar', 'mejor', 'prefiero', 'quiero']):
+            if 'eleccion_hora' in frases:
                 # Y tiene una hora en el mensaje
-                if re.search(r'\b([0-9]{1,2}):?([0-9]{2})?\b', mensaje):
+                if RE_NUMERO_HORA.search(mensaje):
                     logger.info(f"🎯 [CONTEXTO] Usuario elige/cambia hora → elegir_horario")
                     return ("elegir_horario", 0.96)
         
         # Detectar hora aislada cuando esperamos hora
         if contexto.fecha and not contexto.hora:
             # Si el mensaje es solo una hora o "para/a las X"
-            if re.match(r'^(para\s+)?(a\s+)?las?\s+[0-9]{1,2}(:[0-9]{2})?$', mensaje_lower) or \
-               re.match(r'^[0-9]{1,2}(:[0-9]{2})?$', mensaje_lower):
+            if RE_SOLO_LAS_HORA.match(mensaje_lower) or \
+               RE_SOLO_HORA.match(mensaje_lower):
                 logger.info(f"🎯 [CONTEXTO] Usuario da hora directamente → elegir_horario")
                 return ("elegir_horario", 0.97)
         
         # Detectar tipo de trámite cuando pregunta por cédula
         if contexto.nombre and not contexto.cedula:
             # Primera vez / no tengo cédula - MEJORADO: detecta "para mi hijo/hija/niño", "primera cedula"
-            if any(frase in mensaje_lower for frase in [
-                'primera vez', '1ra vez', 'primer tramite', 
-                'no tengo cedula', 'no tengo cédula', 
-                'todavia no tengo', 'todavía no tengo', 
-                'aun no tengo', 'aún no tengo',
-                'es para mi hijo', 'es para mi hija', 'es para mi niño', 'es para mi niña',
-                'para su primera cedula', 'para su primera cédula',
-                'su primera cedula', 'su primera cédula',
-                'primera cedula', 'primera cédula'
-            ]):
+            if 'primera_vez' in frases:
                 logger.info(f"🎯 [CONTEXTO] Tipo de trámite detectado: primera_vez")
                 contexto.tipo_tramite = 'primera_vez'
                 contexto.cedula = 'SIN_CEDULA'  # Marcar que no tiene cédula
                 return ("informar_tipo_tramite", 0.96)
             
             # Pérdida/Robo
-            if any(frase in mensaje_lower for frase in ['se me perdio', 'se me perdió', 'perdi', 'perdí', 'me la robaron', 'me robaron', 'se me extravió', 'se me extravi', 'extravio', 'extravío', 'robo']):
+            if 'perdida' in frases:
                 logger.info(f"🎯 [CONTEXTO] Tipo de trámite detectado: perdida")
                 contexto.tipo_tramite = 'perdida'
                 return ("informar_tipo_tramite", 0.96)
             
             # 🔥 MEJORADO: Extranjero - detectar más variaciones de frases
-            if any(frase in mensaje_lower for frase in [
-                'soy extranjero', 'soy extranjera', 
-                'extranjero', 'extranjera', 
-                'no soy paraguayo', 'no soy paraguaya',
-                'no soy de paraguay', 'no soy paraguaya', 
-                'vengo de', 'soy de otro pais', 'soy de otro país',
-                'extranjeria', 'extranjería',
-                'residente extranjero', 'residente extranjera',
-                'de otro pais', 'de otro país',
-                'ciudadano extranjero', 'ciudadana extranjera'
-            ]):
+            if 'extranjero' in frases:
                 logger.info(f"🎯 [CONTEXTO] Tipo de trámite detectado: extranjero")
                 contexto.tipo_tramite = 'extranjero'
                 return ("informar_tipo_tramite", 0.96)
         
         # 🔥 NUEVO: Detectar consulta de disponibilidad de próxima semana (lista de días)
-        frases_disponibilidad_semana = [
-            'que dias disponibles', 'qué días disponibles', 'que otros dias',
-            'qué otros días', 'dias disponibles de la proxima semana',
-            'días disponibles de la próxima semana', 'disponibilidad para la proxima semana',
-            'disponibilidad de la proxima semana', 'hay disponibilidad para la proxima semana',
-            'dame los dias', 'cuales son los dias', 'cuáles son los días',
-            'ver disponibilidad', 'mostrar disponibilidad',
-            'hay mas dias', 'hay más días', 'hay otros dias', 'hay otros días',
-            'mas dias disponibles', 'más días disponibles', 'otros dias disponibles'
-        ]
-        
         # Detectar si menciona "proxima semana" explícitamente O si contexto ya tiene proxima_semana=True
-        if any(frase in mensaje_lower for frase in frases_disponibilidad_semana):
+        if 'disponibilidad_semana' in frases:
             # CASO 1: Menciona explícitamente "próxima semana"
-            if any(sem in mensaje_lower for sem in ['proxima semana', 'próxima semana', 'siguiente semana', 'semana que viene']):
+            if 'proxima_semana' in frases:
                 logger.info(f"🎯 [CONTEXTO] Consulta disponibilidad próxima semana (explícita) → consultar_disponibilidad (0.96)")
                 return ("consultar_disponibilidad", 0.96)
             # CASO 2: Contexto YA tiene proxima_semana=True (usuario pregunta genéricamente)
@@ -1155,30 +1520,14 @@ class ClasificadorIntentsMejorado:
                 return ("consultar_disponibilidad", 0.96)
         
         # 🔥 NUEVO: Detectar preferencias de horario (SIEMPRE, incluso con fecha)
-        frases_preferencia_horario = [
-            'no puedo por la mañana', 'no puedo de mañana', 'no puedo en la mañana',
-            'no puedo por la tarde', 'no puedo de tarde', 'no puedo en la tarde',
-            'después del mediodía', 'despues del mediodia', 'pasado el mediodía',
-            'por la tarde', 'de tarde', 'en la tarde',
-            'turnos para mañana por la tarde', 'turnos de mañana por la tarde',
-            'horarios por la tarde', 'horarios de tarde', 'disponibilidad por la tarde'
-        ]
-        
-        if any(frase in mensaje_lower for frase in frases_preferencia_horario):
+        if 'preferencia_horario' in frases:
             logger.info(f"🎯 [CONTEXTO] Preferencia de horario detectada → consultar_disponibilidad (0.95)")
             return ("consultar_disponibilidad", 0.95)
         
         # Detectar negación sin cédula (sin importar contexto) - SOLO si no detectamos tipo arriba
-        palabras_negacion_sin_cedula = [
-            'se me perdio', 'se me perdió', 'perdi mi cedula', 'perdí mi cédula',
-            'no tengo cedula', 'no tengo cédula', 'sin cedula', 'sin cédula',
-            'no la tengo', 'me la robaron', 'se me extravió', 'se me extravi',
-            'todavia no tengo', 'todavía no tengo', 'aun no tengo', 'aún no tengo'
-        ]
-        
-        if any(neg in mensaje_lower for neg in palabras_negacion_sin_cedula):
+        if 'negacion_sin_cedula' in frases:
             # Si menciona "turno" o "agendar", convertir a agendar_turno en vez de solo negacion
-            if any(palabra in mensaje_lower for palabra in ['turno', 'agendar', 'cita', 'necesito']):
+            if 'turno_sin_cedula' in frases:
                 logger.info(f"🎯 [PATRON] negacion_sin_cedula + turno → agendar_turno (0.90)")
                 contexto.cedula = 'SIN_CEDULA'  # Marcar que no tiene cédula
                 return ("agendar_turno", 0.90)
@@ -1188,46 +1537,19 @@ class ClasificadorIntentsMejorado:
         
         # SOLO detectar "no tengo" SI estamos esperando cédula
         if contexto.nombre and not contexto.cedula:
-            if mensaje_lower in ['no tengo', 'no tengo nada', 'nada']:
+            if mensaje_lower in NEGACIONES_SIN_CEDULA_SIMPLES:
                 logger.info(f"🎯 [CONTEXTO] negacion_sin_cedula (0.98)")
                 return ("negacion_sin_cedula", 0.98)
         
         # 🔥 NUEVO: Detectar "no tengo email" cuando estamos esperando email
         if contexto.nombre and contexto.cedula and contexto.fecha and contexto.hora and not contexto.email:
-            if any(frase in mensaje_lower for frase in ['no tengo email', 'no tengo correo', 'sin email', 'sin correo', 'no tengo mail']):
+            if 'sin_email' in frases:
                 logger.info(f"🎯 [CONTEXTO] Usuario sin email → proceder a confirmación sin email (0.98)")
                 contexto.email = 'SIN_EMAIL'  # Marcar que no tiene email
                 return ("affirm", 0.98)  # Ir directo a confirmación
         
-        # Palabras clave de intents de ACCIÓN (no son nombres)
-        palabras_accion = ['agendar', 'turno', 'cita', 'horario', 'disponibilidad', 
-                          'requisitos', 'ubicacion', 'ubicación', 'direccion', 'dirección',
-                          'costo', 'precio', 'cuanto', 'cuánto', 'pagar',
-                          'consultar', 'ver', 'necesito', 'información', 'informacion',
-                          'oficina', 'ofi', 'queda', 'keda', 'esta', 'esta ubicada', 'como llego',
-                          'ayuda', 'ayudar', 'puedes', 'necesitas', 'hacer',
-                          'tienen', 'hay', 'libre', 'disponible', 'gente', 'espacio',
-                          'recomendas', 'recomiendas', 'asi', 'así', 'llamo', 'poder', 'cuando',
-                          'adonde', 'donde', 'contactar', 'cancelar', 'cancelo']
-        
         # Si el mensaje contiene palabras de acción, NO validar como nombre
-        es_accion = any(palabra in mensaje_lower for palabra in palabras_accion)
-        
-        # Lista de palabras comunes que NO son nombres (más específica)
-        # Solo palabras que definitivamente NO pueden ser parte de un nombre
-        palabras_prohibidas = {
-            'yo', 'tu', 'el', 'ella', 'nosotros', 'ustedes', 'ellos',
-            'no', 'nada', 'algo', 'todo', 'nadie', 'alguien',
-            'se', 'me', 'te', 'le', 'nos', 'les', 'lo', 'la', 'los', 'las',
-            'este', 'esta', 'estos', 'estas', 'ese', 'esa', 'esos', 'esas',
-            'muy', 'mucho', 'poco', 'mas', 'menos', 'bien', 'mal',
-            'loco', 'loca', 'tonto', 'tonta', 'raro', 'rara',
-            'cosa', 'cosas', 'malo', 'mala', 
-            'macaco', 'mono', 'gorila', 'gorilla', 'animal', 'volador', 'voladora',
-            'idiota', 'estupido', 'estúpido', 'bobo', 'boba', 'insano', 'insana',
-            'payaso', 'ridiculo', 'ridículo', 'absurdo', 'absurda',
-            'gaga', 'total', 'pepe', 'test', 'prueba', 'fake', 'falso'
-        }
+        es_accion = 'accion' in frases
         
         # DETECCIÓN DE CÉDULA CONTEXTUAL (FORMATOS VÁLIDOS SOLAMENTE)
         # Si NO tenemos nombre ni cédula, y el mensaje son solo números
@@ -1239,29 +1561,29 @@ class ClasificadorIntentsMejorado:
             # NO aceptar: espacios dispersos como "1 2 3 4 5 6 7"
             
             # Formato sin separadores
-            if re.match(r'^\d{5,8}$', mensaje.strip()):
+            if RE_CEDULA_SOLO_DIGITOS.match(mensaje.strip()):
                 logger.info(f"🎯 [CONTEXTO] Cédula sin separadores → informar_cedula (0.98)")
                 return ("informar_cedula", 0.98)
             
             # Formato con puntos estándar: X.XXX.XXX
-            elif re.match(r'^\d{1,2}\.\d{3}\.\d{3}$', mensaje.strip()):
+            elif RE_CEDULA_SOLO_PUNTOS.match(mensaje.strip()):
                 logger.info(f"🎯 [CONTEXTO] Cédula con puntos estándar → informar_cedula (0.98)")
                 return ("informar_cedula", 0.98)
             
             # Formato con espacios estándar: X XXX XXX
-            elif re.match(r'^\d{1,2}\s\d{3}\s\d{3}$', mensaje.strip()):
+            elif RE_CEDULA_SOLO_ESPACIOS.match(mensaje.strip()):
                 logger.info(f"🎯 [CONTEXTO] Cédula con espacios estándar → informar_cedula (0.98)")
                 return ("informar_cedula", 0.98)
         
         # DETECCIÓN DE NOMBRES CONTEXTUAL (SIMPLIFICADA)
         # Si NO tenemos nombre y el mensaje es 1-4 palabras solo con letras, es probable que sea un nombre
         if not contexto.nombre and not es_accion:
-            palabras = mensaje.split()
+            palabras = analisis.tokens_originales
             if 1 <= len(palabras) <= 4:
-                palabras_lower = [p.lower() for p in palabras]
+                palabras_lower = analisis.tokens
                 
                 # Verificar que NO contengan palabras prohibidas
-                if any(p in palabras_prohibidas for p in palabras_lower):
+                if any(p in PALABRAS_PROHIBIDAS for p in palabras_lower):
                     pass  # No es nombre, seguir con clasificación normal
                 # Verificar que sean palabras válidas (al menos 2 letras cada una, solo letras)
                 elif all(len(p) >= 2 and p.isalpha() for p in palabras):
@@ -1272,35 +1594,26 @@ class ClasificadorIntentsMejorado:
         # CONTEXTO: Si ya tenemos nombre pero no cédula, y el mensaje son solo números
         if contexto.nombre and not contexto.cedula:
             # Solo aceptar formatos válidos (sin separadores, puntos estándar, espacios estándar)
-            if re.match(r'^\d{5,8}$', mensaje.strip()):
+            if RE_CEDULA_SOLO_DIGITOS.match(mensaje.strip()):
                 logger.info(f"🎯 Intent detectado por contexto: informar_cedula (0.98)")
                 return ("informar_cedula", 0.98)
-            elif re.match(r'^\d{1,2}\.\d{3}\.\d{3}$', mensaje.strip()):
+            elif RE_CEDULA_SOLO_PUNTOS.match(mensaje.strip()):
                 logger.info(f"🎯 Intent detectado por contexto: informar_cedula (0.98)")
                 return ("informar_cedula", 0.98)
-            elif re.match(r'^\d{1,2}\s\d{3}\s\d{3}$', mensaje.strip()):
+            elif RE_CEDULA_SOLO_ESPACIOS.match(mensaje.strip()):
                 logger.info(f"🎯 Intent detectado por contexto: informar_cedula (0.98)")
                 return ("informar_cedula", 0.98)
         
         # CONTEXTO: Si ya tenemos cédula pero no fecha, y el mensaje contiene fecha
         if contexto.cedula and not contexto.fecha:
             # Detectar cualquier palabra relacionada con fechas o días
-            palabras_fecha = ['mañana', 'ma�ana', 'hoy', 'lunes', 'martes', 'miercoles', 'miércoles', 
-                            'jueves', 'viernes', 'sabado', 'sábado', 'domingo', 
-                            'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio',
-                            'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre',
-                            # Abreviaturas de meses
-                            'ene', 'feb', 'mar', 'abr', 'may', 'jun', 
-                            'jul', 'ago', 'sep', 'sept', 'oct', 'nov', 'dic',
-                            'pasado']
-            
             # Detectar formato DD/MM o DD-MM o DD de MES (completo o abreviado)
             tiene_formato_fecha = (
-                re.search(r'\b\d{1,2}[/-]\d{1,2}\b', mensaje) or  # DD/MM o DD-MM
-                re.search(r'\b\d{1,2}\s+(?:de\s+)?(?:ene|feb|mar|abr|may|jun|jul|ago|sep|sept|oct|nov|dic|enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\b', mensaje_lower)  # DD de MES
+                RE_FECHA_DD_MM.search(mensaje) or  # DD/MM o DD-MM
+                RE_FECHA_DD_DE_MES.search(mensaje_lower)  # DD de MES
             )
             
-            if tiene_formato_fecha or any(palabra in mensaje_lower for palabra in palabras_fecha):
+            if tiene_formato_fecha or 'fecha' in frases:
                 logger.info(f"🎯 [CONTEXTO PRIORITARIO] Esperamos fecha y detectamos palabras de fecha → informar_fecha (0.96)")
                 return ("informar_fecha", 0.96)
         
@@ -1310,57 +1623,99 @@ class ClasificadorIntentsMejorado:
             # PERO NO frases sobre consulta de horarios ("que horarios", "cierran", "abren", "atienden", "hay")
             
             # Detectar número simple (ej: "9", "14")
-            if re.match(r'^\s*\d{1,2}\s*$', mensaje):
+            if RE_NUMERO_CORTO_SOLO.match(mensaje):
                 logger.info(f"🎯 Intent detectado por contexto: elegir_horario [número simple] (0.99)")
                 return ("elegir_horario", 0.99)
             
             # Detectar frases con "las X"
-            if re.search(r'\b(las|para\s+las|a\s+las)\s*\d{1,2}\b', mensaje_lower) and \
-               not re.search(r'\b(que|qu[eé]|cuales|cu[aá]les|cual|cu[aá]l)\s+(horarios|horas|hora)\b', mensaje_lower) and \
-               not re.search(r'\b(cierran|abren|atienden|trabajan|est[aá]n|hay|tienen)\b', mensaje_lower):
+            if RE_LAS_NUMERO.search(mensaje_lower) and \
+               not RE_PREGUNTA_HORARIOS.search(mensaje_lower) and \
+               not RE_VERBOS_ATENCION.search(mensaje_lower):
                 logger.info(f"🎯 Intent detectado por contexto: elegir_horario (0.98)")
                 return ("elegir_horario", 0.98)
         
-        # ========================================================================
-        # PIPELINE DE CLASIFICACIÓN UNIFICADA CON LÓGICA DIFUSA
-        # ========================================================================
+        return None
+    
+    def _clasificar_en_cascada(self, mensaje: str, analisis: AnalisisMensaje, contexto: SessionContext) -> Tuple[str, float, Dict]:
+        """
+        Pipeline de clasificación unificada con lógica difusa, en cascada:
+        regex → fuzzy → LLM. Cada etapa corta apenas la decisión ya no puede cambiar,
+        así el LLM (hasta 5s) solo se consulta en la banda de incertidumbre.
+        
+        En modo especulativo (LLM_ESPECULATIVO=1) el LLM se lanza en paralelo con fuzzy
+        y se espera como máximo LLM_PRESUPUESTO_MS. La fuente de la decisión va en metadata.
+        """
+        inicio = time.monotonic()
         
         # 1. CLASIFICACIÓN POR PATRONES (Regex)
-        intent_patron, confianza_patron = self._clasificar_por_patrones(mensaje_lower)
+        intent_patron, confianza_patron = self._clasificar_por_patrones(analisis.normalizado, analisis)
         
         # CONTEXTO: Si el patrón dice "informar_nombre" pero ya tenemos nombre, buscar cédula
         if intent_patron == 'informar_nombre' and contexto.nombre and not contexto.cedula:
             # Verificar si el mensaje contiene números (probablemente cédula)
-            if re.search(r'\d{5,8}', mensaje):
+            if RE_DIGITOS_CEDULA.search(mensaje):
                 logger.info(f"🎯 Intent corregido por contexto: informar_cedula (0.95)")
-                return ("informar_cedula", 0.95)
+                metricas_cascada.registrar('regex_directo')
+                return self._resultado("informar_cedula", 0.95, 'regex_directo', 'omitido', inicio)
         
-        # 2. CLASIFICACIÓN CON LLM
-        intent_llm = 'nlu_fallback'
-        confianza_llm = 0.0
-        
-        if self.llm_url:
-            try:
-                intent_llm, confianza_llm = self._clasificar_con_llm(mensaje, contexto)
-            except Exception as e:
-                logger.warning(f"⚠️ Error en LLM: {e}")
-        
-        # 3. CLASIFICACIÓN CON LÓGICA DIFUSA (solo para análisis, no afecta decisión final todavía)
-        intent_fuzzy, confianza_fuzzy = clasificar_con_logica_difusa(mensaje, threshold=0.3)
-        logger.info(f"🌟 [FUZZY] Clasificación difusa: {intent_fuzzy} ({confianza_fuzzy:.2f})")
-        
-        # 4. DETERMINAR SCORE DE CONTEXTO (si aplicamos detección contextual arriba)
-        # Para contexto, usamos 0 si no se aplicó nada, o alta confianza si se detectó contextualmente
+        # 2. DETERMINAR SCORE DE CONTEXTO
+        # Si patrón tiene MUY ALTA confianza (>0.92), asumimos que fue detección contextual prioritaria
         score_contexto = 0.0
         intent_contexto = ''
         
-        # Si patrón tiene MUY ALTA confianza (>0.92), asumimos que fue detección contextual prioritaria
         if confianza_patron > 0.92:
             score_contexto = confianza_patron
             intent_contexto = intent_patron
-            logger.info(f"� Detección contextual prioritaria: {intent_contexto} ({score_contexto:.2f})")
-            # Retornar directamente, es una detección super confiable
-            return intent_contexto, score_contexto
+            logger.info(f"🎯 Detección contextual prioritaria: {intent_contexto} ({score_contexto:.2f})")
+            # Retornar directamente, es una detección super confiable (sin fuzzy ni LLM)
+            metricas_cascada.registrar('regex_directo')
+            return self._resultado(intent_contexto, score_contexto, 'regex_directo', 'omitido', inicio)
+        
+        # Modo especulativo: si regex no alcanza, el LLM arranca ya y corre mientras se calcula fuzzy
+        futuro_llm = None
+        if self._executor_llm and self.llm_url and confianza_patron <= UMBRAL_REGEX_SIN_LLM:
+            futuro_llm = self._executor_llm.submit(self._clasificar_con_llm, mensaje, contexto)
+        
+        # 3. CLASIFICACIÓN CON LÓGICA DIFUSA
+        keywords_difusas = analisis.frases.frases & KEYWORDS_DIFUSAS  # Ya encontradas por AUTOMATA_FRASES
+        intent_fuzzy, confianza_fuzzy = clasificar_con_logica_difusa(mensaje, threshold=0.3, keywords=keywords_difusas)
+        logger.info(f"🌟 [FUZZY] Clasificación difusa: {intent_fuzzy} ({confianza_fuzzy:.2f})")
+        
+        # 4. CLASIFICACIÓN CON LLM (solo en la banda de incertidumbre)
+        intent_llm = 'nlu_fallback'
+        confianza_llm = 0.0
+        estado_llm = 'omitido'
+        
+        if not en_banda_incierta(confianza_patron, confianza_fuzzy):
+            logger.info(f"⏭️ [CASCADA] Regex/fuzzy ya deciden, se omite el LLM")
+            metricas_cascada.registrar('local')
+            if futuro_llm is not None:
+                self._descartar_llm(futuro_llm)
+        elif futuro_llm is not None:
+            restante = LLM_PRESUPUESTO_MS / 1000 - (time.monotonic() - inicio)
+            try:
+                intent_llm, confianza_llm = futuro_llm.result(timeout=max(0.0, restante))
+                estado_llm = 'a_tiempo'
+                metricas_cascada.registrar('llm')
+            except FuturesTimeout:
+                logger.warning(f"⏱️ [CASCADA] LLM fuera del presupuesto ({LLM_PRESUPUESTO_MS:.0f}ms), se decide sin él")
+                estado_llm = 'fuera_de_presupuesto'
+                metricas_cascada.registrar('llm_tarde')
+                self._descartar_llm(futuro_llm)
+            except Exception as e:
+                logger.warning(f"⚠️ Error en LLM: {e}")
+                estado_llm = 'error'
+                metricas_cascada.registrar('llm')
+        elif self.llm_url:
+            estado_llm = 'secuencial'
+            metricas_cascada.registrar('llm')
+            try:
+                intent_llm, confianza_llm = self._clasificar_con_llm(mensaje, contexto)
+            except Exception as e:
+                logger.warning(f"⚠️ Error en LLM: {e}")
+        else:
+            estado_llm = 'no_disponible'
+            metricas_cascada.registrar('llm_no_disponible')
         
         # 5. DECISION CON PRIORIZACION FUZZY: Fuzzy > Regex > LLM
         logger.info(f"\nDECISION CON PRIORIZACION FUZZY:")
@@ -1439,79 +1794,70 @@ class ClasificadorIntentsMejorado:
         # 6. VALIDACIÓN FINAL: Si confianza es muy baja, fallback
         if confianza_final < 0.3:
             logger.warning(f"❓ Confianza muy baja, usando fallback")
-            return 'nlu_fallback', confianza_final
-        
-        return intent_final, confianza_final
-    
-    def _clasificar_por_patrones(self, mensaje: str) -> Tuple[str, float]:
-        """Clasifica usando patrones de regex"""
-        
-        # PALABRAS CLAVE ÚNICAS (match exacto, alta confianza)
-        palabras_exactas = {
-            'requisitos': 'consultar_requisitos',
-            'documentos': 'consultar_requisitos',
-            'ubicacion': 'consultar_ubicacion',
-            'ubicación': 'consultar_ubicacion',
-            'direccion': 'consultar_ubicacion',
-            'dirección': 'consultar_ubicacion',
-            'telefono': 'consultar_ubicacion',
-            'teléfono': 'consultar_ubicacion',
-            'contacto': 'consultar_ubicacion',
-            'whatsapp': 'consultar_ubicacion',
-            'numero': 'consultar_ubicacion',
-            'número': 'consultar_ubicacion',
-            'costo': 'consultar_costo',
-            'precio': 'consultar_costo',
-            'turno': 'agendar_turno',
-            'horarios': 'consultar_disponibilidad',
-            'disponibilidad': 'consultar_disponibilidad',
-        }
+            return self._resultado('nlu_fallback', confianza_final, fuente, estado_llm, inicio)
+        
+        return self._resultado(intent_final, confianza_final, fuente, estado_llm, inicio)
+    
+    def _resultado(self, intent: str, confianza: float, fuente: str, estado_llm: str, inicio: float,
+                   metadata: Dict = None) -> Tuple[str, float, Dict]:
+        """Resultado del clasificador: registra la fuente de la decisión y la agrega a metadata"""
+        metricas_cascada.registrar_decision(fuente, estado_llm)
+        metadata = dict(metadata or {})
+        metadata.update({
+            'fuente_decision': fuente,
+            'llm': estado_llm,
+            'latencia_ms': round((time.monotonic() - inicio) * 1000, 1)
+        })
+        return intent, confianza, metadata
+    
+    def _descartar_llm(self, futuro):
+        """Cancela el LLM especulativo si aún no arrancó; si ya está en vuelo, su respuesta se ignora"""
+        futuro.cancel()
+        metricas_cascada.registrar('llm_descartadas')
+    
+    def _clasificar_por_patrones(self, mensaje: str, analisis: AnalisisMensaje = None) -> Tuple[str, float]:
+        """Clasifica usando patrones de regex (banco precompilado BANCO_PATRONES_INTENT)"""
+        if analisis is None:
+            analisis = AnalisisMensaje(mensaje)
         
         # Si el mensaje es solo 1-2 palabras, verificar match exacto
-        palabras_mensaje = mensaje.strip().split()
+        palabras_mensaje = analisis.tokens
         if len(palabras_mensaje) <= 2:
-            for palabra in palabras_mensaje:
-                palabra_lower = palabra.lower().strip('¿?¡!.,')
-                if palabra_lower in palabras_exactas:
-                    return palabras_exactas[palabra_lower], 0.96
+            for palabra_lower in analisis.tokens_limpios:
+                if palabra_lower in PALABRAS_EXACTAS_INTENT:
+                    return PALABRAS_EXACTAS_INTENT[palabra_lower], 0.96
         
         # Si el mensaje es MUY corto (1 palabra) y contiene "hoy", priorizar disponibilidad
-        if len(palabras_mensaje) == 1 and palabras_mensaje[0].lower() == 'hoy':
+        if len(palabras_mensaje) == 1 and palabras_mensaje[0] == 'hoy':
             return 'consultar_disponibilidad', 0.93
         
         # VERIFICACIÓN PRIORITARIA: modo_desarrollador debe verificarse PRIMERO
         # para evitar que se confunda con nombre
-        intents_prioritarios = ['modo_desarrollador', 'informar_email', 'informar_cedula', 
-                               'elegir_horario', 'affirm', 'deny', 'negacion', 'cancelar']
-        
-        # Primero verificar intents prioritarios
-        for intent in intents_prioritarios:
-            if intent in self.PATRONES_INTENT:
-                for patron in self.PATRONES_INTENT[intent]:
-                    if re.search(patron, mensaje, re.IGNORECASE):
-                        match = re.search(patron, mensaje, re.IGNORECASE)
-                        score = len(match.group()) / len(mensaje)
-                        score = min(0.95, score + 0.5)  # Boost alto para prioritarios
-                        return intent, score
+        for intent in INTENTS_PRIORITARIOS:
+            match = BANCO_PATRONES_INTENT[intent].primer_match(mensaje) if intent in BANCO_PATRONES_INTENT else None
+            if match:
+                score = len(match.group()) / len(mensaje)
+                score = min(0.95, score + 0.5)  # Boost alto para prioritarios
+                return intent, score
         
         # Luego verificar el resto
         mejor_intent = None
         mejor_score = 0.0
         
-        for intent, patrones in self.PATRONES_INTENT.items():
-            if intent in intents_prioritarios:
+        for intent, banco in BANCO_PATRONES_INTENT.items():
+            if intent in INTENTS_PRIORITARIOS:
                 continue  # Ya verificado
-                
-            for patron in patrones:
-                if re.search(patron, mensaje, re.IGNORECASE):
-                    # Calcular score basado en longitud del match
-                    match = re.search(patron, mensaje, re.IGNORECASE)
-                    score = len(match.group()) / len(mensaje)
-                    score = min(0.95, score + 0.3)  # Boost y cap
-                    
-                    if score > mejor_score:
-                        mejor_score = score
-                        mejor_intent = intent
+            
+            # Calcular score basado en longitud del match más largo del intent
+            largo = banco.match_mas_largo(mensaje)
+            if largo is None:
+                continue
+            score = largo / len(mensaje)
+            score = min(0.95, score + 0.3)  # Boost y cap
+            
+            if score > mejor_score:
+                mejor_score = score
+                mejor_intent = intent
         
         return mejor_intent or 'nlu_fallback', mejor_score
     
@@ -1521,8 +1867,6 @@ class ClasificadorIntentsMejorado:
             logger.info("⚠️ LLM no disponible, saltando clasificación LLM")
             return 'nlu_fallback', 0.0
         
-        logger.info(f"🤖 Consultando LLM para: '{mensaje[:50]}...'")
-        
         # Construir contexto para el LLM
         contexto_str = ""
         if contexto.nombre and not contexto.cedula:
@@ -1532,6 +1876,15 @@ class ClasificadorIntentsMejorado:
         elif contexto.fecha and not contexto.hora:
             contexto_str = " [CONTEXTO: Ya tenemos fecha, ahora esperamos hora]"
         
+        # El prompt solo depende del mensaje y de contexto_str: misma clave, misma respuesta
+        cache = obtener_cache_llm('clasificacion')
+        cacheado = cache.obtener(mensaje, contexto_str)
+        if cacheado is not None:
+            logger.info(f"💾 LLM desde cache: '{mensaje[:50]}' → {cacheado[0]}")
+            return cacheado[0], cacheado[1]
+        
+        logger.info(f"🤖 Consultando LLM para: '{mensaje[:50]}...'")
+        
         prompt = f"""Clasifica esta frase en UNO de estos intents. Responde SOLO el nombre del intent, sin explicaciones.
 
 FRASE: "{mensaje}"{contexto_str}
@@ -1573,9 +1926,8 @@ Ejemplos:
 Tu respuesta (SOLO el intent):"""
 
         try:
-            response = requests.post(
-                self.llm_url,
-                json={
+            response = self.cliente_llm.post(
+                {
                     "messages": [{"role": "user", "content": prompt}],
                     "temperature": 0.1,  # Muy baja para respuestas directas sin explicaciones
                     "max_tokens": 10  # Solo necesitamos el nombre del intent (1-2 tokens)
@@ -1605,10 +1957,12 @@ Tu respuesta (SOLO el intent):"""
                 
                 # Validar que el intent sea válido
                 if intent in self.PATRONES_INTENT:
-                    logger.info(f"🎯 LLM clasificó como: {intent} (confianza: 0.85)")
-                    return intent, 0.85
+                    logger.info(f"🎯 LLM clasificó como: {intent} (confianza: {CONFIANZA_LLM})")
+                    cache.guardar(mensaje, [intent, CONFIANZA_LLM], contexto_str)
+                    return intent, CONFIANZA_LLM
                 else:
                     logger.warning(f"⚠️ LLM devolvió intent inválido: '{intent}'")
+                    cache.guardar(mensaje, ['nlu_fallback', 0.0], contexto_str)
         
         except Exception as e:
             logger.error(f"❌ Error en LLM: {e}")
@@ -1617,14 +1971,80 @@ Tu respuesta (SOLO el intent):"""
         
         return 'nlu_fallback', 0.0
 
+# =====================================================
+# BANCO DE PATRONES DE INTENTS (compilado al importar)
+# =====================================================
+
+# Palabras clave únicas (match exacto en mensajes de 1-2 palabras, alta confianza)
+PALABRAS_EXACTAS_INTENT = {
+    'requisitos': 'consultar_requisitos',
+    'documentos': 'consultar_requisitos',
+    'ubicacion': 'consultar_ubicacion',
+    'ubicación': 'consultar_ubicacion',
+    'direccion': 'consultar_ubicacion',
+    'dirección': 'consultar_ubicacion',
+    'telefono': 'consultar_ubicacion',
+    'teléfono': 'consultar_ubicacion',
+    'contacto': 'consultar_ubicacion',
+    'whatsapp': 'consultar_ubicacion',
+    'numero': 'consultar_ubicacion',
+    'número': 'consultar_ubicacion',
+    'costo': 'consultar_costo',
+    'precio': 'consultar_costo',
+    'turno': 'agendar_turno',
+    'horarios': 'consultar_disponibilidad',
+    'disponibilidad': 'consultar_disponibilidad',
+}
+
+# Intents que se verifican primero (el primero que matchea gana)
+INTENTS_PRIORITARIOS = ('modo_desarrollador', 'informar_email', 'informar_cedula',
+                        'elegir_horario', 'affirm', 'deny', 'negacion', 'cancelar')
+
+class PatronesIntent:
+    """
+    Patrones de un intent compilados una sola vez.
+    La alternación combinada descarta en una sola búsqueda los intents que
+    no aparecen en el mensaje (la gran mayoría); solo si hay match se recorren
+    los patrones individuales para obtener el mismo score que antes.
+    """
+    
+    def __init__(self, patrones: List[str]):
+        self.patrones = [re.compile(p, re.IGNORECASE) for p in patrones]
+        self.combinado = re.compile('|'.join(f'(?:{p})' for p in patrones), re.IGNORECASE)
+    
+    def primer_match(self, mensaje: str):
+        """Match del primer patrón (en orden) que aparece en el mensaje"""
+        if not self.combinado.search(mensaje):
+            return None
+        for patron in self.patrones:
+            match = patron.search(mensaje)
+            if match:
+                return match
+        return None
+    
+    def match_mas_largo(self, mensaje: str) -> Optional[int]:
+        """Largo del match más largo entre los patrones del intent (None si ninguno)"""
+        if not self.combinado.search(mensaje):
+            return None
+        largos = [len(m.group()) for m in (p.search(mensaje) for p in self.patrones) if m]
+        return max(largos) if largos else None
+
+BANCO_PATRONES_INTENT = {
+    intent: PatronesIntent(patrones)
+    for intent, patrones in ClasificadorIntentsMejorado.PATRONES_INTENT.items()
+}
+
 # =====================================================
 # EXTRACTOR DE ENTIDADES
 # =====================================================
 
-def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None) -> Dict:
+def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None,
+                      analisis: AnalisisMensaje = None) -> Dict:
     """Extrae entidades del mensaje según el intent"""
     entidades = {}
-    mensaje_lower = mensaje.lower()
+    if analisis is None:
+        analisis = analizar_mensaje(mensaje)
+    mensaje_lower = analisis.lower
     
     # Palabras comunes que NO son nombres
     palabras_prohibidas = {
@@ -1643,7 +2063,7 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
     
     # 🔥 DETECCIÓN GLOBAL: Nombre en oraciones compuestas
     # 1. Detectar "Nombre Apellido, 7776665" (con coma o número después)
-    nombre_global_match = re.search(r'^([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){1,3})(?:\s*[,:]|\s+\d)', mensaje)
+    nombre_global_match = RE_NOMBRE_INICIAL_SEPARADOR.search(mensaje)
     if nombre_global_match:
         nombre_candidato = nombre_global_match.group(1).strip()
         palabras_candidato = [p.lower() for p in nombre_candidato.split()]
@@ -1656,11 +2076,11 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
     
     # 2. Detectar "soy [Nombre Apellido]" o "me llamo [Nombre]"
     if 'nombre' not in entidades:
-        nombre_soy_match = re.search(r'\b(?:soy|me\s+llamo)\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){1,3})', mensaje, re.IGNORECASE)
+        nombre_soy_match = RE_NOMBRE_SOY.search(mensaje)
         if nombre_soy_match:
             nombre_candidato = nombre_soy_match.group(1).strip()
             # Limpiar caracteres finales (comas, puntos)
-            nombre_candidato = re.sub(r'[,.]$', '', nombre_candidato).strip()
+            nombre_candidato = RE_COMA_PUNTO_FINAL.sub('', nombre_candidato).strip()
             palabras_candidato = [p.lower() for p in nombre_candidato.split()]
             
             # Verificar que no contenga palabras prohibidas
@@ -1671,7 +2091,7 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
     
     # 3. Detectar "Nombre Apellido 7776665" (SIN coma, directo al número)
     if 'nombre' not in entidades:
-        nombre_sinc_match = re.search(r'^([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)\s+(\d{5,8})', mensaje)
+        nombre_sinc_match = RE_NOMBRE_Y_CEDULA.search(mensaje)
         if nombre_sinc_match:
             nombre_candidato = nombre_sinc_match.group(1).strip()
             palabras_candidato = [p.lower() for p in nombre_candidato.split()]
@@ -1683,7 +2103,7 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
     
     # 4. Detectar "Nombre Apellido, CI 123456" (con CI en medio)
     if 'nombre' not in entidades:
-        nombre_ci_match = re.search(r'^([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){1,3}),?\s+(?:CI|ci)\s+(\d{5,8})', mensaje)
+        nombre_ci_match = RE_NOMBRE_CI_CEDULA.search(mensaje)
         if nombre_ci_match:
             nombre_candidato = nombre_ci_match.group(1).strip()
             palabras_candidato = [p.lower() for p in nombre_candidato.split()]
@@ -1699,22 +2119,22 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
     # PRIORIDAD: Detectar nombre ANTES que cédula en oraciones como "Miguel Ortiz, 7776665"
     if intent == 'informar_nombre' or 'me llamo' in mensaje_lower or 'mi nombre es' in mensaje_lower:
         # 1. Buscar con "me llamo" o "mi nombre es"
-        match = re.search(r'(me\s+llamo|mi\s+nombre\s+es|soy)\s+(.+)', mensaje, re.IGNORECASE)
+        match = RE_ME_LLAMO.search(mensaje)
         if match:
             nombre = match.group(2).strip()
             # Limpiar el nombre (quitar puntos, comas, números al final)
-            nombre = re.sub(r'[.,!?]$', '', nombre).strip()
-            nombre = re.sub(r',.*', '', nombre).strip()  # Cortar en coma (ej: "Juan Pérez, 123456")
+            nombre = RE_PUNTUACION_FINAL.sub('', nombre).strip()
+            nombre = RE_DESDE_COMA.sub('', nombre).strip()  # Cortar en coma (ej: "Juan Pérez, 123456")
             
             # 🔥 LIMPIEZA: Quitar frases adicionales comunes
             # Remover: "y quiero...", "y necesito...", "nomas", "no mas", "solo"
-            nombre = re.sub(r'\s+(y\s+(quiero|necesito|voy\s+a|queria|quisiera).*)$', '', nombre, flags=re.IGNORECASE)
-            nombre = re.sub(r'\s+(nomas|no\s+mas)$', '', nombre, flags=re.IGNORECASE)
-            nombre = re.sub(r'^(no\s+)?solo\s+', '', nombre, flags=re.IGNORECASE)  # "no solo Juan" → "Juan"
+            nombre = RE_COLA_Y_QUIERO.sub('', nombre)
+            nombre = RE_COLA_NOMAS.sub('', nombre)
+            nombre = RE_PREFIJO_SOLO.sub('', nombre)  # "no solo Juan" → "Juan"
             nombre = nombre.strip()
             
             # 🔥 NUEVO: Validar que no sea solo números (rechazar entradas numéricas)
-            if nombre and not re.match(r'^[\d\s\.]+$', nombre):  # No solo dígitos/espacios/puntos
+            if nombre and not RE_SOLO_DIGITOS_PUNTOS.match(nombre):  # No solo dígitos/espacios/puntos
                 # Verificar que no contenga palabras prohibidas
                 palabras_nombre = [p.lower() for p in nombre.split()]
                 if not any(p in palabras_prohibidas for p in palabras_nombre):
@@ -1724,12 +2144,12 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
         else:
             # 2. NUEVO: Detectar nombre en oraciones compuestas "Nombre Apellido, cedula, fecha"
             # Buscar: Palabra Palabra(Palabra), seguido de coma o número
-            nombre_match = re.search(r'^([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){1,3})(?:\s*,|\s+\d)', mensaje)
+            nombre_match = RE_NOMBRE_INICIAL_COMA.search(mensaje)
             if nombre_match:
                 nombre = nombre_match.group(1).strip()
                 
                 # 🔥 NUEVO: Validar que no sea un formato de cédula
-                if not re.match(r'^\d+[\s\.]*\d+', nombre):  # No es patrón numérico
+                if not RE_PATRON_NUMERICO.match(nombre):  # No es patrón numérico
                     palabras_nombre = [p.lower() for p in nombre.split()]
                     
                     # Verificar que no contenga palabras prohibidas
@@ -1744,10 +2164,10 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
                 nombre = mensaje.strip()
                 
                 # 🔥 LIMPIEZA: Remover frases comunes que no son parte del nombre
-                nombre = re.sub(r'\s+(y\s+(quiero|necesito|voy\s+a|queria|quisiera).*)$', '', nombre, flags=re.IGNORECASE)
-                nombre = re.sub(r'\s+(para|de|con|en|a|por).+$', '', nombre, flags=re.IGNORECASE)  # Cortar preposiciones
-                nombre = re.sub(r'\s+(nomas|no\s+mas)$', '', nombre, flags=re.IGNORECASE)
-                nombre = re.sub(r'^(no\s+)?solo\s+', '', nombre, flags=re.IGNORECASE)
+                nombre = RE_COLA_Y_QUIERO.sub('', nombre)
+                nombre = RE_COLA_PREPOSICION.sub('', nombre)  # Cortar preposiciones
+                nombre = RE_COLA_NOMAS.sub('', nombre)
+                nombre = RE_PREFIJO_SOLO.sub('', nombre)
                 nombre = nombre.strip()
                 
                 # 🔥 NUEVO: Validar que no sea solo números (rechazar entradas numéricas)
@@ -1758,7 +2178,7 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
                     digit_ratio = digit_chars / total_chars if total_chars > 0 else 0
                     
                     # Rechazar si >50% son dígitos O si es un patrón de cédula
-                    if digit_ratio > 0.5 or re.match(r'^[\d\s\.]+$', nombre):
+                    if digit_ratio > 0.5 or RE_SOLO_DIGITOS_PUNTOS.match(nombre):
                         logger.warning(f"⚠️ Nombre rechazado (alto contenido numérico: {digit_ratio:.0%}): {nombre}")
                     else:
                         palabras_nombre = [p.lower() for p in nombre.split()]
@@ -1783,7 +2203,7 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
     
     # Primero detectar si tiene formato inválido (espacios no estándar entre dígitos)
     # Buscar si hay números separados por espacios que NO sean formato estándar
-    grupos_espaciados = re.findall(r'\b\d+\b', mensaje)
+    grupos_espaciados = [grupo.group() for grupo in analisis.numeros]
     
     # Validar si tiene múltiples grupos de dígitos
     if len(grupos_espaciados) >= 3:
@@ -1806,464 +2226,46 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
     # Si no es formato inválido, intentar extraer cédula normalmente
     if not entidades.get('cedula_invalida'):
         # 1. Primero buscar "mi cedula es NUMERO" o "cedula: NUMERO"
-        cedula_match = re.search(r'(?:mi\s+)?c[eé]dula\s+(?:es|:)?\s*([\d\.\s]+)', mensaje_lower)
+        cedula_match = RE_CEDULA_EXPLICITA.search(mensaje_lower)
         if cedula_match:
             cedula_raw = cedula_match.group(1).strip()
             # Validar que no sea formato disperso
-            if not re.match(r'^(\d\s+){4,}', cedula_raw):
+            if not RE_DIGITOS_ESPACIADOS.match(cedula_raw):
                 # Normalizar: quitar espacios y puntos
-                cedula_limpia = re.sub(r'[\s\.]', '', cedula_raw)
+                cedula_limpia = RE_ESPACIOS_Y_PUNTOS.sub('', cedula_raw)
                 if cedula_limpia.isdigit() and 5 <= len(cedula_limpia) <= 8:
                     entidades['cedula'] = cedula_limpia
         else:
             # 2. Intentar con puntos estándar: X.XXX.XXX (1-2 dígitos, punto, 3 dígitos, punto, 3 dígitos)
-            cedula_match = re.search(r'\b(\d{1,2}\.\d{3}\.\d{3})\b', mensaje)
+            cedula_match = RE_CEDULA_PUNTOS.search(mensaje)
             if cedula_match:
                 cedula_raw = cedula_match.group(1)
-                cedula_limpia = re.sub(r'\.', '', cedula_raw)
+                cedula_limpia = RE_PUNTO.sub('', cedula_raw)
                 entidades['cedula'] = cedula_limpia
                 logger.info(f"📋 Cédula detectada (formato con puntos): {cedula_limpia}")
             else:
                 # 3. Intentar con espacios estándar: X XXX XXX
-                cedula_match = re.search(r'\b(\d{1,2}\s\d{3}\s\d{3})\b', mensaje)
+                cedula_match = RE_CEDULA_ESPACIOS.search(mensaje)
                 if cedula_match:
                     cedula_raw = cedula_match.group(1)
-                    cedula_limpia = re.sub(r'\s', '', cedula_raw)
+                    cedula_limpia = RE_ESPACIO.sub('', cedula_raw)
                     entidades['cedula'] = cedula_limpia
                     logger.info(f"📋 Cédula detectada (formato con espacios estándar): {cedula_limpia}")
                 else:
                     # 4. Si no tiene separadores, buscar 5-8 dígitos consecutivos
-                    cedula_match = re.search(r'\b(\d{5,8})\b', mensaje)
+                    cedula_match = RE_CEDULA_DIGITOS.search(mensaje)
                     if cedula_match:
                         entidades['cedula'] = cedula_match.group(1)
     
-    # Extraer FECHA
-    # 🔥 NUEVO: Detectar URGENCIA - asignar fecha más cercana automáticamente
-    frases_urgencia = [
-        'urgencia', 'urgente', 'fecha más cercana', 'fecha mas cercana',
-        'lo antes posible', 'lo más pronto', 'lo mas pronto',
-        'cuanto antes', 'cuánto antes', 'primera fecha', 'fecha disponible',
-        'más cercano', 'mas cercano', 'más próximo', 'mas proximo',
-        'próxima fecha', 'proxima fecha', 'turno más cercano', 'turno mas cercano',
-        'turno más próximo', 'turno mas proximo', 'día más cercano', 'dia mas cercano',
-        'el dia mas proximo', 'el día más próximo', 'dame el turno mas proximo',
-        'el turno mas cercano', 'el mas cercano', 'el más próximo'
-    ]
-    
-    if any(frase in mensaje_lower for frase in frases_urgencia):
-        # Asignar mañana (o siguiente día laboral si mañana es fin de semana)
-        manana = datetime.now() + timedelta(days=1)
-        
-        # Si mañana es sábado (5) o domingo (6), buscar el siguiente lunes
-        while manana.weekday() >= 5:
-            manana += timedelta(days=1)
-        
-        entidades['fecha'] = manana.strftime('%Y-%m-%d')
-        logger.info(f"🚨 Urgencia detectada → Fecha asignada automáticamente: {entidades['fecha']}")
-    
-    # 🔥 FIX CONV #11: Detectar "ese día" - usar fecha recomendada o fecha en contexto
-    elif 'ese dia' in mensaje_lower or 'ese día' in mensaje_lower:
-        # Prioridad: fecha_recomendada (para recomendaciones del bot) > contexto.fecha
-        if hasattr(contexto, 'fecha_recomendada') and contexto.fecha_recomendada:
-            entidades['fecha'] = contexto.fecha_recomendada
-            logger.info(f"🔗 Referencia 'ese día' resuelta usando recomendación: {contexto.fecha_recomendada}")
-        elif contexto.fecha:
-            entidades['fecha'] = contexto.fecha
-            logger.info(f"🔗 Referencia 'ese día' resuelta usando contexto: {contexto.fecha}")
-    elif 'mañana' in mensaje_lower or 'manana' in mensaje_lower:
-        # 🔥 FIX: NO detectar como fecha si es parte de preferencia horaria
-        es_preferencia_horaria = any(frase in mensaje_lower for frase in [
-            'por la mañana', 'de mañana', 'en la mañana', 'a la mañana',
-            'no puedo por la mañana', 'no puedo de mañana', 'no puedo en la mañana'
-        ])
-        
-        if not es_preferencia_horaria:
-            # 🔥 FIX: Detectar "pasado mañana" ANTES de "mañana" para evitar match incorrecto
-            if any(frase in mensaje_lower for frase in ['pasado mañana', 'pasado manana', 'pasado ma�ana', 'el dia despues de mañana', 'el día después de mañana', 'dos dias', 'dos días']):
-                # Calcular pasado mañana (dentro de 2 días)
-                fecha = (datetime.now() + timedelta(days=2)).strftime('%Y-%m-%d')
-                entidades['fecha'] = fecha
-                logger.info(f"📅 Fecha detectada (pasado mañana): {fecha}")
-            else:
-                # Es solo "mañana" como fecha (tomorrow)
-                fecha = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-                entidades['fecha'] = fecha
-                logger.info(f"📅 Fecha detectada (mañana): {fecha}")
-    
-    # 🔥 NUEVO: Detectar "dia siguiente" / "al dia siguiente" relativo a fecha en contexto
-    elif any(frase in mensaje_lower for frase in ['dia siguiente', 'día siguiente', 'al dia siguiente', 'al día siguiente', 'el dia siguiente', 'el día siguiente']):
-        # Si hay fecha en contexto, sumar 1 día
-        if contexto.fecha:
-            try:
-                fecha_actual = datetime.strptime(contexto.fecha, '%Y-%m-%d')
-                fecha_siguiente = fecha_actual + timedelta(days=1)
-                # Saltar fines de semana
-                while fecha_siguiente.weekday() >= 5:  # 5=sábado, 6=domingo
-                    fecha_siguiente += timedelta(days=1)
-                entidades['fecha'] = fecha_siguiente.strftime('%Y-%m-%d')
-                logger.info(f"📅 'Día siguiente' detectado desde contexto {contexto.fecha} → {entidades['fecha']}")
-            except:
-                # Fallback: mañana
-                entidades['fecha'] = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-                logger.info(f"📅 'Día siguiente' sin contexto válido → mañana: {entidades['fecha']}")
-        else:
-            # Sin contexto, asumir "mañana"
-            entidades['fecha'] = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-            logger.info(f"📅 'Día siguiente' sin contexto → mañana: {entidades['fecha']}")
-    
-    elif 'hoy' in mensaje_lower:
-        # 🔥 FIX: Detectar "X días desde hoy" para calcular fecha relativa
-        dias_match = re.search(r'(\w+)\s+d[ií]as?\s+(desde|a\s+partir\s+de)\s+hoy', mensaje_lower)
-        if dias_match:
-            # Convertir palabra a número (dos → 2, tres → 3, etc.)
-            dias_palabras = {
-                'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5,
-                'seis': 6, 'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10
-            }
-            palabra_dias = dias_match.group(1).lower()
-            if palabra_dias in dias_palabras:
-                num_dias = dias_palabras[palabra_dias]
-                fecha = (datetime.now() + timedelta(days=num_dias)).strftime('%Y-%m-%d')
-                entidades['fecha'] = fecha
-                logger.info(f"📅 Fecha detectada ({palabra_dias} días desde hoy): {fecha}")
-            elif palabra_dias.isdigit():
-                num_dias = int(palabra_dias)
-                fecha = (datetime.now() + timedelta(days=num_dias)).strftime('%Y-%m-%d')
-                entidades['fecha'] = fecha
-                logger.info(f"📅 Fecha detectada ({num_dias} días desde hoy): {fecha}")
-            else:
-                # Fallback: usar hoy
-                entidades['fecha'] = datetime.now().strftime('%Y-%m-%d')
-        else:
-            # Solo "hoy"
-            entidades['fecha'] = datetime.now().strftime('%Y-%m-%d')
-    elif any(frase in mensaje_lower for frase in ['esta semana', 'semana actual']):
-        # 🔥 FIX: Resetear flag de próxima semana cuando dice "esta semana"
-        entidades['proxima_semana'] = False
-        logger.info(f"📅 'Esta semana' detectado → flag proxima_semana=False")
-        # No asignar fecha automática, dejar que el usuario especifique el día
-    elif any(frase in mensaje_lower for frase in ['proxima semana', 'próxima semana', 'siguiente semana', 'semana que viene']):
-        # 🔥 NUEVO: Activar flag de próxima semana
-        entidades['proxima_semana'] = True
-        
-        # Para "próxima semana", sugerir lunes de la próxima semana
-        hoy = datetime.now()
-        dias_hasta_lunes = (7 - hoy.weekday()) % 7
-        if dias_hasta_lunes == 0:  # Si hoy es lunes
-            dias_hasta_lunes = 7
-        fecha_proxima_semana = hoy + timedelta(days=dias_hasta_lunes)
-        entidades['fecha'] = fecha_proxima_semana.strftime('%Y-%m-%d')
-        logger.info(f"📅 'Próxima semana' detectado → lunes {entidades['fecha']} (flag activado)")
-    else:
-        # Reconocer días de la semana (lunes, martes, etc.)
-        dias_semana = {
-            'lunes': 0, 'martes': 1, 'miercoles': 2, 'miércoles': 2,
-            'jueves': 3, 'viernes': 4, 'sabado': 5, 'sábado': 5, 'domingo': 6
-        }
-        
-        # 🔥 FIX: Detectar "próximo/a [día]" o "para el [día]"
-        for dia_nombre, dia_num in dias_semana.items():
-            # Patrones: "próximo jueves", "el próximo lunes", "para el jueves"
-            patrones_proximo = [
-                f'proximo {dia_nombre}',
-                f'próximo {dia_nombre}',
-                f'proxima {dia_nombre}',
-                f'próxima {dia_nombre}',
-                f'el proximo {dia_nombre}',
-                f'el próximo {dia_nombre}',
-                f'la proxima {dia_nombre}',
-                f'la próxima {dia_nombre}',
-                f'para el {dia_nombre}',
-                f'para el dia {dia_nombre}',
-                f'para el día {dia_nombre}'
-            ]
-            
-            if any(patron in mensaje_lower for patron in patrones_proximo):
-                # Calcular el próximo [día] (próxima ocurrencia de ese día)
-                hoy = datetime.now()
-                dia_actual = hoy.weekday()
-                dias_hasta = (dia_num - dia_actual) % 7
-                
-                # Si dias_hasta es 0 (es hoy) y dice "próximo", ir a la próxima semana
-                if dias_hasta == 0:
-                    dias_hasta = 7
-                
-                fecha_dia = hoy + timedelta(days=dias_hasta)
-                entidades['fecha'] = fecha_dia.strftime('%Y-%m-%d')
-                logger.info(f"📅 'Próximo {dia_nombre}' detectado → {entidades['fecha']}")
-                break
-        
-        # Si no se detectó "próximo [día]", buscar día solo
-        if 'fecha' not in entidades:
-            for dia_nombre, dia_num in dias_semana.items():
-                if dia_nombre in mensaje_lower:
-                    # Encontrar el día de la semana
-                    hoy = datetime.now()
-                    dia_actual = hoy.weekday()
-                    
-                    # 🔥 PRIORIDAD 1: Si hay fecha_recomendada Y el día coincide, usar esa fecha
-                    if contexto.fecha_recomendada:
-                        fecha_rec_obj = datetime.strptime(contexto.fecha_recomendada, '%Y-%m-%d')
-                        if fecha_rec_obj.weekday() == dia_num:
-                            entidades['fecha'] = contexto.fecha_recomendada
-                            logger.info(f"📅 Día '{dia_nombre}' confirmado usando fecha recomendada: {contexto.fecha_recomendada}")
-                            break
-                    
-                    # 🔥 PRIORIDAD 2: Si el mensaje contiene "esta semana" explícitamente, forzar esta semana
-                    if any(frase in mensaje_lower for frase in ['esta semana', 'semana actual']):
-                        # Forzar esta semana incluso si contexto.proxima_semana=True
-                        dias_hasta = (dia_num - dia_actual) % 7
-                        if dias_hasta == 0:
-                            fecha_dia = hoy  # Es hoy
-                        else:
-                            fecha_dia = hoy + timedelta(days=dias_hasta)
-                        logger.info(f"📅 Día '{dia_nombre}' con 'esta semana' explícito → {fecha_dia.strftime('%Y-%m-%d')}")
-                    
-                    # 🔥 PRIORIDAD 3: Si contexto tiene flag "proxima_semana", forzar próxima semana
-                    elif contexto.proxima_semana:
-                        # Calcular días hasta el día específico de PRÓXIMA semana
-                        dias_hasta = (dia_num - dia_actual) % 7
-                        if dias_hasta == 0:
-                            dias_hasta = 7  # Si es el mismo día, ir a próxima semana
-                        else:
-                            dias_hasta += 7  # Siempre ir a próxima semana
-                        fecha_dia = hoy + timedelta(days=dias_hasta)
-                        logger.info(f"📅 Día '{dia_nombre}' con contexto 'próxima semana' → {fecha_dia.strftime('%Y-%m-%d')}")
-                    else:
-                        # Lógica original: esta semana o próxima según contexto
-                        dias_hasta = (dia_num - dia_actual) % 7
-                        
-                        # Si es hoy (dias_hasta == 0), usar hoy
-                        # Si el día ya pasó (dias_hasta < 0), ir a la próxima semana
-                        # Si el día está adelante (dias_hasta > 0), usar esta semana
-                        if dias_hasta == 0:
-                            # Es hoy, usar hoy
-                            fecha_dia = hoy
-                        elif dias_hasta < 0 or (dias_hasta == 0 and hoy.hour >= 17):
-                            # Ya pasó o es muy tarde, ir a la próxima semana
-                            dias_hasta = 7 + dias_hasta
-                            fecha_dia = hoy + timedelta(days=dias_hasta)
-                        else:
-                            # Está adelante esta semana
-                            fecha_dia = hoy + timedelta(days=dias_hasta)
-                    
-                    entidades['fecha'] = fecha_dia.strftime('%Y-%m-%d')
-                    break
-        
-        # Si no encontró día de semana, buscar formato "DD de Mes" (ej: "15 de Noviembre")
-        if 'fecha' not in entidades:
-            # Diccionario de meses en español
-            meses_espanol = {
-                'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
-                'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
-                'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12,
-                # Abreviaciones
-                'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'may': 5, 'jun': 6,
-                'jul': 7, 'ago': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dic': 12
-            }
-            
-            # Buscar patrón "DD de MES" o "DD MES"
-            fecha_texto_match = re.search(r'\b(\d{1,2})\s+(?:de\s+)?(\w+)\b', mensaje_lower)
-            if fecha_texto_match:
-                dia = int(fecha_texto_match.group(1))
-                mes_texto = fecha_texto_match.group(2).lower()
-                
-                if mes_texto in meses_espanol:
-                    mes = meses_espanol[mes_texto]
-                    anio = datetime.now().year
-                    
-                    # Si la fecha ya pasó este año, usar el próximo año
-                    fecha_candidata = datetime(anio, mes, dia)
-                    if fecha_candidata.date() < datetime.now().date():
-                        anio += 1
-                    
-                    try:
-                        entidades['fecha'] = f"{anio}-{mes:02d}-{dia:02d}"
-                        logger.info(f"📅 Fecha detectada (formato texto): {dia} de {mes_texto} = {entidades['fecha']}")
-                    except:
-                        pass
-        
-        # Si aún no encontró fecha, buscar formato DD/MM o DD-MM
-        if 'fecha' not in entidades:
-            fecha_match = re.search(r'\b(\d{1,2})[/-](\d{1,2})([/-](\d{2,4}))?\b', mensaje)
-            if fecha_match:
-                dia = int(fecha_match.group(1))
-                mes = int(fecha_match.group(2))
-                anio = int(fecha_match.group(4)) if fecha_match.group(4) else datetime.now().year
-                if anio < 100:
-                    anio += 2000
-                try:
-                    entidades['fecha'] = f"{anio}-{mes:02d}-{dia:02d}"
-                except:
-                    pass
-    
-    # Extraer HORA
-    # 🔥 FIX CONV #11: Detectar "ese horario"/"esa hora" - usar hora recomendada
-    if ('ese horario' in mensaje_lower or 'esa hora' in mensaje_lower or 'ese hora' in mensaje_lower):
-        if hasattr(contexto, 'hora_recomendada') and contexto.hora_recomendada:
-            entidades['hora'] = contexto.hora_recomendada
-            logger.info(f"🔗 Referencia 'ese horario/esa hora' resuelta: {contexto.hora_recomendada}")
-    
-    # 🔥 FIX: Detectar "mediodía" / "mediodia"
-    if 'mediodía' in mensaje_lower or 'mediodia' in mensaje_lower or 'al mediodia' in mensaje_lower:
-        entidades['hora'] = '12:00'
-        logger.info(f"🕐 Hora detectada (mediodía): 12:00")
-    
-    # 🔥 FIX: Detectar "temprano" → 08:00
-    if 'temprano' in mensaje_lower or 'bien temprano' in mensaje_lower or 'lo mas temprano' in mensaje_lower:
-        entidades['hora'] = '08:00'
-        entidades['franja_horaria'] = 'manana'
-        logger.info(f"🕐 Hora detectada (temprano): 08:00")
-    
-    # 🔥 NUEVO: Detectar preferencias NEGATIVAS (tienen MÁXIMA prioridad)
-    preferencia_negativa_manana = any(frase in mensaje_lower for frase in [
-        'no puedo por la mañana', 'no puedo de mañana', 'no puedo en la mañana', 
-        'no puedo a la mañana', 'no puedo mañana', 'no me sirve la mañana',
-        'no me sirve por la mañana', 'no me viene bien la mañana'
-    ])
-    
-    preferencia_negativa_tarde = any(frase in mensaje_lower for frase in [
-        'no puedo por la tarde', 'no puedo de tarde', 'no puedo en la tarde', 
-        'no me sirve la tarde', 'no me sirve por la tarde', 'no me viene bien la tarde'
-    ])
-    
-    if preferencia_negativa_manana:
-        entidades['franja_horaria'] = 'tarde'
-        entidades['preferencia_explicita'] = True
-        logger.info(f"📅 Preferencia negativa detectada → preferir tarde")
-    
-    elif preferencia_negativa_tarde:
-        entidades['franja_horaria'] = 'manana'
-        entidades['preferencia_explicita'] = True
-        logger.info(f"📅 Preferencia negativa detectada → preferir mañana")
-    
-    # 🔥 NUEVO: Detectar "después del mediodía" = tarde
-    elif any(frase in mensaje_lower for frase in ['despues del mediodia', 'después del mediodía',
-                                                     'despues de mediod', 'después de mediod',
-                                                     'pasado el mediodia', 'pasado el mediodía']):
-        entidades['franja_horaria'] = 'tarde'
-        entidades['preferencia_explicita'] = True
-        logger.info(f"📅 'Después del mediodía' detectado → preferir tarde")
-    
-    # 🔥 FIX: Detectar "por la tarde" → guardar franja (SOLO si no hay preferencia negativa)
-    elif not preferencia_negativa_manana and not preferencia_negativa_tarde:
-        if 'por la tarde' in mensaje_lower or 'de tarde' in mensaje_lower or 'en la tarde' in mensaje_lower:
-            entidades['franja_horaria'] = 'tarde'
-            logger.info(f"📅 Franja horaria detectada: tarde")
-        
-        # 🔥 FIX: Detectar "por la mañana" (horario) → guardar franja  
-        elif 'por la mañana' in mensaje_lower or 'de mañana' in mensaje_lower or 'en la mañana' in mensaje_lower or 'a la mañana' in mensaje_lower:
-            entidades['franja_horaria'] = 'manana'
-            logger.info(f"📅 Franja horaria detectada: mañana")
-    
-    hora_match = re.search(r'\b(\d{1,2}):(\d{2})\b', mensaje)
-    if hora_match:
-        entidades['hora'] = f"{int(hora_match.group(1)):02d}:{hora_match.group(2)}"
-    else:
-        # 🔥 NUEVO: Detectar horas en palabras: "una y media", "dos y cuarto", etc.
-        horas_texto = {
-            'una': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5, 'seis': 6,
-            'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10, 'once': 11, 'doce': 12,
-            'trece': 13, 'catorce': 14, 'quince': 15
-        }
-        
-        # Buscar "una y media", "dos y cuarto", etc.
-        for hora_palabra, hora_num in horas_texto.items():
-            patron_texto = rf'\b{hora_palabra}\s+(y\s+(media|cuarto)|menos\s+cuarto)\b'
-            hora_texto_match = re.search(patron_texto, mensaje_lower)
-            if hora_texto_match:
-                fraccion = hora_texto_match.group(1)
-                
-                # Ajustar AM/PM
-                if hora_num < 7:  # Menor a 7 = probablemente PM
-                    hora_num += 12
-                
-                # Calcular minutos
-                if 'media' in fraccion:
-                    minutos = "30"
-                elif 'menos cuarto' in fraccion:
-                    hora_num -= 1
-                    minutos = "45"
-                else:  # "y cuarto"
-                    minutos = "15"
-                
-                entidades['hora'] = f"{hora_num:02d}:{minutos}"
-                logger.info(f"🕐 Hora detectada (texto con fracción): '{hora_palabra} {fraccion}' → {entidades['hora']}")
-                break
-        
-        # Buscar "X y media", "X y cuarto", "X menos cuarto" (con "las" opcional)
-        if 'hora' not in entidades:
-            # 🔥 NUEVO: Patrón más flexible - "las" es opcional
-            hora_match = re.search(r'(?:para\s+)?(?:a\s+)?(?:las\s+)?(\d{1,2})\s+(y\s+(media|cuarto)|menos\s+cuarto)', mensaje_lower)
-            if hora_match:
-                hora = int(hora_match.group(1))
-                fraccion_completa = hora_match.group(2)  # "y media", "y cuarto", "menos cuarto"
-                
-                # Asumir AM/PM basado en el número
-                if hora < 7:  # Si es menor a 7, probablemente sea PM (tarde)
-                    hora += 12
-                
-                # Agregar minutos según la fracción
-                if 'media' in fraccion_completa:
-                    minutos = "30"
-                elif 'menos cuarto' in fraccion_completa:
-                    hora -= 1  # Hora anterior
-                    minutos = "45"
-                else:  # "y cuarto"
-                    minutos = "15"
-                
-                entidades['hora'] = f"{hora:02d}:{minutos}"
-                logger.info(f"🕐 Hora detectada (fracción): {entidades['hora']}")
-        else:
-            # Buscar formato "a las X", "las X", "para las X" o "X hs"
-            hora_match = re.search(r'(?:para\s+)?(?:a\s+)?las\s+(\d{1,2})', mensaje_lower)
-            if hora_match:
-                hora = int(hora_match.group(1))
-                # Asumir AM/PM basado en el número
-                if hora < 7:  # Si es menor a 7, probablemente sea PM (tarde)
-                    hora += 12
-                entidades['hora'] = f"{hora:02d}:00"
-            else:
-                # Buscar formato "X hs", "X am", "X pm"
-                hora_match = re.search(r'\b(\d{1,2})\s*(am|pm|hs|horas?)\b', mensaje_lower)
-                if hora_match:
-                    hora = int(hora_match.group(1))
-                    sufijo = hora_match.group(2)
-                    if sufijo == 'pm' and hora < 12:
-                        hora += 12
-                    entidades['hora'] = f"{hora:02d}:00"
-                else:
-                    # Buscar número solo (ej: "9", "14")
-                    # 🔥 FIX: Solo si el mensaje es ÚNICAMENTE un número de 1-2 dígitos Y dentro del rango de horas válidas (0-23)
-                    hora_match = re.search(r'^\s*(\d{1,2})\s*$', mensaje)
-                    if hora_match:
-                        hora = int(hora_match.group(1))
-                        # 🔥 VALIDACIÓN: Solo aceptar si es una hora válida (0-23)
-                        if hora >= 0 and hora <= 23:
-                            # Asumir AM/PM basado en el número
-                            if hora < 7:  # Si es menor a 7, probablemente sea PM (tarde)
-                                hora += 12
-                            elif hora >= 7 and hora <= 12:  # 7-12 es mañana
-                                pass  # Mantener como está
-                            # Si es 13-23, ya es formato 24h
-                            entidades['hora'] = f"{hora:02d}:00"
-                            logger.info(f"🕐 Hora detectada (número simple): {entidades['hora']} del mensaje: '{mensaje}'")
-    
-    # Extraer FRANJA HORARIA (mañana/tarde) - SOLO si no hay preferencia explícita ya configurada
-    if not entidades.get('preferencia_explicita'):
-        # 🔥 PRIORIDAD 1: Detectar frases completas primero (ej: "mañana por la tarde")
-        if any(frase in mensaje_lower for frase in ['por la tarde', 'de tarde', 'en la tarde', 'a la tarde', 'despues del mediodia', 'después del mediodía', 'para mañana por la tarde', 'mañana por la tarde']):
-            entidades['franja_horaria'] = 'tarde'
-        elif any(frase in mensaje_lower for frase in ['por la mañana', 'de mañana', 'en la mañana', 'a la mañana', 'para mañana por la mañana']):
-            entidades['franja_horaria'] = 'manana'
-        # 🔥 PRIORIDAD 2: Solo palabra "tarde" o "mañana" (si no hay frase completa)
-        elif 'tarde' in mensaje_lower:
-            entidades['franja_horaria'] = 'tarde'
-        elif any(palabra in mensaje_lower for palabra in ['mañana', 'manana', 'temprano']) and 'por la tarde' not in mensaje_lower:
-            entidades['franja_horaria'] = 'manana'
+    # Extraer FECHA, HORA y FRANJA HORARIA: una pasada de la gramática temporal sobre
+    # las frases que ya encontró el análisis (ver parser_temporal.py)
+    temporal = analisis.fecha_hora(contexto)
+    entidades.update(temporal.entidades())
+    if temporal.fecha or temporal.hora:
+        logger.info(f"📅 Fecha/hora detectadas: {temporal}")
     
     # Extraer EMAIL
-    email_match = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', mensaje)
+    email_match = analisis.email
     if email_match:
         entidades['email'] = email_match.group(0)
     
@@ -2276,44 +2278,47 @@ def extraer_entidades(mensaje: str, intent: str, contexto: SessionContext = None
 # CONSULTAS A BASE DE DATOS
 # =====================================================
 
-def obtener_disponibilidad_real(fecha: str = None) -> Dict:
+def obtener_disponibilidad_real(fecha: str = None, usar_cache: bool = True) -> Dict:
     """
     Obtiene disponibilidad real de la base de datos.
     Retorna dict con ocupación por hora: {'08:00': 2, '09:00': 5, ...}
     Si una hora no aparece, significa que está disponible (0 turnos)
+    
+    Con usar_cache=True se sirve desde cache_ocupacion mientras no expire el TTL;
+    usar_cache=False fuerza la lectura de Postgres (validación final antes del INSERT).
     """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        
         if not fecha:
             fecha = datetime.now().strftime('%Y-%m-%d')
         
-        # Contar turnos por hora
-        cursor.execute("""
-            SELECT 
-                TO_CHAR(fecha_hora, 'HH24:MI') as hora,
-                COUNT(*) as ocupados
-            FROM turnos
-            WHERE DATE(fecha_hora) = %s
-            AND estado = 'activo'
-            GROUP BY TO_CHAR(fecha_hora, 'HH24:MI')
-            ORDER BY hora
-        """, (fecha,))
-        
-        resultados = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        if usar_cache:
+            cacheado = cache_ocupacion.obtener(fecha)
+            if cacheado is not None:
+                return cacheado
+        
+        conn = obtener_conexion()
+        try:
+            cursor = conn.cursor()
+            
+            # Contar turnos por hora
+            cursor.execute("""
+                SELECT 
+                    TO_CHAR(fecha_hora, 'HH24:MI') as hora,
+                    COUNT(*) as ocupados
+                FROM turnos
+                WHERE DATE(fecha_hora) = %s
+                AND estado = 'activo'
+                GROUP BY TO_CHAR(fecha_hora, 'HH24:MI')
+                ORDER BY hora
+            """, (fecha,))
+            
+            resultados = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()  # Devuelve la conexión al pool
         
         # Crear estructura completa de horarios (7:00 AM a 3:00 PM = 15:00)
-        # 2 turnos cada media hora: 7:00, 7:30, 8:00, 8:30 ... 14:30, 15:00
-        horarios_completos = {}
-        for hora in range(7, 16):  # 7:00 a 15:00
-            for minuto in [0, 30]:
-                if hora == 15 and minuto == 30:  # No incluir 15:30
-                    break
-                hora_str = f"{hora:02d}:{minuto:02d}"
-                horarios_completos[hora_str] = 0  # Por defecto, disponible
+        horarios_completos = _horarios_vacios()
         
         # Actualizar con ocupación real
         for hora_str, ocupados in resultados:
@@ -2324,18 +2329,161 @@ def obtener_disponibilidad_real(fecha: str = None) -> Dict:
         horarios_disponibles = sum(1 for ocupacion in horarios_completos.values() if ocupacion < 2)
         
         logger.info(f"📊 {fecha}: {horarios_disponibles}/{len(horarios_completos)} horarios disponibles")
+        cache_ocupacion.guardar(fecha, horarios_completos)
         return horarios_completos
         
     except Exception as e:
         logger.error(f"❌ Error obteniendo disponibilidad: {e}")
         # Si hay error, asumir que hay disponibilidad
-        horarios_default = {}
-        for hora in range(7, 16):  # 7:00 a 15:00
-            for minuto in [0, 30]:
-                if hora == 15 and minuto == 30:  # No incluir 15:30
-                    break
-                horarios_default[f"{hora:02d}:{minuto:02d}"] = 0
-        return horarios_default
+        return _horarios_vacios()
+
+def obtener_disponibilidad_rango(desde, hasta) -> Dict[str, Dict[str, int]]:
+    """
+    Obtiene la disponibilidad de todos los días entre `desde` y `hasta` (inclusive)
+    con una sola consulta agrupada por fecha y hora.
+    Acepta fechas como str 'YYYY-MM-DD', date o datetime.
+    Retorna {'2025-11-03': {'07:00': 0, '07:30': 2, ...}, ...}
+    """
+    desde = _a_fecha(desde)
+    hasta = _a_fecha(hasta)
+    
+    # Estructura completa: todos los días del rango con todos los horarios libres
+    rango = {}
+    dia = desde
+    while dia <= hasta:
+        rango[dia.strftime('%Y-%m-%d')] = _horarios_vacios()
+        dia += timedelta(days=1)
+    
+    if not rango:
+        return rango
+    
+    # Si todos los días están en cache no hace falta ir a la BD
+    cacheados = {fecha: cache_ocupacion.obtener(fecha) for fecha in rango}
+    if all(horarios is not None for horarios in cacheados.values()):
+        return cacheados
+    
+    try:
+        conn = obtener_conexion()
+        try:
+            cursor = conn.cursor()
+            
+            # Contar turnos por día y hora en un único round trip
+            cursor.execute("""
+                SELECT 
+                    TO_CHAR(fecha_hora, 'YYYY-MM-DD') as fecha,
+                    TO_CHAR(fecha_hora, 'HH24:MI') as hora,
+                    COUNT(*) as ocupados
+                FROM turnos
+                WHERE fecha_hora >= %s
+                AND fecha_hora < %s
+                AND estado = 'activo'
+                GROUP BY 1, 2
+                ORDER BY 1, 2
+            """, (desde, hasta + timedelta(days=1)))
+            
+            resultados = cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()  # Devuelve la conexión al pool
+        
+        # Actualizar con ocupación real
+        for fecha_str, hora_str, ocupados in resultados:
+            horarios = rango.get(fecha_str)
+            if horarios is not None and hora_str in horarios:
+                horarios[hora_str] = ocupados
+        
+        for fecha_str, horarios in rango.items():
+            cache_ocupacion.guardar(fecha_str, horarios)
+        
+        logger.info(f"📊 Rango {desde} → {hasta}: {len(rango)} días consultados en 1 query")
+        return rango
+        
+    except Exception as e:
+        logger.error(f"❌ Error obteniendo disponibilidad por rango: {e}")
+        # Si hay error, asumir que hay disponibilidad (igual que obtener_disponibilidad_real)
+        return rango
+
+def _horarios_vacios() -> Dict[str, int]:
+    """
+    Horarios de atención con ocupación 0.
+    2 turnos cada media hora: 7:00, 7:30, 8:00, 8:30 ... 14:30, 15:00
+    """
+    horarios = {}
+    for hora in range(7, 16):  # 7:00 a 15:00
+        for minuto in [0, 30]:
+            if hora == 15 and minuto == 30:  # No incluir 15:30
+                break
+            horarios[f"{hora:02d}:{minuto:02d}"] = 0
+    return horarios
+
+def _a_fecha(valor) -> date:
+    """Normaliza str 'YYYY-MM-DD' / datetime / date a date"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+def reservar_turno_atomico(nombre: str, cedula: Optional[str], fecha: str, hora: str,
+                           email: Optional[str], codigo: str) -> Dict:
+    """
+    Reserva un turno respetando la capacidad por horario dentro de la BD.
+    
+    Toma un advisory lock transaccional por (fecha, hora) y hace un INSERT
+    condicionado al conteo de turnos activos, todo en un solo round trip.
+    Dos usuarios confirmando a la vez el último lugar quedan serializados:
+    solo uno inserta, el otro recibe el siguiente horario libre.
+    
+    Retorna:
+        {'ok': True, 'turno_id': 123}
+        {'ok': False, 'siguiente': '09:30' | None, 'disponibles': ['09:30', ...]}
+    """
+    fecha_hora_completa = f"{fecha} {hora}:00"
+    
+    conn = obtener_conexion()
+    try:
+        cursor = conn.cursor()
+        # Dos sentencias en un mismo execute: el lock se toma primero y el
+        # INSERT ve (con snapshot nuevo) cualquier turno confirmado antes del lock.
+        # El lock se libera solo al hacer commit/rollback.
+        cursor.execute("""
+            SELECT pg_advisory_xact_lock(hashtext('turno:' || %s));
+            INSERT INTO turnos (nombre, cedula, fecha_hora, email, codigo, estado)
+            SELECT %s, %s, %s, %s, %s, 'activo'
+            WHERE (
+                SELECT COUNT(*) FROM turnos
+                WHERE fecha_hora = %s AND estado = 'activo'
+            ) < %s
+            RETURNING id
+        """, (
+            fecha_hora_completa,
+            nombre, cedula, fecha_hora_completa, email, codigo,
+            fecha_hora_completa, CAPACIDAD_POR_HORARIO
+        ))
+        fila = cursor.fetchone()
+        conn.commit()
+        cursor.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()  # Devuelve la conexión al pool
+    
+    if fila:
+        # Write-through: reflejar la reserva en el cache de ocupación
+        cache_ocupacion.registrar_reserva(fecha, hora)
+        return {'ok': True, 'turno_id': fila[0]}
+    
+    # Horario lleno: releer la ocupación real del día y ofrecer el siguiente libre
+    logger.warning(f"⚠️ Horario {fecha} {hora} lleno al reservar (capacidad {CAPACIDAD_POR_HORARIO})")
+    disponibilidad = obtener_disponibilidad_real(fecha, usar_cache=False)
+    disponibles = [h for h, o in sorted(disponibilidad.items())
+                   if o < CAPACIDAD_POR_HORARIO and h > hora]
+    return {
+        'ok': False,
+        'siguiente': disponibles[0] if disponibles else None,
+        'disponibles': disponibles
+    }
 
 # =====================================================
 # FUNCIÓN PRINCIPAL: PROCESAR MENSAJE
@@ -2355,20 +2503,18 @@ def procesar_mensaje_inteligente(user_message: str, session_id: str) -> Dict:
         Dict con respuesta y metadata
     """
     
+    contexto = None
     try:
         # 1. Obtener contexto
         contexto = get_or_create_context(session_id)
         contexto.ultimo_mensaje = user_message
         
-        # 2. Clasificar intent
-        resultado_clasificacion = clasificador.clasificar(user_message, contexto)
+        # Minúsculas, tokens, spans y frases clave: una vez para todas las etapas
+        analisis = analizar_mensaje(user_message)
         
-        # Manejar multi-intent
-        metadata = {}
-        if len(resultado_clasificacion) == 3:
-            intent, confidence, metadata = resultado_clasificacion
-        else:
-            intent, confidence = resultado_clasificacion
+        # 2. Clasificar intent
+        intent, confidence, metadata = clasificador.clasificar(user_message, contexto, analisis)
+        clasificacion = {clave: metadata[clave] for clave in ('fuente_decision', 'llm', 'latencia_ms')}
         
         # Guardar intent anterior antes de actualizar
         if hasattr(contexto, 'intent_actual') and contexto.intent_actual:
@@ -2380,14 +2526,14 @@ def procesar_mensaje_inteligente(user_message: str, session_id: str) -> Dict:
         logger.info(f"🎯 Intent: {intent} | Confianza: {confidence:.2f}")
         
         # 3. Extraer entidades (SALVO que sea un comando de cambio)
-        mensaje_lower = user_message.lower()
+        mensaje_lower = analisis.lower
         es_comando_cambio = (
             ('cambiar' in mensaje_lower or 'modificar' in mensaje_lower or 'corregir' in mensaje_lower) and
             any(campo in mensaje_lower for campo in ['nombre', 'email', 'correo', 'hora', 'fecha', 'cedula', 'cédula'])
         )
         
         if not es_comando_cambio:
-            entidades = extraer_entidades(user_message, intent, contexto)
+            entidades = extraer_entidades(user_message, intent, contexto, analisis)
             
             # 🔥 VALIDAR FORMATO DE CÉDULA: Rechazar formatos inválidos
             if entidades.get('cedula_invalida'):
@@ -2513,7 +2659,7 @@ def procesar_mensaje_inteligente(user_message: str, session_id: str) -> Dict:
                 }
         
         # 4. Generar respuesta según intent
-        respuesta = generar_respuesta_inteligente(intent, confidence, contexto, user_message)
+        respuesta = generar_respuesta_inteligente(intent, confidence, contexto, user_message, analisis)
         
         # 🔥 MANEJO DE MULTI-INTENT: Generar respuesta compuesta
         if metadata.get('multi_intent'):
@@ -2537,7 +2683,8 @@ def procesar_mensaje_inteligente(user_message: str, session_id: str) -> Dict:
                 'intent': intent,
                 'confidence': confidence,
                 'entidades': entidades,
-                'contexto': contexto.to_dict()
+                'contexto': contexto.to_dict(),
+                'clasificacion': clasificacion
             }
             # Agregar campos adicionales del diccionario (como show_dashboard_button)
             for key, value in respuesta.items():
@@ -2551,7 +2698,8 @@ def procesar_mensaje_inteligente(user_message: str, session_id: str) -> Dict:
                 'intent': intent,
                 'confidence': confidence,
                 'entidades': entidades,
-                'contexto': contexto.to_dict()
+                'contexto': contexto.to_dict(),
+                'clasificacion': clasificacion
             }
         
     except Exception as e:
@@ -2567,10 +2715,17 @@ def procesar_mensaje_inteligente(user_message: str, session_id: str) -> Dict:
             'confidence': 0.0,
             'error': str(e)
         }
+    finally:
+        # Con backend compartido: persistir lo que cambió este mensaje (no-op en memoria)
+        if contexto is not None:
+            guardar_contexto(contexto)
 
 def generar_respuesta_inteligente(intent: str, confidence: float, 
-                                  contexto: SessionContext, mensaje: str) -> str:
+                                  contexto: SessionContext, mensaje: str,
+                                  analisis: AnalisisMensaje = None) -> str:
     """Genera respuesta apropiada según el intent"""
+    if analisis is None:
+        analisis = analizar_mensaje(mensaje)
     
     # Intent: DESCONOCIDO - Cuando detectamos que el mensaje no es válido
     if intent == 'desconocido' or confidence < 0.3:
@@ -2887,7 +3042,7 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
     
     # Intent: CONSULTAR DISPONIBILIDAD
     elif intent == 'consultar_disponibilidad':
-        mensaje_lower = mensaje.lower()
+        mensaje_lower = analisis.lower
         
         # IMPORTANTE: Si el usuario tiene nombre y cédula, PERMITIR consultar disponibilidad
         # (ya está en el flujo de agendamiento, solo falta fecha/hora)
@@ -3015,28 +3170,26 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
             mejor_dia = None
             max_disponibilidad = 0
             
-            # Revisar próximos 7 días
+            # Revisar próximos 7 días (una sola consulta para todo el rango)
+            disponibilidad_semana = obtener_disponibilidad_rango(hoy, hoy + timedelta(days=6))
             for i in range(7):
                 fecha_revisar = hoy + timedelta(days=i)
                 if fecha_revisar.weekday() < 5:  # Solo días laborables
                     fecha_str = fecha_revisar.strftime('%Y-%m-%d')
-                    try:
-                        disponibilidad = obtener_disponibilidad_real(fecha_str)
-                        horarios_disponibles = len([h for h, o in disponibilidad.items() if o < 2])
-                        
-                        if horarios_disponibles > max_disponibilidad:
-                            max_disponibilidad = horarios_disponibles
-                            mejor_dia = fecha_revisar
-                    except:
-                        continue
+                    disponibilidad = disponibilidad_semana.get(fecha_str, {})
+                    horarios_disponibles = len([h for h, o in disponibilidad.items() if o < 2])
+                    
+                    if horarios_disponibles > max_disponibilidad:
+                        max_disponibilidad = horarios_disponibles
+                        mejor_dia = fecha_revisar
             
             if mejor_dia:
                 dias_nombres = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
                 dia_nombre = dias_nombres[mejor_dia.weekday()]
                 fecha_str = mejor_dia.strftime('%Y-%m-%d')
                 
-                # Obtener disponibilidad completa
-                disponibilidad = obtener_disponibilidad_real(fecha_str)
+                # Disponibilidad completa del día elegido (ya obtenida en el rango)
+                disponibilidad = disponibilidad_semana[fecha_str]
                 horarios_disponibles = {h: o for h, o in disponibilidad.items() if o < 2}
                 lista_horarios = ', '.join(sorted(list(horarios_disponibles.keys())[:5]))  # Primeros 5
                 
@@ -3147,11 +3300,12 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
                 if dias_hasta_lunes == 0:
                     dias_hasta_lunes = 7
                 lunes_proxima = hoy + timedelta(days=dias_hasta_lunes)
+                disponibilidad_semana = obtener_disponibilidad_rango(lunes_proxima, lunes_proxima + timedelta(days=4))
                 
                 for i, dia_nombre in enumerate(dias_nombres):
                     fecha_dia = lunes_proxima + timedelta(days=i)
                     fecha_str = fecha_dia.strftime('%Y-%m-%d')
-                    disponibilidad = obtener_disponibilidad_real(fecha_str)
+                    disponibilidad = disponibilidad_semana[fecha_str]
                     horarios_disponibles = [h for h, o in disponibilidad.items() if o < 2]
                     
                     if horarios_disponibles:
@@ -3161,11 +3315,12 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
             else:
                 # Mostrar desde hoy hasta viernes
                 dias_hasta_viernes = 4 - dia_actual  # 4 = viernes
+                disponibilidad_semana = obtener_disponibilidad_rango(hoy, hoy + timedelta(days=dias_hasta_viernes))
                 for i in range(dias_hasta_viernes + 1):
                     fecha_dia = hoy + timedelta(days=i)
                     dia_nombre = dias_nombres[fecha_dia.weekday()]
                     fecha_str = fecha_dia.strftime('%Y-%m-%d')
-                    disponibilidad = obtener_disponibilidad_real(fecha_str)
+                    disponibilidad = disponibilidad_semana[fecha_str]
                     horarios_disponibles = [h for h, o in disponibilidad.items() if o < 2]
                     
                     prefijo = "🔵" if i == 0 else "✅"  # Marcar hoy con diferente emoji
@@ -3191,10 +3346,11 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
             
             # Mostrar lunes a viernes
             dias_nombres = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes']
+            disponibilidad_semana = obtener_disponibilidad_rango(lunes_proxima, lunes_proxima + timedelta(days=4))
             for i, dia_nombre in enumerate(dias_nombres):
                 fecha_dia = lunes_proxima + timedelta(days=i)
                 fecha_str = fecha_dia.strftime('%Y-%m-%d')
-                disponibilidad = obtener_disponibilidad_real(fecha_str)
+                disponibilidad = disponibilidad_semana[fecha_str]
                 
                 horarios_disponibles = [h for h, o in disponibilidad.items() if o < 2]
                 
@@ -3577,87 +3733,52 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
                 codigo_turno = generar_codigo_turno()
                 
                 # ==========================================
-                # 🔥 VALIDACIÓN FINAL DE DISPONIBILIDAD (evitar race condition)
+                # GUARDAR EN BASE DE DATOS (reserva atómica, evita race condition)
                 # ==========================================
                 try:
-                    disponibilidad_final = obtener_disponibilidad_real(contexto.fecha)
-                    ocupacion_final = disponibilidad_final.get(contexto.hora, 0)
+                    # Verificar si la cédula es "SIN_CEDULA" o un número real
+                    cedula_valor = None if contexto.cedula == "SIN_CEDULA" else contexto.cedula
                     
-                    if ocupacion_final >= 2:
-                        logger.warning(f"⚠️ RACE CONDITION EVITADA: {contexto.hora} se llenó antes de confirmar")
-                        
-                        # Buscar alternativa
-                        horarios_disponibles = [h for h, o in sorted(disponibilidad_final.items()) 
-                                                if o < 2 and h > contexto.hora]
+                    reserva = reservar_turno_atomico(
+                        contexto.nombre,
+                        cedula_valor,
+                        contexto.fecha,
+                        contexto.hora,
+                        contexto.email,
+                        codigo_turno
+                    )
+                    
+                    if not reserva['ok']:
+                        hora_llena = contexto.hora
+                        logger.warning(f"⚠️ RACE CONDITION EVITADA: {hora_llena} se llenó antes de confirmar")
                         
                         contexto.hora = None  # Resetear hora llena
                         
-                        if horarios_disponibles:
-                            siguiente_horario = horarios_disponibles[0]
+                        if reserva['siguiente']:
+                            siguiente_horario = reserva['siguiente']
                             return (
-                                f"⚠️ Lo siento mucho! El horario {contexto.hora} se llenó mientras confirmabas.\n\n"
+                                f"⚠️ Lo siento mucho! El horario {hora_llena} se llenó mientras confirmabas.\n\n"
                                 f"🌟 Te ofrezco el siguiente disponible: **{siguiente_horario}**\n\n"
-                                f"Otros horarios: {', '.join(horarios_disponibles[:5])}\n\n"
+                                f"Otros horarios: {', '.join(reserva['disponibles'][:5])}\n\n"
                                 f"¿Te sirve {siguiente_horario}?"
                             )
                         else:
                             return (
-                                f"⚠️ Lo siento, el horario {contexto.hora} ya no está disponible.\n\n"
+                                f"⚠️ Lo siento, el horario {hora_llena} ya no está disponible.\n\n"
                                 f"❌ No quedan más horarios para el {contexto.fecha}.\n\n"
                                 f"¿Prefieres otro día?"
                             )
-                except Exception as e:
-                    logger.error(f"❌ Error en validación final de disponibilidad: {e}")
-                    # Continuar con el guardado si falla la validación (mejor que perder el turno)
-                
-                # ==========================================
-                # GUARDAR EN BASE DE DATOS
-                # ==========================================
-                try:
-                    conn = psycopg2.connect(**DB_CONFIG)
-                    cursor = conn.cursor()
-                    
-                    # Verificar si la cédula es "SIN_CEDULA" o un número real
-                    cedula_valor = None if contexto.cedula == "SIN_CEDULA" else contexto.cedula
                     
-                    # Combinar fecha y hora en un timestamp
-                    fecha_hora_completa = f"{contexto.fecha} {contexto.hora}:00"
-                    
-                    # Insertar turno en la base de datos CON código único
-                    # Nota: La tabla usa 'fecha_hora' (timestamp), 'codigo', 'created_at'
-                    cursor.execute("""
-                        INSERT INTO turnos (nombre, cedula, fecha_hora, email, codigo, estado)
-                        VALUES (%s, %s, %s, %s, %s, %s)
-                        RETURNING id
-                    """, (
-                        contexto.nombre,
-                        cedula_valor,
-                        fecha_hora_completa,
-                        contexto.email,
-                        codigo_turno,
-                        'activo'
-                    ))
-                    
-                    turno_id = cursor.fetchone()[0]
-                    conn.commit()
-                    cursor.close()
-                    conn.close()
+                    turno_id = reserva['turno_id']
                     
                     logger.info(f"✅ Turno guardado en BD con ID: {turno_id}, Código: {codigo_turno}")
                     
                     # ==========================================
-                    # GENERAR CÓDIGO QR (opcional - requiere setup)
+                    # QR + TOKEN + EMAIL EN SEGUNDO PLANO
                     # ==========================================
+                    # La cola persiste el trabajo en el outbox y lo reintenta con backoff;
+                    # la respuesta al usuario no espera al SMTP
                     try:
-                        import sys
-                        # os ya está importado al inicio del archivo
-                        sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'notificaciones'))
-                        from qr_generator import QRConfirmationGenerator
-                        
-                        # Obtener URL base desde variable de entorno (para Cloudflare/ngrok/producción)
-                        base_url = os.getenv('BASE_URL', 'http://localhost:5000')
-                        qr_gen = QRConfirmationGenerator(base_url=base_url)
-                        logger.info(f"📍 Usando BASE_URL para QR: {base_url}")
                         turno_data_qr = {
                             'nombre': contexto.nombre,
                             'cedula': contexto.cedula,
@@ -3667,60 +3788,10 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
                             'codigo_turno': codigo_turno,
                             'turno_id': turno_id
                         }
-                        qr_data = qr_gen.generate_qr_confirmation(turno_data_qr)
-                        token = qr_data['token']
-                        logger.info(f"✅ QR generado para turno {turno_id} con código {codigo_turno}, token: {token[:10]}...")
-                        
-                        # Guardar el token en la BD para confirmación
-                        try:
-                            conn_token = psycopg2.connect(**DB_CONFIG)
-                            cursor_token = conn_token.cursor()
-                            cursor_token.execute("""
-                                UPDATE turnos 
-                                SET token_confirmacion = %s 
-                                WHERE id = %s
-                            """, (token, turno_id))
-                            conn_token.commit()
-                            cursor_token.close()
-                            conn_token.close()
-                            logger.info(f"✅ Token de confirmación guardado en BD")
-                        except Exception as e_token:
-                            logger.warning(f"⚠️ No se pudo guardar token en BD (puede que la columna no exista): {e_token}")
-                        
-                        # ==========================================
-                        # ENVIAR EMAIL CON QR
-                        # ==========================================
-                        smtp_email = os.getenv('SMTP_EMAIL')
-                        smtp_password = os.getenv('SMTP_PASSWORD')
-                        
-                        if smtp_email and smtp_password:
-                            try:
-                                logger.info(f"📧 Intentando enviar email a {contexto.email}...")
-                                from email_sender import EmailNotificationSender
-                                logger.info("✅ EmailNotificationSender importado correctamente")
-                                
-                                email_sender = EmailNotificationSender(
-                                    smtp_server=os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
-                                    smtp_port=int(os.getenv('SMTP_PORT', 587)),
-                                    email=smtp_email,
-                                    password=smtp_password
-                                )
-                                logger.info("✅ EmailNotificationSender instanciado correctamente")
-                                
-                                resultado = email_sender.send_confirmation_email(contexto.email, turno_data_qr, qr_data)
-                                if resultado:
-                                    logger.info(f"✅ Email enviado exitosamente a {contexto.email}")
-                                else:
-                                    logger.warning(f"⚠️ Email NO enviado a {contexto.email} (retorno False)")
-                                
-                            except Exception as e_email:
-                                logger.error(f"❌ Error al enviar email: {e_email}")
-                                logger.error(f"❌ Traceback: {traceback.format_exc()}")
-                        else:
-                            logger.warning("⚠️ Credenciales de email no configuradas. Email no enviado.")
-                        
-                    except Exception as e_qr:
-                        logger.warning(f"⚠️ No se pudo generar QR: {e_qr}")
+                        encolar_confirmacion(turno_data_qr, contexto.email)
+                        logger.info(f"📬 Notificación de turno {turno_id} encolada para {contexto.email}")
+                    except Exception as e_cola:
+                        logger.warning(f"⚠️ No se pudo encolar la notificación: {e_cola}")
                     
                 except Exception as e_db:
                     logger.error(f"❌ Error al guardar en BD: {e_db}")
@@ -3824,7 +3895,7 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
     
     # Intent: CONSULTAR REQUISITOS
     elif intent == 'consultar_requisitos':
-        mensaje_lower = mensaje.lower()
+        mensaje_lower = analisis.lower
         
         # Construir la respuesta base según el tipo de consulta
         respuesta_base = ""
@@ -3916,7 +3987,7 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
     
     # Intent: CONSULTAR UBICACIÓN
     elif intent == 'consultar_ubicacion':
-        mensaje_lower = mensaje.lower()
+        mensaje_lower = analisis.lower
         
         # Detectar si pregunta ESPECÍFICAMENTE por teléfono/contacto
         pregunta_telefono = any(palabra in mensaje_lower for palabra in [
@@ -4001,7 +4072,7 @@ def generar_respuesta_inteligente(intent: str, confidence: float,
     
     # Intent: CANCELAR TURNO
     elif intent == 'cancelar':
-        mensaje_lower = mensaje.lower()
+        mensaje_lower = analisis.lower
         
         # Si el usuario tiene un turno en progreso (datos completos o parciales)
         if contexto.tiene_datos_completos() or contexto.nombre or contexto.cedula or contexto.fecha or contexto.hora:
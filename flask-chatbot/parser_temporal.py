@@ -0,0 +1,399 @@
+"""
+PARSER TEMPORAL
+Fechas y horas de extraer_entidades() en una sola pasada, en vez de la cascada
+de `in` y regex sueltas que corrían todas aunque una anterior ya hubiera matcheado.
+- Palabras clave ("mañana", "pasado mañana", días, "próxima semana", "mediodía",
+  franjas...): grupos tiempo_* del autómata de frases. El orquestador los indexa
+  en AUTOMATA_FRASES, así que le llegan del recorrido que ya hizo AnalisisMensaje
+- Formas con números ("09:30", "15/11", "15 de nov", "3 y media", "las 9",
+  "10 hs", "dos días desde hoy"...): una sola alternativa compilada, un solo finditer
+- Después se resuelve con las mismas prioridades que tenía la cascada
+  (urgencia > "ese día" > mañana > día siguiente > hoy > semanas > días > fechas)
+Devuelve fecha YYYY-MM-DD y hora HH:MM normalizadas, con el span que las originó
+(sobre el texto analizado, en minúsculas).
+"""
+
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from automata_frases import AutomataFrases, ResultadoEscaneo, plegar_acentos
+
+# =====================================================
+# GRAMÁTICA: PALABRAS CLAVE
+# =====================================================
+
+# Frases sin acentos ni ñ: se comparan contra el texto plegado (plegar_acentos),
+# así "mañana"/"manana" o "miércoles"/"miercoles" se escriben una sola vez
+FRASES_URGENCIA = [
+    'urgencia', 'urgente', 'fecha mas cercana', 'lo antes posible', 'lo mas pronto',
+    'cuanto antes', 'primera fecha', 'fecha disponible', 'mas cercano', 'mas proximo',
+    'proxima fecha', 'turno mas cercano', 'turno mas proximo', 'dia mas cercano',
+    'el dia mas proximo', 'dame el turno mas proximo', 'el turno mas cercano',
+    'el mas cercano', 'el mas proximo'
+]
+
+FRASES_PASADO_MANANA = [
+    'pasado manana', 'pasado ma�ana',  # Con la ñ perdida por mala decodificación
+    'el dia despues de manana', 'dos dias'
+]
+
+DIAS_SEMANA_NUMERO = {
+    'lunes': 0, 'martes': 1, 'miercoles': 2, 'jueves': 3, 'viernes': 4, 'sabado': 5, 'domingo': 6
+}
+
+# "próximo jueves", "la próxima lunes", "para el día viernes"... -> número de día
+PROXIMO_DIA_NUMERO = {
+    f'{prefijo} {dia}': numero
+    for dia, numero in DIAS_SEMANA_NUMERO.items()
+    for prefijo in ['proximo', 'proxima', 'para el', 'para el dia']
+}
+
+# Frases de franja: "no puedo ..." manda sobre todo lo demás y cuenta como preferencia explícita
+FRASES_NO_MANANA = [
+    'no puedo por la manana', 'no puedo de manana', 'no puedo en la manana',
+    'no puedo a la manana', 'no puedo manana', 'no me sirve la manana',
+    'no me sirve por la manana', 'no me viene bien la manana'
+]
+FRASES_NO_TARDE = [
+    'no puedo por la tarde', 'no puedo de tarde', 'no puedo en la tarde',
+    'no me sirve la tarde', 'no me sirve por la tarde', 'no me viene bien la tarde'
+]
+FRASES_DESPUES_MEDIODIA = ['despues del mediodia', 'despues de mediod', 'pasado el mediodia']
+FRASES_FRANJA_TARDE = [
+    'por la tarde', 'de tarde', 'en la tarde', 'a la tarde', 'despues del mediodia',
+    'para manana por la tarde', 'manana por la tarde'
+]
+FRASES_FRANJA_MANANA = ['por la manana', 'de manana', 'en la manana', 'a la manana', 'para manana por la manana']
+
+# Grupo -> frases. El orquestador los suma a AUTOMATA_FRASES (nombres con prefijo tiempo_)
+GRUPOS_TEMPORALES = {
+    'tiempo_urgencia': FRASES_URGENCIA,
+    'tiempo_ese_dia': ['ese dia'],
+    'tiempo_manana': ['manana'],
+    'tiempo_manana_horario': ['por la manana', 'de manana', 'en la manana', 'a la manana'],  # No es "tomorrow"
+    'tiempo_pasado_manana': FRASES_PASADO_MANANA,
+    'tiempo_dia_siguiente': ['dia siguiente'],
+    'tiempo_hoy': ['hoy'],
+    'tiempo_esta_semana': ['esta semana', 'semana actual'],
+    'tiempo_proxima_semana': ['proxima semana', 'siguiente semana', 'semana que viene'],
+    'tiempo_proximo_dia': list(PROXIMO_DIA_NUMERO),
+    'tiempo_dia': list(DIAS_SEMANA_NUMERO),
+    'tiempo_ese_horario': ['ese horario', 'esa hora', 'ese hora'],
+    'tiempo_mediodia': ['mediodia'],
+    'tiempo_temprano': ['temprano'],
+    'tiempo_no_manana': FRASES_NO_MANANA,
+    'tiempo_no_tarde': FRASES_NO_TARDE,
+    'tiempo_despues_mediodia': FRASES_DESPUES_MEDIODIA,
+    'tiempo_franja_tarde': FRASES_FRANJA_TARDE,
+    'tiempo_franja_manana': FRASES_FRANJA_MANANA,
+    'tiempo_tarde': ['tarde'],
+}
+
+# Para usar el parser por su cuenta (tests, scripts); el orquestador usa AUTOMATA_FRASES
+AUTOMATA_TEMPORAL = AutomataFrases(GRUPOS_TEMPORALES, sin_acentos=True)
+
+# =====================================================
+# GRAMÁTICA: FORMAS CON NÚMEROS
+# =====================================================
+
+MESES_NUMERO = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4,
+    'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
+    'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12,
+    # Abreviaciones
+    'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dic': 12
+}
+
+HORAS_PALABRA = {
+    'una': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5, 'seis': 6,
+    'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10, 'once': 11, 'doce': 12,
+    'trece': 13, 'catorce': 14, 'quince': 15
+}
+
+DIAS_PALABRA = {
+    'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5,
+    'seis': 6, 'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10
+}
+
+_FRACCION = r'y\s+(?:media|cuarto)|menos\s+cuarto'
+
+# Una alternativa por forma; m.lastgroup dice cuál matcheó. "las " no consume el
+# número (lookahead) para que "las 3 y media" o "las 10 de marzo" también se vean.
+PATRON_TEMPORAL = re.compile('|'.join([
+    r'(?P<hora_hhmm>\b(?P<hh>\d{1,2}):(?P<mm>\d{2})\b)',  # 09:30
+    r'(?P<fecha_numerica>\b(?P<dia_n>\d{1,2})[/-](?P<mes_n>\d{1,2})(?:[/-](?P<anio_n>\d{2,4}))?\b)',  # 15/11[/2025]
+    r'(?P<fecha_texto>\b(?P<dia_t>\d{1,2})\s+(?:de\s+)?(?P<mes_t>' + '|'.join(MESES_NUMERO) + r')\b)',  # 15 de nov
+    r'(?P<hora_fraccion>(?P<hf>\d{1,2})\s+(?P<fraccion>' + _FRACCION + r'))',  # 3 y media
+    r'(?P<hora_palabra>\b(?P<hp>' + '|'.join(HORAS_PALABRA) + r')\s+(?P<fraccion_p>' + _FRACCION + r')\b)',  # tres y cuarto
+    r'(?P<hora_las>las\s+(?=(?P<hl>\d{1,2})))',  # las 9
+    r'(?P<hora_sufijo>\b(?P<hs>\d{1,2})\s*(?P<sufijo>am|pm|hs|horas?)\b)',  # 9 hs, 3 pm
+    r'(?P<dias_desde_hoy>\b(?P<n_dias>\w+)\s+dias?\s+(?:desde|a\s+partir\s+de)\s+hoy)',  # dos días desde hoy
+    r'(?P<hora_sola>^\s*(?P<hn>\d{1,2})\s*$)',  # el mensaje es solo "9"
+]))
+
+def escanear_expresiones(texto: str) -> Dict[str, List[re.Match]]:
+    """Un finditer de PATRON_TEMPORAL sobre el texto plegado: forma -> matches en orden de aparición"""
+    expresiones = {}
+    for match in PATRON_TEMPORAL.finditer(texto):
+        expresiones.setdefault(match.lastgroup, []).append(match)
+    return expresiones
+
+# =====================================================
+# RESULTADO
+# =====================================================
+
+class ResultadoTemporal:
+    """Fecha/hora/franja detectadas; *_span son (inicio, fin) en el texto analizado"""
+
+    __slots__ = ('fecha', 'fecha_span', 'hora', 'hora_span', 'franja_horaria',
+                 'preferencia_explicita', 'proxima_semana')
+
+    def __init__(self):
+        self.fecha = None  # 'YYYY-MM-DD'
+        self.fecha_span = None
+        self.hora = None  # 'HH:MM'
+        self.hora_span = None
+        self.franja_horaria = None  # 'manana' / 'tarde'
+        self.preferencia_explicita = False  # "no puedo por la mañana", "después del mediodía"
+        self.proxima_semana = None  # True/False solo si el mensaje habla de la semana
+
+    def entidades(self) -> Dict:
+        """Las mismas claves que cargaba extraer_entidades (solo las detectadas)"""
+        entidades = {}
+        if self.proxima_semana is not None:
+            entidades['proxima_semana'] = self.proxima_semana
+        if self.fecha:
+            entidades['fecha'] = self.fecha
+        if self.hora:
+            entidades['hora'] = self.hora
+        if self.franja_horaria:
+            entidades['franja_horaria'] = self.franja_horaria
+        if self.preferencia_explicita:
+            entidades['preferencia_explicita'] = True
+        return entidades
+
+    def __repr__(self):
+        return (f"ResultadoTemporal(fecha={self.fecha!r} {self.fecha_span}, hora={self.hora!r} {self.hora_span}, "
+                f"franja={self.franja_horaria!r})")
+
+# =====================================================
+# RESOLUCIÓN
+# =====================================================
+
+def _span_frase(texto: str, encontradas, candidatas) -> Optional[Tuple[int, int]]:
+    """Span de la primera aparición de alguna de las frases candidatas encontradas (la más larga si empatan)"""
+    mejor = None
+    for frase in encontradas:
+        if frase in candidatas:
+            inicio = texto.find(frase)
+            fin = inicio + len(frase)
+            if inicio >= 0 and (mejor is None or (inicio, -fin) < (mejor[0], -mejor[1])):
+                mejor = (inicio, fin)
+    return mejor
+
+def _dia_habil_desde(dia: date) -> date:
+    """El mismo día o el siguiente lunes si cae en fin de semana"""
+    while dia.weekday() >= 5:
+        dia += timedelta(days=1)
+    return dia
+
+def _hora_fraccion(hora: int, fraccion: str) -> Optional[str]:
+    """'3', 'y media' -> '15:30' (menos de 7 se toma como de la tarde)"""
+    if hora < 7:
+        hora += 12
+    if 'media' in fraccion:
+        minutos = 30
+    elif 'menos' in fraccion:
+        hora -= 1
+        minutos = 45
+    else:
+        minutos = 15
+    return f"{hora:02d}:{minutos:02d}" if hora <= 23 else None
+
+def _resolver_fecha(resultado: ResultadoTemporal, texto: str, frases: ResultadoEscaneo,
+                    expresiones: Dict[str, List[re.Match]], contexto, hoy: date):
+    grupos = frases.grupos
+    encontradas = frases.frases
+    fecha = None
+    candidatas = None  # Frases que originaron la fecha, para el span
+
+    if 'tiempo_urgencia' in grupos:
+        fecha = _dia_habil_desde(hoy + timedelta(days=1))
+        candidatas = FRASES_URGENCIA
+    elif 'tiempo_ese_dia' in grupos:
+        # Prioridad: fecha recomendada por el bot > fecha ya elegida
+        anterior = getattr(contexto, 'fecha_recomendada', None) or getattr(contexto, 'fecha', None)
+        if anterior:
+            resultado.fecha = anterior
+            resultado.fecha_span = _span_frase(texto, encontradas, GRUPOS_TEMPORALES['tiempo_ese_dia'])
+        return
+    elif 'tiempo_manana' in grupos:
+        if 'tiempo_manana_horario' in grupos:
+            return  # "por la mañana" es franja, no fecha
+        if 'tiempo_pasado_manana' in grupos:
+            fecha, candidatas = hoy + timedelta(days=2), FRASES_PASADO_MANANA
+        else:
+            fecha, candidatas = hoy + timedelta(days=1), GRUPOS_TEMPORALES['tiempo_manana']
+    elif 'tiempo_dia_siguiente' in grupos:
+        fecha = hoy + timedelta(days=1)
+        fecha_contexto = getattr(contexto, 'fecha', None)
+        if fecha_contexto:
+            try:
+                fecha = _dia_habil_desde(datetime.strptime(fecha_contexto, '%Y-%m-%d').date() + timedelta(days=1))
+            except (TypeError, ValueError):
+                pass  # Contexto inválido: mañana
+        candidatas = GRUPOS_TEMPORALES['tiempo_dia_siguiente']
+    elif 'tiempo_hoy' in grupos:
+        fecha = hoy
+        desde_hoy = expresiones.get('dias_desde_hoy')
+        if desde_hoy:
+            match = desde_hoy[0]
+            palabra = match.group('n_dias')
+            dias = DIAS_PALABRA.get(palabra) or (int(palabra) if palabra.isdecimal() else 0)
+            fecha = hoy + timedelta(days=dias)
+            resultado.fecha, resultado.fecha_span = fecha.strftime('%Y-%m-%d'), match.span()
+            return
+        candidatas = GRUPOS_TEMPORALES['tiempo_hoy']
+    elif 'tiempo_esta_semana' in grupos:
+        resultado.proxima_semana = False  # El usuario elige el día después
+        return
+    elif 'tiempo_proxima_semana' in grupos:
+        resultado.proxima_semana = True
+        fecha = hoy + timedelta(days=(7 - hoy.weekday()) % 7 or 7)  # Lunes de la semana que viene
+        candidatas = GRUPOS_TEMPORALES['tiempo_proxima_semana']
+    elif 'tiempo_proximo_dia' in grupos:
+        frase = min((f for f in encontradas if f in PROXIMO_DIA_NUMERO), key=PROXIMO_DIA_NUMERO.get)
+        dias = (PROXIMO_DIA_NUMERO[frase] - hoy.weekday()) % 7 or 7  # "próximo" nunca es hoy
+        fecha, candidatas = hoy + timedelta(days=dias), (frase,)
+    elif 'tiempo_dia' in grupos:
+        frase = min((f for f in encontradas if f in DIAS_SEMANA_NUMERO), key=DIAS_SEMANA_NUMERO.get)
+        numero = DIAS_SEMANA_NUMERO[frase]
+        dias = (numero - hoy.weekday()) % 7
+        recomendada = getattr(contexto, 'fecha_recomendada', None)
+        if recomendada and datetime.strptime(recomendada, '%Y-%m-%d').weekday() == numero:
+            resultado.fecha = recomendada  # Confirma el día que recomendó el bot
+        elif getattr(contexto, 'proxima_semana', False):
+            resultado.fecha = (hoy + timedelta(days=dias + 7 if dias else 7)).strftime('%Y-%m-%d')
+        else:
+            resultado.fecha = (hoy + timedelta(days=dias)).strftime('%Y-%m-%d')  # 0 = hoy
+        resultado.fecha_span = _span_frase(texto, encontradas, (frase,))
+        return
+    else:
+        # "15 de noviembre": la primera fecha válida; si ya pasó este año, la del que viene
+        for match in expresiones.get('fecha_texto', ()):
+            dia, mes = int(match.group('dia_t')), MESES_NUMERO[match.group('mes_t')]
+            try:
+                fecha = date(hoy.year, mes, dia)
+                if fecha < hoy:
+                    fecha = date(hoy.year + 1, mes, dia)
+            except ValueError:
+                continue
+            resultado.fecha, resultado.fecha_span = fecha.strftime('%Y-%m-%d'), match.span()
+            return
+        # "15/11", "15-11-2025", "15/11/25"
+        for match in expresiones.get('fecha_numerica', ()):
+            anio = int(match.group('anio_n')) if match.group('anio_n') else hoy.year
+            if anio < 100:
+                anio += 2000
+            try:
+                fecha = date(anio, int(match.group('mes_n')), int(match.group('dia_n')))
+            except ValueError:
+                continue
+            resultado.fecha, resultado.fecha_span = fecha.strftime('%Y-%m-%d'), match.span()
+            return
+        return
+
+    resultado.fecha = fecha.strftime('%Y-%m-%d')
+    resultado.fecha_span = _span_frase(texto, encontradas, candidatas)
+
+def _resolver_hora(resultado: ResultadoTemporal, texto: str, frases: ResultadoEscaneo,
+                   expresiones: Dict[str, List[re.Match]], contexto):
+    # Orden de prioridad: una hora escrita gana a "mediodía"/"temprano", que ganan a "ese horario"
+    for match in expresiones.get('hora_hhmm', ()):
+        hora, minutos = int(match.group('hh')), int(match.group('mm'))
+        if hora <= 23 and minutos <= 59:
+            resultado.hora, resultado.hora_span = f"{hora:02d}:{minutos:02d}", match.span()
+            return
+    palabras = expresiones.get('hora_palabra')
+    if palabras:
+        match = min(palabras, key=lambda m: HORAS_PALABRA[m.group('hp')])
+        resultado.hora = _hora_fraccion(HORAS_PALABRA[match.group('hp')], match.group('fraccion_p'))
+        resultado.hora_span = match.span()
+        return
+    for match in expresiones.get('hora_fraccion', ()):
+        hora = _hora_fraccion(int(match.group('hf')), match.group('fraccion'))
+        if hora:
+            resultado.hora, resultado.hora_span = hora, match.span()
+            return
+    for match in expresiones.get('hora_las', ()):
+        hora = int(match.group('hl'))
+        if hora < 7:
+            hora += 12  # "las 3" es de la tarde
+        if hora <= 23:
+            resultado.hora, resultado.hora_span = f"{hora:02d}:00", (match.start(), match.end('hl'))
+            return
+    for match in expresiones.get('hora_sufijo', ()):
+        hora = int(match.group('hs'))
+        if match.group('sufijo') == 'pm' and hora < 12:
+            hora += 12
+        if hora <= 23:
+            resultado.hora, resultado.hora_span = f"{hora:02d}:00", match.span()
+            return
+    for match in expresiones.get('hora_sola', ()):
+        hora = int(match.group('hn'))
+        if hora <= 23:
+            resultado.hora = f"{hora + 12 if hora < 7 else hora:02d}:00"
+            resultado.hora_span = match.span('hn')
+            return
+
+    grupos = frases.grupos
+    if 'tiempo_temprano' in grupos:
+        resultado.hora = '08:00'
+        resultado.hora_span = _span_frase(texto, frases.frases, GRUPOS_TEMPORALES['tiempo_temprano'])
+    elif 'tiempo_mediodia' in grupos:
+        resultado.hora = '12:00'
+        resultado.hora_span = _span_frase(texto, frases.frases, GRUPOS_TEMPORALES['tiempo_mediodia'])
+    elif 'tiempo_ese_horario' in grupos and getattr(contexto, 'hora_recomendada', None):
+        resultado.hora = contexto.hora_recomendada
+        resultado.hora_span = _span_frase(texto, frases.frases, GRUPOS_TEMPORALES['tiempo_ese_horario'])
+
+def _resolver_franja(resultado: ResultadoTemporal, grupos):
+    if 'tiempo_no_manana' in grupos:
+        resultado.franja_horaria, resultado.preferencia_explicita = 'tarde', True
+    elif 'tiempo_no_tarde' in grupos:
+        resultado.franja_horaria, resultado.preferencia_explicita = 'manana', True
+    elif 'tiempo_despues_mediodia' in grupos:
+        resultado.franja_horaria, resultado.preferencia_explicita = 'tarde', True
+    # Frases completas primero ("mañana por la tarde"), después la palabra sola
+    elif 'tiempo_franja_tarde' in grupos:
+        resultado.franja_horaria = 'tarde'
+    elif 'tiempo_franja_manana' in grupos:
+        resultado.franja_horaria = 'manana'
+    elif 'tiempo_tarde' in grupos:
+        resultado.franja_horaria = 'tarde'
+    elif 'tiempo_manana' in grupos or 'tiempo_temprano' in grupos:
+        resultado.franja_horaria = 'manana'
+
+def interpretar_fecha_hora(texto: str, contexto=None, frases: ResultadoEscaneo = None,
+                           ahora: datetime = None,
+                           expresiones: Dict[str, List[re.Match]] = None) -> ResultadoTemporal:
+    """
+    Fecha, hora y franja de un mensaje en minúsculas (se compara sin acentos).
+    `frases`: escaneo sin acentos que ya incluya GRUPOS_TEMPORALES (si no, se escanea con AUTOMATA_TEMPORAL).
+    `expresiones`: escanear_expresiones() ya hecho sobre el mismo texto plegado.
+    `contexto`: SessionContext para "ese día", "día siguiente", la fecha recomendada y la próxima semana.
+    """
+    texto = plegar_acentos(texto)
+    if frases is None:
+        frases = AUTOMATA_TEMPORAL.escanear(texto, plegado=True)
+    hoy = (ahora or datetime.now()).date()
+    if expresiones is None:
+        expresiones = escanear_expresiones(texto)
+
+    resultado = ResultadoTemporal()
+    _resolver_fecha(resultado, texto, frases, expresiones, contexto, hoy)
+    _resolver_hora(resultado, texto, frases, expresiones, contexto)
+    _resolver_franja(resultado, frases.grupos)
+    return resultado
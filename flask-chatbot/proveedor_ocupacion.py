@@ -0,0 +1,324 @@
+"""
+PROVEEDORES DE OCUPACIÓN PARA EL MOTOR DIFUSO
+Reemplazan la ocupación inventada (tabla fija + ruido aleatorio) por datos de la BD:
+- ProveedorOcupacionBD: turnos activos de la fecha (vía cache_ocupacion) como % de la capacidad
+- ProveedorPerfilHistorico: promedio por día de semana y media hora, recalculado cada noche
+- ProveedorPatronFijo: el patrón de oficina original sin ruido (respaldo sin BD)
+Todos son deterministas: la misma fecha con los mismos turnos da la misma ocupación.
+"""
+
+import os
+import json
+import time
+import datetime
+import threading
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from cache_ocupacion import cache_ocupacion
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# CONFIGURACIÓN
+# =====================================================
+
+OCUPACION_PROVEEDOR = os.getenv('OCUPACION_PROVEEDOR', 'bd')  # 'bd', 'perfil' o 'fijo'
+OCUPACION_PERFIL_SEMANAS = int(os.getenv('OCUPACION_PERFIL_SEMANAS', 8))  # Semanas de historia del perfil
+OCUPACION_PERFIL_HORA = int(os.getenv('OCUPACION_PERFIL_HORA', 3))  # Hora del recálculo nocturno
+OCUPACION_PERFIL_ARCHIVO = os.getenv('OCUPACION_PERFIL_ARCHIVO', '')  # JSON del perfil ('' = solo memoria)
+OCUPACION_PERFIL_REINTENTO = float(os.getenv('OCUPACION_PERFIL_REINTENTO', 300))  # Seg entre reintentos si la BD falla
+
+CAPACIDAD_POR_HORARIO = 2  # Turnos por cada media hora (la misma que usa la reserva del orquestador)
+
+# Horarios de atención: cada media hora de 07:00 a 15:00 (igual que _horarios_vacios del orquestador)
+HORARIOS_ATENCION = [f"{hora:02d}:{minuto:02d}" for hora in range(7, 16) for minuto in (0, 30)
+                     if not (hora == 15 and minuto == 30)]
+
+def hora_a_slot(hora_decimal: float) -> str:
+    """9.5 -> '09:30'"""
+    minutos = int(round(hora_decimal * 60))
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+def _porcentaje(ocupados: float) -> float:
+    """Turnos ocupados -> % de la capacidad del horario (0-100)"""
+    return min(100.0, 100.0 * ocupados / CAPACIDAD_POR_HORARIO)
+
+# =====================================================
+# CONSULTAS A LA BD
+# =====================================================
+
+def _consultar_turnos_dia(fecha: str) -> List[Tuple[str, int]]:
+    """[(hora 'HH:MM', turnos activos)] de una fecha, misma consulta que obtener_disponibilidad_real"""
+    from db_pool import obtener_conexion  # psycopg2 solo hace falta si se consulta la BD
+    conn = obtener_conexion()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT
+                TO_CHAR(fecha_hora, 'HH24:MI') as hora,
+                COUNT(*) as ocupados
+            FROM turnos
+            WHERE DATE(fecha_hora) = %s
+            AND estado = 'activo'
+            GROUP BY TO_CHAR(fecha_hora, 'HH24:MI')
+        """, (fecha,))
+        resultados = cursor.fetchall()
+        cursor.close()
+        return resultados
+    finally:
+        conn.close()  # Devuelve la conexión al pool
+
+def _consultar_historico(desde: datetime.date, hasta: datetime.date) -> List[Tuple[int, str, int]]:
+    """[(día de semana 0=lunes, hora 'HH:MM', turnos)] en [desde, hasta), sin cancelados"""
+    from db_pool import obtener_conexion
+    conn = obtener_conexion()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT
+                EXTRACT(ISODOW FROM fecha_hora)::int - 1 as dia_semana,
+                TO_CHAR(fecha_hora, 'HH24:MI') as hora,
+                COUNT(*) as turnos
+            FROM turnos
+            WHERE fecha_hora >= %s
+            AND fecha_hora < %s
+            AND estado <> 'cancelado'
+            GROUP BY 1, 2
+        """, (desde, hasta))
+        resultados = cursor.fetchall()
+        cursor.close()
+        return resultados
+    finally:
+        conn.close()
+
+# =====================================================
+# PROVEEDORES
+# =====================================================
+
+class ProveedorOcupacion(ABC):
+    """Interfaz: ocupación (0-100) de una fecha en horas decimales (7.5 = 07:30)"""
+
+    nombre = 'base'
+
+    @abstractmethod
+    def ocupaciones_dia(self, fecha: datetime.date, horas: Sequence[float]) -> List[float]:
+        ...
+
+    def ocupacion(self, fecha: datetime.date, hora_decimal: float) -> float:
+        return self.ocupaciones_dia(fecha, [hora_decimal])[0]
+
+class ProveedorPatronFijo(ProveedorOcupacion):
+    """Patrón típico de oficina pública por hora y día de semana (el de simular_ocupacion, sin ruido)"""
+
+    nombre = 'fijo'
+
+    FACTORES_HORA = {
+        7: 25, 8: 45, 9: 70, 10: 85, 11: 90,
+        12: 95, 13: 100, 14: 95, 15: 80, 16: 60, 17: 40
+    }
+    FACTORES_DIA = {0: 1.2, 1: 0.9, 2: 0.9, 3: 0.9, 4: 1.1}  # Lunes más cargado, martes a jueves más tranquilos
+
+    def ocupaciones_dia(self, fecha: datetime.date, horas: Sequence[float]) -> List[float]:
+        factor_dia = self.FACTORES_DIA.get(fecha.weekday(), 1.0)
+        return [max(0.0, min(100.0, self.FACTORES_HORA.get(int(hora), 50) * factor_dia)) for hora in horas]
+
+class ProveedorPerfilHistorico(ProveedorOcupacion):
+    """
+    Ocupación promedio por (día de semana, media hora) de las últimas semanas.
+    El perfil se precalcula una vez por noche; consultar es solo un lookup.
+    Horarios fuera de atención o sin historia en la BD van al respaldo.
+    """
+
+    nombre = 'perfil'
+
+    def __init__(self, respaldo: ProveedorOcupacion = None,
+                 consultar: Callable[[datetime.date, datetime.date], List[Tuple[int, str, int]]] = None,
+                 semanas: int = OCUPACION_PERFIL_SEMANAS, archivo: str = OCUPACION_PERFIL_ARCHIVO):
+        self.respaldo = respaldo or ProveedorPatronFijo()
+        self.consultar = consultar or _consultar_historico
+        self.semanas = semanas
+        self.archivo = archivo
+        self.perfil = None  # {dia_semana: {'HH:MM': %}}
+        self.calculado = None  # Fecha del último cálculo
+        self._ultimo_intento = None
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        if archivo:
+            self._cargar_archivo()
+
+    def recalcular(self, hoy: datetime.date = None) -> bool:
+        """Recalcula el perfil con las `semanas` completas anteriores a `hoy`"""
+        hoy = hoy or datetime.date.today()
+        self._ultimo_intento = time.monotonic()
+        desde = hoy - datetime.timedelta(days=7 * self.semanas)
+        try:
+            filas = self.consultar(desde, hoy)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo calcular el perfil de ocupación: {e}")
+            return False
+
+        # Cada día de semana aparece exactamente `semanas` veces en la ventana
+        perfil = {dia: dict.fromkeys(HORARIOS_ATENCION, 0.0) for dia in range(7)}
+        for dia_semana, hora, turnos in filas:
+            if hora in perfil[int(dia_semana)]:
+                perfil[int(dia_semana)][hora] = round(_porcentaje(turnos / self.semanas), 2)
+
+        with self._lock:
+            self.perfil = perfil if filas else None  # Sin historia no hay perfil: se usa el respaldo
+            self.calculado = hoy
+        logger.info(f"📈 Perfil de ocupación recalculado ({len(filas)} celdas, {desde} → {hoy})")
+        if self.archivo and filas:
+            self._guardar_archivo()
+        return True
+
+    def _vigente(self) -> bool:
+        return self.calculado == datetime.date.today()
+
+    def _asegurar_perfil(self):
+        """Calcula el perfil si está vencido, sin reintentar contra una BD caída en cada consulta"""
+        if self._vigente():
+            return
+        if self._ultimo_intento is not None and time.monotonic() - self._ultimo_intento < OCUPACION_PERFIL_REINTENTO:
+            return
+        self.recalcular()
+
+    def ocupaciones_dia(self, fecha: datetime.date, horas: Sequence[float]) -> List[float]:
+        self._asegurar_perfil()
+        with self._lock:
+            perfil_dia = self.perfil.get(fecha.weekday(), {}) if self.perfil else {}
+        valores = [perfil_dia.get(hora_a_slot(hora)) for hora in horas]
+        faltantes = [hora for hora, valor in zip(horas, valores) if valor is None]
+        if faltantes:
+            respaldo = iter(self.respaldo.ocupaciones_dia(fecha, faltantes))
+            valores = [next(respaldo) if valor is None else valor for valor in valores]
+        return valores
+
+    # =====================================================
+    # PERSISTENCIA Y RECÁLCULO NOCTURNO
+    # =====================================================
+
+    def _guardar_archivo(self):
+        with self._lock:
+            datos = {
+                'calculado': self.calculado.isoformat(),
+                'semanas': self.semanas,
+                'perfil': {str(dia): horarios for dia, horarios in self.perfil.items()}
+            }
+        temporal = f"{self.archivo}.tmp"
+        try:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f)
+            os.replace(temporal, self.archivo)  # Atómico: otro proceso nunca lee un JSON a medias
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo guardar el perfil de ocupación: {e}")
+
+    def _cargar_archivo(self):
+        try:
+            with open(self.archivo, encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return
+        if datos.get('semanas') != self.semanas:
+            return
+        with self._lock:
+            self.perfil = {int(dia): horarios for dia, horarios in datos['perfil'].items()}
+            self.calculado = datetime.date.fromisoformat(datos['calculado'])
+        logger.info(f"📈 Perfil de ocupación cargado de {self.archivo} ({self.calculado})")
+
+    def iniciar_recalculo_nocturno(self):
+        """Hilo daemon que recalcula el perfil todos los días a las OCUPACION_PERFIL_HORA"""
+        if self._hilo is not None:
+            return
+        self._hilo = threading.Thread(target=self._bucle_nocturno, name='perfil-ocupacion', daemon=True)
+        self._hilo.start()
+
+    def _bucle_nocturno(self):
+        while True:
+            ahora = datetime.datetime.now()
+            proxima = ahora.replace(hour=OCUPACION_PERFIL_HORA, minute=0, second=0, microsecond=0)
+            if proxima <= ahora:
+                proxima += datetime.timedelta(days=1)
+            if self._detener.wait((proxima - ahora).total_seconds()):
+                return
+            try:
+                self.recalcular()
+            except Exception as e:
+                logger.warning(f"⚠️ Error en recálculo nocturno del perfil: {e}")
+
+    def detener(self):
+        self._detener.set()
+
+class ProveedorOcupacionBD(ProveedorOcupacion):
+    """
+    Ocupación real: turnos activos de cada media hora / capacidad del horario.
+    Lee a través de cache_ocupacion, así comparte TTL y write-through con el orquestador.
+    Horarios fuera de atención (o la BD caída) van al respaldo.
+    """
+
+    nombre = 'bd'
+
+    def __init__(self, respaldo: ProveedorOcupacion = None,
+                 consultar: Callable[[str], List[Tuple[str, int]]] = None):
+        self.respaldo = respaldo or ProveedorPatronFijo()
+        self.consultar = consultar or _consultar_turnos_dia
+
+    def horarios_dia(self, fecha: datetime.date) -> Dict[str, int]:
+        """{'HH:MM': turnos activos} de la fecha, desde el cache o la BD"""
+        fecha_str = fecha.strftime('%Y-%m-%d')
+        horarios = cache_ocupacion.obtener(fecha_str)
+        if horarios is not None:
+            return horarios
+        horarios = dict.fromkeys(HORARIOS_ATENCION, 0)
+        for hora, ocupados in self.consultar(fecha_str):
+            if hora in horarios:
+                horarios[hora] = ocupados
+        cache_ocupacion.guardar(fecha_str, horarios)
+        return horarios
+
+    def ocupaciones_dia(self, fecha: datetime.date, horas: Sequence[float]) -> List[float]:
+        try:
+            horarios = self.horarios_dia(fecha)
+        except Exception as e:
+            logger.warning(f"⚠️ Ocupación real no disponible para {fecha}, usando {self.respaldo.nombre}: {e}")
+            return self.respaldo.ocupaciones_dia(fecha, horas)
+        valores = [horarios.get(hora_a_slot(hora)) for hora in horas]
+        faltantes = [hora for hora, valor in zip(horas, valores) if valor is None]
+        respaldo = iter(self.respaldo.ocupaciones_dia(fecha, faltantes) if faltantes else [])
+        return [next(respaldo) if valor is None else _porcentaje(valor) for valor in valores]
+
+# =====================================================
+# INSTANCIA GLOBAL
+# =====================================================
+
+_proveedor = None
+_lock_proveedor = threading.Lock()
+
+def _crear_proveedor(tipo: str) -> ProveedorOcupacion:
+    fijo = ProveedorPatronFijo()
+    if tipo == 'fijo':
+        return fijo
+    perfil = ProveedorPerfilHistorico(respaldo=fijo)
+    perfil.iniciar_recalculo_nocturno()
+    if tipo == 'perfil':
+        return perfil
+    if tipo != 'bd':
+        logger.warning(f"⚠️ OCUPACION_PROVEEDOR desconocido '{tipo}', usando 'bd'")
+    return ProveedorOcupacionBD(respaldo=perfil)
+
+def obtener_proveedor_ocupacion() -> ProveedorOcupacion:
+    """Proveedor compartido según OCUPACION_PROVEEDOR (se crea en el primer uso)"""
+    global _proveedor
+    with _lock_proveedor:
+        if _proveedor is None:
+            _proveedor = _crear_proveedor(OCUPACION_PROVEEDOR)
+            logger.info(f"📊 Proveedor de ocupación: {_proveedor.nombre}")
+        return _proveedor
+
+def fijar_proveedor_ocupacion(proveedor: Optional[ProveedorOcupacion]):
+    """Reemplaza el proveedor compartido (None = volver al de la configuración)"""
+    global _proveedor
+    with _lock_proveedor:
+        _proveedor = proveedor
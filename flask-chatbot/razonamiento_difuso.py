@@ -4,9 +4,12 @@ Implementa lógica difusa para interpretar ambigüedad en consultas
 """
 
 import numpy as np
-from typing import Dict, List, Tuple
+from scipy import sparse
+from typing import Dict, List, Sequence, Tuple
 import logging
 
+from automata_frases import AutomataFrases, plegar_acentos
+
 logger = logging.getLogger(__name__)
 
 # =====================================================
@@ -132,6 +135,8 @@ FUZZY_WEIGHTS = {
 # RAZONADOR DIFUSO
 # =====================================================
 
+MENSAJES_POR_BLOQUE = 4096  # Mensajes por bloque en el modo batch (acota la memoria)
+
 class FuzzyIntentReasoner:
     """
     Clasificador de intents usando lógica difusa
@@ -140,7 +145,72 @@ class FuzzyIntentReasoner:
     def __init__(self):
         self.keywords = FUZZY_KEYWORDS
         self.weights = FUZZY_WEIGHTS
-        logger.info("🌟 FuzzyIntentReasoner inicializado")
+        self._build_keyword_index()
+        logger.info(f"🌟 FuzzyIntentReasoner inicializado ({len(self.keyword_index)} keywords indexadas)")
+    
+    # =====================================================
+    # ÍNDICE INVERTIDO DE KEYWORDS
+    # =====================================================
+    
+    def _build_keyword_index(self):
+        """
+        Índice invertido keyword -> [(intent, orden, aporte)] y AutomataFrases
+        con todas las keywords, para encontrarlas en una sola pasada por el mensaje.
+        Las keywords se buscan como substring (igual que `keyword in mensaje`),
+        así que "no" también aparece dentro de "turno": el autómata lo respeta.
+        Se comparan sin acentos ni ñ: "cuándo" y "cuando" son una sola keyword del intent
+        (cuenta una vez aunque el mensaje traiga las dos).
+        """
+        self.intents = list(self.keywords.keys())
+        self.keyword_index = {}
+        for intent in self.intents:
+            orden = 0  # Posición de la keyword dentro del intent: fija el orden de la suma
+            for nivel, keywords in self.keywords[intent].items():
+                peso = self.weights[nivel]
+                for keyword in keywords:
+                    keyword = plegar_acentos(keyword)
+                    if any(entrada[0] == intent for entrada in self.keyword_index.get(keyword, ())):
+                        continue  # Variante con acento de una keyword ya indexada
+                    # Doble peso a frases multi-palabra (bigramas/trigramas)
+                    # Esto hace que "turno rapido" gane sobre "necesito" individual
+                    multiplicador = 2.0 if ' ' in keyword else 1.0
+                    self.keyword_index.setdefault(keyword, []).append((intent, orden, peso * multiplicador))
+                    orden += 1
+        
+        # Mismo autómata que el resto del chatbot: todas las keywords en un solo grupo
+        self._automata = AutomataFrases({'keyword_difusa': self.keyword_index}, sin_acentos=True)
+        
+        self._build_weight_matrix()
+    
+    def _build_weight_matrix(self):
+        """
+        Matriz de pesos keyword x (intent, posición) para el modo batch.
+        Cada keyword va a la columna de su posición dentro del intent, así el producto
+        presencia x pesos nunca suma dos términos en la misma celda y los totales
+        se acumulan después por posición, en el mismo orden que el camino escalar.
+        """
+        self.keyword_columns = {keyword: j for j, keyword in enumerate(self.keyword_index)}
+        self._posiciones = max(orden for entradas in self.keyword_index.values()
+                               for _, orden, _ in entradas) + 1
+        columna_intent = {intent: i * self._posiciones for i, intent in enumerate(self.intents)}
+        filas, columnas, valores = [], [], []
+        for keyword, entradas in self.keyword_index.items():
+            for intent, orden, aporte in entradas:
+                filas.append(self.keyword_columns[keyword])
+                columnas.append(columna_intent[intent] + orden)
+                valores.append(aporte)
+        self.weight_matrix = sparse.csr_matrix(
+            (valores, (filas, columnas)),
+            shape=(len(self.keyword_columns), len(self.intents) * self._posiciones)
+        )
+    
+    def _find_keywords(self, mensaje_lower: str) -> set:
+        """Keywords presentes en el mensaje (como substring), en una sola pasada"""
+        return self._automata.escanear(mensaje_lower).frases
+    
+    # =====================================================
+    # MEMBRESÍAS
+    # =====================================================
     
     def calculate_fuzzy_membership(self, mensaje: str, intent: str) -> float:
         """
@@ -149,63 +219,119 @@ class FuzzyIntentReasoner:
         Returns:
             float: Score difuso entre 0 y 1
         """
-        mensaje_lower = mensaje.lower()
-        palabras_mensaje = set(mensaje_lower.split())
-        
-        if intent not in self.keywords:
-            return 0.0
-        
-        total_score = 0.0
-        total_weight = 0.0
-        
-        for nivel, keywords in self.keywords[intent].items():
-            peso = self.weights[nivel]
-            
-            for keyword in keywords:
-                # Buscar keyword en mensaje (puede ser parte de palabra o frase)
-                if keyword in mensaje_lower:
-                    # NUEVO: Dar doble peso a frases multi-palabra (bigramas/trigramas)
-                    # Esto hace que "turno rapido" gane sobre "necesito" individual
-                    multiplicador = 2.0 if ' ' in keyword else 1.0
-                    total_score += peso * multiplicador
-                    total_weight += peso * multiplicador
-        
-        # Normalizar por el número de keywords encontradas
-        if total_weight > 0:
-            normalized_score = min(total_score / (total_weight + 1), 1.0)
-        else:
-            normalized_score = 0.0
-        
-        return normalized_score
+        return self.calculate_all_memberships(mensaje).get(intent, 0.0)
     
-    def calculate_all_memberships(self, mensaje: str) -> Dict[str, float]:
+    def calculate_all_memberships(self, mensaje: str, keywords: set = None) -> Dict[str, float]:
         """
         Calcula membresías difusas para todos los intents.
+        `keywords`: las keywords presentes, si quien llama ya recorrió el mensaje
+        con un autómata que las incluye (el orquestador las toma de AnalisisMensaje).
         
         Returns:
             Dict con intent: score
         """
+        # Aportes de cada intent a partir de las keywords encontradas
+        aportes = {}
+        if keywords is None:
+            keywords = self._find_keywords(mensaje.lower())
+        for keyword in keywords:
+            for intent, orden, aporte in self.keyword_index[keyword]:
+                aportes.setdefault(intent, []).append((orden, aporte))
+        
         memberships = {}
         
-        for intent in self.keywords.keys():
-            score = self.calculate_fuzzy_membership(mensaje, intent)
+        for intent in self.intents:
+            if intent not in aportes:
+                continue
+            # Sumar en el orden de FUZZY_KEYWORDS para obtener exactamente los mismos floats
+            total_weight = 0.0
+            for _, aporte in sorted(aportes[intent]):
+                total_weight += aporte
+            
+            # Normalizar por el número de keywords encontradas
+            score = min(total_weight / (total_weight + 1), 1.0)
             if score > 0:
                 memberships[intent] = score
         
         return memberships
     
-    def classify_with_fuzzy_logic(self, mensaje: str, threshold: float = 0.3) -> Tuple[str, float]:
+    # =====================================================
+    # MODO BATCH (MATRIZ DISPERSA)
+    # =====================================================
+    
+    def keyword_presence_matrix(self, mensajes: Sequence[str]) -> sparse.csr_matrix:
+        """Matriz dispersa mensajes x keywords con 1.0 donde la keyword aparece"""
+        indices, indptr = [], [0]
+        vistos = {}  # Los logs repiten mucho ("si", "hola"): cada texto se recorre una sola vez
+        for mensaje in mensajes:
+            mensaje_lower = mensaje.lower()
+            columnas = vistos.get(mensaje_lower)
+            if columnas is None:
+                columnas = [self.keyword_columns[k] for k in self._find_keywords(mensaje_lower)]
+                vistos[mensaje_lower] = columnas
+            indices.extend(columnas)
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.ones(len(indices)), indices, indptr),
+            shape=(len(mensajes), len(self.keyword_columns))
+        )
+    
+    def calculate_memberships_matrix(self, mensajes: Sequence[str]) -> np.ndarray:
+        """
+        Membresías de todos los mensajes a todos los intents de una vez.
+        
+        Returns:
+            np.ndarray (mensajes x intents, columnas en el orden de self.intents)
+        """
+        resultado = np.zeros((len(mensajes), len(self.intents)))
+        for inicio in range(0, len(mensajes), MENSAJES_POR_BLOQUE):
+            bloque = mensajes[inicio:inicio + MENSAJES_POR_BLOQUE]
+            aportes = (self.keyword_presence_matrix(bloque) @ self.weight_matrix).toarray()
+            aportes = aportes.reshape(len(bloque), len(self.intents), self._posiciones)
+            # cumsum suma en secuencia: mismos floats que el total escalar (sumar 0.0 no cambia nada)
+            totales = np.cumsum(aportes, axis=2)[:, :, -1]
+            resultado[inicio:inicio + len(bloque)] = np.minimum(totales / (totales + 1), 1.0)
+        return resultado
+    
+    def calculate_all_memberships_batch(self, mensajes: Sequence[str]) -> List[Dict[str, float]]:
+        """calculate_all_memberships para una lista de mensajes"""
+        scores = self.calculate_memberships_matrix(mensajes)
+        memberships = [{} for _ in range(len(mensajes))]
+        # Solo las celdas con score > 0 (por fila salen en el orden de self.intents)
+        filas, columnas = np.nonzero(scores > 0)
+        for fila, columna, score in zip(filas.tolist(), columnas.tolist(), scores[filas, columnas].tolist()):
+            memberships[fila][self.intents[columna]] = score
+        return memberships
+    
+    def classify_batch(self, mensajes: Sequence[str], threshold: float = 0.3) -> List[Tuple[str, float]]:
+        """classify_with_fuzzy_logic para una lista de mensajes (sin log por mensaje)"""
+        scores = self.calculate_memberships_matrix(mensajes)
+        mejores = scores.argmax(axis=1)  # Primer máximo, igual que max() sobre el dict ordenado
+        resultados = []
+        for fila, mejor in zip(scores.tolist(), mejores.tolist()):
+            score = fila[mejor]
+            if score <= 0:
+                resultados.append(("nlu_fallback", 0.0))
+            elif score >= threshold:
+                resultados.append((self.intents[mejor], score))
+            else:
+                resultados.append(("nlu_fallback", score))
+        return resultados
+    
+    def classify_with_fuzzy_logic(self, mensaje: str, threshold: float = 0.3,
+                                  keywords: set = None) -> Tuple[str, float]:
         """
         Clasifica mensaje usando lógica difusa.
         
         Args:
             mensaje: Texto a clasificar
             threshold: Umbral mínimo de confianza
+            keywords: Keywords ya encontradas en el mensaje (opcional, evita recorrerlo)
         
         Returns:
             (intent, confianza)
         """
-        memberships = self.calculate_all_memberships(mensaje)
+        memberships = self.calculate_all_memberships(mensaje, keywords)
         
         if not memberships:
             return ("nlu_fallback", 0.0)
@@ -303,14 +429,14 @@ score_aggregator = FuzzyScoreAggregator()
 # FUNCIONES PÚBLICAS
 # =====================================================
 
-def clasificar_con_logica_difusa(mensaje: str, threshold: float = 0.3) -> Tuple[str, float]:
+def clasificar_con_logica_difusa(mensaje: str, threshold: float = 0.3, keywords: set = None) -> Tuple[str, float]:
     """
     Clasifica mensaje usando razonamiento difuso.
     
     Returns:
         (intent, confianza_difusa)
     """
-    return fuzzy_reasoner.classify_with_fuzzy_logic(mensaje, threshold)
+    return fuzzy_reasoner.classify_with_fuzzy_logic(mensaje, threshold, keywords)
 
 def agregar_scores_difusos(contexto: float, regex: float, llm: float, fuzzy: float) -> float:
     """
@@ -330,6 +456,16 @@ def obtener_membresias_difusas(mensaje: str) -> Dict[str, float]:
     """
     return fuzzy_reasoner.calculate_all_memberships(mensaje)
 
+def clasificar_lote_con_logica_difusa(mensajes: Sequence[str], threshold: float = 0.3) -> List[Tuple[str, float]]:
+    """
+    Clasifica muchos mensajes a la vez (evaluación offline, reetiquetado de logs).
+    Mismos resultados que llamar a clasificar_con_logica_difusa por mensaje.
+    
+    Returns:
+        Lista de (intent, confianza_difusa)
+    """
+    return fuzzy_reasoner.classify_batch(list(mensajes), threshold)
+
 if __name__ == "__main__":
     # Test del razonador difuso
     print("🧪 Testing Fuzzy Intent Reasoner")
@@ -1,21 +1,173 @@
 # email_sender.py
 import smtplib
+import threading
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 import base64
 
+# Errores tras los cuales la sesión SMTP ya no sirve y hay que reconectar.
+# Las respuestas del servidor a un mensaje (destinatario/remitente rechazado,
+# error de datos) también son OSError, pero la sesión sigue sirviendo.
+SMTP_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+
+def is_connection_error(error):
+    """True si la conexión se perdió (socket, timeout, desconexión), no si el servidor respondió con error"""
+    if isinstance(error, SMTP_CONNECTION_ERRORS):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+# Sesión inactiva por más que esto: se verifica con NOOP antes de usarla.
+# Antes de eso se usa directo; si el servidor la cerró, _send_on_session reconecta.
+SMTP_NOOP_IDLE_SECONDS = 60
+
 class EmailNotificationSender:
-    def __init__(self, smtp_server, smtp_port, email, password):
+    def __init__(self, smtp_server, smtp_port, email, password, persistent=False):
+        """
+        persistent=True mantiene la sesión SMTP abierta entre envíos
+        (reconecta sola si el servidor la cierra). Llamar a close() al terminar.
+        """
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.email = email
         self.password = password
+        self.persistent = persistent
+        self._server = None
+        self._last_used = 0.0  # time.monotonic() del último uso de la sesión
+        self._lock = threading.Lock()
+    
+    # ==========================================
+    # CONEXIÓN SMTP
+    # ==========================================
+    
+    def _connect(self):
+        """Abre conexión, STARTTLS y login"""
+        print(f"📧 Conectando a SMTP {self.smtp_server}:{self.smtp_port}...")
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.starttls()
+        server.login(self.email, self.password)
+        print(f"✅ Sesión SMTP lista ({self.email})")
+        return server
+    
+    def _get_server(self):
+        """Devuelve la sesión abierta (NOOP solo si estuvo inactiva) o crea una nueva"""
+        if self._server is not None:
+            if time.monotonic() - self._last_used < SMTP_NOOP_IDLE_SECONDS:
+                return self._server
+            try:
+                status = self._server.noop()[0]
+                if status == 250:
+                    return self._server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._drop_server()
+        self._server = self._connect()
+        return self._server
+    
+    def _drop_server(self):
+        """Cierra la sesión actual sin propagar errores"""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                try:
+                    self._server.close()
+                except Exception:
+                    pass
+            self._server = None
+    
+    def close(self):
+        """Cierra la sesión SMTP persistente"""
+        with self._lock:
+            self._drop_server()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+    
+    def _send_on_session(self, msg):
+        """
+        Envía un mensaje sobre la sesión actual. Si la conexión se cayó,
+        reconecta una vez y reintenta; los rechazos del servidor se propagan
+        sin reenviar. Debe llamarse con self._lock tomado.
+        """
+        try:
+            self._get_server().send_message(msg)
+        except OSError as e:
+            if not is_connection_error(e):
+                raise
+            print(f"⚠️ Sesión SMTP perdida ({e}), reconectando...")
+            self._drop_server()
+            self._get_server().send_message(msg)
+        self._last_used = time.monotonic()
+    
+    # ==========================================
+    # ENVÍO
+    # ==========================================
     
     def send_confirmation_email(self, recipient_email, turno_data, qr_data):
         """
         Envía email de confirmación con QR
         """
+        msg = self.build_confirmation_message(recipient_email, turno_data, qr_data)
+        
+        # Enviar email
+        with self._lock:
+            try:
+                print(f"📤 Enviando email a {recipient_email}...")
+                self._send_on_session(msg)
+                print(f"✅ Email enviado exitosamente")
+                return True
+            except Exception as e:
+                print(f"❌ Error enviando email: {e}")
+                import traceback
+                print(f"❌ Traceback: {traceback.format_exc()}")
+                if is_connection_error(e):
+                    self._drop_server()
+                return False
+            finally:
+                if not self.persistent:
+                    self._drop_server()
+    
+    def send_many(self, items):
+        """
+        Envía un lote de emails de confirmación sobre una sola sesión SMTP.
+        
+        items: lista de (recipient_email, turno_data, qr_data)
+        Retorna lista de {'recipient': str, 'ok': bool, 'error': str | None}
+        en el mismo orden que items.
+        """
+        results = []
+        with self._lock:
+            try:
+                for recipient_email, turno_data, qr_data in items:
+                    try:
+                        msg = self.build_confirmation_message(recipient_email, turno_data, qr_data)
+                        self._send_on_session(msg)
+                        results.append({'recipient': recipient_email, 'ok': True, 'error': None})
+                    except smtplib.SMTPRecipientsRefused as e:
+                        # Destinatario rechazado: la sesión sigue sirviendo
+                        results.append({'recipient': recipient_email, 'ok': False, 'error': str(e)})
+                    except Exception as e:
+                        results.append({'recipient': recipient_email, 'ok': False, 'error': str(e)})
+                        if is_connection_error(e):
+                            self._drop_server()  # El siguiente envío reconecta
+            finally:
+                if not self.persistent:
+                    self._drop_server()
+        
+        enviados = sum(1 for r in results if r['ok'])
+        print(f"📤 Lote enviado: {enviados}/{len(results)} emails OK")
+        return results
+    
+    def build_confirmation_message(self, recipient_email, turno_data, qr_data):
+        """
+        Arma el mensaje MIME de confirmación con QR embebido
+        """
         msg = MIMEMultipart('related')
         msg['From'] = self.email
         msg['To'] = recipient_email
@@ -83,29 +235,4 @@ class EmailNotificationSender:
         qr_image.add_header('Content-ID', '<qr_code>')
         msg.attach(qr_image)
         
-        # Enviar email
-        try:
-            print(f"📧 Conectando a SMTP {self.smtp_server}:{self.smtp_port}...")
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            print(f"✅ Conexión establecida")
-            
-            print(f"🔒 Iniciando TLS...")
-            server.starttls()
-            print(f"✅ TLS activado")
-            
-            print(f"🔑 Autenticando con {self.email}...")
-            server.login(self.email, self.password)
-            print(f"✅ Autenticación exitosa")
-            
-            print(f"📤 Enviando email a {recipient_email}...")
-            server.send_message(msg)
-            print(f"✅ Email enviado exitosamente")
-            
-            server.quit()
-            print(f"✅ Conexión cerrada")
-            return True
-        except Exception as e:
-            print(f"❌ Error enviando email: {e}")
-            import traceback
-            print(f"❌ Traceback: {traceback.format_exc()}")
-            return False
\ No newline at end of file
+        return msg
@@ -1,48 +1,112 @@
 # qr_generator.py
 import qrcode
+from qrcode.exceptions import DataOverflowError
 import secrets
 import json
+import threading
 from io import BytesIO
 import base64
 
+# Largo de secrets.token_urlsafe(32)
+TOKEN_LENGTH = 43
+
+# Máscara fija: evita evaluar las 8 máscaras posibles en cada make()
+# (cualquier máscara es válida según el estándar; solo cambia el "penalty score")
+FAST_MASK_PATTERN = 0
+
 class QRConfirmationGenerator:
-    def __init__(self, base_url="http://localhost:5000"):
+    def __init__(self, base_url="http://localhost:5000", fast=True):
+        """
+        fast=True usa una versión de QR fija (calculada una sola vez para el
+        largo de la URL de confirmación), máscara fija y reutiliza el encoder.
+        fast=False conserva el comportamiento original (make(fit=True)).
+        """
         self.base_url = base_url
-    
+        self.fast = fast
+        self._lock = threading.Lock()
+        self._encoder = None
+        if fast:
+            self._encoder = qrcode.QRCode(
+                version=self._fixed_version(),
+                error_correction=qrcode.constants.ERROR_CORRECT_L,
+                box_size=10,
+                border=4,
+                mask_pattern=FAST_MASK_PATTERN,
+            )
+
+    def _fixed_version(self):
+        """Versión mínima que entra la URL más larga posible para este base_url"""
+        sample_url = f"{self.base_url}/confirmar_turno/{'x' * TOKEN_LENGTH}"
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L)
+        qr.add_data(sample_url)
+        qr.best_fit()
+        return qr.version
+
     def generate_confirmation_token(self):
         """Genera token único para confirmación"""
         return secrets.token_urlsafe(32)
-    
-    def generate_qr_confirmation(self, turno_data):
-        """
-        Genera QR con URL de confirmación
-        """
-        token = self.generate_confirmation_token()
-        
-        # URL que contiene token para confirmación
-        confirmation_url = f"{self.base_url}/confirmar_turno/{token}"
-        
-        # Crear QR
+
+    def _render_fast(self, data):
+        """Renderiza con el encoder reutilizable (versión y máscara fijas)"""
+        with self._lock:
+            qr = self._encoder
+            qr.clear()
+            qr.add_data(data)
+            try:
+                qr.make(fit=False)
+            except DataOverflowError:
+                # URL más larga que la prevista: caer al camino lento solo esta vez
+                return self._render_fit(data)
+            return qr.make_image(fill_color="black", back_color="white")
+
+    def _render_fit(self, data):
+        """Camino original: busca la versión mínima en cada llamada"""
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
             box_size=10,
             border=4,
         )
-        qr.add_data(confirmation_url)
+        qr.add_data(data)
         qr.make(fit=True)
-        
-        # Generar imagen
-        img = qr.make_image(fill_color="black", back_color="white")
-        
+        return qr.make_image(fill_color="black", back_color="white")
+
+    def generate_qr_confirmation(self, turno_data):
+        """
+        Genera QR con URL de confirmación
+        """
+        token = self.generate_confirmation_token()
+
+        # URL que contiene token para confirmación
+        confirmation_url = f"{self.base_url}/confirmar_turno/{token}"
+
+        # Crear QR y generar imagen
+        if self.fast:
+            img = self._render_fast(confirmation_url)
+        else:
+            img = self._render_fit(confirmation_url)
+
         # Convertir a base64 para email
         buffer = BytesIO()
         img.save(buffer, format='PNG')
         qr_base64 = base64.b64encode(buffer.getvalue()).decode()
-        
+
         return {
             'token': token,
             'qr_base64': qr_base64,
             'confirmation_url': confirmation_url,
             'turno_data': turno_data
-        }
\ No newline at end of file
+        }
+
+# Generadores compartidos por base_url (el encoder se reutiliza entre llamadas)
+_generators = {}
+_generators_lock = threading.Lock()
+
+def get_qr_generator(base_url="http://localhost:5000"):
+    """Devuelve el generador rápido compartido para ese base_url"""
+    with _generators_lock:
+        generator = _generators.get(base_url)
+        if generator is None:
+            generator = QRConfirmationGenerator(base_url=base_url)
+            _generators[base_url] = generator
+        return generator
@@ -27,6 +27,7 @@ import time
 import random
 from pathlib import Path
 from datetime import datetime
+from verificacion import verificar, terminar
 
 # =====================================================
 # CONFIGURACIÓN CON TUS CREDENCIALES EXACTAS
@@ -364,6 +365,72 @@ def evaluar_motor_difuso():
     
     return resultados
 
+def benchmark_latencia_motor(motor_module, repeticiones=300):
+    """
+    Latencia por llamada de calcular_espera / evaluar_recomendacion:
+    antes  = ControlSystemSimulation nueva por llamada sobre un ControlSystem estándar
+    después = sistemas compilados + simulación reutilizable (motor_difuso actual)
+    """
+    print("\n[TIME]  BENCHMARK LATENCIA MOTOR DIFUSO...")
+    
+    if not motor_module:
+        print("  [WARN]  Motor difuso no importado, se omite el benchmark")
+        return []
+    
+    from skfuzzy import control as ctrl
+    
+    # Sistemas sin compilar con las mismas reglas (camino original)
+    sistema_espera_std = ctrl.ControlSystem(list(motor_module.sistema_espera.rules))
+    sistema_rec_std = ctrl.ControlSystem(list(motor_module.sistema_recomendacion.rules))
+    
+    def espera_antes(ocupacion, urgencia, hora):
+        simulacion = ctrl.ControlSystemSimulation(sistema_espera_std)
+        simulacion.input['ocupacion'] = ocupacion
+        simulacion.input['urgencia'] = urgencia
+        simulacion.input['hora_dia'] = hora
+        simulacion.compute()
+        return round(simulacion.output['espera'], 1)
+    
+    def recomendacion_antes(ocupacion, hora):
+        simulacion = ctrl.ControlSystemSimulation(sistema_rec_std)
+        simulacion.input['ocupacion'] = ocupacion
+        simulacion.input['hora_dia'] = hora
+        simulacion.compute()
+        return round(simulacion.output['recomendacion'], 1)
+    
+    generador = random.Random(42)
+    casos = [(generador.uniform(0, 100), generador.uniform(0, 10), generador.uniform(7, 17))
+             for _ in range(repeticiones)]
+    
+    def medir(funcion, argumentos):
+        inicio = time.perf_counter()
+        for args in argumentos:
+            try:
+                funcion(*args)
+            except Exception:
+                pass  # Combinaciones sin reglas activas: mismo costo de cálculo
+        return (time.perf_counter() - inicio) * 1000 / len(argumentos)
+    
+    args_recomendacion = [(o, h) for o, _, h in casos]
+    resultados = [
+        {'funcion': 'calcular_espera',
+         'antes_ms': medir(espera_antes, casos),
+         'despues_ms': medir(motor_module.calcular_espera, casos)},
+        {'funcion': 'evaluar_recomendacion',
+         'antes_ms': medir(recomendacion_antes, args_recomendacion),
+         'despues_ms': medir(motor_module.evaluar_recomendacion, args_recomendacion)},
+    ]
+    
+    for r in resultados:
+        r['speedup'] = r['antes_ms'] / r['despues_ms'] if r['despues_ms'] else 0
+        print(f"  {r['funcion']:<22} antes: {r['antes_ms']:6.2f} ms | "
+              f"después: {r['despues_ms']:6.2f} ms | {r['speedup']:.1f}x")
+    
+    iguales = sum(espera_antes(*c) == motor_module.calcular_espera(*c) for c in casos[:50])
+    verificar(f"Mismo resultado en {iguales}/50 casos de calcular_espera", iguales == 50)
+    
+    return resultados
+
 def medir_tiempos_bd(bd_conectada, config_bd):
     """Mide tiempos reales de base de datos"""
     print("\n[TIME]  MIDIENDO TIEMPOS DE BASE DE DATOS...")
@@ -660,6 +727,10 @@ def main():
     # Evaluar motor difuso
     resultados_motor = evaluar_motor_difuso()
     
+    # Latencia por llamada del motor (antes/después de compilar los sistemas)
+    motor_module, _ = importar_motor_difuso()
+    latencias_motor = benchmark_latencia_motor(motor_module)
+    
     # Medir tiempos del sistema
     tiempos_sistema = medir_tiempos_sistema(servidor_rasa, bd_conectada, config_bd)
     
@@ -690,6 +761,9 @@ def main():
     ])
     df_tiempos.to_csv(OUTPUT_DIR / "tiempos_sistema_CORREGIDO.csv", index=False)
     
+    if latencias_motor:
+        pd.DataFrame(latencias_motor).to_csv(OUTPUT_DIR / "latencia_motor_CORREGIDO.csv", index=False)
+    
     generar_graficos_corregidos(resultados_motor, tiempos_sistema)
     generar_reporte_corregido(resultados_motor, tiempos_sistema, servidor_rasa, bd_conectada, motor_real)
     
@@ -699,6 +773,7 @@ def main():
     print("[*] Archivos generados:")
     print(f"   [*] resultados_motor_CORREGIDO.csv")
     print(f"   [*] tiempos_sistema_CORREGIDO.csv")
+    print(f"   [*] latencia_motor_CORREGIDO.csv")
     print(f"   [NOTE] reporte_motor_CORREGIDO.md")
     print(f"   [STATS] graficos_motor_CORREGIDO.png")
     
@@ -711,7 +786,8 @@ def main():
 
 if __name__ == "__main__":
     try:
-    main()
+        main()
+        terminar()
     except Exception as e:
         print(f"[ERROR] {type(e).__name__}: {str(e)}")
         import traceback
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Test del almacén de sesiones (almacen_sesiones.py) que reemplaza al dict SESSION_CONTEXTS
+Verifica desalojo LRU por capacidad, expiración por inactividad, el barrido en
+segundo plano, la interfaz de dict que usan app.py y los tests, y las métricas.
+
+Ejecutar: python tests/test_almacen_sesiones.py
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+from almacen_sesiones import AlmacenSesiones
+from verificacion import verificar, terminar
+
+class ContextoFalso:
+    """Imita a SessionContext: se crea con el session_id"""
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.conversacion_historial = []
+
+print("=" * 60)
+print("TEST: Almacén de sesiones")
+print("=" * 60)
+
+print("\n[Test 1] Obtener o crear")
+almacen = AlmacenSesiones(capacidad=3, ttl=60, barrido_seg=60)
+contexto, creado = almacen.obtener_o_crear('web_1', ContextoFalso)
+verificar("primera vez se crea", creado and contexto.session_id == 'web_1')
+otra_vez, creado = almacen.obtener_o_crear('web_1', ContextoFalso)
+verificar("segunda vez devuelve el mismo objeto", not creado and otra_vez is contexto)
+
+print("\n[Test 2] Desalojo LRU por capacidad")
+almacen.obtener_o_crear('web_2', ContextoFalso)
+almacen.obtener_o_crear('web_3', ContextoFalso)
+almacen.obtener_o_crear('web_1', ContextoFalso)  # web_1 pasa a ser la más reciente
+almacen.obtener_o_crear('web_4', ContextoFalso)
+verificar("nunca más sesiones que la capacidad", len(almacen) == 3)
+verificar("sale la usada hace más tiempo (web_2)", 'web_2' not in almacen and 'web_1' in almacen)
+verificar("desalojo contado en métricas", almacen.metricas()['desalojadas'] == 1)
+
+print("\n[Test 3] Expiración por inactividad")
+almacen = AlmacenSesiones(capacidad=100, ttl=0.2, barrido_seg=60)
+almacen.obtener_o_crear('vieja', ContextoFalso)
+almacen.obtener_o_crear('activa', ContextoFalso)
+time.sleep(0.12)
+almacen['activa']  # Leer cuenta como actividad
+time.sleep(0.12)
+verificar("la sesión inactiva expira al leerla", 'vieja' not in almacen)
+verificar("la sesión usada sigue viva", 'activa' in almacen)
+_, creado = almacen.obtener_o_crear('vieja', ContextoFalso)
+verificar("una sesión expirada vuelve a crearse de cero", creado)
+
+print("\n[Test 4] Barrido en segundo plano")
+almacen = AlmacenSesiones(capacidad=1000, ttl=0.1, barrido_seg=0.05)
+for i in range(200):
+    almacen.obtener_o_crear(f'web_{i}', ContextoFalso)
+verificar("el barrido arranca con la primera sesión", almacen._hilo is not None and almacen._hilo.is_alive())
+time.sleep(0.4)
+metricas = almacen.metricas()
+verificar("el barrido liberó todas las sesiones inactivas", len(almacen) == 0)
+verificar(f"expiradas contadas ({metricas['expiradas']})", metricas['expiradas'] == 200)
+almacen.detener()
+almacen = AlmacenSesiones(capacidad=10, ttl=60, barrido_seg=60)
+almacen['web_1'] = ContextoFalso('web_1')
+verificar("también arranca al guardar con almacen[id] = ...", almacen._hilo is not None and almacen._hilo.is_alive())
+almacen.detener()
+
+print("\n[Test 5] Interfaz de dict (app.py y tests existentes)")
+almacen = AlmacenSesiones(capacidad=10, ttl=60)
+almacen['a'] = ContextoFalso('a')
+verificar("in / [] / get", 'a' in almacen and almacen['a'].session_id == 'a' and almacen.get('x') is None)
+del almacen['a']
+verificar("del", 'a' not in almacen)
+try:
+    almacen['a']
+    verificar("KeyError si no existe", False)
+except KeyError:
+    verificar("KeyError si no existe", True)
+almacen['b'] = ContextoFalso('b')
+verificar("keys / items", almacen.keys() == ['b'] and almacen.items()[0][0] == 'b')
+almacen.clear()
+verificar("clear", len(almacen) == 0)
+
+print("\n[Test 6] Concurrencia: una sola creación por sesión")
+almacen = AlmacenSesiones(capacidad=100, ttl=60)
+creados = []
+def pedir():
+    for i in range(50):
+        _, creado = almacen.obtener_o_crear(f'web_{i % 10}', ContextoFalso)
+        if creado:
+            creados.append(i)
+hilos = [threading.Thread(target=pedir) for _ in range(8)]
+for hilo in hilos:
+    hilo.start()
+for hilo in hilos:
+    hilo.join()
+verificar("10 sesiones creadas una sola vez cada una", len(creados) == 10 and len(almacen) == 10)
+
+print("\n[Test 7] Métricas")
+metricas = almacen.metricas()
+print(f"   {metricas}")
+verificar("vivas / creadas / hits", metricas['vivas'] == 10 and metricas['creadas'] == 10 and metricas['hits'] == 390)
+
+terminar()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Test del análisis de mensaje compartido (analisis_mensaje.AnalisisMensaje)
+Verifica que cada campo sea exactamente lo que cada etapa derivaba por su cuenta
+(lower/strip/split, findall de números, .search() de email, fecha y hora) sobre
+los ejemplos de data/nlu.yml, que un solo autómata con frases y keywords difusas
+encuentre las mismas keywords que el razonador, los spans, el cálculo perezoso
+y cuánto CPU se ahorra por mensaje frente a re-derivar todo en cada etapa.
+
+Ejecutar: python tests/test_analisis_mensaje.py
+"""
+
+import sys
+import re
+import time
+import logging
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+from datetime import datetime
+
+from analisis_mensaje import AnalisisMensaje, RE_EMAIL, RE_GRUPOS_NUMERICOS
+from automata_frases import AutomataFrases
+from parser_temporal import interpretar_fecha_hora, GRUPOS_TEMPORALES
+from razonamiento_difuso import fuzzy_reasoner, FUZZY_KEYWORDS
+from verificacion import verificar, terminar
+
+logging.disable(logging.CRITICAL)
+
+REPETICIONES = 20
+
+def ejemplos_nlu():
+    """Ejemplos de data/nlu.yml sin anotaciones de entidades"""
+    ejemplos = []
+    with open(PROJECT_ROOT / 'data' / 'nlu.yml', encoding='utf-8') as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea.startswith('- ') and not linea.startswith('- intent'):
+                ejemplos.append(re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', linea[2:]))
+    return ejemplos
+
+def span(match):
+    return match.span() if match else None
+
+# Las reglas de contexto se representan con un autómata de tamaño parecido a AUTOMATA_FRASES;
+# en el orquestador las keywords difusas se agregan a ese mismo autómata (grupo 'keyword_difusa')
+KEYWORDS_DIFUSAS = frozenset(fuzzy_reasoner.keyword_index)
+GRUPOS_REGLAS = {intent: [k.upper() + ' ' + k for lista in niveles.values() for k in lista]
+                 for intent, niveles in FUZZY_KEYWORDS.items()}
+AUTOMATA_REGLAS = AutomataFrases(GRUPOS_REGLAS, sin_acentos=True)
+AUTOMATA_COMBINADO = AutomataFrases(dict(GRUPOS_REGLAS, keyword_difusa=KEYWORDS_DIFUSAS, **GRUPOS_TEMPORALES),
+                                    sin_acentos=True)
+AHORA = datetime(2025, 11, 17, 10, 0)  # Lunes
+
+def derivar_por_etapa(mensaje):
+    """Lo que procesar_mensaje_inteligente re-derivaba en cada etapa antes del análisis compartido"""
+    mensaje_lower = mensaje.lower().strip()      # _clasificar_por_contexto
+    AUTOMATA_REGLAS.escanear(mensaje_lower)
+    mensaje_lower.strip().split()                # palabras (reglas de contexto)
+    mensaje_lower = mensaje.lower().strip()      # clasificar → _clasificar_en_cascada
+    palabras = mensaje_lower.strip().split()     # _clasificar_por_patrones
+    if len(palabras) <= 2:
+        [p.lower().strip('¿?¡!.,') for p in palabras]
+    fuzzy_reasoner._find_keywords(mensaje.lower())  # razonador difuso: su propio recorrido
+    mensaje.lower()                              # extraer_entidades
+    RE_GRUPOS_NUMERICOS.findall(mensaje)
+    interpretar_fecha_hora(mensaje.lower(), ahora=AHORA)
+    RE_EMAIL.search(mensaje)
+    mensaje.lower()                              # es_comando_cambio
+    mensaje.lower()                              # generar_respuesta_inteligente
+
+def analizar_una_vez(mensaje):
+    """Lo mismo con un AnalisisMensaje compartido"""
+    analisis = AnalisisMensaje(mensaje, AUTOMATA_COMBINADO)
+    analisis.frases
+    analisis.tokens
+    if len(analisis.tokens) <= 2:
+        analisis.tokens_limpios
+    analisis.frases.frases & KEYWORDS_DIFUSAS
+    analisis.numeros
+    analisis.fecha_hora(ahora=AHORA)
+    analisis.email
+
+def cpu_por_mensaje(funcion, mensajes):
+    inicio = time.process_time()
+    for _ in range(REPETICIONES):
+        for m in mensajes:
+            funcion(m)
+    return (time.process_time() - inicio) * 1e6 / (REPETICIONES * len(mensajes))
+
+print("=" * 60)
+print("TEST: Análisis de mensaje compartido")
+print("=" * 60)
+
+ejemplos = ejemplos_nlu() + ['Juan Pérez, 4.567.890, 15/11/2025 a las 9:30', 'mi correo es ana@mail.com  ',
+                             '  ¿HOY?  ', '1 2 3 4 5 6 7', '¡Mañana a las 14:00!']
+
+print(f"\n[Test 1] Mismos valores que cada etapa derivaba ({len(ejemplos)} mensajes)")
+distintos = []
+for m in ejemplos:
+    a = AnalisisMensaje(m)
+    iguales = (
+        a.lower == m.lower() and a.normalizado == m.lower().strip() and
+        list(a.tokens) == m.lower().strip().split() and
+        list(a.tokens) == [p.lower() for p in m.split()] and
+        list(a.tokens_originales) == m.split() and
+        list(a.tokens_limpios) == [p.lower().strip('¿?¡!.,') for p in m.strip().split()] and
+        [g.group() for g in a.numeros] == RE_GRUPOS_NUMERICOS.findall(m) and
+        span(a.email) == span(RE_EMAIL.search(m)) and
+        repr(AnalisisMensaje(m, AUTOMATA_COMBINADO).fecha_hora(ahora=AHORA)) == repr(interpretar_fecha_hora(m.lower(), ahora=AHORA))
+    )
+    if not iguales:
+        distintos.append(m)
+verificar(f"{len(ejemplos) - len(distintos)}/{len(ejemplos)} iguales", not distintos)
+
+print("\n[Test 2] Spans y formas normalizadas")
+a = AnalisisMensaje('Turno el 15/11 a las 09:30, mi mail es Ana@Mail.com. ¿Se puede el miércoles?')
+verificar("email con span y mayúsculas originales", a.email.group(0) == 'Ana@Mail.com' and a.email.span() == (39, 51))
+verificar("sin email → None", AnalisisMensaje('hola').email is None)
+verificar("números con span", [(n.group(), n.start()) for n in a.numeros] == [('15', 9), ('11', 12), ('09', 21), ('30', 24)])
+verificar("sin acentos ni ñ, mismo largo", AnalisisMensaje('Miércoles, MAÑANA último').sin_acentos == 'miercoles, manana ultimo')
+t = AnalisisMensaje('  El Miércoles a las 9:30', AUTOMATA_COMBINADO).fecha_hora(ahora=AHORA)
+verificar("fecha y hora con spans sobre el mensaje original",
+          (t.fecha, t.fecha_span, t.hora, t.hora_span) == ('2025-11-19', (5, 14), '09:30', (21, 25)))
+a_temporal = AnalisisMensaje('mañana por la tarde, manana', AUTOMATA_COMBINADO)
+verificar("una sola frase para 'mañana' y 'manana'",
+          a_temporal.frases.frases & {'manana', 'mañana'} == {'manana'} and 'tiempo_franja_tarde' in a_temporal.frases)
+verificar("el resultado queda en el análisis", a_temporal.fecha_hora(ahora=AHORA) is a_temporal.temporal)
+verificar("tokens inmutables", isinstance(a.tokens, tuple) and isinstance(a.tokens_limpios, tuple))
+
+print("\n[Test 3] Un solo recorrido para reglas y keywords difusas")
+distintos = [m for m in ejemplos
+             if AnalisisMensaje(m, AUTOMATA_COMBINADO).frases.frases & KEYWORDS_DIFUSAS != fuzzy_reasoner._find_keywords(m.lower())]
+verificar(f"mismas keywords que el recorrido propio del razonador en {len(ejemplos) - len(distintos)}/{len(ejemplos)}",
+          not distintos)
+distintos = [m for m in ejemplos
+             if fuzzy_reasoner.classify_with_fuzzy_logic(m, 0.3, AnalisisMensaje(m, AUTOMATA_COMBINADO).frases.frases & KEYWORDS_DIFUSAS)
+             != fuzzy_reasoner.classify_with_fuzzy_logic(m, 0.3)]
+verificar("misma clasificación difusa pasando las keywords", not distintos)
+
+print("\n[Test 4] Cálculo perezoso y frases clave")
+automata = AutomataFrases({'saludo': ['hola', 'buenas'], 'turno': ['turno']})
+a = AnalisisMensaje('  Hola, quiero un TURNO ', automata)
+verificar("lo opcional no se calcula hasta que una etapa lo pide",
+          not {'tokens_originales', 'tokens_limpios', 'expresiones_temporales'} & set(vars(a)))
+a.tokens_limpios
+verificar("y queda guardado en la instancia", 'tokens_limpios' in vars(a))
+verificar("frases del autómata sobre el texto normalizado", 'saludo' in a.frases and 'turno' in a.frases)
+verificar("sin autómata → None", AnalisisMensaje('hola').frases is None)
+
+print(f"\n[Test 5] CPU por mensaje ({REPETICIONES} pasadas sobre {len(ejemplos)} mensajes)")
+dos_recorridos = cpu_por_mensaje(lambda m: (AUTOMATA_REGLAS.escanear(m.lower().strip()),
+                                            fuzzy_reasoner._find_keywords(m.lower())), ejemplos)
+un_recorrido = cpu_por_mensaje(lambda m: AUTOMATA_COMBINADO.escanear(m.lower().strip()), ejemplos)
+print(f"   frases + keywords: {dos_recorridos:.2f} µs/msg en dos recorridos | {un_recorrido:.2f} µs/msg en uno")
+verificar("un solo recorrido cuesta menos que dos", un_recorrido < dos_recorridos)
+antes = cpu_por_mensaje(derivar_por_etapa, ejemplos)
+ahora = cpu_por_mensaje(analizar_una_vez, ejemplos)
+print(f"   todo lo que derivaban las etapas: {antes:.2f} µs/msg | análisis compartido: {ahora:.2f} µs/msg "
+      f"| ahorro {antes - ahora:.2f} µs/msg")
+
+terminar()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Test del backend de sesiones compartido (backend_sesiones.py)
+Verifica el versionado optimista de BackendLocal (el mismo contrato que cumplen
+Postgres y Redis), la fusión de dos workers que guardan la misma sesión a la vez
+y la fábrica según SESIONES_BACKEND.
+
+Ejecutar: python tests/test_backend_sesiones.py
+"""
+
+import sys
+import json
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+from backend_sesiones import BackendLocal, ConflictoVersion, crear_backend_sesiones, SESIONES_REINTENTOS
+from almacen_sesiones import AlmacenSesiones
+from verificacion import verificar, terminar
+
+def fusionar(base, mio, remoto):
+    """Fusión de 3 vías de SessionContext.fusionar: lo que cambié gano yo, el resto viene de remoto"""
+    base, mio, remoto = json.loads(base), json.loads(mio), json.loads(remoto)
+    return {k: mio.get(k) if mio.get(k) != base.get(k) else remoto.get(k) for k in set(mio) | set(remoto)}
+
+def guardar_fusionando(backend, session_id, version, base, datos):
+    """Lo que hace guardar_contexto del orquestador: guardar y, ante conflicto, recargar y fusionar"""
+    for _ in range(SESIONES_REINTENTOS + 1):
+        try:
+            return backend.guardar(session_id, json.dumps(datos), version), datos
+        except ConflictoVersion:
+            version, remoto = backend.cargar(session_id)
+            datos = fusionar(base, json.dumps(datos), remoto)
+            base = remoto
+    return None, datos
+
+print("=" * 60)
+print("TEST: Backend de sesiones compartido")
+print("=" * 60)
+
+print("\n[Test 1] Cargar y guardar con versión")
+backend = BackendLocal()
+verificar("sesión inexistente → None", backend.cargar('web_1') is None)
+v1 = backend.guardar('web_1', '{"nombre":"Ana"}', 0)
+verificar("sesión nueva queda en versión 1", v1 == 1 and backend.cargar('web_1') == (1, '{"nombre":"Ana"}'))
+v2 = backend.guardar('web_1', '{"nombre":"Ana","cedula":"123"}', v1)
+verificar("cada guardado sube la versión", v2 == 2)
+
+print("\n[Test 2] Conflictos de versión")
+try:
+    backend.guardar('web_1', '{}', v1)  # Otro worker que leyó la versión 1
+    verificar("guardar con versión vieja falla", False)
+except ConflictoVersion:
+    verificar("guardar con versión vieja falla", True)
+try:
+    backend.guardar('web_1', '{}', 0)  # Dos workers creando la misma sesión
+    verificar("crear una sesión que ya existe falla", False)
+except ConflictoVersion:
+    verificar("crear una sesión que ya existe falla", True)
+verificar("el dato guardado no se pisó", backend.cargar('web_1')[1] == '{"nombre":"Ana","cedula":"123"}')
+
+print("\n[Test 3] Expiración y eliminación")
+backend_ttl = BackendLocal(AlmacenSesiones(capacidad=10, ttl=0))
+backend_ttl.guardar('web_2', '{}', 0)
+verificar("sesión vencida → None, y se puede crear de nuevo",
+          backend_ttl.cargar('web_2') is None and backend_ttl.guardar('web_2', '{}', 0) == 1)
+backend.eliminar('web_1')
+verificar("eliminar", backend.cargar('web_1') is None)
+
+print("\n[Test 4] Dos workers procesan mensajes de la misma sesión a la vez")
+backend = BackendLocal()
+backend.guardar('web_3', '{"nombre":"Ana","fecha":null}', 0)
+version_a, base_a = backend.cargar('web_3')  # Worker A: mensaje con la fecha
+version_b, base_b = backend.cargar('web_3')  # Worker B: mensaje con la cédula
+version, _ = guardar_fusionando(backend, 'web_3', version_b, base_b, {'nombre': 'Ana', 'fecha': None, 'cedula': '123'})
+verificar("el primero en guardar no tiene conflicto", version == 2)
+version, datos = guardar_fusionando(backend, 'web_3', version_a, base_a, {'nombre': 'Ana', 'fecha': '2025-11-10'})
+verificar("el segundo choca, fusiona y guarda", version == 3 and backend.metricas()['conflictos'] == 1)
+verificar(f"ningún cambio perdido: {datos}", datos == {'nombre': 'Ana', 'fecha': '2025-11-10', 'cedula': '123'})
+
+barrera = threading.Barrier(4)
+def worker(n):
+    barrera.wait()
+    for i in range(25):
+        version, base = backend.cargar('web_3')
+        guardar_fusionando(backend, 'web_3', version, base, dict(json.loads(base), **{f'campo_{n}': i}))
+hilos = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+for hilo in hilos:
+    hilo.start()
+for hilo in hilos:
+    hilo.join()
+version, datos = backend.cargar('web_3')
+metricas = backend.metricas()
+print(f"   {metricas}")
+verificar("4 hilos x 25 guardados: todos los campos en su último valor",
+          all(json.loads(datos)[f'campo_{n}'] == 24 for n in range(4)))
+verificar("una versión por guardado exitoso", version == metricas['guardados'])
+
+print("\n[Test 5] Fábrica")
+verificar("memoria → None (contextos vivos en el proceso)", crear_backend_sesiones('memoria') is None)
+verificar("local → BackendLocal", isinstance(crear_backend_sesiones('local'), BackendLocal))
+verificar("desconocido → None", crear_backend_sesiones('otro') is None)
+
+terminar()
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark de notificaciones: CPU por email antes y después del camino rápido
+- QR: make(fit=True) con encoder nuevo vs versión/máscara fija con encoder reutilizado
+- Email completo: mismo build_confirmation_message en ambos lados, solo cambia el QR
+No envía emails: solo mide generación de QR + armado del mensaje MIME.
+
+Ejecutar: python tests/test_benchmark_notificaciones.py
+"""
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import time
+
+# Agregar path para importar módulos
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'notificaciones'))
+
+from qr_generator import QRConfirmationGenerator
+from email_sender import EmailNotificationSender
+
+N = int(os.getenv('BENCH_N', 200))
+BASE_URL = os.getenv('BASE_URL', 'http://localhost:5000')
+
+TURNO = {
+    'nombre': 'Juan Pérez',
+    'cedula': '4567890',
+    'fecha': '2025-11-20',
+    'hora': '09:30',
+    'numero_turno': '1234',
+    'codigo_turno': 'ABC123',
+    'turno_id': 1234
+}
+
+def medir(nombre, funcion):
+    """Ejecuta funcion N veces y devuelve ms de CPU por llamada"""
+    funcion()  # Calentamiento
+    inicio = time.process_time()
+    for _ in range(N):
+        funcion()
+    ms = (time.process_time() - inicio) * 1000 / N
+    print(f"   {nombre:<45} {ms:8.3f} ms/email")
+    return ms
+
+print("[BENCH] MICRO-BENCHMARK DE NOTIFICACIONES")
+print("=" * 70)
+print(f"   Iteraciones: {N}   BASE_URL: {BASE_URL}")
+
+sender = EmailNotificationSender('smtp.invalid', 587, 'bench@example.com', 'x')
+qr_lento = QRConfirmationGenerator(base_url=BASE_URL, fast=False)
+qr_rapido = QRConfirmationGenerator(base_url=BASE_URL, fast=True)
+
+print("\n1. Generación de QR")
+antes_qr = medir("QR make(fit=True) (antes)", lambda: qr_lento.generate_qr_confirmation(TURNO))
+despues_qr = medir("QR versión fija + encoder reutilizado", lambda: qr_rapido.generate_qr_confirmation(TURNO))
+
+print("\n2. Email completo (QR + mensaje MIME)")
+antes = medir("antes", lambda: sender.build_confirmation_message(
+    'a@b.com', TURNO, qr_lento.generate_qr_confirmation(TURNO)))
+despues = medir("después", lambda: sender.build_confirmation_message(
+    'a@b.com', TURNO, qr_rapido.generate_qr_confirmation(TURNO)))
+
+print("\n" + "=" * 70)
+print(f"[OK] QR: {antes_qr / despues_qr:.1f}x más rápido   Email completo: {antes / despues:.1f}x más rápido")
+print("=" * 70)
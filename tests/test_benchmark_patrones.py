@@ -0,0 +1,97 @@
+"""
+Benchmark de la etapa de patrones regex del clasificador
+Mide mensajes/segundo de _clasificar_por_patrones sobre los ejemplos de data/nlu.yml
+y lo compara con el recorrido original (re.search por patrón, dos veces por match).
+También verifica que ambos den exactamente el mismo intent y score.
+
+Ejecutar: python tests/test_benchmark_patrones.py
+"""
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import re
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+from orquestador_inteligente import (
+    ClasificadorIntentsMejorado,
+    PALABRAS_EXACTAS_INTENT,
+    INTENTS_PRIORITARIOS
+)
+
+REPETICIONES = int(os.getenv('BENCH_REPETICIONES', 5))
+
+def cargar_ejemplos_nlu():
+    """Ejemplos de data/nlu.yml sin anotaciones de entidades"""
+    ejemplos = []
+    with open(PROJECT_ROOT / 'data' / 'nlu.yml', encoding='utf-8') as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea.startswith('- ') and not linea.startswith('- intent'):
+                ejemplos.append(re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', linea[2:]))
+    return ejemplos
+
+def clasificar_original(mensaje):
+    """Recorrido original: re.search sin precompilar, dos veces por patrón que matchea"""
+    palabras_mensaje = mensaje.strip().split()
+    if len(palabras_mensaje) <= 2:
+        for palabra in palabras_mensaje:
+            palabra_lower = palabra.lower().strip('¿?¡!.,')
+            if palabra_lower in PALABRAS_EXACTAS_INTENT:
+                return PALABRAS_EXACTAS_INTENT[palabra_lower], 0.96
+    if len(palabras_mensaje) == 1 and palabras_mensaje[0].lower() == 'hoy':
+        return 'consultar_disponibilidad', 0.93
+
+    patrones_intent = ClasificadorIntentsMejorado.PATRONES_INTENT
+    for intent in INTENTS_PRIORITARIOS:
+        for patron in patrones_intent.get(intent, []):
+            if re.search(patron, mensaje, re.IGNORECASE):
+                match = re.search(patron, mensaje, re.IGNORECASE)
+                return intent, min(0.95, len(match.group()) / len(mensaje) + 0.5)
+
+    mejor_intent, mejor_score = None, 0.0
+    for intent, patrones in patrones_intent.items():
+        if intent in INTENTS_PRIORITARIOS:
+            continue
+        for patron in patrones:
+            if re.search(patron, mensaje, re.IGNORECASE):
+                match = re.search(patron, mensaje, re.IGNORECASE)
+                score = min(0.95, len(match.group()) / len(mensaje) + 0.3)
+                if score > mejor_score:
+                    mejor_score, mejor_intent = score, intent
+    return mejor_intent or 'nlu_fallback', mejor_score
+
+def medir(nombre, funcion, ejemplos):
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        for mensaje in ejemplos:
+            funcion(mensaje)
+    segundos = time.perf_counter() - inicio
+    mps = REPETICIONES * len(ejemplos) / segundos
+    print(f"   {nombre:<35} {mps:10.0f} mensajes/seg")
+    return mps
+
+print("\n" + "=" * 70)
+print("BENCHMARK: ETAPA DE PATRONES REGEX")
+print("=" * 70)
+
+ejemplos = cargar_ejemplos_nlu()
+clasificador = ClasificadorIntentsMejorado()
+print(f"   Ejemplos: {len(ejemplos)}   Repeticiones: {REPETICIONES}\n")
+
+diferencias = [m for m in ejemplos if clasificar_original(m) != clasificador._clasificar_por_patrones(m)]
+if diferencias:
+    print(f"[FAIL] {len(diferencias)} mensajes con resultado distinto, ej: {diferencias[:3]}")
+else:
+    print("[OK] Mismo intent y score que el recorrido original en todos los ejemplos\n")
+
+antes = medir("Original (re.search x2)", clasificar_original, ejemplos)
+despues = medir("Banco precompilado", clasificador._clasificar_por_patrones, ejemplos)
+
+print("\n" + "=" * 70)
+print(f"[OK] Speedup: {despues / antes:.1f}x")
+print("=" * 70)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Test del cache LRU+TTL de respuestas del LLM (cache_llm.py)
+No necesita LM Studio: verifica normalización, contexto, LRU, TTL y persistencia.
+
+Ejecutar: python tests/test_cache_llm.py
+"""
+
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+from cache_llm import CacheLLM
+from verificacion import verificar, terminar
+
+print("=" * 60)
+print("TEST: Cache de respuestas del LLM")
+print("=" * 60)
+
+print("\n[Test 1] Mensaje normalizado + contexto")
+cache = CacheLLM('test')
+cache.guardar('hola', ['greet', 0.85])
+cache.guardar('1234567', ['informar_cedula', 0.85], ' [CONTEXTO: Ya tenemos nombre, ahora esperamos cédula]')
+verificar("'Hola  ' usa la entrada de 'hola'", cache.obtener('Hola  ') == ['greet', 0.85])
+verificar("mismo mensaje con otro contexto es miss",
+          cache.obtener('1234567') is None)
+verificar("mismo mensaje y contexto es hit",
+          cache.obtener('1234567', ' [CONTEXTO: Ya tenemos nombre, ahora esperamos cédula]') == ['informar_cedula', 0.85])
+
+print("\n[Test 2] Desalojo LRU")
+cache = CacheLLM('test', capacidad=2)
+cache.guardar('a', 1)
+cache.guardar('b', 2)
+cache.obtener('a')  # 'a' pasa a ser el más usado
+cache.guardar('c', 3)
+verificar("se desaloja el menos usado ('b')", cache.obtener('b') is None)
+verificar("'a' y 'c' siguen", cache.obtener('a') == 1 and cache.obtener('c') == 3)
+
+print("\n[Test 3] Expiración por TTL")
+cache = CacheLLM('test', ttl=0.05)
+cache.guardar('cuanto cuesta', ['consultar_costo', 0.85])
+time.sleep(0.1)
+verificar("entrada vencida es miss", cache.obtener('cuanto cuesta') is None)
+verificar("se cuenta como expirada", cache.metricas()['expirados'] == 1)
+
+print("\n[Test 4] Persistencia en disco")
+archivo = os.path.join(tempfile.mkdtemp(), 'cache_llm_test.json')
+cache = CacheLLM('test', archivo=archivo)
+cache.guardar('que hay hoy', ['consultar_disponibilidad', 0.85])
+cache.guardar_en_disco()
+reiniciado = CacheLLM('test', archivo=archivo)
+verificar("tras 'reiniciar' la entrada sigue",
+          reiniciado.obtener('que hay hoy') == ['consultar_disponibilidad', 0.85])
+
+print("\n[Test 5] Métricas")
+metricas = reiniciado.metricas()
+print(f"   {metricas}")
+verificar("hit_rate calculado", metricas['hit_rate'] == 1.0)
+
+terminar()
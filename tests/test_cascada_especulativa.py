@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Test del modo especulativo de la cascada (LLM_ESPECULATIVO=1)
+Con un LLM de prueba lento verifica que el clasificador respeta LLM_PRESUPUESTO_MS,
+que decide con regex/fuzzy sin esperar al LLM, que la llamada especulativa en cola
+se cancela, y que la fuente de la decisión queda en metadata y en metricas_cascada.
+
+Ejecutar: python tests/test_cascada_especulativa.py
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+# Antes de importar el orquestador: modo especulativo, presupuesto corto y un solo worker
+os.environ['LLM_ESPECULATIVO'] = '1'
+os.environ['LLM_PRESUPUESTO_MS'] = '200'
+os.environ['LLM_WORKERS'] = '1'
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+from orquestador_inteligente import ClasificadorIntentsMejorado, SessionContext, metricas_cascada
+from verificacion import verificar, terminar
+
+LLM_DEMORA_SEG = 1.0
+INTENT_LLM = 'consultar_requisitos'
+llamadas_llm = []
+
+def llm_lento(mensaje, contexto):
+    """LLM de prueba: tarda mucho más que el presupuesto y contesta con alta confianza"""
+    llamadas_llm.append(mensaje)
+    time.sleep(LLM_DEMORA_SEG)
+    return INTENT_LLM, 0.99
+
+clasificador = ClasificadorIntentsMejorado()
+clasificador.cliente_llm.url_activa = lambda: 'http://llm-de-prueba'
+clasificador._clasificar_con_llm = llm_lento
+
+descartados = []
+descartar_original = clasificador._descartar_llm
+
+def descartar_registrando(futuro):
+    descartar_original(futuro)
+    descartados.append(futuro)
+
+clasificador._descartar_llm = descartar_registrando
+
+# Sin reglas de contexto, regex ni fuzzy: cae en la banda de incertidumbre y hace falta el LLM
+MENSAJE_INCIERTO = "el perro come pizza"
+OTRO_INCIERTO = "y entonces que onda con eso"
+
+print("=" * 60)
+print("TEST: Cascada especulativa con presupuesto de LLM")
+print("=" * 60)
+
+print("\n[Test 1] El presupuesto se respeta con un LLM lento")
+antes = metricas_cascada.metricas()
+inicio = time.monotonic()
+intent, confianza, metadata = clasificador.clasificar(MENSAJE_INCIERTO, SessionContext('especulativo_1'))
+ms = (time.monotonic() - inicio) * 1000
+print(f"   {intent} ({confianza:.2f}) en {ms:.0f}ms: {metadata}")
+verificar("responde antes que el LLM", ms < LLM_DEMORA_SEG * 1000 / 2)
+verificar("estado del LLM: fuera_de_presupuesto", metadata['llm'] == 'fuera_de_presupuesto')
+verificar("decide regex/fuzzy, no el LLM", intent != INTENT_LLM and not metadata['fuente_decision'].startswith('llm'))
+despues = metricas_cascada.metricas()
+verificar("metricas: llm_tarde +1", despues['llm_tarde'] == antes['llm_tarde'] + 1)
+verificar("metricas: fuente registrada",
+          despues['fuentes'].get(metadata['fuente_decision'], 0) == antes['fuentes'].get(metadata['fuente_decision'], 0) + 1)
+
+print("\n[Test 2] La llamada especulativa en cola se cancela")
+# El único worker sigue ocupado con la llamada del Test 1: esta queda en cola
+intent, confianza, metadata = clasificador.clasificar(OTRO_INCIERTO, SessionContext('especulativo_2'))
+verificar("fuera de presupuesto otra vez", metadata['llm'] == 'fuera_de_presupuesto')
+verificar("futuro en cola cancelado", descartados and descartados[-1].cancelled())
+time.sleep(LLM_DEMORA_SEG * 1.5)
+verificar("el LLM nunca recibió el mensaje cancelado", llamadas_llm == [MENSAJE_INCIERTO])
+
+print("\n[Test 3] Misma forma de resultado en todos los caminos")
+for mensaje in ("hola", "quiero sacar un turno", "la verdad no se", MENSAJE_INCIERTO):
+    resultado = clasificador.clasificar(mensaje, SessionContext('especulativo_3'))
+    verificar(f"'{mensaje}' -> {resultado[0]} [{resultado[2]['fuente_decision']}]",
+              len(resultado) == 3 and {'fuente_decision', 'llm', 'latencia_ms'} <= set(resultado[2]))
+
+terminar()
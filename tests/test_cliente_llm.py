@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Test del cliente LLM compartido (cliente_llm.py)
+No necesita LM Studio: levanta servidores HTTP locales que imitan sus endpoints
+y verifica failover, circuit breaker, recuperación y que un host lento no dispara failover.
+
+Ejecutar: python tests/test_cliente_llm.py
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+import requests
+import cliente_llm
+from cliente_llm import ClienteLLM, LLMNoDisponible
+from verificacion import verificar, terminar
+
+class LMStudioFalso(BaseHTTPRequestHandler):
+    """GET /v1/models siempre OK; POST responde 500 si el servidor está 'roto' y tarda `demora` segundos"""
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, codigo):
+        self.send_response(codigo)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        try:
+            self.wfile.write(b'{}')
+        except BrokenPipeError:
+            pass  # El cliente ya cortó por timeout de lectura
+
+    def do_GET(self):
+        self._responder(200)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(self.server.demora)
+        self._responder(500 if self.server.roto else 200)
+
+def levantar_servidor(roto):
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), LMStudioFalso)
+    servidor.roto = roto
+    servidor.demora = 0
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}/v1/chat/completions"
+
+print("=" * 60)
+print("TEST: Cliente LLM compartido")
+print("=" * 60)
+
+cliente_llm.LLM_CB_ENFRIAMIENTO = 0.3
+roto, url_roto = levantar_servidor(True)
+sano, url_sano = levantar_servidor(False)
+url_caido = "http://127.0.0.1:1/v1/chat/completions"  # Nadie escucha
+
+cliente = ClienteLLM([url_caido, url_roto, url_sano])
+cliente.sondear()
+
+print("\n[Test 1] Sondeo de salud")
+verificar("host caído queda fuera de la rotación", cliente.endpoints[0].resumen()['estado'] == 'abierto')
+verificar("url activa = primera sana", cliente.url_activa() == url_roto)
+
+print("\n[Test 2] Failover ante HTTP 500")
+codigos = [cliente.post({'messages': []}, timeout=2).status_code for _ in range(4)]
+verificar("todas las peticiones respondidas", codigos == [200] * 4)
+verificar(f"circuito abierto tras {cliente_llm.LLM_CB_FALLOS} fallos",
+          cliente.endpoints[1].resumen()['estado'] == 'abierto')
+verificar("con el circuito abierto no se le manda tráfico",
+          cliente.endpoints[1].resumen()['peticiones'] == cliente_llm.LLM_CB_FALLOS)
+
+print("\n[Test 3] Recuperación tras el enfriamiento")
+roto.roto = False
+time.sleep(0.35)
+cliente.post({'messages': []}, timeout=2)
+verificar("petición de prueba exitosa cierra el circuito", cliente.endpoints[1].resumen()['estado'] == 'cerrado')
+
+print("\n[Test 4] Host lento: el timeout de lectura no dispara failover")
+cliente_lento = ClienteLLM([url_roto, url_sano])
+roto.demora = 0.5
+peticiones_sano = cliente_lento.endpoints[1].resumen()['peticiones']
+inicio = time.monotonic()
+try:
+    cliente_lento.post({'messages': []}, timeout=0.2)
+    verificar("lanza el timeout de lectura", False)
+except requests.exceptions.ReadTimeout:
+    verificar("lanza el timeout de lectura", True)
+verificar("espera un solo timeout", time.monotonic() - inicio < 0.45)
+verificar("no prueba el siguiente endpoint", cliente_lento.endpoints[1].resumen()['peticiones'] == peticiones_sano)
+verificar("el host lento no suma fallos", cliente_lento.endpoints[0].resumen()['fallos'] == 0)
+roto.demora = 0
+cliente_lento.detener()
+
+print("\n[Test 5] Ningún endpoint disponible")
+for servidor in (roto, sano):
+    servidor.shutdown()
+    servidor.server_close()
+time.sleep(0.35)
+try:
+    cliente.post({'messages': []}, timeout=1)
+    verificar("lanza LLMNoDisponible", False)
+except LLMNoDisponible:
+    verificar("lanza LLMNoDisponible", True)
+
+print("\n[Test 6] Métricas")
+resumen = cliente.resumen()
+print(f"   peticiones={resumen['peticiones']} failovers={resumen['failovers']} sin_endpoint={resumen['sin_endpoint']}")
+verificar("failovers contados", resumen['failovers'] >= 3)
+cliente.detener()
+
+terminar()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Test de la cola de notificaciones (cola_notificaciones.py) sobre el outbox en memoria
+Verifica reintentos con backoff (proximo_intento se respeta), el paso a 'fallido',
+la recuperación de pendientes y de reclamos vencidos, que dos colas sobre el mismo
+outbox no envían dos veces, y que con la cola llena el trabajo no se pierde.
+
+Ejecutar: python tests/test_cola_notificaciones.py
+"""
+
+import sys
+import time
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+import cola_notificaciones
+from cola_notificaciones import ColaNotificaciones, OutboxMemoria
+from verificacion import verificar, terminar
+
+def esperar(condicion, limite=3.0):
+    """Espera (con límite) a que los workers lleguen al estado esperado"""
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if condicion():
+            return True
+        time.sleep(0.01)
+    return condicion()
+
+# Handler de prueba: falla las primeras `fallas[clave]` veces y registra cada llamada
+llamadas = []
+fallas = {}
+lock = threading.Lock()
+
+def handler_prueba(payload):
+    with lock:
+        llamadas.append((payload['clave'], time.monotonic()))
+        if fallas.get(payload['clave'], 0) > 0:
+            fallas[payload['clave']] -= 1
+            raise RuntimeError("smtp caído")
+
+cola_notificaciones.HANDLERS['prueba'] = handler_prueba
+
+def llamadas_de(clave):
+    with lock:
+        return [t for c, t in llamadas if c == clave]
+
+print("=" * 60)
+print("TEST: Cola de notificaciones")
+print("=" * 60)
+
+print("\n[Test 1] Reintento con backoff")
+outbox = OutboxMemoria()
+cola = ColaNotificaciones(workers=1, backoff_base=0.3, outbox=outbox, poll_seg=0.02)
+fallas['reintento'] = 1
+outbox_id = cola.encolar('prueba', {'clave': 'reintento'})
+verificar("reintento programado como pendiente",
+          esperar(lambda: outbox.estado(outbox_id)['estado'] == 'pendiente' or len(llamadas_de('reintento')) > 1))
+verificar("no se reintenta antes del proximo_intento", len(llamadas_de('reintento')) == 1)
+verificar("enviado tras el reintento", esperar(lambda: outbox.estado(outbox_id)['estado'] == 'enviado'))
+tiempos = llamadas_de('reintento')
+verificar(f"espera >= backoff ({tiempos[1] - tiempos[0]:.2f}s)", len(tiempos) == 2 and tiempos[1] - tiempos[0] >= 0.3)
+verificar("intentos = 2", outbox.estado(outbox_id)['intentos'] == 2)
+cola.detener()
+
+print("\n[Test 2] Fallido tras max_intentos")
+outbox = OutboxMemoria()
+cola = ColaNotificaciones(workers=1, max_intentos=3, backoff_base=0.01, outbox=outbox, poll_seg=0.02)
+fallas['fallido'] = 10
+outbox_id = cola.encolar('prueba', {'clave': 'fallido'})
+verificar("estado fallido", esperar(lambda: outbox.estado(outbox_id)['estado'] == 'fallido'))
+verificar("3 intentos y último error guardado",
+          len(llamadas_de('fallido')) == 3 and outbox.estado(outbox_id)['ultimo_error'] == 'smtp caído')
+verificar("métricas: 2 reintentos, 1 fallido",
+          cola.metricas()['reintentos'] == 2 and cola.metricas()['fallidos'] == 1)
+cola.detener()
+
+print("\n[Test 3] Recuperación al iniciar")
+outbox = OutboxMemoria(lease_seg=0.2)
+pendiente = outbox.insertar('prueba', {'clave': 'pendiente'}, None)
+outbox.marcar(pendiente, 'pendiente')
+abandonada = outbox.insertar('prueba', {'clave': 'abandonada'}, None)  # 'procesando' de un proceso caído
+vigente = outbox.insertar('prueba', {'clave': 'vigente'}, None)
+time.sleep(0.25)
+outbox.marcar(vigente, 'procesando')  # Su dueño la renovó: no se toca
+cola = ColaNotificaciones(workers=1, outbox=outbox, poll_seg=0.02)
+cola.iniciar()
+verificar("pendiente enviada", esperar(lambda: outbox.estado(pendiente)['estado'] == 'enviado'))
+verificar("procesando con reclamo vencido enviada", esperar(lambda: outbox.estado(abandonada)['estado'] == 'enviado'))
+time.sleep(0.1)
+verificar("procesando con reclamo vigente intacta",
+          outbox.estado(vigente)['estado'] == 'procesando' and not llamadas_de('vigente'))
+verificar("métricas: 2 recuperados", cola.metricas()['recuperados'] == 2)
+cola.detener()
+
+print("\n[Test 4] Dos procesos sobre el mismo outbox no duplican envíos")
+outbox = OutboxMemoria()
+ids = []
+for i in range(40):
+    ids.append(outbox.insertar('prueba', {'clave': f'dedup_{i}'}, None))
+    outbox.marcar(ids[-1], 'pendiente')
+colas = [ColaNotificaciones(workers=2, outbox=outbox, poll_seg=0.01) for _ in range(2)]
+for c in colas:
+    c.iniciar()
+verificar("todas enviadas", esperar(lambda: all(outbox.estado(i)['estado'] == 'enviado' for i in ids)))
+time.sleep(0.1)
+verificar("cada una exactamente una vez", all(len(llamadas_de(f'dedup_{i}')) == 1 for i in range(40)))
+verificar("repartidas entre ambas colas", sum(c.metricas()['enviados'] for c in colas) == 40)
+for c in colas:
+    c.detener()
+
+print("\n[Test 5] Cola llena: el trabajo queda en el outbox y se retoma")
+outbox = OutboxMemoria()
+cola = ColaNotificaciones(workers=0, max_cola=1, outbox=outbox, poll_seg=60)
+cola.iniciar()
+primero = cola.encolar('prueba', {'clave': 'lleno_1'})
+segundo = cola.encolar('prueba', {'clave': 'lleno_2'})
+verificar("descartado de memoria por cola llena", cola.metricas()['descartados_cola_llena'] == 1)
+verificar("liberado como pendiente", outbox.estado(segundo)['estado'] == 'pendiente')
+verificar("el primero sigue reclamado", outbox.estado(primero)['estado'] == 'procesando')
+otra = ColaNotificaciones(workers=1, outbox=outbox, poll_seg=0.02)
+otra.iniciar()
+verificar("otro proceso lo envía", esperar(lambda: outbox.estado(segundo)['estado'] == 'enviado'))
+verificar("y no toca el reclamado por el primero", outbox.estado(primero)['estado'] == 'procesando')
+cola.detener()
+otra.detener()
+
+terminar()
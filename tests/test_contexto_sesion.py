@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Test del SessionContext con esquema fijo (contexto_sesion.py)
+Verifica que no acepte campos sin declarar, la codificación versionada de ida y
+vuelta, la lectura del formato anterior, la fusión de 3 vías, el to_dict cacheado
+y cuánto ocupa en memoria frente al objeto con __dict__ que había antes.
+
+Ejecutar: python tests/test_contexto_sesion.py
+"""
+
+import sys
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+import contexto_sesion
+from contexto_sesion import SessionContext, ESQUEMA_VERSION
+from verificacion import verificar, terminar
+
+SESIONES = 5000
+
+class ContextoAnterior:
+    """El SessionContext de antes: atributos en un __dict__ por instancia"""
+    def __init__(self, session_id):
+        self.session_id = session_id
+        for campo, default in contexto_sesion.ESQUEMA_SESION:
+            setattr(self, campo, type(default)() if isinstance(default, (list, dict)) else default)
+
+def contexto_con_datos(session_id):
+    contexto = SessionContext(session_id)
+    contexto.nombre = 'María Pérez'
+    contexto.cedula = '4567890'
+    contexto.fecha = '2025-11-10'
+    contexto.hora = '09:30'
+    contexto.proxima_semana = True
+    contexto.datos_difusos = {'urgencia': 0.4}
+    contexto.ultimo_intent_confianza = 0.87
+    return contexto
+
+print("=" * 60)
+print("TEST: SessionContext con esquema fijo")
+print("=" * 60)
+
+print("\n[Test 1] Esquema fijo")
+contexto = SessionContext('web_1')
+verificar("sin __dict__", not hasattr(contexto, '__dict__'))
+verificar("flujo_activo declarado", contexto.flujo_activo is None)
+try:
+    contexto.campo_inventado = 1
+    verificar("asignar un campo no declarado falla", False)
+except AttributeError:
+    verificar("asignar un campo no declarado falla", True)
+otro = SessionContext('web_2')
+otro.conversacion_historial.append('hola')
+verificar("listas y dicts propios de cada sesión", contexto.conversacion_historial == [])
+contexto.actualizar(nombre='Ana', inventado='x', email=None)
+verificar("actualizar ignora campos desconocidos y None", contexto.nombre == 'Ana' and contexto.email is None)
+
+print("\n[Test 2] Codificación versionada")
+verificar("contexto nuevo codifica solo la versión", SessionContext('x').codificar() == f'[{ESQUEMA_VERSION}]')
+contexto = contexto_con_datos('web_3')
+contexto.flujo_activo = 'agendar_turno'
+datos = contexto.codificar()
+print(f"   {len(datos)} bytes: {datos}")
+copia = SessionContext.decodificar('web_3', datos)
+verificar("ida y vuelta sin pérdida", copia.campos() == contexto.campos() and copia.session_id == 'web_3')
+verificar("más compacto que el JSON por nombre", len(datos) < len(json.dumps(contexto.campos(), ensure_ascii=False)))
+anterior = SessionContext.decodificar('web_3', '{"nombre":"Ana","flujo_activo":"x","borrado":1}')
+verificar("lee el formato por nombre (descarta campos que ya no existen)",
+          anterior.nombre == 'Ana' and anterior.flujo_activo == 'x')
+contexto_sesion.ESQUEMAS[2] = ('cedula', 'nombre')  # Una versión futura con otro orden
+verificar("cada versión se lee con su propio esquema",
+          SessionContext.decodificar('x', '[2,"123","Ana"]').nombre == 'Ana')
+del contexto_sesion.ESQUEMAS[2]
+try:
+    SessionContext.decodificar('x', '[99]')
+    verificar("versión desconocida falla", False)
+except ValueError:
+    verificar("versión desconocida falla", True)
+
+print("\n[Test 3] Fusión de 3 vías")
+base = contexto_con_datos('web_4').codificar()
+mio = SessionContext.decodificar('web_4', base)
+mio.email = 'ana@mail.com'
+remoto = SessionContext.decodificar('web_4', base)
+remoto.hora = '10:00'
+mio.fusionar(base, remoto.codificar())
+verificar("conserva lo propio y toma lo remoto", mio.email == 'ana@mail.com' and mio.hora == '10:00')
+mio = SessionContext.decodificar('web_4', base)
+mio.conversacion_historial.append('mio')
+remoto = SessionContext.decodificar('web_4', base)
+remoto.conversacion_historial.append('remoto')
+mio.fusionar(base, remoto.codificar())
+verificar("historial: conserva lo agregado de ambos lados", mio.conversacion_historial == ['remoto', 'mio'])
+
+print("\n[Test 4] to_dict cacheado")
+contexto = contexto_con_datos('web_5')
+respuesta = contexto.to_dict()
+verificar("mismos campos que antes", list(respuesta) == ['nombre', 'cedula', 'fecha', 'hora', 'email', 'intent_actual',
+                                                         'franja_horaria', 'proxima_semana', 'fecha_recomendada'])
+contexto.ultimo_mensaje = 'hola'
+verificar("se reutiliza si no cambian sus campos", contexto.to_dict() is respuesta)
+contexto.hora = '11:00'
+verificar("se rearma al cambiar un campo de la respuesta", contexto.to_dict()['hora'] == '11:00')
+
+print(f"\n[Test 5] Memoria y velocidad ({SESIONES} sesiones)")
+medidas = {}
+for nombre, clase in [('con __dict__', ContextoAnterior), ('con __slots__', SessionContext)]:
+    tracemalloc.start()
+    sesiones = [clase(f'web_{i}') for i in range(SESIONES)]
+    medidas[nombre] = tracemalloc.get_traced_memory()[0] / SESIONES
+    tracemalloc.stop()
+    del sesiones
+print(f"   bytes por sesión: {', '.join(f'{k} {v:.0f}' for k, v in medidas.items())}")
+verificar("menos memoria por sesión", medidas['con __slots__'] < medidas['con __dict__'])
+contexto = contexto_con_datos('web_6')
+inicio = time.perf_counter()
+for _ in range(SESIONES):
+    SessionContext.decodificar('web_6', contexto.codificar())
+print(f"   codificar + decodificar: {(time.perf_counter() - inicio) * 1e6 / SESIONES:.1f} µs")
+
+terminar()
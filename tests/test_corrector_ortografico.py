@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Test del corrector ortográfico indexado (mejoras_fuzzy.CorrectOrOrtografico)
+Compara el índice de borrados contra la búsqueda exhaustiva que hacía
+process.extractOne (fuzz.ratio sobre todo el diccionario) y mide la latencia
+por mensaje con el diccionario original y con miles de palabras.
+
+Ejecutar: python tests/test_corrector_ortografico.py
+"""
+
+import sys
+import time
+import random
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+from mejoras_fuzzy import CorrectOrOrtografico, similitud, _procesar, _mascaras, _largo_lcs, CORRECTOR_MAX_BORRADOS
+from verificacion import verificar, terminar
+
+MAX_MS_POR_MENSAJE = 1.0
+
+def corregir_exhaustivo(corrector, palabra, umbral):
+    """Comportamiento original: manuales, diccionario y extractOne(scorer=fuzz.ratio) sobre toda la lista"""
+    palabra_lower = palabra.lower()
+    if palabra_lower in corrector.correcciones_manuales:
+        return corrector.correcciones_manuales[palabra_lower]
+    if palabra_lower in corrector.diccionario_base:
+        return palabra
+    procesada = _procesar(palabra_lower)
+    scores = [(opcion, similitud(procesada, _procesar(opcion)) if procesada else 0) for opcion in corrector.diccionario_base]
+    mejor = max(scores, key=lambda x: x[1])
+    return mejor[0] if mejor[1] >= umbral else palabra
+
+def borrados_necesarios(a, b):
+    """Letras a borrar de cada lado para llegar a la subsecuencia común"""
+    a, b = _procesar(a), _procesar(b)
+    lcs = _largo_lcs(_mascaras(a), len(a), b)
+    return max(len(a) - lcs, len(b) - lcs)
+
+def con_errores(palabra, generador, ediciones):
+    """Aplica `ediciones` errores al azar: sustitución, inserción, borrado o transposición"""
+    letras = 'abcdefghijklmnopqrstuvwxyzñ'
+    for _ in range(ediciones):
+        i = generador.randrange(len(palabra) + 1)
+        tipo = generador.choice(['sustituir', 'insertar', 'borrar', 'transponer'])
+        if tipo == 'insertar' or len(palabra) < 2:
+            palabra = palabra[:i] + generador.choice(letras) + palabra[i:]
+        elif tipo == 'sustituir':
+            i = min(i, len(palabra) - 1)
+            palabra = palabra[:i] + generador.choice(letras) + palabra[i + 1:]
+        elif tipo == 'borrar':
+            i = min(i, len(palabra) - 1)
+            palabra = palabra[:i] + palabra[i + 1:]
+        else:
+            i = min(i, len(palabra) - 2)
+            palabra = palabra[:i] + palabra[i + 1] + palabra[i] + palabra[i + 2:]
+    return palabra
+
+def palabras_nlu():
+    """Vocabulario de los ejemplos de data/nlu.yml"""
+    palabras = set()
+    with open(PROJECT_ROOT / 'data' / 'nlu.yml', encoding='utf-8') as f:
+        for linea in f:
+            if linea.startswith('    - '):
+                palabras.update(p.strip('.,;:!?¿¡()"\'') for p in linea[6:].lower().split())
+    return sorted(p for p in palabras if p)
+
+print("=" * 60)
+print("TEST: Corrector ortográfico indexado")
+print("=" * 60)
+
+generador = random.Random(13)
+corrector = CorrectOrOrtografico()
+
+print("\n[Test 1] similitud = fuzz.ratio (python-Levenshtein)")
+verificar("'kiero' vs 'quiero' = 73", similitud('kiero', 'quiero') == 73)
+verificar("iguales = 100, vacía = 0", similitud('turno', 'turno') == 100 and similitud('', 'turno') == 0)
+verificar("'turmo' vs 'turno' = 80", similitud('turmo', 'turno') == 80)
+
+print("\n[Test 2] Mismas correcciones que la búsqueda exhaustiva")
+errores_tipeo = [con_errores(p, generador, generador.choice([1, 2])) for p in corrector.diccionario_base * 10]
+for umbral in (75, 80):
+    distintas = [p for p in errores_tipeo if corrector.corregir_palabra(p, umbral) != corregir_exhaustivo(corrector, p, umbral)]
+    verificar(f"errores de 1-2 ediciones, umbral {umbral}: {len(errores_tipeo) - len(distintas)}/{len(errores_tipeo)} iguales",
+              not distintas)
+
+# Palabras reales: el índice solo deja sin corregir lo que está a más de N borrados por lado
+# (ej. 'necesarios' -> 'necesito'); nunca propone una corrección distinta
+vocabulario = palabras_nlu()
+for umbral in (75, 80):
+    distintas = [p for p in vocabulario if corrector.corregir_palabra(p, umbral) != corregir_exhaustivo(corrector, p, umbral)]
+    for palabra in distintas:
+        print(f"      '{palabra}': se deja igual (exhaustivo: {corregir_exhaustivo(corrector, palabra, umbral)})")
+    verificar(f"vocabulario de nlu.yml, umbral {umbral}: {len(vocabulario) - len(distintas)}/{len(vocabulario)} iguales, "
+              f"el resto a más de {CORRECTOR_MAX_BORRADOS} borrados",
+              all(corrector.corregir_palabra(p, umbral) == p and
+                  borrados_necesarios(p, corregir_exhaustivo(corrector, p, umbral)) > CORRECTOR_MAX_BORRADOS
+                  for p in distintas))
+
+print("\n[Test 3] corregir_mensaje y memo")
+mensaje = 'kiero un turmo para el lunes, cuanto cuseta?'
+verificar("mensaje corregido", corrector.corregir_mensaje(mensaje)[0] == 'quiero un turno para el lunes, cuanto cuesta?')
+info = corrector._corregir_memo.cache_info()
+corrector.corregir_mensaje(mensaje)
+verificar("la segunda vez todas las palabras salen de la memoria",
+          corrector._corregir_memo.cache_info().hits - info.hits == len(mensaje.split()))
+corrector.agregar_palabras(['cuseta'])
+verificar("agregar palabras invalida la memoria", corrector.corregir_palabra('cuseta') == 'cuseta')
+
+print("\n[Test 4] Latencia por mensaje")
+mensajes = [' '.join(con_errores(p, generador, generador.choice([0, 1, 2])) if len(p) > 3 else p
+                     for p in generador.choices(vocabulario, k=generador.randint(3, 10))) for _ in range(300)]
+grande = CorrectOrOrtografico()
+extra = sorted({con_errores(p, generador, 3) for p in vocabulario * 4} - set(grande.diccionario_base))
+grande.agregar_palabras(vocabulario + extra)
+for nombre, instancia in [(f'diccionario base ({len(corrector.diccionario_base)} palabras)', CorrectOrOrtografico()),
+                          (f'diccionario grande ({len(grande.diccionario_base)} palabras)', grande)]:
+    inicio = time.perf_counter()
+    for m in mensajes:
+        instancia._corregir_memo.cache_clear()  # Cada mensaje en frío
+        instancia.corregir_mensaje(m)
+    frio = (time.perf_counter() - inicio) * 1000 / len(mensajes)
+    for m in mensajes:
+        instancia.corregir_mensaje(m)
+    inicio = time.perf_counter()
+    for m in mensajes:
+        instancia.corregir_mensaje(m)
+    memo = (time.perf_counter() - inicio) * 1000 / len(mensajes)
+    inicio = time.perf_counter()
+    for m in mensajes[:20]:
+        for palabra in m.split():
+            corregir_exhaustivo(instancia, palabra, 75)
+    exhaustivo = (time.perf_counter() - inicio) * 1000 / 20
+    print(f"   {nombre}: índice {frio:.3f} ms/msg | con memo {memo:.3f} ms/msg | exhaustivo {exhaustivo:.2f} ms/msg")
+    verificar(f"< {MAX_MS_POR_MENSAJE} ms por mensaje sin memo", frio < MAX_MS_POR_MENSAJE)
+
+terminar()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Test de la sesión SMTP reutilizada de EmailNotificationSender con un servidor simulado
+Verifica que un rechazo del servidor (destinatario, datos) no reconecta ni reenvía,
+que una desconexión reconecta una sola vez, y que el NOOP solo se manda tras inactividad.
+
+Ejecutar: python tests/test_email_sesion_smtp.py
+"""
+
+import sys
+import smtplib
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'notificaciones'))
+
+import email_sender
+from email_sender import EmailNotificationSender
+from verificacion import verificar, terminar
+
+TURNO = {'nombre': 'Ana', 'cedula': '123', 'fecha': '2025-11-20', 'hora': '09:30', 'numero_turno': '1'}
+QR = {'confirmation_url': 'http://localhost/c/1', 'qr_base64': 'iVBORw0KGgo='}
+
+class ServidorFalso:
+    """smtplib.SMTP simulado: falla según `fallas` (destinatario -> excepción a lanzar una vez)"""
+    conexiones = 0
+    envios = []
+    noops = 0
+    fallas = {}
+
+    def __init__(self, *args):
+        ServidorFalso.conexiones += 1
+
+    def starttls(self):
+        pass
+
+    def login(self, *args):
+        pass
+
+    def noop(self):
+        ServidorFalso.noops += 1
+        return (250, b'ok')
+
+    def send_message(self, msg):
+        error = ServidorFalso.fallas.pop(msg['To'], None)
+        if error is not None:
+            raise error
+        ServidorFalso.envios.append(msg['To'])
+
+    def quit(self):
+        pass
+
+def reiniciar(fallas=None):
+    ServidorFalso.conexiones, ServidorFalso.envios, ServidorFalso.noops = 0, [], 0
+    ServidorFalso.fallas = dict(fallas or {})
+
+email_sender.smtplib.SMTP = ServidorFalso
+
+print("=" * 60)
+print("TEST: Sesión SMTP reutilizada")
+print("=" * 60)
+
+print("\n[Test 1] Destinatario rechazado en un lote")
+reiniciar({'b@x.com': smtplib.SMTPRecipientsRefused({'b@x.com': (550, b'no existe')})})
+sender = EmailNotificationSender('smtp.falso', 587, 'yo@x.com', 'x')
+resultados = sender.send_many([(d, TURNO, QR) for d in ('a@x.com', 'b@x.com', 'c@x.com')])
+verificar("una sola conexión", ServidorFalso.conexiones == 1)
+verificar("el rechazado no se reenvía", ServidorFalso.envios == ['a@x.com', 'c@x.com'])
+verificar("resultado por destinatario", [r['ok'] for r in resultados] == [True, False, True])
+
+print("\n[Test 2] Error de datos: se propaga sin reenviar")
+reiniciar({'a@x.com': smtplib.SMTPDataError(554, b'rechazado')})
+sender = EmailNotificationSender('smtp.falso', 587, 'yo@x.com', 'x', persistent=True)
+verificar("falla el envío", sender.send_confirmation_email('a@x.com', TURNO, QR) is False)
+verificar("sin reconexión ni reenvío", ServidorFalso.conexiones == 1 and ServidorFalso.envios == [])
+verificar("la sesión sigue abierta", sender._server is not None)
+sender.send_confirmation_email('c@x.com', TURNO, QR)
+verificar("el siguiente usa la misma sesión", ServidorFalso.conexiones == 1 and ServidorFalso.envios == ['c@x.com'])
+
+print("\n[Test 3] Desconexión: reconecta una vez y reenvía")
+for error in (smtplib.SMTPServerDisconnected('cerrada'), ConnectionResetError('reset'), TimeoutError('timeout')):
+    reiniciar({'a@x.com': error})
+    sender = EmailNotificationSender('smtp.falso', 587, 'yo@x.com', 'x')
+    ok = sender.send_confirmation_email('a@x.com', TURNO, QR)
+    verificar(f"{type(error).__name__}: 2 conexiones, 1 envío",
+              ok and ServidorFalso.conexiones == 2 and ServidorFalso.envios == ['a@x.com'])
+
+print("\n[Test 4] NOOP solo tras inactividad")
+reiniciar()
+sender = EmailNotificationSender('smtp.falso', 587, 'yo@x.com', 'x', persistent=True)
+sender.send_many([(f'{i}@x.com', TURNO, QR) for i in range(5)])
+verificar("sin NOOP en un lote", ServidorFalso.noops == 0)
+sender._last_used -= email_sender.SMTP_NOOP_IDLE_SECONDS + 1
+sender.send_confirmation_email('z@x.com', TURNO, QR)
+verificar("un NOOP tras la inactividad", ServidorFalso.noops == 1 and ServidorFalso.conexiones == 1)
+sender.close()
+
+terminar()
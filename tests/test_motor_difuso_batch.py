@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Test de la API batch del motor difuso (calcular_espera_batch / evaluar_recomendacion_batch)
+Verifica que la inferencia vectorizada dé exactamente lo mismo que skfuzzy punto a punto
+(incluidos los respaldos cuando ninguna regla se activa) y mide la latencia por punto.
+
+Ejecutar: python tests/test_motor_difuso_batch.py
+"""
+
+import sys
+import time
+import logging
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+import motor_difuso
+from verificacion import verificar, terminar
+
+logging.disable(logging.CRITICAL)  # Los respaldos sin reglas activas loguean errores esperados
+
+PUNTOS = 1000
+
+print("=" * 60)
+print("TEST: API batch del motor difuso")
+print("=" * 60)
+
+generador = np.random.RandomState(3)
+# Valores continuos (incluye fuera de rango) + valores típicos del chatbot (enteros, medias horas)
+ocupaciones = np.concatenate([generador.uniform(-10, 110, PUNTOS), generador.randint(0, 101, 200)])
+urgencias = np.concatenate([generador.uniform(-1, 11, PUNTOS), generador.randint(0, 11, 200)])
+horas = np.concatenate([generador.uniform(6, 18, PUNTOS), generador.choice(np.arange(7, 17.5, 0.5), 200)])
+
+print("\n[Test 1] calcular_espera_batch vs calcular_espera")
+inicio = time.perf_counter()
+escalares = np.array([motor_difuso.calcular_espera(o, u, h) for o, u, h in zip(ocupaciones, urgencias, horas)])
+tiempo_escalar = time.perf_counter() - inicio
+inicio = time.perf_counter()
+lote = motor_difuso.calcular_espera_batch(ocupaciones, urgencias, horas)
+tiempo_lote = time.perf_counter() - inicio
+print(f"   escalar: {tiempo_escalar * 1000 / len(lote):.3f} ms/punto | batch: {tiempo_lote * 1000 / len(lote):.4f} ms/punto")
+verificar(f"mismo resultado en {int((lote == escalares).sum())}/{len(lote)} puntos", np.array_equal(lote, escalares))
+
+print("\n[Test 2] evaluar_recomendacion_batch vs evaluar_recomendacion (con zonas sin reglas activas)")
+escalares = np.array([motor_difuso.evaluar_recomendacion(o, h) for o, h in zip(ocupaciones, horas)])
+lote = motor_difuso.evaluar_recomendacion_batch(ocupaciones, horas)
+verificar(f"mismo resultado en {int((lote == escalares).sum())}/{len(lote)} puntos", np.array_equal(lote, escalares))
+
+print("\n[Test 3] Salida sin redondear contra skfuzzy")
+o, u, h = np.clip(ocupaciones[:200], 0, 100), np.clip(urgencias[:200], 0, 10), np.clip(horas[:200], 7, 17)
+vectorizado = motor_difuso.vectorizado_espera.evaluar(o, u, h)
+exacto = np.array([motor_difuso._salida_exacta(motor_difuso.sistema_espera,
+                                                {'ocupacion': a, 'urgencia': b, 'hora_dia': c}, 'espera')
+                   for a, b, c in zip(o, u, h)])
+diferencia = np.nanmax(np.abs(vectorizado - exacto))
+print(f"   diferencia máxima: {diferencia:.2e}")
+verificar("diferencia < 1e-9", diferencia < 1e-9)
+
+print("\n[Test 4] Horizonte de 30 días en una sola llamada")
+slots = np.tile(np.arange(7, 17, 0.25), 30)
+ocupacion_slots = generador.uniform(0, 100, len(slots))
+inicio = time.perf_counter()
+esperas = motor_difuso.calcular_espera_batch(ocupacion_slots, 5, slots)
+puntajes = motor_difuso.evaluar_recomendacion_batch(ocupacion_slots, slots)
+print(f"   {len(slots)} horarios evaluados en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+verificar("una salida por horario", esperas.shape == puntajes.shape == slots.shape)
+
+print("\n[Test 5] Escalares y broadcasting")
+verificar("escalares devuelven arreglo 0-d con el valor de calcular_espera",
+          float(motor_difuso.calcular_espera_batch(30, 5, 9)) == motor_difuso.calcular_espera(30, 5, 9))
+verificar("urgencia escalar con arreglos de ocupación/hora",
+          motor_difuso.calcular_espera_batch([20, 80], 5, [8, 13]).shape == (2,))
+
+terminar()
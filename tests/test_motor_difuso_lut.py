@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Test del modo LUT del motor difuso (tablas precalculadas + interpolación)
+Compara calcular_espera_lut / evaluar_recomendacion_lut contra el resultado
+exacto de skfuzzy en puntos al azar, y mide la latencia de ambos caminos.
+
+La primera vez las tablas se calculan (~10s); con MOTOR_DIFUSO_LUT_DIR se guardan
+en .npy y las siguientes ejecuciones las cargan al instante.
+
+Ejecutar: python tests/test_motor_difuso_lut.py
+"""
+
+import sys
+import time
+import logging
+import datetime
+import random
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+import motor_difuso
+from verificacion import verificar, terminar
+
+logging.disable(logging.CRITICAL)  # Los respaldos sin reglas activas loguean errores esperados
+
+PUNTOS = 1000
+# Tolerancias: error medio y percentil 99 (minutos de espera / puntos de recomendación)
+MAX_ERROR_MEDIO_ESPERA = 0.5
+MAX_P99_ESPERA = 5.0
+MAX_ERROR_MEDIO_RECOMENDACION = 0.5
+MAX_P99_RECOMENDACION = 2.0
+
+print("=" * 60)
+print("TEST: Motor difuso en modo LUT")
+print("=" * 60)
+
+print("\n[Test 1] Construcción de tablas")
+inicio = time.perf_counter()
+tablas = motor_difuso.obtener_tablas_lut()
+print(f"   Listas en {time.perf_counter() - inicio:.1f}s")
+verificar("tabla de espera con la forma de la grilla",
+          tablas['espera'].valores.shape == tuple(len(e) for e in motor_difuso.EJES_ESPERA))
+verificar("tabla de recomendación con la forma de la grilla",
+          tablas['recomendacion'].valores.shape == tuple(len(e) for e in motor_difuso.EJES_RECOMENDACION))
+
+generador = np.random.RandomState(7)
+ocupaciones = generador.uniform(0, 100, PUNTOS)
+urgencias = generador.uniform(0, 10, PUNTOS)
+horas = generador.uniform(7, 17, PUNTOS)
+
+print("\n[Test 2] Error de espera contra skfuzzy exacto")
+inicio = time.perf_counter()
+exactas = np.array([motor_difuso.calcular_espera(o, u, h) for o, u, h in zip(ocupaciones, urgencias, horas)])
+tiempo_exacto = time.perf_counter() - inicio
+inicio = time.perf_counter()
+interpoladas = motor_difuso.calcular_espera_lut(ocupaciones, urgencias, horas)
+tiempo_lut = time.perf_counter() - inicio
+error = np.abs(interpoladas - exactas)
+print(f"   medio={error.mean():.3f}  p99={np.percentile(error, 99):.2f}  max={error.max():.2f} min")
+print(f"   exacto: {tiempo_exacto * 1000 / PUNTOS:.3f} ms/punto | LUT: {tiempo_lut * 1000 / PUNTOS:.4f} ms/punto")
+verificar(f"error medio < {MAX_ERROR_MEDIO_ESPERA}", error.mean() < MAX_ERROR_MEDIO_ESPERA)
+verificar(f"p99 < {MAX_P99_ESPERA}", np.percentile(error, 99) < MAX_P99_ESPERA)
+
+print("\n[Test 3] Error de recomendación contra skfuzzy exacto (incluye zonas sin reglas activas)")
+exactas = np.array([motor_difuso.evaluar_recomendacion(o, h) for o, h in zip(ocupaciones, horas)])
+interpoladas = motor_difuso.evaluar_recomendacion_lut(ocupaciones, horas)
+error = np.abs(interpoladas - exactas)
+print(f"   medio={error.mean():.3f}  p99={np.percentile(error, 99):.2f}  max={error.max():.2f}")
+verificar(f"error medio < {MAX_ERROR_MEDIO_RECOMENDACION}", error.mean() < MAX_ERROR_MEDIO_RECOMENDACION)
+verificar(f"p99 < {MAX_P99_RECOMENDACION}", np.percentile(error, 99) < MAX_P99_RECOMENDACION)
+
+print("\n[Test 4] Entradas fuera de rango y nodos de la grilla")
+verificar("fuera de rango se recorta igual que calcular_espera",
+          float(motor_difuso.calcular_espera_lut(-5, 15, 20)) == motor_difuso.calcular_espera(-5, 15, 20))
+verificar("en un nodo de la grilla coincide con el exacto",
+          float(motor_difuso.calcular_espera_lut(50, 5, 12)) == motor_difuso.calcular_espera(50, 5, 12))
+
+print("\n[Test 5] analizar_disponibilidad_dia con LUT")
+fecha = datetime.date(2026, 10, 19)
+random.seed(1)
+exacto = motor_difuso.analizar_disponibilidad_dia(fecha)
+motor_difuso.MOTOR_DIFUSO_LUT = True
+random.seed(1)
+inicio = time.perf_counter()
+con_lut = motor_difuso.analizar_disponibilidad_dia(fecha)
+print(f"   Día completo con LUT: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+motor_difuso.MOTOR_DIFUSO_LUT = False
+verificar("mismas franjas y ocupaciones", all(
+    exacto[f]['ocupacion'] == con_lut[f]['ocupacion'] for f in exacto))
+verificar("espera por franja dentro de 2 min", all(
+    abs(exacto[f]['espera_estimada'] - con_lut[f]['espera_estimada']) < 2 for f in exacto))
+
+terminar()
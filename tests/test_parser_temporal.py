@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+Test del parser temporal (parser_temporal.py) que reemplaza la cascada de fecha/hora
+de extraer_entidades(). Verifica cada formato que cubren los tests de fechas y horas,
+los spans, las reglas que dependen del contexto y, sobre los ejemplos de data/nlu.yml,
+que dé lo mismo que la cascada original y cuánto CPU cuesta cada uno por mensaje.
+
+Ejecutar: python tests/test_parser_temporal.py
+"""
+
+import sys
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+from parser_temporal import interpretar_fecha_hora, AUTOMATA_TEMPORAL
+from contexto_sesion import SessionContext
+from verificacion import verificar, terminar
+
+REPETICIONES = int(os.getenv('BENCH_REPETICIONES', 20))
+
+AHORA = datetime(2025, 11, 12, 10, 0)  # Miércoles
+
+def ejemplos_nlu():
+    """Ejemplos de data/nlu.yml sin anotaciones de entidades"""
+    ejemplos = []
+    with open(PROJECT_ROOT / 'data' / 'nlu.yml', encoding='utf-8') as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea.startswith('- ') and not linea.startswith('- intent'):
+                ejemplos.append(re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', linea[2:]))
+    return ejemplos
+
+def dias(n):
+    return (AHORA + timedelta(days=n)).strftime('%Y-%m-%d')
+
+# =====================================================
+# CASCADA ORIGINAL DE extraer_entidades() (referencia)
+# =====================================================
+
+RE_HORA_HH_MM = re.compile(r'\b(\d{1,2}):(\d{2})\b')
+RE_FECHA_NUMERICA = re.compile(r'\b(\d{1,2})[/-](\d{1,2})([/-](\d{2,4}))?\b')
+RE_HORA_FRACCION = re.compile(r'(?:para\s+)?(?:a\s+)?(?:las\s+)?(\d{1,2})\s+(y\s+(media|cuarto)|menos\s+cuarto)')
+RE_HORA_LAS = re.compile(r'(?:para\s+)?(?:a\s+)?las\s+(\d{1,2})')
+RE_HORA_SUFIJO = re.compile(r'\b(\d{1,2})\s*(am|pm|hs|horas?)\b')
+RE_HORA_NUMERO_SOLO = re.compile(r'^\s*(\d{1,2})\s*$')
+RE_FECHA_TEXTO = re.compile(r'\b(\d{1,2})\s+(?:de\s+)?(\w+)\b')
+RE_DIAS_DESDE_HOY = re.compile(r'(\w+)\s+d[ií]as?\s+(desde|a\s+partir\s+de)\s+hoy')
+HORAS_TEXTO_PATRONES = [
+    (palabra, numero, re.compile(rf'\b{palabra}\s+(y\s+(media|cuarto)|menos\s+cuarto)\b'))
+    for palabra, numero in [
+        ('una', 1), ('dos', 2), ('tres', 3), ('cuatro', 4), ('cinco', 5), ('seis', 6),
+        ('siete', 7), ('ocho', 8), ('nueve', 9), ('diez', 10), ('once', 11), ('doce', 12),
+        ('trece', 13), ('catorce', 14), ('quince', 15)
+    ]
+]
+
+def cascada_original(mensaje, contexto, ahora):
+    """Bloques FECHA/HORA/FRANJA de extraer_entidades() tal como estaban (sin logs, con `ahora` fijo)"""
+    mensaje_lower = mensaje.lower()
+    entidades = {}
+    frases_urgencia = [
+        'urgencia', 'urgente', 'fecha más cercana', 'fecha mas cercana',
+        'lo antes posible', 'lo más pronto', 'lo mas pronto',
+        'cuanto antes', 'cuánto antes', 'primera fecha', 'fecha disponible',
+        'más cercano', 'mas cercano', 'más próximo', 'mas proximo',
+        'próxima fecha', 'proxima fecha', 'turno más cercano', 'turno mas cercano',
+        'turno más próximo', 'turno mas proximo', 'día más cercano', 'dia mas cercano',
+        'el dia mas proximo', 'el día más próximo', 'dame el turno mas proximo',
+        'el turno mas cercano', 'el mas cercano', 'el más próximo'
+    ]
+    if any(frase in mensaje_lower for frase in frases_urgencia):
+        manana = ahora + timedelta(days=1)
+        while manana.weekday() >= 5:
+            manana += timedelta(days=1)
+        entidades['fecha'] = manana.strftime('%Y-%m-%d')
+    elif 'ese dia' in mensaje_lower or 'ese día' in mensaje_lower:
+        if hasattr(contexto, 'fecha_recomendada') and contexto.fecha_recomendada:
+            entidades['fecha'] = contexto.fecha_recomendada
+        elif contexto.fecha:
+            entidades['fecha'] = contexto.fecha
+    elif 'mañana' in mensaje_lower or 'manana' in mensaje_lower:
+        es_preferencia_horaria = any(frase in mensaje_lower for frase in [
+            'por la mañana', 'de mañana', 'en la mañana', 'a la mañana',
+            'no puedo por la mañana', 'no puedo de mañana', 'no puedo en la mañana'
+        ])
+        if not es_preferencia_horaria:
+            if any(frase in mensaje_lower for frase in ['pasado mañana', 'pasado manana', 'pasado ma�ana', 'el dia despues de mañana', 'el día después de mañana', 'dos dias', 'dos días']):
+                entidades['fecha'] = (ahora + timedelta(days=2)).strftime('%Y-%m-%d')
+            else:
+                entidades['fecha'] = (ahora + timedelta(days=1)).strftime('%Y-%m-%d')
+    elif any(frase in mensaje_lower for frase in ['dia siguiente', 'día siguiente', 'al dia siguiente', 'al día siguiente', 'el dia siguiente', 'el día siguiente']):
+        if contexto.fecha:
+            try:
+                fecha_siguiente = datetime.strptime(contexto.fecha, '%Y-%m-%d') + timedelta(days=1)
+                while fecha_siguiente.weekday() >= 5:
+                    fecha_siguiente += timedelta(days=1)
+                entidades['fecha'] = fecha_siguiente.strftime('%Y-%m-%d')
+            except:
+                entidades['fecha'] = (ahora + timedelta(days=1)).strftime('%Y-%m-%d')
+        else:
+            entidades['fecha'] = (ahora + timedelta(days=1)).strftime('%Y-%m-%d')
+    elif 'hoy' in mensaje_lower:
+        dias_match = RE_DIAS_DESDE_HOY.search(mensaje_lower)
+        if dias_match:
+            dias_palabras = {
+                'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5,
+                'seis': 6, 'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10
+            }
+            palabra_dias = dias_match.group(1).lower()
+            if palabra_dias in dias_palabras:
+                entidades['fecha'] = (ahora + timedelta(days=dias_palabras[palabra_dias])).strftime('%Y-%m-%d')
+            elif palabra_dias.isdigit():
+                entidades['fecha'] = (ahora + timedelta(days=int(palabra_dias))).strftime('%Y-%m-%d')
+            else:
+                entidades['fecha'] = ahora.strftime('%Y-%m-%d')
+        else:
+            entidades['fecha'] = ahora.strftime('%Y-%m-%d')
+    elif any(frase in mensaje_lower for frase in ['esta semana', 'semana actual']):
+        entidades['proxima_semana'] = False
+    elif any(frase in mensaje_lower for frase in ['proxima semana', 'próxima semana', 'siguiente semana', 'semana que viene']):
+        entidades['proxima_semana'] = True
+        dias_hasta_lunes = (7 - ahora.weekday()) % 7
+        if dias_hasta_lunes == 0:
+            dias_hasta_lunes = 7
+        entidades['fecha'] = (ahora + timedelta(days=dias_hasta_lunes)).strftime('%Y-%m-%d')
+    else:
+        dias_semana = {
+            'lunes': 0, 'martes': 1, 'miercoles': 2, 'miércoles': 2,
+            'jueves': 3, 'viernes': 4, 'sabado': 5, 'sábado': 5, 'domingo': 6
+        }
+        for dia_nombre, dia_num in dias_semana.items():
+            patrones_proximo = [
+                f'proximo {dia_nombre}', f'próximo {dia_nombre}', f'proxima {dia_nombre}', f'próxima {dia_nombre}',
+                f'el proximo {dia_nombre}', f'el próximo {dia_nombre}', f'la proxima {dia_nombre}',
+                f'la próxima {dia_nombre}', f'para el {dia_nombre}', f'para el dia {dia_nombre}', f'para el día {dia_nombre}'
+            ]
+            if any(patron in mensaje_lower for patron in patrones_proximo):
+                dias_hasta = (dia_num - ahora.weekday()) % 7
+                if dias_hasta == 0:
+                    dias_hasta = 7
+                entidades['fecha'] = (ahora + timedelta(days=dias_hasta)).strftime('%Y-%m-%d')
+                break
+        if 'fecha' not in entidades:
+            for dia_nombre, dia_num in dias_semana.items():
+                if dia_nombre in mensaje_lower:
+                    if contexto.fecha_recomendada:
+                        if datetime.strptime(contexto.fecha_recomendada, '%Y-%m-%d').weekday() == dia_num:
+                            entidades['fecha'] = contexto.fecha_recomendada
+                            break
+                    dias_hasta = (dia_num - ahora.weekday()) % 7
+                    if contexto.proxima_semana:
+                        dias_hasta = 7 if dias_hasta == 0 else dias_hasta + 7
+                    entidades['fecha'] = (ahora + timedelta(days=dias_hasta)).strftime('%Y-%m-%d')
+                    break
+        if 'fecha' not in entidades:
+            meses_espanol = {
+                'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6, 'julio': 7,
+                'agosto': 8, 'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12,
+                'ene': 1, 'feb': 2, 'mar': 3, 'abr': 4, 'may': 5, 'jun': 6,
+                'jul': 7, 'ago': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dic': 12
+            }
+            fecha_texto_match = RE_FECHA_TEXTO.search(mensaje_lower)
+            if fecha_texto_match:
+                dia = int(fecha_texto_match.group(1))
+                mes_texto = fecha_texto_match.group(2).lower()
+                if mes_texto in meses_espanol:
+                    mes = meses_espanol[mes_texto]
+                    anio = ahora.year
+                    if datetime(anio, mes, dia).date() < ahora.date():
+                        anio += 1
+                    entidades['fecha'] = f"{anio}-{mes:02d}-{dia:02d}"
+        if 'fecha' not in entidades:
+            fecha_match = RE_FECHA_NUMERICA.search(mensaje)
+            if fecha_match:
+                dia = int(fecha_match.group(1))
+                mes = int(fecha_match.group(2))
+                anio = int(fecha_match.group(4)) if fecha_match.group(4) else ahora.year
+                if anio < 100:
+                    anio += 2000
+                entidades['fecha'] = f"{anio}-{mes:02d}-{dia:02d}"
+
+    if ('ese horario' in mensaje_lower or 'esa hora' in mensaje_lower or 'ese hora' in mensaje_lower):
+        if hasattr(contexto, 'hora_recomendada') and contexto.hora_recomendada:
+            entidades['hora'] = contexto.hora_recomendada
+    if 'mediodía' in mensaje_lower or 'mediodia' in mensaje_lower or 'al mediodia' in mensaje_lower:
+        entidades['hora'] = '12:00'
+    if 'temprano' in mensaje_lower or 'bien temprano' in mensaje_lower or 'lo mas temprano' in mensaje_lower:
+        entidades['hora'] = '08:00'
+        entidades['franja_horaria'] = 'manana'
+    preferencia_negativa_manana = any(frase in mensaje_lower for frase in [
+        'no puedo por la mañana', 'no puedo de mañana', 'no puedo en la mañana',
+        'no puedo a la mañana', 'no puedo mañana', 'no me sirve la mañana',
+        'no me sirve por la mañana', 'no me viene bien la mañana'
+    ])
+    preferencia_negativa_tarde = any(frase in mensaje_lower for frase in [
+        'no puedo por la tarde', 'no puedo de tarde', 'no puedo en la tarde',
+        'no me sirve la tarde', 'no me sirve por la tarde', 'no me viene bien la tarde'
+    ])
+    if preferencia_negativa_manana:
+        entidades['franja_horaria'] = 'tarde'
+        entidades['preferencia_explicita'] = True
+    elif preferencia_negativa_tarde:
+        entidades['franja_horaria'] = 'manana'
+        entidades['preferencia_explicita'] = True
+    elif any(frase in mensaje_lower for frase in ['despues del mediodia', 'después del mediodía',
+                                                   'despues de mediod', 'después de mediod',
+                                                   'pasado el mediodia', 'pasado el mediodía']):
+        entidades['franja_horaria'] = 'tarde'
+        entidades['preferencia_explicita'] = True
+    elif 'por la tarde' in mensaje_lower or 'de tarde' in mensaje_lower or 'en la tarde' in mensaje_lower:
+        entidades['franja_horaria'] = 'tarde'
+    elif 'por la mañana' in mensaje_lower or 'de mañana' in mensaje_lower or 'en la mañana' in mensaje_lower or 'a la mañana' in mensaje_lower:
+        entidades['franja_horaria'] = 'manana'
+
+    hora_match = RE_HORA_HH_MM.search(mensaje)
+    if hora_match:
+        entidades['hora'] = f"{int(hora_match.group(1)):02d}:{hora_match.group(2)}"
+    else:
+        for hora_palabra, hora_num, patron_texto in HORAS_TEXTO_PATRONES:
+            hora_texto_match = patron_texto.search(mensaje_lower)
+            if hora_texto_match:
+                fraccion = hora_texto_match.group(1)
+                if hora_num < 7:
+                    hora_num += 12
+                if 'media' in fraccion:
+                    minutos = "30"
+                elif 'menos cuarto' in fraccion:
+                    hora_num -= 1
+                    minutos = "45"
+                else:
+                    minutos = "15"
+                entidades['hora'] = f"{hora_num:02d}:{minutos}"
+                break
+        if 'hora' not in entidades:
+            hora_match = RE_HORA_FRACCION.search(mensaje_lower)
+            if hora_match:
+                hora = int(hora_match.group(1))
+                if hora < 7:
+                    hora += 12
+                if 'media' in hora_match.group(2):
+                    minutos = "30"
+                elif 'menos cuarto' in hora_match.group(2):
+                    hora -= 1
+                    minutos = "45"
+                else:
+                    minutos = "15"
+                entidades['hora'] = f"{hora:02d}:{minutos}"
+        else:
+            # Quedaba colgado del `if 'hora' not in entidades`: solo corría si ya había una hora
+            hora_match = RE_HORA_LAS.search(mensaje_lower)
+            if hora_match:
+                hora = int(hora_match.group(1))
+                if hora < 7:
+                    hora += 12
+                entidades['hora'] = f"{hora:02d}:00"
+            else:
+                hora_match = RE_HORA_SUFIJO.search(mensaje_lower)
+                if hora_match:
+                    hora = int(hora_match.group(1))
+                    if hora_match.group(2) == 'pm' and hora < 12:
+                        hora += 12
+                    entidades['hora'] = f"{hora:02d}:00"
+                else:
+                    hora_match = RE_HORA_NUMERO_SOLO.search(mensaje)
+                    if hora_match:
+                        hora = int(hora_match.group(1))
+                        if 0 <= hora <= 23:
+                            if hora < 7:
+                                hora += 12
+                            entidades['hora'] = f"{hora:02d}:00"
+
+    if not entidades.get('preferencia_explicita'):
+        if any(frase in mensaje_lower for frase in ['por la tarde', 'de tarde', 'en la tarde', 'a la tarde', 'despues del mediodia', 'después del mediodía', 'para mañana por la tarde', 'mañana por la tarde']):
+            entidades['franja_horaria'] = 'tarde'
+        elif any(frase in mensaje_lower for frase in ['por la mañana', 'de mañana', 'en la mañana', 'a la mañana', 'para mañana por la mañana']):
+            entidades['franja_horaria'] = 'manana'
+        elif 'tarde' in mensaje_lower:
+            entidades['franja_horaria'] = 'tarde'
+        elif any(palabra in mensaje_lower for palabra in ['mañana', 'manana', 'temprano']) and 'por la tarde' not in mensaje_lower:
+            entidades['franja_horaria'] = 'manana'
+    return entidades
+
+def parser_nuevo(mensaje, contexto, ahora):
+    return interpretar_fecha_hora(mensaje.lower(), contexto, ahora=ahora).entidades()
+
+# =====================================================
+# TESTS
+# =====================================================
+
+print("=" * 60)
+print("TEST: Parser temporal")
+print("=" * 60)
+
+print("\n[Test 1] Formatos (hoy = miércoles 12/11/2025)")
+casos = [
+    ("mañana", {'fecha': dias(1), 'franja_horaria': 'manana'}),
+    ("pasado mañana", {'fecha': dias(2), 'franja_horaria': 'manana'}),
+    ("hoy", {'fecha': dias(0)}),
+    ("dos días desde hoy", {'fecha': dias(2)}),
+    ("5 dias a partir de hoy", {'fecha': dias(5)}),
+    ("la próxima semana", {'fecha': '2025-11-17', 'proxima_semana': True}),
+    ("esta semana", {'proxima_semana': False}),
+    ("jueves", {'fecha': '2025-11-13'}),
+    ("el miércoles", {'fecha': '2025-11-12'}),
+    ("para el próximo jueves", {'fecha': '2025-11-13'}),
+    ("el próximo miércoles", {'fecha': '2025-11-19'}),
+    ("para el lunes", {'fecha': '2025-11-17'}),
+    ("lo antes posible", {'fecha': '2025-11-13'}),
+    ("15 de Noviembre", {'fecha': '2025-11-15'}),
+    ("para el 25 de abril", {'fecha': '2026-04-25'}),
+    ("el 3 de dic", {'fecha': '2025-12-03'}),
+    ("20/11", {'fecha': '2025-11-20'}),
+    ("15-12-25", {'fecha': '2025-12-15'}),
+    ("a las 09:30", {'hora': '09:30'}),
+    ("una y media", {'hora': '13:30'}),
+    ("diez y cuarto", {'hora': '10:15'}),
+    ("a las 3 y media", {'hora': '15:30'}),
+    ("11 menos cuarto", {'hora': '10:45'}),
+    ("a las 10", {'hora': '10:00'}),
+    ("las 2", {'hora': '14:00'}),
+    ("10 hs", {'hora': '10:00'}),
+    ("3 pm", {'hora': '15:00'}),
+    ("9", {'hora': '09:00'}),
+    ("al mediodía", {'hora': '12:00'}),
+    ("bien temprano", {'hora': '08:00', 'franja_horaria': 'manana'}),
+    ("mañana por la tarde", {'fecha': dias(1), 'franja_horaria': 'tarde'}),
+    ("mañana por la mañana", {'franja_horaria': 'manana'}),
+    ("no puedo por la mañana", {'franja_horaria': 'tarde', 'preferencia_explicita': True}),
+    ("después del mediodía", {'hora': '12:00', 'franja_horaria': 'tarde', 'preferencia_explicita': True}),
+    ("mañana a las 10:30", {'fecha': dias(1), 'hora': '10:30', 'franja_horaria': 'manana'}),
+]
+fallidos = []
+for mensaje, esperado in casos:
+    obtenido = parser_nuevo(mensaje, SessionContext('t'), AHORA)
+    if obtenido != esperado:
+        fallidos.append((mensaje, obtenido, esperado))
+for mensaje, obtenido, esperado in fallidos:
+    print(f"      '{mensaje}': {obtenido} (esperado {esperado})")
+verificar(f"{len(casos) - len(fallidos)}/{len(casos)} formatos", not fallidos)
+
+print("\n[Test 2] Spans sobre el texto en minúsculas")
+texto = "quiero turno el 15 de noviembre a las 3 y media"
+resultado = interpretar_fecha_hora(texto, ahora=AHORA)
+verificar("fecha con span", resultado.fecha == '2025-11-15' and texto[slice(*resultado.fecha_span)] == '15 de noviembre')
+verificar("hora con span", resultado.hora == '15:30' and texto[slice(*resultado.hora_span)] == '3 y media')
+texto = "pasado mañana a las 10"
+resultado = interpretar_fecha_hora(texto, ahora=AHORA)
+verificar("span de palabra clave", texto[slice(*resultado.fecha_span)] == 'pasado mañana')
+verificar("span de 'las X' hasta el número", texto[slice(*resultado.hora_span)] == 'las 10')
+verificar("sin fecha ni hora → sin spans", interpretar_fecha_hora("hola", ahora=AHORA).fecha_span is None)
+texto = "el miércoles, ese horario"
+contexto = SessionContext('t')
+contexto.hora_recomendada = '09:00'
+resultado = interpretar_fecha_hora(texto, contexto, ahora=AHORA)
+verificar("span con acentos sobre el texto original", texto[slice(*resultado.fecha_span)] == 'miércoles')
+verificar("si dos frases empiezan igual, la más larga", texto[slice(*resultado.hora_span)] == 'ese horario')
+
+print("\n[Test 3] Reglas que dependen del contexto")
+contexto = SessionContext('t')
+contexto.fecha_recomendada = '2025-11-20'
+contexto.hora_recomendada = '09:30'
+verificar("'ese día' usa la fecha recomendada", parser_nuevo("ese día", contexto, AHORA)['fecha'] == '2025-11-20')
+verificar("'esa hora' usa la hora recomendada", parser_nuevo("a esa hora", contexto, AHORA)['hora'] == '09:30')
+verificar("el día que recomendó el bot se confirma", parser_nuevo("jueves", contexto, AHORA)['fecha'] == '2025-11-20')
+contexto = SessionContext('t')
+contexto.fecha = '2025-11-14'  # Viernes
+verificar("'al día siguiente' salta el fin de semana", parser_nuevo("al día siguiente", contexto, AHORA)['fecha'] == '2025-11-17')
+contexto.proxima_semana = True
+verificar("con 'próxima semana' en contexto el día es de la semana que viene",
+          parser_nuevo("el jueves", contexto, AHORA)['fecha'] == '2025-11-20')
+verificar("sin contexto no falla", parser_nuevo("ese día al día siguiente", None, AHORA) == {})
+
+print("\n[Test 4] Mismo resultado que la cascada original (data/nlu.yml)")
+ejemplos = ejemplos_nlu() + [mensaje for mensaje, _ in casos]
+iguales, recuperadas, distintos = 0, [], []
+for mensaje in ejemplos:
+    contexto = SessionContext('t')
+    antes = cascada_original(mensaje, contexto, AHORA)
+    ahora = parser_nuevo(mensaje, contexto, AHORA)
+    if antes == ahora:
+        iguales += 1
+    elif 'hora' not in antes and {k: v for k, v in ahora.items() if k != 'hora'} == antes:
+        recuperadas.append((mensaje, ahora['hora']))  # "las X", "X hs", "9" que la cascada no llegaba a mirar
+    else:
+        distintos.append((mensaje, antes, ahora))
+for mensaje, antes, ahora in distintos:
+    print(f"      '{mensaje}': {antes} → {ahora}")
+print(f"   {iguales}/{len(ejemplos)} iguales, {len(recuperadas)} con una hora que la cascada perdía:")
+for mensaje, hora in recuperadas[:8]:
+    print(f"      '{mensaje}' → {hora}")
+verificar("el resto es idéntico", not distintos)
+
+print(f"\n[Test 5] CPU por mensaje ({REPETICIONES} pasadas sobre {len(ejemplos)} mensajes)")
+
+def cpu_por_mensaje(funcion, mensajes):
+    inicio = time.process_time()
+    for _ in range(REPETICIONES):
+        for mensaje in mensajes:
+            funcion(mensaje)
+    return (time.process_time() - inicio) / (REPETICIONES * len(mensajes)) * 1e6
+
+contexto = SessionContext('t')
+escaneos = {mensaje: AUTOMATA_TEMPORAL.escanear(mensaje.lower()) for mensaje in ejemplos}
+original = cpu_por_mensaje(lambda m: cascada_original(m, contexto, AHORA), ejemplos)
+propio = cpu_por_mensaje(lambda m: interpretar_fecha_hora(m.lower(), contexto, ahora=AHORA), ejemplos)
+compartido = cpu_por_mensaje(lambda m: interpretar_fecha_hora(m.lower(), contexto, escaneos[m], AHORA), ejemplos)
+print(f"   cascada original: {original:.2f} µs/msg")
+print(f"   parser (con su propio escaneo de frases): {propio:.2f} µs/msg")
+print(f"   parser (frases del recorrido de AnalisisMensaje): {compartido:.2f} µs/msg")
+verificar("el parser cuesta menos que la cascada", propio < original)
+
+terminar()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Test de los proveedores de ocupación del motor difuso (proveedor_ocupacion.py)
+No necesita Postgres: las consultas a turnos se reemplazan por funciones que
+devuelven agregados fijos. Verifica el % por capacidad, el perfil por día de semana,
+los respaldos, la persistencia del perfil y la memoria por (fecha, franja).
+
+Ejecutar: python tests/test_proveedor_ocupacion.py
+"""
+
+import os
+import sys
+import time
+import logging
+import datetime
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+import motor_difuso
+from cache_ocupacion import cache_ocupacion
+from proveedor_ocupacion import (
+    ProveedorOcupacionBD, ProveedorPerfilHistorico, ProveedorPatronFijo,
+    fijar_proveedor_ocupacion, hora_a_slot, HORARIOS_ATENCION
+)
+from verificacion import verificar, terminar
+
+logging.disable(logging.CRITICAL)  # Los respaldos ante BD caída loguean advertencias esperadas
+
+LUNES = datetime.date(2026, 10, 19)
+consultas_dia = []
+
+def turnos_dia(fecha):
+    """2 turnos a las 07:00 (lleno) y 1 a las 09:30"""
+    consultas_dia.append(fecha)
+    return [('07:00', 2), ('09:30', 1)]
+
+def historico(desde, hasta):
+    """8 semanas: los lunes 07:00 tuvieron 16 turnos (lleno siempre), los martes 08:00 tuvieron 4"""
+    return [(0, '07:00', 16), (1, '08:00', 4), (0, '18:00', 3)]
+
+def bd_caida(*args):
+    raise ConnectionError("sin BD")
+
+print("=" * 60)
+print("TEST: Proveedores de ocupación")
+print("=" * 60)
+
+print("\n[Test 1] Patrón fijo determinista")
+fijo = ProveedorPatronFijo()
+verificar("misma fecha y hora, misma ocupación", fijo.ocupacion(LUNES, 10) == fijo.ocupacion(LUNES, 10))
+verificar("lunes 10:00 = 85 * 1.2 = 100 (recortado)", fijo.ocupacion(LUNES, 10) == 100.0)
+verificar("martes 8:00 = 45 * 0.9", abs(fijo.ocupacion(LUNES + datetime.timedelta(days=1), 8) - 40.5) < 1e-9)
+
+print("\n[Test 2] Ocupación real desde turnos")
+cache_ocupacion.invalidar()
+bd = ProveedorOcupacionBD(respaldo=fijo, consultar=turnos_dia)
+valores = bd.ocupaciones_dia(LUNES, [7, 7.5, 9.5, 16])
+verificar("07:00 con 2 de 2 turnos = 100%", valores[0] == 100.0)
+verificar("07:30 sin turnos = 0%", valores[1] == 0.0)
+verificar("09:30 con 1 turno = 50%", valores[2] == 50.0)
+verificar("16:00 fuera de atención usa el respaldo", valores[3] == fijo.ocupacion(LUNES, 16))
+bd.ocupaciones_dia(LUNES, [8])
+verificar("segunda lectura servida por cache_ocupacion", len(consultas_dia) == 1)
+cache_ocupacion.registrar_reserva('2026-10-19', '07:30')
+verificar("write-through del cache se ve en la ocupación", bd.ocupacion(LUNES, 7.5) == 50.0)
+cache_ocupacion.invalidar()
+verificar("BD caída usa el respaldo completo",
+          ProveedorOcupacionBD(respaldo=fijo, consultar=bd_caida).ocupaciones_dia(LUNES, [7, 9.5]) ==
+          fijo.ocupaciones_dia(LUNES, [7, 9.5]))
+
+print("\n[Test 3] Perfil histórico por día de semana y media hora")
+perfil = ProveedorPerfilHistorico(respaldo=fijo, consultar=historico, semanas=8)
+perfil.recalcular()
+martes = LUNES + datetime.timedelta(days=1)
+verificar("lunes 07:00 = 16 turnos / 8 semanas / 2 = 100%", perfil.ocupacion(LUNES, 7) == 100.0)
+verificar("martes 08:00 = 4 / 8 / 2 = 25%", perfil.ocupacion(martes, 8) == 25.0)
+verificar("horario de atención sin turnos = 0%", perfil.ocupacion(martes, 12) == 0.0)
+verificar("fuera de atención usa el respaldo", perfil.ocupacion(martes, 16.5) == fijo.ocupacion(martes, 16.5))
+verificar("el perfil cubre todos los horarios de atención", len(perfil.perfil[0]) == len(HORARIOS_ATENCION))
+
+sin_bd = ProveedorPerfilHistorico(respaldo=fijo, consultar=bd_caida)
+verificar("sin BD el perfil cae al patrón fijo", sin_bd.ocupaciones_dia(LUNES, [7, 10]) == fijo.ocupaciones_dia(LUNES, [7, 10]))
+sin_historia = ProveedorPerfilHistorico(respaldo=fijo, consultar=lambda desde, hasta: [])
+verificar("sin historia el perfil cae al patrón fijo", sin_historia.ocupacion(LUNES, 10) == fijo.ocupacion(LUNES, 10))
+
+print("\n[Test 4] Perfil persistido en JSON")
+with tempfile.TemporaryDirectory() as carpeta:
+    archivo = os.path.join(carpeta, 'perfil.json')
+    ProveedorPerfilHistorico(respaldo=fijo, consultar=historico, archivo=archivo).recalcular()
+    cargado = ProveedorPerfilHistorico(respaldo=fijo, consultar=bd_caida, archivo=archivo)
+    verificar("el perfil se carga sin ir a la BD", cargado.ocupacion(martes, 8) == 25.0)
+    otra_ventana = ProveedorPerfilHistorico(respaldo=fijo, consultar=bd_caida, semanas=4, archivo=archivo)
+    verificar("con otra ventana de semanas el archivo se ignora", otra_ventana.perfil is None)
+
+print("\n[Test 5] analizar_disponibilidad_dia reproducible y memorizado")
+cache_ocupacion.invalidar()
+consultas_dia.clear()
+fijar_proveedor_ocupacion(ProveedorOcupacionBD(respaldo=perfil, consultar=turnos_dia))
+inicio = time.perf_counter()
+primero = motor_difuso.analizar_disponibilidad_dia(LUNES)
+tiempo_frio = time.perf_counter() - inicio
+inicio = time.perf_counter()
+segundo = motor_difuso.analizar_disponibilidad_dia(LUNES)
+tiempo_memo = time.perf_counter() - inicio
+print(f"   en frío: {tiempo_frio * 1000:.2f} ms | memorizado: {tiempo_memo * 1000:.3f} ms")
+verificar("dos llamadas dan el mismo análisis", primero == segundo)
+verificar("mismo orden de franjas", list(segundo) == list(motor_difuso.FRANJAS_DIA))
+verificar("las franjas solo usan horarios de atención",
+          all(hora_a_slot(h) in HORARIOS_ATENCION for f in motor_difuso.FRANJAS_DIA.values() for h in f['horas']))
+verificar("temprano refleja las 07:00 llenas", primero['temprano']['ocupacion'] == 20.0)
+segundo['manana']['horarios_sugeridos'].append('99:99')
+verificar("modificar el resultado no altera la memoria",
+          motor_difuso.analizar_disponibilidad_dia(LUNES)['manana'] == primero['manana'])
+
+cache_ocupacion.registrar_reserva('2026-10-19', '10:00')
+tercero = motor_difuso.analizar_disponibilidad_dia(LUNES)
+verificar("una reserva nueva recalcula solo su franja", tercero['manana'] != primero['manana'] and
+          all(tercero[f] == primero[f] for f in ('temprano', 'mediodia', 'tarde')))
+verificar("la franja recalculada coincide con un análisis sin memoria",
+          tercero['manana']['ocupacion'] == round(sum(ProveedorOcupacionBD(respaldo=perfil, consultar=turnos_dia)
+                                                      .ocupaciones_dia(LUNES, motor_difuso.FRANJAS_DIA['manana']['horas'])) / 5, 1))
+fijar_proveedor_ocupacion(None)
+cache_ocupacion.invalidar()
+
+terminar()
@@ -44,7 +44,7 @@ for i, mensaje in enumerate(casos, 1):
     contexto = SessionContext(session_id=f"test_{i}")
     
     # Clasificar
-    intent, confianza = clasificador.clasificar(mensaje, contexto)
+    intent, confianza, _ = clasificador.clasificar(mensaje, contexto)
     print(f"   Intent: {intent} (confianza: {confianza})")
     
     # Extraer entidades
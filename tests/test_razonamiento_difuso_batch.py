@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Test del modo batch del razonador difuso (matriz dispersa de keywords x pesos)
+Verifica que clasificar_lote_con_logica_difusa y calculate_all_memberships_batch
+den exactamente lo mismo que el camino escalar mensaje a mensaje, y mide el
+throughput sobre un lote del tamaño de los logs de conversation_messages.
+
+Ejecutar: python tests/test_razonamiento_difuso_batch.py
+"""
+
+import sys
+import time
+import random
+import logging
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+import razonamiento_difuso
+from razonamiento_difuso import fuzzy_reasoner, clasificar_lote_con_logica_difusa, FUZZY_KEYWORDS
+from verificacion import verificar, terminar
+
+logging.disable(logging.CRITICAL)  # classify_with_fuzzy_logic loguea cada clasificación
+
+MENSAJES = 20000
+
+def ejemplos_nlu():
+    """Ejemplos de data/nlu.yml (líneas '    - texto')"""
+    with open(PROJECT_ROOT / 'data' / 'nlu.yml', encoding='utf-8') as f:
+        return [linea[6:].strip() for linea in f if linea.startswith('    - ')]
+
+print("=" * 60)
+print("TEST: Modo batch del razonador difuso")
+print("=" * 60)
+
+# Ejemplos reales + mensajes armados con keywords y relleno; como en los logs,
+# el lote se sortea con repetición de ese conjunto ("si", "hola" aparecen miles de veces)
+generador = random.Random(5)
+keywords = [k for niveles in FUZZY_KEYWORDS.values() for lista in niveles.values() for k in lista]
+relleno = ['turno', 'bueno', 'hola', 'cédula', 'el', 'de', '?', 'gracias', 'xyz', '']
+distintos = ejemplos_nlu()
+while len(distintos) < MENSAJES // 4:
+    distintos.append(' '.join(generador.choices(keywords + relleno * 3, k=generador.randint(1, 10))))
+mensajes = distintos + generador.choices(distintos, k=MENSAJES - len(distintos))
+
+print(f"\n[Test 1] Membresías batch vs escalar ({len(mensajes)} mensajes)")
+inicio = time.perf_counter()
+escalares = [fuzzy_reasoner.calculate_all_memberships(m) for m in mensajes]
+tiempo_escalar = time.perf_counter() - inicio
+inicio = time.perf_counter()
+lote = fuzzy_reasoner.calculate_all_memberships_batch(mensajes)
+tiempo_lote = time.perf_counter() - inicio
+iguales = sum(1 for a, b in zip(lote, escalares) if a == b and list(a) == list(b))
+verificar(f"mismos scores y orden en {iguales}/{len(mensajes)} mensajes", iguales == len(mensajes))
+
+print("\n[Test 2] Clasificación batch vs classify_with_fuzzy_logic")
+for umbral in (0.3, 0.5, 0.0):
+    escalares = [fuzzy_reasoner.classify_with_fuzzy_logic(m, umbral) for m in mensajes[:5000]]
+    lote_clasificado = clasificar_lote_con_logica_difusa(mensajes[:5000], umbral)
+    verificar(f"mismas clasificaciones con umbral {umbral}", lote_clasificado == escalares)
+
+print("\n[Test 3] Bloques y casos borde")
+razonamiento_difuso.MENSAJES_POR_BLOQUE = 7
+verificar("bloques pequeños dan el mismo resultado",
+          fuzzy_reasoner.calculate_all_memberships_batch(mensajes[:50]) == lote[:50])
+razonamiento_difuso.MENSAJES_POR_BLOQUE = 4096
+verificar("lote vacío", clasificar_lote_con_logica_difusa([]) == [])
+verificar("mensaje sin keywords → nlu_fallback 0.0", clasificar_lote_con_logica_difusa(['xyz']) == [('nlu_fallback', 0.0)])
+verificar("matriz mensajes x intents", fuzzy_reasoner.calculate_memberships_matrix(mensajes[:3]).shape ==
+          (3, len(fuzzy_reasoner.intents)))
+
+print("\n[Test 4] Throughput")
+print(f"   escalar: {len(mensajes) / tiempo_escalar:,.0f} mensajes/s | batch: {len(mensajes) / tiempo_lote:,.0f} mensajes/s")
+verificar("el batch no es más lento que el escalar", tiempo_lote <= tiempo_escalar)
+
+terminar()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Test del índice invertido de keywords de FuzzyIntentReasoner
+Compara las membresías del índice (una sola pasada por el mensaje) contra el
+recorrido original intent x keyword con `keyword in mensaje` (ambos sin acentos) sobre los ejemplos
+de data/nlu.yml y mensajes al azar, y mide la latencia de ambos caminos.
+
+Ejecutar: python tests/test_razonamiento_difuso_indice.py
+"""
+
+import sys
+import time
+import random
+import logging
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / 'flask-chatbot'))
+
+from razonamiento_difuso import FuzzyIntentReasoner, FUZZY_KEYWORDS, FUZZY_WEIGHTS
+from automata_frases import plegar_acentos
+from verificacion import verificar, terminar
+
+logging.disable(logging.CRITICAL)
+
+def membresias_referencia(mensaje):
+    """Cálculo original: recorre cada intent y cada keyword buscando substrings (sin acentos)"""
+    mensaje_lower = plegar_acentos(mensaje.lower())
+    memberships = {}
+    for intent, niveles in FUZZY_KEYWORDS.items():
+        total_score = 0.0
+        total_weight = 0.0
+        vistas = set()  # "cuándo" y "cuando" son la misma keyword del intent
+        for nivel, keywords in niveles.items():
+            peso = FUZZY_WEIGHTS[nivel]
+            for keyword in keywords:
+                keyword = plegar_acentos(keyword)
+                if keyword in vistas:
+                    continue
+                vistas.add(keyword)
+                if keyword in mensaje_lower:
+                    multiplicador = 2.0 if ' ' in keyword else 1.0
+                    total_score += peso * multiplicador
+                    total_weight += peso * multiplicador
+        score = min(total_score / (total_weight + 1), 1.0) if total_weight > 0 else 0.0
+        if score > 0:
+            memberships[intent] = score
+    return memberships
+
+def ejemplos_nlu():
+    """Ejemplos de data/nlu.yml (líneas '    - texto')"""
+    ejemplos = []
+    with open(PROJECT_ROOT / 'data' / 'nlu.yml', encoding='utf-8') as f:
+        for linea in f:
+            if linea.startswith('    - '):
+                ejemplos.append(linea[6:].strip())
+    return ejemplos
+
+print("=" * 60)
+print("TEST: Índice invertido del razonador difuso")
+print("=" * 60)
+
+reasoner = FuzzyIntentReasoner()
+corpus = ejemplos_nlu()
+
+# Mensajes al azar armados con keywords (incluye substrings dentro de palabras y mayúsculas)
+generador = random.Random(11)
+keywords = [k for niveles in FUZZY_KEYWORDS.values() for lista in niveles.values() for k in lista]
+relleno = ['turno', 'bueno', 'nos', 'mayo', 'cédula', 'el', 'de', 'y', '¿', '?', 'ÑANDÚ', 'Hola']
+for _ in range(1000):
+    palabras = generador.choices(keywords + relleno, k=generador.randint(1, 8))
+    corpus.append(' '.join(p.upper() if generador.random() < 0.1 else p for p in palabras))
+corpus += ['', '   ', 'xyz', 'noooo', 'siiii', 'cuanto antes mejor', 'turno rápido por favor']
+
+print(f"\n[Test 1] Membresías idénticas ({len(corpus)} mensajes)")
+distintos = [m for m in corpus if reasoner.calculate_all_memberships(m) != membresias_referencia(m)]
+verificar(f"mismos scores en {len(corpus) - len(distintos)}/{len(corpus)} mensajes", not distintos)
+for mensaje in distintos[:5]:
+    print(f"      '{mensaje}': {reasoner.calculate_all_memberships(mensaje)} vs {membresias_referencia(mensaje)}")
+orden_igual = all(list(reasoner.calculate_all_memberships(m)) == list(membresias_referencia(m)) for m in corpus)
+verificar("mismo orden de intents (desempates de max iguales)", orden_igual)
+
+print("\n[Test 2] Substrings dentro de palabras")
+verificar("'no' dentro de 'turno' sigue contando para negacion",
+          'negacion' in reasoner.calculate_all_memberships('turno'))
+verificar("keyword multi-palabra con doble peso", reasoner.calculate_fuzzy_membership('turno rapido', 'frase_ambigua') ==
+          membresias_referencia('turno rapido')['frase_ambigua'])
+verificar("sin acentos: 'cuándo' = 'cuando' y las dos juntas cuentan una vez",
+          reasoner.calculate_all_memberships('cuándo') == reasoner.calculate_all_memberships('cuando')
+          == reasoner.calculate_all_memberships('cuando o cuándo'))
+verificar("intent desconocido = 0.0", reasoner.calculate_fuzzy_membership('hola', 'inexistente') == 0.0)
+
+print("\n[Test 3] Clasificación")
+for mensaje, esperado in [('quiero agendar un turno', 'agendar_turno'), ('cuanto cuesta?', 'consultar_costo'),
+                          ('si confirmo', 'affirm'), ('lo antes posible', 'frase_ambigua')]:
+    intent, _ = reasoner.classify_with_fuzzy_logic(mensaje)
+    verificar(f"'{mensaje}' → {esperado}", intent == esperado)
+
+print("\n[Test 4] Latencia")
+inicio = time.perf_counter()
+for mensaje in corpus:
+    membresias_referencia(mensaje)
+tiempo_referencia = time.perf_counter() - inicio
+inicio = time.perf_counter()
+for mensaje in corpus:
+    reasoner.calculate_all_memberships(mensaje)
+tiempo_indice = time.perf_counter() - inicio
+print(f"   original: {tiempo_referencia * 1e6 / len(corpus):.1f} µs/mensaje | "
+      f"índice: {tiempo_indice * 1e6 / len(corpus):.1f} µs/mensaje")
+verificar("el índice no es más lento que el recorrido original", tiempo_indice <= tiempo_referencia)
+
+terminar()
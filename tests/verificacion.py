@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Verificaciones compartidas por los tests que se ejecutan como script
+Cada test importa verificar() para sus chequeos y termina con terminar(),
+que imprime el resumen y sale con código 1 si alguna verificación falló.
+"""
+
+import sys
+
+errores = 0
+
+def verificar(descripcion, condicion):
+    """Imprime [OK]/[FAIL] con la descripción y cuenta las fallas"""
+    global errores
+    print(f"   {'[OK]' if condicion else '[FAIL]'} {descripcion}")
+    if not condicion:
+        errores += 1
+
+def terminar():
+    """Resumen final; código de salida distinto de cero si hubo fallas"""
+    print("\n" + "=" * 60)
+    print("[*] Tests completados" if not errores else f"[FAIL] {errores} verificaciones fallaron")
+    print("=" * 60)
+    sys.exit(1 if errores else 0)